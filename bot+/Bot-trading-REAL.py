@@ -11,9 +11,19 @@ def log_event(text):
 # CONFIGURADO PARA TRADING REAL CON $10 USD
 
 from binance.client import Client
+import os
 import numpy as np
 import time
 import threading
+from rate_limiter import RateLimitedClient
+from market_data_sidecar import MarketDataClient, KLINES_MAX_AGE
+from candle_ring import read_candles, COLUMN_INDEX
+from metrics_server import BotMetrics, get_metrics_port
+from state_journal import StateJournal
+from execution import OrderExecutor, MODE_AUTO, MODE_MARKET
+from risk_service import RiskClient
+from order_manager import ProtectiveOrders, start_user_stream, STOP_LIMIT_OFFSET_BPS
+from scheduler import CandleScheduler
 
 # Importar configuración segura
 try:
@@ -42,54 +52,210 @@ STOP_LOSS_PCT = 0.002  # 0.2% stop loss (más conservador)
 TAKE_PROFIT_PCT = 0.005  # 0.5% take profit (más conservador)
 MAX_TRADES_PER_DAY = 30  # Límite más conservador para dinero real
 
+# Ejecución: MARKET si el libro absorbe la orden con poco slippage, si no LIMIT IOC
+EXECUTION_MODE = MODE_AUTO
+MAX_SLIPPAGE_BPS = 5.0  # 0.05% máximo contra el precio medio en compras
+
 # INICIALIZACIÓN CON TRADING REAL
-client = Client(API_KEY, API_SECRET)
+# Exchange alternativo (ej: fake_exchange.py local): BINANCE_API_URL=http://127.0.0.1:8800/api
+if os.getenv('BINANCE_API_URL'):
+    Client.API_URL = os.getenv('BINANCE_API_URL')
+# Velas y ticker por el sidecar local si está corriendo (un solo fetch para todos los bots de la VM)
+client = MarketDataClient(RateLimitedClient(Client(API_KEY, API_SECRET), log=log_event), log=log_event)
 
 trade_count = 0
 last_buy_price = None
+position_qty = 0.0
+position_profit = 0.0  # P&L de las ventas parciales de la posición abierta
 total_profit = 0.0
 current_balance = INITIAL_BALANCE
 
+# Métricas en vivo (consultables por HTTP local)
+metrics = BotMetrics('basic_real')
+
+# Ejecución consciente del libro de órdenes
+executor = OrderExecutor(client, SYMBOL, mode=EXECUTION_MODE, max_slippage_bps=MAX_SLIPPAGE_BPS, log=log_event)
+
+# Diario de estado: no perder la compra REAL abierta si el proceso cae
+journal = StateJournal('basic_real')
+
+# Riesgo de toda la flota (servicio local compartido por todos los bots)
+risk = RiskClient('basic_real', log=log_event)
+
+# Stop loss y take profit como OCO en el exchange (se ejecutan entre iteraciones del loop)
+protection = ProtectiveOrders(client, SYMBOL, log=log_event)
+
+# Despertar al cerrar cada vela en lugar de dormir 60 s fijos (sin espaciar ciclos: dinero real)
+scheduler = CandleScheduler(INTERVAL, log=log_event)
+
+def restore_state():
+    """Restaurar posición y contadores desde el diario de estado"""
+    global trade_count, last_buy_price, position_qty, position_profit, total_profit, current_balance
+    state = journal.restore()
+    if not state:
+        return
+    # El límite de trades es diario: el contador solo se conserva dentro del mismo día
+    if state.get('trade_date') == datetime.date.today().isoformat():
+        trade_count = state.get('trade_count', 0)
+    last_buy_price = state.get('last_buy_price')
+    position_qty = state.get('position_qty', QUANTITY if last_buy_price else 0.0)
+    position_profit = state.get('position_profit', 0.0)
+    total_profit = state.get('total_profit', 0.0)
+    current_balance = state.get('current_balance', INITIAL_BALANCE)
+    # La OCO pudo ejecutarse con el bot caído: restore() la concilia y deja la salida en fills()
+    protection.restore(state.get('protection'))
+    log_event(f"💾 Estado restaurado: Balance ${current_balance:.2f} USD | Trades: {trade_count}")
+    if last_buy_price:
+        log_event(f"📍 Compra REAL abierta restaurada: ${last_buy_price:.2f}")
+
+def save_state(event):
+    """Registrar el estado actual en el diario antes de continuar"""
+    journal.record(event, trade_count=trade_count, trade_date=datetime.date.today().isoformat(),
+                   last_buy_price=last_buy_price, position_qty=position_qty, position_profit=position_profit,
+                   total_profit=total_profit, current_balance=current_balance, protection=protection.export())
+
+def record_sell(icon, label, executed_price, executed_qty):
+    """Contabilizar una venta; si falló o fue parcial, el resto sigue en posición con su OCO"""
+    global trade_count, last_buy_price, position_qty, position_profit, total_profit, current_balance
+    if executed_price:
+        print(f"{icon} {label} a ${executed_price:.2f}")
+        log_event(f"{label} a ${executed_price:.2f}")
+        profit = (executed_price - last_buy_price) * executed_qty
+        position_profit += profit
+        total_profit += profit
+        current_balance += (executed_qty * executed_price)  # Recuperar balance
+        log_event(f"Ganancia/Pérdida: ${profit:.2f} USD | Acumulado: ${total_profit:.2f} USD | Balance: ${current_balance:.2f} USD")
+    else:
+        executed_qty = 0.0
+    
+    remaining = position_qty - executed_qty
+    price = executed_price or last_buy_price
+    if remaining > position_qty * 0.001 and not executor.below_minimum(remaining, price):
+        # Se reintenta la salida en la próxima iteración; mientras tanto la protege el exchange
+        position_qty = remaining
+        log_event(f"⚠️  Venta incompleta: quedan {remaining:.8f} BTC en posición, se reintenta")
+        if not protection.protect(SYMBOL, remaining, last_buy_price * (1 - STOP_LOSS_PCT),
+                                  last_buy_price * (1 + TAKE_PROFIT_PCT)):
+            log_event("⚠️  Sin OCO en el exchange: SL/TP por polling")
+        save_state('partial_sell')
+        risk.sync([{'id': SYMBOL, 'symbol': SYMBOL, 'notional': remaining * price, 'price': price}],
+                  equity=current_balance + remaining * price)
+        return
+    
+    risk.closed(SYMBOL, position_profit, equity=current_balance)
+    last_buy_price = None
+    position_qty = 0.0
+    position_profit = 0.0
+    trade_count += 1
+    save_state('sell')
+
+def apply_exchange_exits():
+    """Registrar las ventas que ejecutó la OCO del exchange (stream o conciliación REST)"""
+    protection.reconcile()
+    for fill in protection.fills():
+        if last_buy_price is None:
+            continue
+        executed_price, executed_qty = fill['price'], fill['quantity']
+        # Si la OCO se llenó en parte, vender el resto a mercado
+        remaining = position_qty - executed_qty
+        if remaining > position_qty * 0.001:
+            rest_price, rest_qty = place_order_real('SELL', remaining, mode=MODE_MARKET)
+            if rest_price:
+                executed_price = (executed_price * executed_qty + rest_price * rest_qty) / (executed_qty + rest_qty)
+                executed_qty += rest_qty
+        label = "STOP LOSS" if fill['reason'] == 'STOP_LOSS' else "TAKE PROFIT"
+        record_sell("🛑", f"{label} ejecutado por el exchange. Venta BTC", executed_price, executed_qty)
+        metrics.update(protection=protection.summary())
+    # OCO cancelada o expirada sin ejecutarse (a mano, por el exchange): reponerla o seguir por polling
+    for position_id in protection.dropped():
+        if last_buy_price is not None:
+            if not protection.protect(SYMBOL, position_qty, last_buy_price * (1 - STOP_LOSS_PCT),
+                                      last_buy_price * (1 + TAKE_PROFIT_PCT)):
+                log_event("⚠️  Sin OCO en el exchange: SL/TP por polling")
+            save_state('reprotect')
+
 def get_klines(symbol, interval, limit=100):
+    """(aperturas en ms, cierres); la última vela es la que está en formación"""
+    # Velas publicadas por el sidecar en memoria compartida (sin request ni socket)
+    candles = read_candles(symbol, interval, limit, max_age=KLINES_MAX_AGE)
+    if candles is not None:
+        return candles[:, COLUMN_INDEX['open_time']], candles[:, COLUMN_INDEX['close']]
     klines = client.get_klines(symbol=symbol, interval=interval, limit=limit)
+    open_times = [k[0] for k in klines]
     close_prices = [float(k[4]) for k in klines]
-    return np.array(close_prices)
+    return np.array(open_times, dtype=np.float64), np.array(close_prices)
 
-def simple_strategy():
-    prices = get_klines(SYMBOL, INTERVAL, limit=LONG_WINDOW+1)
+def simple_strategy(prices):
+    # Medias sobre velas cerradas: la vela en formación cambia hasta su cierre
     short_ma = np.mean(prices[-SHORT_WINDOW:])
     long_ma = np.mean(prices[-LONG_WINDOW:])
     return short_ma, long_ma
 
-def place_order_real(side, quantity):
-    """FUNCIÓN PARA TRADING REAL - ACTIVADA CON CLAVES REALES"""
+def place_order_real(side, quantity, mode=None):
+    """FUNCIÓN PARA TRADING REAL - ACTIVADA CON CLAVES REALES
+    
+    Devuelve (precio promedio ponderado de todos los fills, cantidad ejecutada)
+    o (None, 0.0) si la orden no se ejecutó.
+    """
     try:
         # TRADING REAL ACTIVADO:
-        order = client.create_order(
-            symbol=SYMBOL,
-            side=side,
-            type='MARKET',
-            quantity=quantity
-        )
-        executed_price = float(order['fills'][0]['price'])
-        print(f"ORDEN REAL {side} ejecutada: ${executed_price:.2f}")
-        return executed_price
+        fill = executor.execute(side, quantity, mode=mode)
+        if fill is None:
+            return None, 0.0
+        print(f"ORDEN REAL {side} ejecutada: ${fill['price']:.2f} | {fill['order_type']} | "
+              f"{fill['executed_qty']:.8f} BTC en {fill['fills']} fills | "
+              f"Slippage: {fill.get('slippage_bps', 0.0):+.2f} bps")
+        metrics.update(execution=executor.summary())
+        return fill['price'], fill['executed_qty']
     except Exception as e:
         print(f"Error al ejecutar orden: {e}")
-        return None
+        metrics.record_error('order')
+        return None, 0.0
 
 def run_bot_real():
-    global trade_count, last_buy_price, total_profit, current_balance
+    global trade_count, last_buy_price, position_qty, total_profit, current_balance
     
     log_event("🚀 BOT BÁSICO INICIADO - CONFIGURACIÓN REAL")
     log_event(f"💰 Balance inicial: ${INITIAL_BALANCE:.2f} USD")
     log_event(f"🎯 Par de trading: {SYMBOL}")
     log_event(f"⚠️  MODO: TRADING REAL ACTIVADO")
+    restore_state()
+    open_positions = [{'id': SYMBOL, 'symbol': SYMBOL, 'notional': position_qty * last_buy_price,
+                       'price': last_buy_price}] if last_buy_price else []
+    risk.sync(open_positions, equity=current_balance + (position_qty * last_buy_price if last_buy_price else 0.0))
+    
+    # Ejecuciones de la OCO en tiempo real; sin stream se concilian por REST cada 30s
+    try:
+        user_stream = start_user_stream(protection.on_event, API_KEY, API_SECRET, testnet=IS_TESTNET, log=log_event)
+    except Exception as e:
+        user_stream = None
+        log_event(f"⚠️  User-data stream no disponible ({e}), conciliando salidas por REST")
+    
+    try:
+        metrics.start_server(get_metrics_port('basic_real'))
+    except OSError as e:
+        log_event(f"⚠️  No se pudo iniciar servidor de métricas: {e}")
+    iteration = 0
+    # Precio para las estadísticas finales aunque no haya iteraciones (límite diario ya alcanzado al restaurar)
+    current_price = last_buy_price
     
     while trade_count < MAX_TRADES_PER_DAY:
         try:
-            short_ma, long_ma = simple_strategy()
-            current_price = get_klines(SYMBOL, INTERVAL, limit=1)[-1]
+            # Un solo pedido de velas: medias con las cerradas, precio actual de la vela en formación
+            with metrics.stage('market_data'):
+                times, prices = get_klines(SYMBOL, INTERVAL, limit=LONG_WINDOW + 2)
+            # Ventas que hizo el exchange desde la última iteración (haya o no vela nueva)
+            apply_exchange_exits()
+            closed = scheduler.closed_count(times)
+            if closed < LONG_WINDOW or not scheduler.is_new(times[closed - 1]):
+                # Sin vela cerrada nueva: nada cambió para las medias
+                metrics.update(scheduler=scheduler.summary())
+                scheduler.wait()
+                continue
+            iteration += 1
+            with metrics.stage('strategy'):
+                short_ma, long_ma = simple_strategy(prices[:closed])
+            current_price = prices[-1]
             
             # Log cada 10 iteraciones
             if trade_count % 10 == 0:
@@ -97,70 +263,81 @@ def run_bot_real():
                 print(f"MA corta: ${short_ma:.2f}, MA larga: ${long_ma:.2f}")
                 print(f"Balance actual: ${current_balance:.2f} USD")
             
+            risk.mark({SYMBOL: current_price})
+            equity = current_balance + (position_qty * current_price if last_buy_price else 0.0)
+            
             # Estrategia: compra si la corta > larga, vende si la corta < larga
             if short_ma > long_ma and last_buy_price is None and current_balance >= (QUANTITY * current_price):
-                executed_price = place_order_real('BUY', QUANTITY)
-                if executed_price:
+                # Cantidad fija: si el servicio de riesgo no permite el nocional completo, no se compra
+                notional = QUANTITY * current_price
+                approved, reason = risk.allow_open(SYMBOL, notional, SYMBOL, equity=equity,
+                                                   price=current_price, min_notional=notional)
+                executed_price, executed_qty = place_order_real('BUY', QUANTITY) if approved else (None, 0.0)
+                if not approved:
+                    log_event(f"🛡️ Compra REAL bloqueada por riesgo de la flota: {reason}")
+                elif executed_price:
                     print(f"🟢 COMPRA REAL BTC a ${executed_price:.2f}")
                     log_event(f"COMPRA BTC a ${executed_price:.2f}")
                     last_buy_price = executed_price
-                    current_balance -= (QUANTITY * executed_price)  # Reducir balance
+                    position_qty = executed_qty  # Neta de comisión en BTC; parcial si fue LIMIT IOC (nunca bajo el mínimo)
+                    current_balance -= (position_qty * executed_price)  # Reducir balance
                     trade_count += 1
+                    if not protection.protect(SYMBOL, position_qty, executed_price * (1 - STOP_LOSS_PCT),
+                                              executed_price * (1 + TAKE_PROFIT_PCT)):
+                        log_event("⚠️  Sin OCO en el exchange: SL/TP por polling")
+                    save_state('buy')
+                    risk.sync([{'id': SYMBOL, 'symbol': SYMBOL, 'notional': position_qty * executed_price,
+                                'price': executed_price}], equity=equity)
+                else:
+                    # La orden no se ejecutó: liberar la reserva
+                    risk.closed(SYMBOL, 0.0, equity=equity)
                     
             elif last_buy_price:
-                # Stop Loss
-                if current_price <= last_buy_price * (1 - STOP_LOSS_PCT):
-                    executed_price = place_order_real('SELL', QUANTITY)
-                    if executed_price:
-                        print(f"🔴 STOP LOSS activado. Venta BTC a ${executed_price:.2f}")
-                        log_event(f"STOP LOSS activado. Venta BTC a ${executed_price:.2f}")
-                        profit = (executed_price - last_buy_price) * QUANTITY
-                        total_profit += profit
-                        current_balance += (QUANTITY * executed_price)  # Recuperar balance
-                        log_event(f"Ganancia/Pérdida: ${profit:.2f} USD | Acumulado: ${total_profit:.2f} USD | Balance: ${current_balance:.2f} USD")
-                        last_buy_price = None
-                        trade_count += 1
+                # Con OCO en el exchange el SL/TP lo ejecuta Binance; por polling solo como respaldo
+                # (sin OCO, o precio debajo del límite del stop)
+                protected = protection.active(SYMBOL)
+                stop_trigger = last_buy_price * (1 - STOP_LOSS_PCT)
+                if protected:
+                    stop_trigger *= 1 - STOP_LIMIT_OFFSET_BPS / 10000
+                
+                # Stop Loss (si la cancelación de la OCO no se confirma, no se vende: se reintenta)
+                if current_price <= stop_trigger and (not protected or protection.cancel(SYMBOL)):
+                    executed_price, executed_qty = place_order_real('SELL', position_qty, mode=MODE_MARKET)
+                    record_sell("🔴", "STOP LOSS activado. Venta BTC", executed_price, executed_qty)
                         
                 # Take Profit        
-                elif current_price >= last_buy_price * (1 + TAKE_PROFIT_PCT):
-                    executed_price = place_order_real('SELL', QUANTITY)
-                    if executed_price:
-                        print(f"🟢 TAKE PROFIT activado. Venta BTC a ${executed_price:.2f}")
-                        log_event(f"TAKE PROFIT activado. Venta BTC a ${executed_price:.2f}")
-                        profit = (executed_price - last_buy_price) * QUANTITY
-                        total_profit += profit
-                        current_balance += (QUANTITY * executed_price)  # Recuperar balance
-                        log_event(f"Ganancia/Pérdida: ${profit:.2f} USD | Acumulado: ${total_profit:.2f} USD | Balance: ${current_balance:.2f} USD")
-                        last_buy_price = None
-                        trade_count += 1
+                elif current_price >= last_buy_price * (1 + TAKE_PROFIT_PCT) and not protected:
+                    executed_price, executed_qty = place_order_real('SELL', position_qty, mode=MODE_MARKET)
+                    record_sell("🟢", "TAKE PROFIT activado. Venta BTC", executed_price, executed_qty)
                         
-                # Cruce de medias (venta)        
-                elif short_ma < long_ma:
-                    executed_price = place_order_real('SELL', QUANTITY)
-                    if executed_price:
-                        print(f"🔄 VENTA BTC por cruce a ${executed_price:.2f}")
-                        log_event(f"VENTA BTC por cruce a ${executed_price:.2f}")
-                        profit = (executed_price - last_buy_price) * QUANTITY
-                        total_profit += profit
-                        current_balance += (QUANTITY * executed_price)  # Recuperar balance
-                        log_event(f"Ganancia/Pérdida: ${profit:.2f} USD | Acumulado: ${total_profit:.2f} USD | Balance: ${current_balance:.2f} USD")
-                        last_buy_price = None
-                        trade_count += 1
+                # Cruce de medias (venta): quitar antes la OCO (si ya se ejecutó, la venta se registra en la próxima iteración)
+                elif short_ma < long_ma and (not protected or protection.cancel(SYMBOL)):
+                    executed_price, executed_qty = place_order_real('SELL', position_qty, mode=MODE_MARKET)
+                    record_sell("🔄", "VENTA BTC por cruce", executed_price, executed_qty)
                 else:
                     if trade_count % 20 == 0:  # Log posición cada 20 iteraciones
                         print(f"📊 Posición abierta BTC: ${last_buy_price:.2f} → ${current_price:.2f} ({((current_price/last_buy_price-1)*100):+.2f}%)")
             else:
                 if trade_count % 30 == 0:  # Log sin señal cada 30 iteraciones
                     print("⏳ Sin señal clara, esperando...")
+            
+            metrics.update(iteration=iteration, last_price=current_price,
+                           short_ma=short_ma, long_ma=long_ma, balance=current_balance,
+                           position={'entry_price': last_buy_price} if last_buy_price else None,
+                           total_trades=trade_count, total_profit=total_profit,
+                           scheduler=scheduler.summary())
                     
         except Exception as e:
             print(f"❌ Error en bot: {e}")
             log_event(f"Error en bot: {e}")
+            metrics.record_error('loop')
             
-        time.sleep(60)  # Esperar 60 segundos entre iteraciones
+        scheduler.wait()  # Hasta el cierre de la próxima vela
         
+    if user_stream is not None:
+        user_stream.stop()
     # Estadísticas finales
-    final_balance = current_balance + (QUANTITY * current_price if last_buy_price else 0)
+    final_balance = current_balance + (position_qty * current_price if last_buy_price else 0)
     roi = ((final_balance / INITIAL_BALANCE - 1) * 100)
     
     log_event("=" * 50)
@@ -174,6 +351,7 @@ def run_bot_real():
     if trade_count > 0:
         log_event(f"📊 P&L promedio por trade: ${total_profit/trade_count:.4f} USD")
     log_event("=" * 50)
+    journal.close()
 
 if __name__ == "__main__":
     print("🚀 INICIANDO BOT BÁSICO - CONFIGURACIÓN REAL")
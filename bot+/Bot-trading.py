@@ -11,9 +11,17 @@ def log_event(text):
 # NOTA: Usa tus propias claves API de Binance
 
 from binance.client import Client
+import os
 import numpy as np
 import time
 import threading
+from rate_limiter import RateLimitedClient
+from market_data_sidecar import MarketDataClient, KLINES_MAX_AGE
+from candle_ring import read_candles, COLUMN_INDEX
+from metrics_server import BotMetrics, get_metrics_port
+from param_store import ParamStore
+from risk_service import RiskClient
+from scheduler import CandleScheduler
 # import tkinter as tk  # Comentado para uso futuro en PC
 # from tkinter import scrolledtext  # Comentado para uso futuro en PC
 
@@ -43,21 +51,66 @@ LONG_WINDOW = 7  # media móvil larga (7 minutos)
 STOP_LOSS_PCT = 0.003  # 0.3% stop loss (ajustado para BTC)
 TAKE_PROFIT_PCT = 0.006  # 0.6% take profit (ajustado para BTC)
 MAX_TRADES_PER_DAY = 50  # Límite diario más razonable
-
-client = Client(API_KEY, API_SECRET)
+RISK_CAPITAL = 10.0  # Capital que este bot reporta al servicio de riesgo (balance_per_bot)
+
+# Ciclo alineado al cierre de vela: cada vela con volatilidad alta o posición abierta, hasta 3 en calma
+CYCLE_REFERENCE_VOLATILITY = 0.0008  # Desvío de retornos de 1m por debajo del cual se espacian los ciclos
+CYCLE_MAX_STRIDE = 3
+VOLATILITY_CANDLES = 30
+
+# Parámetros ajustables en caliente (basic_params.json, se aplican entre iteraciones)
+params = ParamStore('basic', {
+    'QUANTITY': QUANTITY,
+    'SHORT_WINDOW': SHORT_WINDOW,
+    'LONG_WINDOW': LONG_WINDOW,
+    'STOP_LOSS_PCT': STOP_LOSS_PCT,
+    'TAKE_PROFIT_PCT': TAKE_PROFIT_PCT,
+    'MAX_TRADES_PER_DAY': MAX_TRADES_PER_DAY
+}, ranges={
+    'QUANTITY': (0.00001, 0.01),
+    'SHORT_WINDOW': (1, 100),
+    'LONG_WINDOW': (2, 500),
+    'STOP_LOSS_PCT': (0.0005, 0.05),
+    'TAKE_PROFIT_PCT': (0.0005, 0.1),
+    'MAX_TRADES_PER_DAY': (1, 1000)
+}, check=lambda p: None if p['SHORT_WINDOW'] < p['LONG_WINDOW'] else "SHORT_WINDOW debe ser menor que LONG_WINDOW",
+   log=log_event)
+
+# Exchange alternativo (ej: fake_exchange.py local): BINANCE_API_URL=http://127.0.0.1:8800/api
+if os.getenv('BINANCE_API_URL'):
+    Client.API_URL = os.getenv('BINANCE_API_URL')
+# Velas y ticker por el sidecar local si está corriendo (un solo fetch para todos los bots de la VM)
+client = MarketDataClient(RateLimitedClient(Client(API_KEY, API_SECRET), log=log_event), log=log_event)
 
 trade_count = 0
 last_buy_price = None
+position_qty = 0.0  # Cantidad comprada: QUANTITY puede cambiar en caliente con la posición abierta
+
+# Métricas en vivo (consultables por HTTP local)
+metrics = BotMetrics('basic')
+
+# Riesgo de toda la flota (servicio local compartido por todos los bots)
+risk = RiskClient('basic', log=log_event)
+
+# Despertar al cerrar cada vela en lugar de dormir 60 s fijos
+scheduler = CandleScheduler(INTERVAL, reference_volatility=CYCLE_REFERENCE_VOLATILITY,
+                            max_stride=CYCLE_MAX_STRIDE, log=log_event)
 
 def get_klines(symbol, interval, limit=100):
+    """(aperturas en ms, cierres); la última vela es la que está en formación"""
+    # Velas publicadas por el sidecar en memoria compartida (sin request ni socket)
+    candles = read_candles(symbol, interval, limit, max_age=KLINES_MAX_AGE)
+    if candles is not None:
+        return candles[:, COLUMN_INDEX['open_time']], candles[:, COLUMN_INDEX['close']]
     klines = client.get_klines(symbol=symbol, interval=interval, limit=limit)
+    open_times = [k[0] for k in klines]
     close_prices = [float(k[4]) for k in klines]
-    return np.array(close_prices)
+    return np.array(open_times, dtype=np.float64), np.array(close_prices)
 
-def simple_strategy():
-    prices = get_klines(SYMBOL, INTERVAL, limit=LONG_WINDOW+1)
-    short_ma = np.mean(prices[-SHORT_WINDOW:])
-    long_ma = np.mean(prices[-LONG_WINDOW:])
+def simple_strategy(prices):
+    # Medias sobre velas cerradas: la vela en formación cambia hasta su cierre
+    short_ma = np.mean(prices[-params.SHORT_WINDOW:])
+    long_ma = np.mean(prices[-params.LONG_WINDOW:])
     return short_ma, long_ma
 
 def place_order(side, quantity):
@@ -73,51 +126,94 @@ def place_order(side, quantity):
         print(f"Error al ejecutar orden: {e}")
 
 def run_bot_console():
-    global trade_count, last_buy_price
+    global trade_count, last_buy_price, position_qty
     print("Bot de trading en modo consola (sin interfaz gráfica)")
     total_profit = 0.0
-    while trade_count < MAX_TRADES_PER_DAY:
-        short_ma, long_ma = simple_strategy()
-        current_price = get_klines(SYMBOL, INTERVAL, limit=1)[-1]
+    iteration = 0
+    # Sin estado persistido: cualquier posición que el servicio tenga de una ejecución anterior ya no existe
+    risk.sync([], equity=RISK_CAPITAL)
+    try:
+        metrics.start_server(get_metrics_port('basic'))
+    except OSError as e:
+        print(f"⚠️  No se pudo iniciar servidor de métricas: {e}")
+    while trade_count < params.MAX_TRADES_PER_DAY:
+        # Aplicar parámetros editados (sin reiniciar ni perder la posición)
+        params.poll()
+        # Un solo pedido de velas: medias con las cerradas, precio actual de la vela en formación
+        with metrics.stage('market_data'):
+            times, prices = get_klines(SYMBOL, INTERVAL, limit=max(params.LONG_WINDOW, VOLATILITY_CANDLES) + 2)
+        closed = scheduler.closed_count(times)
+        if closed < params.LONG_WINDOW or not scheduler.is_new(times[closed - 1]):
+            # Sin vela cerrada nueva: nada cambió para las medias
+            metrics.update(scheduler=scheduler.summary())
+            scheduler.wait()
+            continue
+        iteration += 1
+        with metrics.stage('strategy'):
+            short_ma, long_ma = simple_strategy(prices[:closed])
+        current_price = prices[-1]
         print(f"Precio actual BTC: ${current_price:.2f}")
         print(f"MA corta: ${short_ma:.2f}, MA larga: ${long_ma:.2f}")
         
         # Estrategia: compra si la corta > larga, vende si la corta < larga
+        risk.mark({SYMBOL: current_price})
         if short_ma > long_ma and last_buy_price is None:
-            print(f"COMPRA BTC a ${current_price:.2f}")
-            log_event(f"COMPRA BTC a ${current_price:.2f}")
-            last_buy_price = current_price
-            trade_count += 1
+            # Cantidad fija: si el servicio de riesgo no permite el nocional completo, no se compra
+            notional = params.QUANTITY * current_price
+            approved, reason = risk.allow_open(SYMBOL, notional, SYMBOL, equity=RISK_CAPITAL + total_profit,
+                                               price=current_price, min_notional=notional)
+            if approved:
+                print(f"COMPRA BTC a ${current_price:.2f}")
+                log_event(f"COMPRA BTC a ${current_price:.2f}")
+                last_buy_price = current_price
+                position_qty = params.QUANTITY
+                trade_count += 1
+            else:
+                log_event(f"🛡️ Compra BTC bloqueada por riesgo de la flota: {reason}")
         elif last_buy_price:
-            if current_price <= last_buy_price * (1 - STOP_LOSS_PCT):
+            if current_price <= last_buy_price * (1 - params.STOP_LOSS_PCT):
                 print(f"STOP LOSS activado. Venta BTC a ${current_price:.2f}")
                 log_event(f"STOP LOSS activado. Venta BTC a ${current_price:.2f}")
-                profit = (current_price - last_buy_price) * QUANTITY
+                profit = (current_price - last_buy_price) * position_qty
                 total_profit += profit
                 log_event(f"Ganancia/Pérdida: ${profit:.2f} USD | Acumulado: ${total_profit:.2f} USD")
+                risk.closed(SYMBOL, profit, equity=RISK_CAPITAL + total_profit)
                 last_buy_price = None
+                position_qty = 0.0
                 trade_count += 1
-            elif current_price >= last_buy_price * (1 + TAKE_PROFIT_PCT):
+            elif current_price >= last_buy_price * (1 + params.TAKE_PROFIT_PCT):
                 print(f"TAKE PROFIT activado. Venta BTC a ${current_price:.2f}")
                 log_event(f"TAKE PROFIT activado. Venta BTC a ${current_price:.2f}")
-                profit = (current_price - last_buy_price) * QUANTITY
+                profit = (current_price - last_buy_price) * position_qty
                 total_profit += profit
                 log_event(f"Ganancia/Pérdida: ${profit:.2f} USD | Acumulado: ${total_profit:.2f} USD")
+                risk.closed(SYMBOL, profit, equity=RISK_CAPITAL + total_profit)
                 last_buy_price = None
+                position_qty = 0.0
                 trade_count += 1
             elif short_ma < long_ma:
                 print(f"VENTA BTC por cruce a ${current_price:.2f}")
                 log_event(f"VENTA BTC por cruce a ${current_price:.2f}")
-                profit = (current_price - last_buy_price) * QUANTITY
+                profit = (current_price - last_buy_price) * position_qty
                 total_profit += profit
                 log_event(f"Ganancia/Pérdida: ${profit:.2f} USD | Acumulado: ${total_profit:.2f} USD")
+                risk.closed(SYMBOL, profit, equity=RISK_CAPITAL + total_profit)
                 last_buy_price = None
+                position_qty = 0.0
                 trade_count += 1
             else:
                 print("Sin señal clara o esperando gestión de riesgo")
         else:
             print("Sin señal clara")
-        time.sleep(60)  # Esperar 60 segundos entre iteraciones para BTC
+        metrics.update(iteration=iteration, last_price=current_price,
+                       short_ma=short_ma, long_ma=long_ma,
+                       position={'entry_price': last_buy_price, 'quantity': position_qty} if last_buy_price else None,
+                       total_trades=trade_count, total_profit=total_profit)
+        # Cadencia según la volatilidad de las últimas velas cerradas (cada vela con posición abierta)
+        returns = np.diff(np.log(prices[max(0, closed - VOLATILITY_CANDLES - 1):closed]))
+        scheduler.adapt(float(np.std(returns)) if len(returns) > 1 else None, busy=last_buy_price is not None)
+        metrics.update(scheduler=scheduler.summary())
+        scheduler.wait()
     print(f"Bot BTC detenido. Ganancia/Pérdida total: ${total_profit:.2f} USD")
     log_event(f"Bot BTC detenido. Ganancia/Pérdida total: ${total_profit:.2f} USD")
 
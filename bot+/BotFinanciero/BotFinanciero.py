@@ -21,8 +21,6 @@ import json
 import logging
 import warnings
 from datetime import datetime, timedelta
-import pytz
-from sklearn.ensemble import RandomForestClassifier
 from sklearn.preprocessing import StandardScaler
 import threading
 import sys
@@ -47,6 +45,33 @@ except ImportError:
     SUMMARY_FREQUENCY = 12
     ALERT_LEVEL = "MEDIUM"
 
+# Módulos compartidos del directorio padre (métricas en vivo)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from metrics_server import BotMetrics, get_metrics_port
+from param_store import ParamStore
+from state_journal import StateJournal
+from indicators import technical_indicators, financiero_feature_tensor, universe_features
+from ml_models import make_backend
+from risk_service import RiskClient
+from volatility import VolatilityBook, position_sizes
+from fill_model import first_exits, EXIT_REASONS, EXIT_STOP
+from market_calendar import MarketCalendar
+from scheduler import CandleScheduler
+
+# Claves obligatorias de cada entrada de STOCK_CONFIGS
+STOCK_CONFIG_KEYS = ('stop_loss', 'take_profit', 'confidence_threshold')
+
+def validate_stock_configs(params):
+    """Regla de validación de STOCK_CONFIGS para el archivo de parámetros"""
+    for symbol, stock_config in params['STOCK_CONFIGS'].items():
+        if not isinstance(stock_config, dict):
+            return f"STOCK_CONFIGS[{symbol}] debe ser un objeto"
+        for key in STOCK_CONFIG_KEYS:
+            value = stock_config.get(key)
+            if isinstance(value, bool) or not isinstance(value, (int, float)) or not 0 < value < 1:
+                return f"STOCK_CONFIGS[{symbol}].{key} debe ser un número entre 0 y 1"
+    return None
+
 class BotFinanciero:
     def __init__(self):
         # Verificar configuración
@@ -69,20 +94,59 @@ class BotFinanciero:
         # Configuración específica por acción
         self.stock_configs = getattr(sys.modules[__name__], 'STOCK_CONFIGS', {})
         
-        # Configuración ML
-        self.ml_model = RandomForestClassifier(n_estimators=100, random_state=42)
+        # Configuración ML: backend intercambiable (n_jobs: árboles en paralelo al entrenar)
+        self.ml_model = make_backend(getattr(sys.modules[__name__], 'ML_BACKEND', 'forest'),
+                                     n_jobs=getattr(sys.modules[__name__], 'ML_N_JOBS', -1))
         self.scaler = StandardScaler()
         self.is_model_trained = False
         
+        # Volatilidad por acción con las velas diarias de cada ciclo (span 20 ~ la ventana de 30 días)
+        self.volatility = VolatilityBook(span=20, atr_period=10)
+        
+        # SL/TP simulados contra máximo y mínimo de velas intradía (fill_model.py)
+        self.intrabar_interval = getattr(sys.modules[__name__], 'INTRABAR_INTERVAL', '5m')
+        self.intrabar_options = {
+            'ordering': getattr(sys.modules[__name__], 'INTRABAR_ORDERING', 'stop_first'),
+            'stop_slippage_bps': getattr(sys.modules[__name__], 'STOP_SLIPPAGE_BPS', 5.0)
+        }
+        
         # Posiciones activas (simuladas)
         self.positions = {}
         
-        # Configuración de mercado (NYSE/NASDAQ)
-        self.market_timezone = pytz.timezone('US/Eastern')
+        # Configuración de mercado (NYSE/NASDAQ): sesiones precalculadas con feriados y medios días
+        config = sys.modules[__name__]
+        self.calendar = MarketCalendar(
+            open_time=(getattr(config, 'MARKET_OPEN_HOUR', 9), getattr(config, 'MARKET_OPEN_MINUTE', 30)),
+            close_time=(getattr(config, 'MARKET_CLOSE_HOUR', 16), getattr(config, 'MARKET_CLOSE_MINUTE', 0)))
         
         # Configuración de logging
         self.setup_logging()
         
+        # Análisis alineados al cierre de las velas de ANALYSIS_INTERVAL, más espaciados en calma
+        # (volatilidad diaria: VolatilityBook se alimenta con las velas de 1d del análisis).
+        # Si Yahoo todavía no publicó la vela cerrada, se reintenta cada 15 s (no cada 2 s)
+        self.scheduler = CandleScheduler(
+            ANALYSIS_INTERVAL, delay=getattr(config, 'CYCLE_CLOSE_DELAY', 30),
+            reference_volatility=getattr(config, 'CYCLE_REFERENCE_VOLATILITY', 0.03),
+            max_stride=getattr(config, 'CYCLE_MAX_STRIDE', 3),
+            retry_seconds=15, max_retries=4,
+            running=lambda: self.running, log=self.logger.info)
+        
+        # Parámetros ajustables en caliente (financiero_params.json junto a este archivo)
+        self.params = ParamStore('financiero', {
+            'CONFIDENCE_THRESHOLD': self.confidence_threshold,
+            'STOP_LOSS_PERCENT': self.stop_loss_pct,
+            'TAKE_PROFIT_PERCENT': self.take_profit_pct,
+            'STOCK_CONFIGS': self.stock_configs
+        }, ranges={
+            'CONFIDENCE_THRESHOLD': (0.5, 1.0),
+            'STOP_LOSS_PERCENT': (0.001, 0.2),
+            'TAKE_PROFIT_PERCENT': (0.001, 0.5)
+        }, check=validate_stock_configs,
+           path=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'financiero_params.json'),
+           log=self.logger.info)
+        self.apply_param_changes(self.params.current)
+        
         # Estado del bot
         self.running = False
         self.analysis_count = 0
@@ -95,9 +159,46 @@ class BotFinanciero:
             'start_time': datetime.now()
         }
         
+        # Métricas en vivo (consultables por HTTP local)
+        self.metrics = BotMetrics('financiero')
+        
+        # Diario de estado: recuperar posiciones y estadísticas tras una caída
+        self.journal = StateJournal('financiero',
+                                    path=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'financiero_state.db'))
+        self.restore_state()
+        
+        # Riesgo de toda la flota: capital de referencia = balance por acción x acciones,
+        # y el servicio conoce las posiciones restauradas (o que no hay ninguna)
+        self.risk_capital = self.balance_per_stock * len(self.symbols)
+        self.risk = RiskClient('financiero', log=self.logger.warning)
+        self.risk.sync([{'id': trade_id, 'symbol': trade['symbol'], 'notional': trade['trade_value'],
+                         'price': trade['entry_price'], 'side': 'LONG' if trade['action'] == 'BUY' else 'SHORT'}
+                        for trade_id, trade in self.positions.items()], equity=self.risk_capital)
+        
         self.logger.info("🤖 Bot Financiero inicializado correctamente")
         self.send_telegram_message("🚀 Bot Financiero iniciado - Listo para análisis de acciones!")
 
+    def restore_state(self):
+        """Restaurar posiciones abiertas y contadores desde el diario de estado"""
+        state = self.journal.restore()
+        if not state:
+            return
+        
+        self.positions = state.get('positions', {})
+        for key in ('total_analyses', 'trading_signals', 'successful_predictions'):
+            self.stats[key] = state.get(key, 0)
+        self.logger.info(f"💾 Estado restaurado: {len(self.positions)} posiciones abiertas, {self.stats['trading_signals']} señales")
+
+    def save_state(self, event):
+        """Registrar posiciones y contadores en el diario antes de continuar"""
+        self.journal.record(
+            event,
+            positions=self.positions,
+            total_analyses=self.stats['total_analyses'],
+            trading_signals=self.stats['trading_signals'],
+            successful_predictions=self.stats['successful_predictions']
+        )
+
     def setup_logging(self):
         """Configurar sistema de logging"""
         logging.basicConfig(
@@ -122,8 +223,22 @@ class BotFinanciero:
             response = requests.post(url, data=data, timeout=10)
             if response.status_code != 200:
                 self.logger.warning(f"Error enviando mensaje Telegram: {response.status_code}")
+                self.metrics.record_error('telegram')
         except Exception as e:
             self.logger.error(f"Error en Telegram: {e}")
+            self.metrics.record_error('telegram')
+
+    def apply_param_changes(self, current=None):
+        """Aplicar parámetros editados entre ciclos (sin reiniciar ni perder posiciones)"""
+        if current is None:
+            if not self.params.poll():
+                return
+            current = self.params.current
+        
+        self.confidence_threshold = current['CONFIDENCE_THRESHOLD']
+        self.stop_loss_pct = current['STOP_LOSS_PERCENT']
+        self.take_profit_pct = current['TAKE_PROFIT_PERCENT']
+        self.stock_configs = current['STOCK_CONFIGS']
 
     def get_stock_config(self, symbol):
         """Obtener configuración específica para una acción"""
@@ -137,29 +252,21 @@ class BotFinanciero:
 
     def calculate_position_size(self, symbol, price):
         """Calcular tamaño de posición basado en volatilidad"""
-        try:
-            # Obtener datos para calcular volatilidad
+        if self.volatility.get(symbol) is None:
+            # Acción sin velas en este ciclo: descargar una vez para iniciar su estimador
             data = self.get_stock_data(symbol, period="30d")
-            if data is None or len(data) < 10:
-                return self.balance_per_stock / price
-            
-            # Calcular volatilidad (desviación estándar de retornos)
-            returns = data['Close'].pct_change().dropna()
-            volatility = returns.std()
-            
-            # Ajustar tamaño de posición inversamente a la volatilidad
-            volatility_factor = max(0.5, min(2.0, 1.0 / (volatility * 100)))
-            adjusted_balance = self.balance_per_stock * volatility_factor
-            
-            shares = adjusted_balance / price
-            
-            self.logger.info(f"📊 {symbol} - Volatilidad: {volatility:.4f}, Factor: {volatility_factor:.2f}, Shares: {shares:.2f}")
-            
-            return shares
-            
-        except Exception as e:
-            self.logger.error(f"Error calculando position size para {symbol}: {e}")
-            return self.balance_per_stock / price
+            if data is not None and len(data):
+                self.volatility.update_frame(symbol, data)
+        return float(self.position_sizes([symbol], [price])[0])
+
+    def position_sizes(self, symbols, prices):
+        """Shares de un lote de señales, inversas a la volatilidad EWMA de cada acción"""
+        vols, _ = self.volatility.vectors(symbols)
+        shares = position_sizes(self.balance_per_stock, prices, vols)
+        for symbol, price, volatility, n in zip(symbols, prices, vols, shares):
+            self.logger.info(f"📊 {symbol} - Volatilidad: {volatility:.4f}, "
+                             f"Factor: {n * price / self.balance_per_stock:.2f}, Shares: {n:.2f}")
+        return shares
 
     def check_risk_management(self, symbol, entry_price, current_price, position_type):
         """Verificar condiciones de stop-loss y take-profit"""
@@ -191,15 +298,28 @@ class BotFinanciero:
         
         return 'HOLD', 'Mantener posición'
 
-    def simulate_trade(self, symbol, action, price, confidence):
-        """Simular una operación de trading"""
+    def simulate_trade(self, symbol, action, price, confidence, shares=None):
+        """Simular una operación de trading (shares ya calculadas si vienen de un lote)"""
         try:
             config = self.get_stock_config(symbol)
-            shares = self.calculate_position_size(symbol, price)
+            if shares is None:
+                shares = self.calculate_position_size(symbol, price)
             trade_value = shares * price
             
             trade_id = f"{symbol}_{int(time.time())}"
             
+            # El servicio de riesgo reserva la posición o la achica/bloquea según el resto de la flota
+            approved, reason = self.risk.allow_open(symbol, trade_value, trade_id,
+                                                    side='LONG' if action == 'BUY' else 'SHORT',
+                                                    equity=self.risk_capital, price=price)
+            if not approved:
+                self.logger.info(f"🛡️ Trade bloqueado por riesgo de la flota: {action} {symbol} - {reason}")
+                return None
+            if approved < trade_value:
+                self.logger.info(f"🛡️ Tamaño reducido por riesgo de la flota ({reason}): ${trade_value:.2f} -> ${approved:.2f}")
+                shares = approved / price
+                trade_value = approved
+            
             trade = {
                 'id': trade_id,
                 'symbol': symbol,
@@ -236,8 +356,9 @@ class BotFinanciero:
 ⏰ {datetime.now().strftime('%H:%M:%S')}
             """
             
-            self.send_telegram_message(trade_message)
             self.stats['trading_signals'] += 1
+            self.save_state('open')
+            self.send_telegram_message(trade_message)
             
             return trade_id
             
@@ -253,32 +374,33 @@ class BotFinanciero:
             
             closed_positions = []
             
+            # Salidas de todas las posiciones, resueltas por acción con una descarga de velas intradía
+            trade_ids_by_symbol = {}
             for trade_id, trade in self.positions.items():
+                trade_ids_by_symbol.setdefault(trade['symbol'], []).append(trade_id)
+            exits = {}
+            for symbol, trade_ids in trade_ids_by_symbol.items():
+                exits.update(self.resolve_exits(symbol, trade_ids))
+            
+            for trade_id, (exit_price, risk_status, reason) in exits.items():
+                trade = self.positions[trade_id]
                 symbol = trade['symbol']
-                current_price = self.get_current_price(symbol)
-                
-                if current_price is None:
-                    continue
-                
-                position_type = 'LONG' if trade['action'] == 'BUY' else 'SHORT'
-                risk_status, reason = self.check_risk_management(
-                    symbol, trade['entry_price'], current_price, position_type
-                )
                 
                 if risk_status in ['STOP_LOSS', 'TAKE_PROFIT']:
                     # Cerrar posición
-                    trade['exit_price'] = current_price
+                    trade['exit_price'] = exit_price
                     trade['exit_time'] = datetime.now()
                     trade['status'] = risk_status
                     
                     # Calcular P&L
                     if trade['action'] == 'BUY':
-                        pnl = (current_price - trade['entry_price']) * trade['shares']
+                        pnl = (exit_price - trade['entry_price']) * trade['shares']
                     else:
-                        pnl = (trade['entry_price'] - current_price) * trade['shares']
+                        pnl = (trade['entry_price'] - exit_price) * trade['shares']
                     
                     trade['pnl'] = pnl
                     pnl_pct = pnl / trade['trade_value'] * 100
+                    self.risk.closed(trade_id, pnl, equity=self.risk_capital)
                     
                     # Notificación de cierre
                     close_emoji = "🟢" if pnl > 0 else "🔴"
@@ -288,7 +410,7 @@ class BotFinanciero:
 
 📈 <b>{symbol}</b> - {trade['action']}
 💰 Entrada: ${trade['entry_price']:.2f}
-💰 Salida: ${current_price:.2f}
+💰 Salida: ${exit_price:.2f}
 📊 P&L: ${pnl:.2f} ({pnl_pct:+.2f}%)
 🎯 Razón: {reason}
 
@@ -306,10 +428,79 @@ class BotFinanciero:
             # Remover posiciones cerradas
             for trade_id in closed_positions:
                 del self.positions[trade_id]
+            if closed_positions:
+                self.save_state('close')
                 
         except Exception as e:
             self.logger.error(f"Error monitoreando posiciones: {e}")
 
+    def resolve_exits(self, symbol, trade_ids):
+        """SL/TP de las posiciones de una acción contra el máximo y mínimo de cada vela intradía
+
+        Devuelve {trade_id: (precio de salida, 'STOP_LOSS'/'TAKE_PROFIT', motivo)}.
+        """
+        trades = [self.positions[trade_id] for trade_id in trade_ids]
+        bars = self.get_intraday_bars(symbol)
+        if bars is None or not len(bars):
+            # Sin velas intradía: solo el precio actual, como antes
+            current_price = self.get_current_price(symbol)
+            if current_price is None:
+                return {}
+            exits = {}
+            for trade_id, trade in zip(trade_ids, trades):
+                risk_status, reason = self.check_risk_management(
+                    symbol, trade['entry_price'], current_price, 'LONG' if trade['action'] == 'BUY' else 'SHORT')
+                if risk_status in ('STOP_LOSS', 'TAKE_PROFIT'):
+                    exits[trade_id] = (current_price, risk_status, reason)
+            return exits
+        
+        # Solo velas que abren después de la entrada (en segundos epoch: no depende de la resolución del índice)
+        times = np.array([bar_time.timestamp() for bar_time in bars.index])
+        since = np.array([trade['entry_time'].timestamp() for trade in trades])
+        sides = np.array([1 if trade['action'] == 'BUY' else -1 for trade in trades])
+        # Niveles con la configuración vigente de cada acción (como check_risk_management)
+        entries = np.array([trade['entry_price'] for trade in trades])
+        config = self.get_stock_config(symbol)
+        stops = entries * (1 - sides * config['stop_loss'])
+        targets = entries * (1 + sides * config['take_profit'])
+        bar, code, price = first_exits(
+            times, bars['Open'].to_numpy(dtype=float), bars['High'].to_numpy(dtype=float),
+            bars['Low'].to_numpy(dtype=float), bars['Close'].to_numpy(dtype=float), since, stops, targets,
+            sides, **self.intrabar_options)
+        
+        exits = {}
+        for i in np.flatnonzero(bar >= 0):
+            trade = trades[i]
+            price_change = sides[i] * (price[i] - entries[i]) / entries[i]
+            label = "Stop Loss" if code[i] == EXIT_STOP else "Take Profit"
+            exits[trade_ids[i]] = (float(price[i]), EXIT_REASONS[code[i]],
+                                   f"{label} activado en la vela de las {bars.index[bar[i]].strftime('%H:%M')}: {price_change:.2%}")
+        return exits
+
+    def get_intraday_bars(self, symbol):
+        """Velas intradía de los últimos días (None si yfinance falla)"""
+        try:
+            return yf.Ticker(symbol).history(period="5d", interval=self.intrabar_interval)
+        except Exception as e:
+            self.logger.error(f"Error obteniendo velas intradía de {symbol}: {e}")
+            return None
+
+    def latest_bar_times(self):
+        """Aperturas (ms) de las velas de ANALYSIS_INTERVAL de la primera acción; None si Yahoo no responde.
+        
+        Sonda de un solo request para saber si cerró una vela nueva antes de descargar el universo.
+        """
+        symbol = self.symbols[0]
+        try:
+            bars = yf.Ticker(symbol).history(period="1d", interval=f"{ANALYSIS_INTERVAL // 60}m")
+        except Exception as e:
+            self.logger.warning(f"⚠️ No se pudo consultar la última vela de {symbol}: {e}")
+            return None
+        if bars is None or not len(bars):
+            return None
+        # En ms sin depender de la resolución interna del índice (ns o us según la versión de pandas)
+        return np.asarray((bars.index - pd.Timestamp(0, tz='UTC')) // pd.Timedelta(milliseconds=1), dtype=np.int64)
+
     def get_current_price(self, symbol):
         """Obtener precio actual de una acción"""
         try:
@@ -323,30 +514,8 @@ class BotFinanciero:
             return None
 
     def is_market_open(self):
-        """Verificar si el mercado está abierto"""
-        now = datetime.now(self.market_timezone)
-        
-        # Verificar si es fin de semana
-        if now.weekday() >= 5:  # Sábado = 5, Domingo = 6
-            return False
-        
-        # Horario de mercado: 9:30 AM - 4:00 PM EST
-        market_open = now.replace(hour=9, minute=30, second=0, microsecond=0)
-        market_close = now.replace(hour=16, minute=0, second=0, microsecond=0)
-        
-        return market_open <= now <= market_close
-        """Verificar si el mercado está abierto"""
-        now = datetime.now(self.market_timezone)
-        
-        # Verificar si es fin de semana
-        if now.weekday() >= 5:  # Sábado = 5, Domingo = 6
-            return False
-        
-        # Horario de mercado: 9:30 AM - 4:00 PM EST
-        market_open = now.replace(hour=9, minute=30, second=0, microsecond=0)
-        market_close = now.replace(hour=16, minute=0, second=0, microsecond=0)
-        
-        return market_open <= now <= market_close
+        """Verificar si el mercado está abierto (sesión regular NYSE, consulta cacheada)"""
+        return self.calendar.is_open()
 
     def get_stock_data(self, symbol, period="30d"):
         """Obtener datos históricos de una acción"""
@@ -356,84 +525,78 @@ class BotFinanciero:
             return data
         except Exception as e:
             self.logger.error(f"Error obteniendo datos de {symbol}: {e}")
+            self.metrics.record_error('market_data')
             return None
 
+    def get_universe_data(self, symbols, period="30d"):
+        """Datos históricos de todas las acciones en una sola descarga (por acción si falla)"""
+        try:
+            data = yf.download(symbols, period=period, group_by='ticker', auto_adjust=True,
+                               threads=True, progress=False)
+            downloaded = set(data.columns.get_level_values(0))
+            frames = {symbol: data[symbol].dropna(how='all') for symbol in symbols if symbol in downloaded}
+            frames = {symbol: frame for symbol, frame in frames.items() if len(frame)}
+            if frames:
+                return frames
+        except Exception as e:
+            self.logger.warning(f"⚠️ Descarga en lote fallida ({e}), descargando por acción")
+            self.metrics.record_error('market_data')
+        
+        frames = {}
+        for symbol in symbols:
+            data = self.get_stock_data(symbol, period=period)
+            if data is not None and len(data):
+                frames[symbol] = data
+            time.sleep(1)  # Evitar rate limiting
+        return frames
+
+    def universe_snapshot(self, frames):
+        """Indicadores y features actuales de todas las acciones en una pasada vectorizada.
+        
+        Devuelve {símbolo: (data, indicadores, features (1, 10) o None)}; las acciones
+        con menos de 20 velas quedan sin indicadores (como calculate_technical_indicators).
+        """
+        snapshot = {symbol: (data, None, None) for symbol, data in frames.items()}
+        symbols, index, tensor, close, indicators = universe_features(
+            {symbol: data for symbol, data in frames.items() if len(data) >= 20},
+            momentum_period=10, volume_window=20, return_indicators=True)
+        if not symbols:
+            return snapshot
+        
+        # Última vela de cada acción: en la unión de fechas puede faltarle la del final
+        last = close.shape[1] - 1 - (~np.isnan(close))[:, ::-1].argmax(axis=1)
+        features = tensor[np.arange(len(symbols)), last]
+        for row, symbol in enumerate(symbols):
+            end = last[row] + 1
+            series = {name: pd.Series(values[row, :end], index=index[:end], name=name)
+                      for name, values in indicators.items()}
+            vector = features[row]
+            snapshot[symbol] = (frames[symbol], series,
+                                vector.reshape(1, -1) if np.isfinite(vector).all() else None)
+        return snapshot
+
     def calculate_technical_indicators(self, data):
         """Calcular indicadores técnicos"""
         if data is None or len(data) < 20:
             return None
         
-        indicators = {}
-        
-        # RSI (Relative Strength Index)
-        delta = data['Close'].diff()
-        gain = (delta.where(delta > 0, 0)).rolling(window=14).mean()
-        loss = (-delta.where(delta < 0, 0)).rolling(window=14).mean()
-        rs = gain / loss
-        indicators['rsi'] = 100 - (100 / (1 + rs))
-        
-        # MACD
-        exp1 = data['Close'].ewm(span=12).mean()
-        exp2 = data['Close'].ewm(span=26).mean()
-        indicators['macd'] = exp1 - exp2
-        indicators['macd_signal'] = indicators['macd'].ewm(span=9).mean()
-        indicators['macd_histogram'] = indicators['macd'] - indicators['macd_signal']
-        
-        # Bollinger Bands
-        sma_20 = data['Close'].rolling(window=20).mean()
-        std_20 = data['Close'].rolling(window=20).std()
-        indicators['bb_upper'] = sma_20 + (std_20 * 2)
-        indicators['bb_lower'] = sma_20 - (std_20 * 2)
-        indicators['bb_middle'] = sma_20
-        
-        # Moving Averages
-        indicators['sma_10'] = data['Close'].rolling(window=10).mean()
-        indicators['sma_20'] = data['Close'].rolling(window=20).mean()
-        indicators['ema_12'] = data['Close'].ewm(span=12).mean()
-        
-        # Volume indicators
-        indicators['volume_sma'] = data['Volume'].rolling(window=20).mean()
-        indicators['volume_ratio'] = data['Volume'] / indicators['volume_sma']
-        
-        # Price momentum
-        indicators['momentum'] = data['Close'] / data['Close'].shift(10) - 1
-        
-        # Support and resistance levels
-        indicators['support'] = data['Low'].rolling(window=20).min()
-        indicators['resistance'] = data['High'].rolling(window=20).max()
-        
-        return indicators
+        # RSI, MACD, Bollinger, medias, volumen, momentum (10 días) y soporte/resistencia en un solo paso
+        return technical_indicators(data, momentum_period=10, volume_window=20)
 
     def prepare_ml_features(self, data, indicators):
         """Preparar características para el modelo ML"""
         if indicators is None:
             return None
         
-        features = []
-        
-        # Obtener valores más recientes
-        latest_idx = -1
-        
         try:
-            feature_vector = [
-                indicators['rsi'].iloc[latest_idx],
-                indicators['macd'].iloc[latest_idx],
-                indicators['macd_histogram'].iloc[latest_idx],
-                (data['Close'].iloc[latest_idx] - indicators['bb_lower'].iloc[latest_idx]) / 
-                (indicators['bb_upper'].iloc[latest_idx] - indicators['bb_lower'].iloc[latest_idx]),
-                indicators['volume_ratio'].iloc[latest_idx],
-                indicators['momentum'].iloc[latest_idx],
-                (data['Close'].iloc[latest_idx] - indicators['sma_10'].iloc[latest_idx]) / indicators['sma_10'].iloc[latest_idx],
-                (data['Close'].iloc[latest_idx] - indicators['sma_20'].iloc[latest_idx]) / indicators['sma_20'].iloc[latest_idx],
-                (data['Close'].iloc[latest_idx] - indicators['support'].iloc[latest_idx]) / data['Close'].iloc[latest_idx],
-                (indicators['resistance'].iloc[latest_idx] - data['Close'].iloc[latest_idx]) / data['Close'].iloc[latest_idx]
-            ]
+            # Mismas features que el entrenamiento (FINANCIERO_FEATURES), vela más reciente
+            feature_vector = financiero_feature_tensor(data['Close'], indicators)[-1]
             
             # Verificar que no hay valores NaN
-            if any(pd.isna(val) for val in feature_vector):
+            if np.isnan(feature_vector).any():
                 return None
                 
-            return np.array(feature_vector).reshape(1, -1)
+            return feature_vector.reshape(1, -1)
             
         except Exception as e:
             self.logger.error(f"Error preparando features ML: {e}")
@@ -444,54 +607,36 @@ class BotFinanciero:
         try:
             self.logger.info("🧠 Entrenando modelo ML...")
             
-            all_features = []
-            all_targets = []
-            
+            # Obtener más datos históricos para entrenamiento
+            frames = {}
             for symbol in self.symbols:
-                # Obtener más datos históricos para entrenamiento
                 data = self.get_stock_data(symbol, period="3mo")
-                if data is None or len(data) < 50:
-                    continue
-                
-                indicators = self.calculate_technical_indicators(data)
-                if indicators is None:
-                    continue
-                
-                # Crear targets (1 = subida, 0 = bajada) para los próximos 3 días
-                future_returns = data['Close'].shift(-3) / data['Close'] - 1
-                targets = (future_returns > 0.01).astype(int)  # 1% umbral
-                
-                # Preparar features para cada día
-                for i in range(20, len(data) - 3):  # Evitar NaN y datos futuros
-                    try:
-                        feature_vector = [
-                            indicators['rsi'].iloc[i],
-                            indicators['macd'].iloc[i],
-                            indicators['macd_histogram'].iloc[i],
-                            (data['Close'].iloc[i] - indicators['bb_lower'].iloc[i]) / 
-                            (indicators['bb_upper'].iloc[i] - indicators['bb_lower'].iloc[i]),
-                            indicators['volume_ratio'].iloc[i],
-                            indicators['momentum'].iloc[i],
-                            (data['Close'].iloc[i] - indicators['sma_10'].iloc[i]) / indicators['sma_10'].iloc[i],
-                            (data['Close'].iloc[i] - indicators['sma_20'].iloc[i]) / indicators['sma_20'].iloc[i],
-                            (data['Close'].iloc[i] - indicators['support'].iloc[i]) / data['Close'].iloc[i],
-                            (indicators['resistance'].iloc[i] - data['Close'].iloc[i]) / data['Close'].iloc[i]
-                        ]
-                        
-                        if not any(pd.isna(val) for val in feature_vector):
-                            all_features.append(feature_vector)
-                            all_targets.append(targets.iloc[i])
-                            
-                    except Exception as e:
-                        continue
-            
-            if len(all_features) < 100:
+                if data is not None and len(data) >= 50:
+                    frames[symbol] = data
+            
+            # Indicadores de todo el universo de una vez: tensor (símbolos, días, features)
+            symbols, index, tensor, close = universe_features(frames)
+            if not symbols:
+                self.logger.warning("Insuficientes datos para entrenar ML")
+                return False
+            
+            # Crear targets (1 = subida, 0 = bajada) para los próximos 3 días (1% umbral)
+            future_returns = np.full(close.shape, np.nan)
+            future_returns[:, :-3] = close[:, 3:] / close[:, :-3] - 1
+            
+            # Días válidos: desde el día 20 de cada símbolo, con futuro conocido y sin NaN
+            observed = ~np.isnan(close)
+            position = np.cumsum(observed, axis=1) - 1
+            valid = (observed & (position >= 20) & ~np.isnan(future_returns) &
+                     np.isfinite(tensor).all(axis=-1))
+            
+            if valid.sum() < 100:
                 self.logger.warning("Insuficientes datos para entrenar ML")
                 return False
             
-            # Convertir a arrays numpy
-            X = np.array(all_features)
-            y = np.array(all_targets)
+            # Convertir a arrays numpy (filas por símbolo y en orden temporal)
+            X = tensor[valid]
+            y = (future_returns[valid] > 0.01).astype(int)
             
             # Normalizar features
             X_scaled = self.scaler.fit_transform(X)
@@ -503,7 +648,7 @@ class BotFinanciero:
             # Calcular accuracy en training set
             train_score = self.ml_model.score(X_scaled, y)
             
-            self.logger.info(f"✅ Modelo ML entrenado - Accuracy: {train_score:.2%}")
+            self.logger.info(f"✅ Modelo ML entrenado ({self.ml_model.name}) - Accuracy: {train_score:.2%}")
             self.send_telegram_message(f"🧠 <b>Modelo ML entrenado</b>\n📊 Accuracy: {train_score:.2%}\n📈 Samples: {len(X)}")
             
             return True
@@ -512,46 +657,70 @@ class BotFinanciero:
             self.logger.error(f"Error entrenando modelo ML: {e}")
             return False
 
-    def predict_stock_direction(self, symbol):
+    def predict_directions(self, features_by_symbol):
+        """Predecir dirección de varias acciones con un solo predict_proba.
+        
+        features_by_symbol: {símbolo: features (1, 10) de prepare_ml_features}
+        Devuelve {símbolo: (dirección, confianza)}; (None, 0.5) si no hay predicción.
+        """
+        predictions = {symbol: (None, 0.5) for symbol in features_by_symbol}
+        symbols = [symbol for symbol, features in features_by_symbol.items() if features is not None]
+        if not self.is_model_trained or not symbols:
+            return predictions
+        
+        try:
+            # Una fila por acción: el costo fijo de sklearn se paga una vez por ciclo
+            features_scaled = self.scaler.transform(np.vstack([features_by_symbol[s] for s in symbols]))
+            probabilities = self.ml_model.predict_proba(features_scaled)
+            
+            # La clase predicha es la de mayor probabilidad (lo mismo que predict)
+            best = probabilities.argmax(axis=1)
+            classes = self.ml_model.classes_[best]
+            confidences = probabilities[np.arange(len(symbols)), best]
+            
+            for symbol, prediction, confidence in zip(symbols, classes, confidences):
+                direction = "BUY" if prediction == 1 else "SELL"
+                predictions[symbol] = (direction, confidence)
+                
+        except Exception as e:
+            self.logger.error(f"Error prediciendo lote de {len(symbols)} acciones: {e}")
+        
+        return predictions
+
+    def predict_stock_direction(self, symbol, data=None, indicators=None):
         """Predecir dirección de una acción usando ML"""
         if not self.is_model_trained:
             return None, 0.5
         
         try:
-            data = self.get_stock_data(symbol, period="30d")
             if data is None:
-                return None, 0.5
+                data = self.get_stock_data(symbol, period="30d")
+                if data is None:
+                    return None, 0.5
+                indicators = None
             
-            indicators = self.calculate_technical_indicators(data)
+            if indicators is None:
+                indicators = self.calculate_technical_indicators(data)
             features = self.prepare_ml_features(data, indicators)
             
-            if features is None:
-                return None, 0.5
-            
-            # Normalizar features
-            features_scaled = self.scaler.transform(features)
-            
-            # Predecir
-            prediction = self.ml_model.predict(features_scaled)[0]
-            confidence = self.ml_model.predict_proba(features_scaled)[0].max()
-            
-            direction = "BUY" if prediction == 1 else "SELL"
-            
-            return direction, confidence
+            return self.predict_directions({symbol: features})[symbol]
             
         except Exception as e:
             self.logger.error(f"Error prediciendo {symbol}: {e}")
             return None, 0.5
 
-    def analyze_stock(self, symbol):
-        """Análisis completo de una acción"""
+    def analyze_stock(self, symbol, data=None, indicators=None, prediction=None):
+        """Análisis completo de una acción (data/indicators/prediction si ya se calcularon en el ciclo)"""
         try:
-            data = self.get_stock_data(symbol)
             if data is None:
-                return None
+                data = self.get_stock_data(symbol)
+                if data is None:
+                    return None
+                indicators = None
             
             current_price = data['Close'].iloc[-1]
-            indicators = self.calculate_technical_indicators(data)
+            if indicators is None:
+                indicators = self.calculate_technical_indicators(data)
             
             if indicators is None:
                 return None
@@ -563,7 +732,9 @@ class BotFinanciero:
             bb_position = (current_price - indicators['bb_lower'].iloc[-1]) / (indicators['bb_upper'].iloc[-1] - indicators['bb_lower'].iloc[-1])
             
             # Predicción ML
-            ml_direction, ml_confidence = self.predict_stock_direction(symbol)
+            if prediction is None:
+                prediction = self.predict_stock_direction(symbol, data, indicators)
+            ml_direction, ml_confidence = prediction
             
             # Análisis de volumen
             volume_ratio = indicators['volume_ratio'].iloc[-1]
@@ -672,14 +843,34 @@ class BotFinanciero:
                 self.logger.info("📴 Mercado cerrado - Análisis limitado")
             
             # Monitorear posiciones activas primero
-            self.monitor_positions()
+            with self.metrics.stage('monitor_positions'):
+                self.monitor_positions()
             
             analyses = []
             trading_opportunities = []
             
-            for symbol in self.symbols:
-                analysis = self.analyze_stock(symbol)
+            # Datos de todas las acciones en una descarga; indicadores y features en una pasada del universo
+            with self.metrics.stage('market_data'):
+                frames = self.get_universe_data(self.symbols)
+            for symbol, data in frames.items():
+                self.volatility.update_frame(symbol, data)
+            with self.metrics.stage('indicators'):
+                market_data = self.universe_snapshot(frames)
+            self.risk.mark({symbol: data['Close'].iloc[-1] for symbol, (data, _, _) in market_data.items()})
+            
+            # Predicción ML de todo el ciclo en un solo lote
+            with self.metrics.stage('ml_predict'):
+                predictions = self.predict_directions(
+                    {symbol: features for symbol, (_, _, features) in market_data.items()})
+            
+            for symbol, (data, indicators, _) in market_data.items():
+                with self.metrics.stage('analyze_stock'):
+                    analysis = self.analyze_stock(symbol, data, indicators, predictions[symbol])
                 if analysis:
+                    self.metrics.update(last_price=analysis['price'],
+                                        last_prediction=analysis['ml_direction'],
+                                        last_confidence=analysis['ml_confidence'],
+                                        last_symbol=symbol)
                     analyses.append(analysis)
                     
                     # Verificar oportunidades de trading
@@ -687,16 +878,19 @@ class BotFinanciero:
                         has_opportunity, reason = self.check_trading_opportunity(analysis)
                         if has_opportunity:
                             trading_opportunities.append((analysis, reason))
-                            
-                            # Ejecutar trade simulado si hay señal clara
-                            self.simulate_trade(
-                                symbol, 
-                                analysis['ml_direction'], 
-                                analysis['price'], 
-                                analysis['ml_confidence']
-                            )
-                        
-                time.sleep(1)  # Evitar rate limiting
+            
+            # Ejecutar trades simulados de las señales claras, con el tamaño de todo el lote en una llamada
+            if trading_opportunities:
+                shares = self.position_sizes([analysis['symbol'] for analysis, _ in trading_opportunities],
+                                             [analysis['price'] for analysis, _ in trading_opportunities])
+                for (analysis, _), n in zip(trading_opportunities, shares):
+                    self.simulate_trade(
+                        analysis['symbol'],
+                        analysis['ml_direction'],
+                        analysis['price'],
+                        analysis['ml_confidence'],
+                        shares=float(n)
+                    )
             
             # Enviar resumen por Telegram cada hora
             self.analysis_count += 1
@@ -707,9 +901,23 @@ class BotFinanciero:
             # Enviar alertas de trading inmediatamente (ya no es necesario, se hace en simulate_trade)
             
             self.logger.info(f"✅ Análisis completado - {len(analyses)} stocks, {len(trading_opportunities)} opportunities, {len(self.positions)} positions active")
+            self.publish_metrics(market_open=market_open)
             
         except Exception as e:
             self.logger.error(f"Error en ciclo de análisis: {e}")
+            self.metrics.record_error('analysis_cycle')
+
+    def publish_metrics(self, **fields):
+        """Publicar el estado actual en el endpoint de métricas"""
+        self.metrics.update(
+            iteration=self.analysis_count,
+            position=list(self.positions.values()),
+            total_trades=self.stats['trading_signals'],
+            winning_trades=self.stats['successful_predictions'],
+            total_analyses=self.stats['total_analyses'],
+            model_trained=self.is_model_trained,
+            **fields
+        )
 
     def send_performance_summary(self):
         """Enviar resumen de performance del bot"""
@@ -834,21 +1042,50 @@ class BotFinanciero:
 🎯 <b>Take Profit:</b> {self.take_profit_pct:.1%}
 🧠 <b>ML Threshold:</b> {self.confidence_threshold:.0%}
 
-⚡ Análisis cada 5 minutos
+⚡ Análisis al cierre de cada vela nueva de 5 minutos (hasta 15 min en calma)
 📊 Resumen cada hora
         """
         
         self.send_telegram_message(start_message)
         
+        try:
+            metrics_port = get_metrics_port('financiero')
+            self.metrics.start_server(metrics_port)
+            self.logger.info(f"📡 Métricas en vivo: http://127.0.0.1:{metrics_port}/metrics")
+        except OSError as e:
+            self.logger.warning(f"⚠️ No se pudo iniciar servidor de métricas: {e}")
+        self.publish_metrics()
+        
         try:
             while self.running:
-                self.run_analysis_cycle()
+                self.apply_param_changes()
+                
+                # Sin una vela cerrada nueva no cambió nada: no descargar ni analizar el universo
+                # (si la sonda falla se analiza igual, como antes)
+                with self.metrics.stage('market_data'):
+                    times = self.latest_bar_times()
+                closed = self.scheduler.closed_count(times) if times is not None else 0
+                if times is None or (closed and self.scheduler.is_new(int(times[closed - 1]))):
+                    with self.metrics.stage('analysis_cycle'):
+                        self.run_analysis_cycle()
                 
-                # Esperar 5 minutos entre análisis
-                for _ in range(300):  # 5 minutos = 300 segundos
-                    if not self.running:
-                        break
-                    time.sleep(1)
+                # Con el mercado cerrado (noche, fin de semana, feriado) dormir hasta la apertura
+                # en vez de repetir ciclos sin sesión
+                wait_seconds = self.calendar.seconds_until_open()
+                if wait_seconds > 0:
+                    if wait_seconds > 300:
+                        self.logger.info(f"😴 Mercado cerrado - próximo análisis en la apertura: "
+                                         f"{self.calendar.next_open():%a %d/%m %H:%M} ET ({wait_seconds / 3600:.1f} h)")
+                    self.sleep(wait_seconds)
+                    continue
+                
+                # Próximo análisis al cierre de la vela: cada vela con posiciones abiertas o volatilidad
+                # alta, hasta CYCLE_MAX_STRIDE velas con la volatilidad mediana de las acciones baja
+                vols, _ = self.volatility.vectors(self.symbols)
+                vols = vols[np.isfinite(vols)]
+                self.scheduler.adapt(float(np.median(vols)) if len(vols) else None, busy=bool(self.positions))
+                self.publish_metrics(scheduler=self.scheduler.summary())
+                self.scheduler.wait()
                     
         except KeyboardInterrupt:
             self.logger.info("🛑 Bot detenido por usuario")
@@ -858,9 +1095,16 @@ class BotFinanciero:
         finally:
             self.stop()
 
+    def sleep(self, seconds):
+        """Esperar de a un segundo para cortar enseguida si se detiene el bot"""
+        deadline = time.time() + seconds
+        while self.running and time.time() < deadline:
+            time.sleep(max(0.0, min(1.0, deadline - time.time())))
+
     def stop(self):
         """Detener el bot"""
         self.running = False
+        self.journal.close()
         self.logger.info("🛑 Bot Financiero detenido")
         self.send_telegram_message("🛑 Bot Financiero detenido")
 
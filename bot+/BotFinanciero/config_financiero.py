@@ -46,6 +46,11 @@ BALANCE_PER_STOCK = 1000
 STOP_LOSS_PERCENT = 0.02    # 2% stop loss
 TAKE_PROFIT_PERCENT = 0.04  # 4% take profit
 
+# Simulación de SL/TP con máximo y mínimo de velas intradía (ver fill_model.py)
+INTRABAR_INTERVAL = "5m"          # Velas de yfinance para revisar las posiciones
+INTRABAR_ORDERING = "stop_first"  # Si una vela toca SL y TP: "stop_first", "target_first" u "ohlc_path"
+STOP_SLIPPAGE_BPS = 5.0           # Slippage en contra al salir por stop (0.05%)
+
 # Configuración ML
 CONFIDENCE_THRESHOLD = 0.70  # 70% confianza mínima
 
@@ -55,6 +60,11 @@ CONFIDENCE_THRESHOLD = 0.70  # 70% confianza mínima
 
 # Frecuencia de análisis (en segundos)
 ANALYSIS_INTERVAL = 300  # 5 minutos
+CYCLE_CLOSE_DELAY = 30   # Segundos tras el cierre de cada vela de 5 min (Yahoo publica con demora)
+# Volatilidad EWMA diaria (VolatilityBook usa las velas de 1d): stride = 0.03 // vol, así la mediana
+# habitual del universo (~2%) analiza cada vela, 1-1.5% cada 2 y menos de 1% cada 3
+CYCLE_REFERENCE_VOLATILITY = 0.03
+CYCLE_MAX_STRIDE = 3     # En calma y sin posiciones, analizar cada hasta 3 velas (15 min)
 
 # Enviar resumen cada X análisis
 SUMMARY_FREQUENCY = 12   # Cada hora (12 * 5 min = 60 min)
@@ -75,6 +85,8 @@ MARKET_CLOSE_MINUTE = 0
 # Configuración de recursos para VM
 MAX_MEMORY_USAGE = 300  # MB
 MAX_CPU_USAGE = 50      # %
+ML_N_JOBS = -1          # Hilos del RandomForest (-1 = todos los cores, 1 = sin paralelismo)
+ML_BACKEND = 'forest'   # Modelo ML: 'forest', 'gbt' o 'logistic' (ver ml_models.py)
 
 # Logging
 LOG_LEVEL = "INFO"      # DEBUG, INFO, WARNING, ERROR
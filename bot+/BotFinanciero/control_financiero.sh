@@ -9,6 +9,7 @@ BOT_SCRIPT="BotFinanciero.py"
 LOG_FILE="financial_bot_log.txt"
 PID_FILE="${BOT_NAME}.pid"
 VENV_PATH="financial-env"
+METRICS_PORT=8721
 
 # Colores para output
 RED='\033[0;31m'
@@ -218,6 +219,11 @@ status_bot() {
         echo -e "${BLUE}📈 Información del proceso:${NC}"
         ps -p $PID -o pid,ppid,cmd,%cpu,%mem,etime
         
+        # Mostrar métricas en vivo (sin recorrer el log)
+        echo -e "${BLUE}📡 Métricas en vivo:${NC}"
+        curl -s --max-time 2 http://127.0.0.1:$METRICS_PORT/metrics | python3 -m json.tool \
+            || echo -e "${YELLOW}⚠️  Endpoint de métricas no disponible${NC}"
+        
         # Mostrar últimas líneas del log
         if [ -f "$LOG_FILE" ]; then
             echo -e "${BLUE}📝 Últimas líneas del log:${NC}"
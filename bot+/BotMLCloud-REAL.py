@@ -13,6 +13,17 @@ import warnings
 import os
 import signal
 import sys
+from metrics_server import BotMetrics, get_metrics_port
+from param_store import ParamStore
+from state_journal import StateJournal
+from rate_limiter import RateLimitedClient, Backoff
+from market_data_sidecar import MarketDataClient, KLINES_MAX_AGE
+from candle_ring import read_candles, candles_frame
+from indicators import add_indicator_columns
+from execution import OrderExecutor, MODE_AUTO, MODE_MARKET
+from risk_service import RiskClient
+from order_manager import ProtectiveOrders, start_user_stream, STOP_LIMIT_OFFSET_BPS
+from scheduler import CandleScheduler
 warnings.filterwarnings('ignore')
 
 def log_event(text, log_file="ml_btc_trading_real_log.txt"):
@@ -51,7 +62,30 @@ BASE_STOP_LOSS = 0.002      # 0.2% stop loss (más conservador)
 BASE_TAKE_PROFIT = 0.006    # 0.6% take profit (más conservador)
 MAX_POSITION_SIZE = 0.8     # Usar máximo 80% del balance
 
-client = Client(API_KEY, API_SECRET)
+# Ejecución: MARKET si el libro absorbe la orden con poco slippage, si no LIMIT IOC
+EXECUTION_MODE = MODE_AUTO
+MAX_SLIPPAGE_BPS = 5.0  # 0.05% máximo contra el precio medio en compras
+
+# Parámetros ajustables en caliente (ml_real_params.json, se aplican entre iteraciones)
+params = ParamStore('ml_real', {
+    'QUANTITY': QUANTITY,
+    'MIN_CONFIDENCE': MIN_CONFIDENCE,
+    'BASE_STOP_LOSS': BASE_STOP_LOSS,
+    'BASE_TAKE_PROFIT': BASE_TAKE_PROFIT,
+    'MAX_POSITION_SIZE': MAX_POSITION_SIZE
+}, ranges={
+    'QUANTITY': (0.00001, 0.01),
+    'MIN_CONFIDENCE': (0.5, 1.0),
+    'BASE_STOP_LOSS': (0.001, 0.05),
+    'BASE_TAKE_PROFIT': (0.001, 0.1),
+    'MAX_POSITION_SIZE': (0.01, 1.0)
+}, log=log_event)
+
+# Exchange alternativo (ej: fake_exchange.py local): BINANCE_API_URL=http://127.0.0.1:8800/api
+if os.getenv('BINANCE_API_URL'):
+    Client.API_URL = os.getenv('BINANCE_API_URL')
+# Velas y ticker por el sidecar local si está corriendo (un solo fetch para todos los bots de la VM)
+client = MarketDataClient(RateLimitedClient(Client(API_KEY, API_SECRET), log=log_event), log=log_event)
 
 class RealMLBot:
     def __init__(self):
@@ -66,6 +100,39 @@ class RealMLBot:
         self.start_time = datetime.datetime.now()
         self.last_heartbeat = datetime.datetime.now()
         
+        # Métricas en vivo (consultables por HTTP local)
+        self.metrics = BotMetrics('ml_real')
+        # Espera creciente tras errores consecutivos del loop (se reinicia al completar una iteración)
+        self.error_backoff = Backoff(base=10.0, cap=300.0)
+        # Un ciclo por vela cerrada en lugar de cada 45 s (sin espaciar ciclos: dinero real)
+        self.scheduler = CandleScheduler(INTERVAL, log=log_event)
+        
+        # Ejecución consciente del libro de órdenes
+        self.executor = OrderExecutor(client, SYMBOL, mode=EXECUTION_MODE,
+                                      max_slippage_bps=MAX_SLIPPAGE_BPS, log=log_event)
+        
+        # Stop loss y take profit como OCO en el exchange (se ejecutan aunque el bot esté esperando)
+        self.protection = ProtectiveOrders(client, SYMBOL, log=log_event)
+        
+        # Diario de estado: no perder la posición REAL abierta si el proceso cae
+        self.journal = StateJournal('ml_real')
+        self.restore_state()
+        
+        # Ejecuciones de la OCO en tiempo real; sin stream se concilian por REST cada 30s
+        try:
+            self.user_stream = start_user_stream(self.protection.on_event, API_KEY, API_SECRET,
+                                                 testnet=IS_TESTNET, log=log_event)
+        except Exception as e:
+            self.user_stream = None
+            log_event(f"⚠️  User-data stream no disponible ({e}), conciliando salidas por REST")
+        
+        # Riesgo de toda la flota: el servicio conoce la posición REAL restaurada (o que no hay ninguna)
+        self.risk = RiskClient('ml_real', log=log_event)
+        position = self.current_position
+        position_value = position['quantity'] * position['entry_price'] if position else 0.0
+        self.risk.sync([{'id': SYMBOL, 'symbol': SYMBOL, 'notional': position_value,
+                         'price': position['entry_price']}] if position else [], equity=self.balance + position_value)
+        
         # Setup signal handlers para shutdown limpio
         signal.signal(signal.SIGINT, self.signal_handler)
         signal.signal(signal.SIGTERM, self.signal_handler)
@@ -82,12 +149,49 @@ class RealMLBot:
                 log_event(f"Error cerrando posición en shutdown: {e}")
         
         self.print_final_statistics()
+        self.journal.close()
         log_event("Bot ML REAL detenido limpiamente")
         sys.exit(0)
         
+    def restore_state(self):
+        """Restaurar posición REAL y contadores desde el diario de estado (tras una caída)"""
+        state = self.journal.restore()
+        if not state:
+            return
+        
+        self.balance = state.get('balance', self.balance)
+        self.current_position = state.get('current_position')
+        self.total_trades = state.get('total_trades', 0)
+        self.winning_trades = state.get('winning_trades', 0)
+        self.total_profit = state.get('total_profit', 0.0)
+        # La OCO pudo ejecutarse con el bot caído: restore() la concilia y deja la salida en fills()
+        self.protection.restore(state.get('protection'))
+        
+        log_event(f"💾 Estado restaurado: Balance ${self.balance:.4f} USD | Trades: {self.total_trades} | Ganadores: {self.winning_trades}")
+        if self.current_position:
+            log_event(f"📍 Posición REAL restaurada: {self.current_position['quantity']} BTC desde ${self.current_position['entry_price']:.2f} | SL: ${self.current_position['stop_loss']:.2f} | TP: ${self.current_position['take_profit']:.2f}")
+    
+    def save_state(self, event):
+        """Registrar el estado actual en el diario antes de continuar"""
+        self.journal.record(
+            event,
+            balance=self.balance,
+            current_position=self.current_position,
+            total_trades=self.total_trades,
+            winning_trades=self.winning_trades,
+            total_profit=self.total_profit,
+            protection=self.protection.export()
+        )
+    
     def get_market_data(self, symbol, interval, limit=100):
         """Obtiene datos del mercado con retry logic"""
+        # Velas publicadas por el sidecar en memoria compartida (sin request ni socket)
+        candles = read_candles(symbol, interval, limit, max_age=KLINES_MAX_AGE)
+        if candles is not None:
+            return candles_frame(candles)
+        
         max_retries = 3
+        backoff = Backoff(base=2.0, cap=30.0)
         for attempt in range(max_retries):
             try:
                 klines = client.get_klines(symbol=symbol, interval=interval, limit=limit)
@@ -105,60 +209,25 @@ class RealMLBot:
                 return df
             except Exception as e:
                 log_event(f"Error obteniendo datos (intento {attempt+1}): {e}")
+                self.metrics.record_error('market_data')
                 if attempt < max_retries - 1:
-                    time.sleep(5)
+                    time.sleep(backoff.next_delay(e))
                 else:
                     return None
     
     def calculate_advanced_features(self, df):
         """Calcula características avanzadas para predicción"""
-        # Medias móviles
-        df['ma_5'] = df['close'].rolling(window=5).mean()
-        df['ma_10'] = df['close'].rolling(window=10).mean()
-        df['ma_20'] = df['close'].rolling(window=20).mean()
-        
-        # RSI
-        delta = df['close'].diff()
-        gain = (delta.where(delta > 0, 0)).rolling(window=14).mean()
-        loss = (-delta.where(delta < 0, 0)).rolling(window=14).mean()
-        rs = gain / loss
-        df['rsi'] = 100 - (100 / (1 + rs))
-        
-        # MACD
-        exp1 = df['close'].ewm(span=12).mean()
-        exp2 = df['close'].ewm(span=26).mean()
-        df['macd'] = exp1 - exp2
-        df['macd_signal'] = df['macd'].ewm(span=9).mean()
-        
-        # Bollinger Bands
-        df['bb_middle'] = df['close'].rolling(window=20).mean()
-        bb_std = df['close'].rolling(window=20).std()
-        df['bb_upper'] = df['bb_middle'] + (bb_std * 2)
-        df['bb_lower'] = df['bb_middle'] - (bb_std * 2)
-        df['bb_position'] = (df['close'] - df['bb_lower']) / (df['bb_upper'] - df['bb_lower'])
-        
-        # Volatilidad
-        df['volatility'] = df['close'].rolling(window=10).std()
-        
-        # Momentum
-        df['momentum'] = df['close'] / df['close'].shift(5) - 1
-        
-        # Price rate of change
-        df['roc'] = df['close'].pct_change(periods=10)
-        
-        # Volume features
-        df['volume_ma'] = df['volume'].rolling(window=10).mean()
-        df['volume_ratio'] = df['volume'] / df['volume_ma']
-        
-        return df
+        # Medias, RSI, MACD, Bollinger, volatilidad, momentum (5 velas), ROC y volumen en un solo paso
+        return add_indicator_columns(df, momentum_period=5, volume_window=10)
     
-    def enhanced_ml_prediction(self):
-        """Algoritmo ML conservador para dinero real"""
-        df = self.get_market_data(SYMBOL, INTERVAL, limit=60)
+    def enhanced_ml_prediction(self, df=None, closed=None):
+        """Algoritmo ML conservador para dinero real (closed: velas cerradas de df; sin la vela en formación)"""
+        if df is None:
+            df = self.get_market_data(SYMBOL, INTERVAL, limit=60)
         if df is None:
             return None, 0
         
-        df = self.calculate_advanced_features(df)
+        df = self.calculate_advanced_features(df if closed is None else df.iloc[:closed])
         
         # Obtener últimos valores
         latest_data = df.iloc[-1]
@@ -257,23 +326,27 @@ class RealMLBot:
         
         return prediction_score, confidence
     
-    def place_real_order(self, side, quantity):
-        """Ejecutar orden REAL - ACTIVADA CON CLAVES REALES"""
+    def place_real_order(self, side, quantity, mode=None):
+        """Ejecutar orden REAL - ACTIVADA CON CLAVES REALES
+        
+        Devuelve (precio promedio ponderado de todos los fills, cantidad ejecutada)
+        o (None, 0.0) si la orden no se ejecutó.
+        """
         try:
             # TRADING REAL ACTIVADO:
-            order = client.create_order(
-                symbol=SYMBOL,
-                side=side,
-                type='MARKET',
-                quantity=quantity
-            )
-            executed_price = float(order['fills'][0]['price'])
-            log_event(f"ORDEN REAL {side} ejecutada: ${executed_price:.2f}")
-            return executed_price
+            fill = self.executor.execute(side, quantity, mode=mode)
+            if fill is None:
+                return None, 0.0
+            log_event(f"ORDEN REAL {side} ejecutada: ${fill['price']:.2f} | {fill['order_type']} | "
+                      f"{fill['executed_qty']:.8f} BTC en {fill['fills']} fills | "
+                      f"Slippage: {fill.get('slippage_bps', 0.0):+.2f} bps")
+            self.metrics.update(execution=self.executor.summary())
+            return fill['price'], fill['executed_qty']
             
         except Exception as e:
             log_event(f"Error ejecutando orden {side}: {e}")
-            return None
+            self.metrics.record_error('order')
+            return None, 0.0
     
     def execute_real_ml_strategy(self, prediction, confidence, current_price):
         """Ejecuta estrategia ML REAL con gestión conservadora"""
@@ -281,19 +354,29 @@ class RealMLBot:
         prediction_threshold = 0.025  # 2.5% mínimo
         
         # Verificar balance disponible
-        available_balance = self.balance * MAX_POSITION_SIZE
-        position_value = QUANTITY * current_price
+        available_balance = self.balance * params.MAX_POSITION_SIZE
+        position_value = params.QUANTITY * current_price
         
         # Señal de compra con confianza muy alta y balance suficiente
         if (prediction > prediction_threshold and 
-            confidence > MIN_CONFIDENCE and 
+            confidence > params.MIN_CONFIDENCE and 
             not self.current_position and
             available_balance >= position_value):
             
-            executed_price = self.place_real_order('BUY', QUANTITY)
-            if executed_price:
-                stop_loss = executed_price * (1 - BASE_STOP_LOSS)
-                take_profit = executed_price * (1 + BASE_TAKE_PROFIT)
+            # Cantidad fija: si el servicio de riesgo no permite el nocional completo, no se compra
+            approved, reason = self.risk.allow_open(SYMBOL, position_value, SYMBOL, equity=self.balance,
+                                                    price=current_price, min_notional=position_value)
+            if not approved:
+                log_event(f"🛡️ Compra ML REAL bloqueada por riesgo de la flota: {reason}")
+                return
+            
+            executed_price, executed_qty = self.place_real_order('BUY', params.QUANTITY)
+            if not executed_price:
+                # La orden no se ejecutó: liberar la reserva
+                self.risk.closed(SYMBOL, 0.0, equity=self.balance)
+            else:
+                stop_loss = executed_price * (1 - params.BASE_STOP_LOSS)
+                take_profit = executed_price * (1 + params.BASE_TAKE_PROFIT)
                 
                 log_event(f"🟢 COMPRA ML REAL - Pred: +{prediction*100:.2f}% | Conf: {confidence*100:.1f}% | Precio: ${executed_price:.2f}")
                 log_event(f"   📊 SL: ${stop_loss:.2f} | TP: ${take_profit:.2f}")
@@ -301,14 +384,19 @@ class RealMLBot:
                 self.current_position = {
                     'type': 'LONG',
                     'entry_price': executed_price,
-                    'quantity': QUANTITY,
+                    'quantity': executed_qty,  # Neta de comisión en BTC; parcial si fue LIMIT IOC (nunca bajo el mínimo)
                     'stop_loss': stop_loss,
                     'take_profit': take_profit,
                     'entry_time': datetime.datetime.now(),
                     'prediction': prediction,
                     'confidence': confidence
                 }
-                self.balance -= position_value
+                self.balance -= executed_qty * executed_price
+                if not self.protection.protect(SYMBOL, executed_qty, stop_loss, take_profit):
+                    log_event("⚠️  Sin OCO en el exchange: SL/TP por polling")
+                self.save_state('open')
+                self.risk.sync([{'id': SYMBOL, 'symbol': SYMBOL, 'notional': executed_qty * executed_price,
+                                 'price': executed_price}], equity=self.balance + executed_qty * executed_price)
                 
         # Gestión de posición existente
         elif self.current_position:
@@ -322,12 +410,17 @@ class RealMLBot:
             time_in_position = datetime.datetime.now() - position['entry_time']
             hours_in_position = time_in_position.total_seconds() / 3600
             
+            # Con OCO en el exchange el SL/TP lo ejecuta Binance; por polling solo si el precio
+            # quedó debajo del límite del stop (la orden ya no puede llenarse)
+            protected = self.protection.active(SYMBOL)
+            stop_trigger = position['stop_loss'] * (1 - STOP_LIMIT_OFFSET_BPS / 10000) if protected else position['stop_loss']
+            
             # Stop Loss
-            if current_price <= position['stop_loss']:
+            if current_price <= stop_trigger:
                 self.close_real_position(current_price, "Stop Loss")
                 
             # Take Profit
-            elif current_price >= position['take_profit']:
+            elif current_price >= position['take_profit'] and not protected:
                 self.close_real_position(current_price, "Take Profit")
                 
             # Trailing Stop muy conservador
@@ -336,6 +429,10 @@ class RealMLBot:
                 new_stop = current_price * (1 - trailing_pct)
                 if new_stop > position['stop_loss']:
                     position['stop_loss'] = new_stop
+                    # Mover también el stop de la OCO (cancelar y reemplazar)
+                    if not self.protection.amend_stop(SYMBOL, new_stop) and not self.protection.active(SYMBOL):
+                        log_event("⚠️  Sin OCO en el exchange tras mover el stop: SL/TP por polling")
+                    self.save_state('trailing_stop')
                     log_event(f"🔄 Trailing Stop: ${new_stop:.2f}")
             
             # Stop Loss por tiempo (12 horas máximo para dinero real)
@@ -348,15 +445,74 @@ class RealMLBot:
         if not self.current_position:
             return
         
+        # Quitar la OCO antes de vender; si ya se había ejecutado esa es la salida, y si
+        # la cancelación no se confirmó la OCO sigue viva: no vender, reintentar en la próxima iteración
+        if not self.protection.cancel(SYMBOL):
+            self.check_exchange_exits()
+            return
+        
+        executed_price, executed_qty = self.place_real_order('SELL', self.current_position['quantity'], mode=MODE_MARKET)
+        self.record_close(executed_price, executed_qty, reason)
+    
+    def check_exchange_exits(self):
+        """Aplicar las salidas que ejecutó el exchange (stream o conciliación REST)"""
+        self.protection.reconcile()
+        for fill in self.protection.fills():
+            if self.current_position:
+                self.close_from_exchange(fill)
+        # OCO cancelada o expirada sin ejecutarse (a mano, por el exchange): reponerla o seguir por polling
+        for position_id in self.protection.dropped():
+            position = self.current_position
+            if position:
+                if not self.protection.protect(SYMBOL, position['quantity'], position['stop_loss'], position['take_profit']):
+                    log_event("⚠️  Sin OCO en el exchange: SL/TP por polling")
+                self.save_state('reprotect')
+    
+    def close_from_exchange(self, fill):
+        """Registrar una salida ejecutada por la OCO (y vender el resto si fue parcial)"""
+        reason = "Stop Loss (exchange)" if fill['reason'] == 'STOP_LOSS' else "Take Profit (exchange)"
+        executed_price, executed_qty = fill['price'], fill['quantity']
+        remaining = self.current_position['quantity'] - executed_qty
+        if remaining > self.current_position['quantity'] * 0.001:
+            rest_price, rest_qty = self.place_real_order('SELL', remaining, mode=MODE_MARKET)
+            if rest_price:
+                executed_price = (executed_price * executed_qty + rest_price * rest_qty) / (executed_qty + rest_qty)
+                executed_qty += rest_qty
+        self.metrics.update(protection=self.protection.summary())
+        self.record_close(executed_price, executed_qty, reason)
+    
+    def record_close(self, executed_price, executed_qty, reason):
+        """Contabilizar la venta y avisar al servicio de riesgo
+
+        Si la venta falló o fue parcial la posición sigue abierta con el resto,
+        vuelve a tener su OCO y el cierre se reintenta en la próxima iteración.
+        """
         position = self.current_position
-        executed_price = self.place_real_order('SELL', position['quantity'])
+        if not executed_price:
+            executed_qty = 0.0
+        if executed_qty > 0:
+            self.balance += (executed_qty * executed_price)
+            position['realized_pnl'] = position.get('realized_pnl', 0.0) + (executed_price - position['entry_price']) * executed_qty
+            position['sold_qty'] = position.get('sold_qty', 0.0) + executed_qty
+        
+        remaining = position['quantity'] - executed_qty
+        price = executed_price or position['entry_price']
+        if remaining > position['quantity'] * 0.001 and not self.executor.below_minimum(remaining, price):
+            position['quantity'] = remaining
+            log_event(f"⚠️  Venta incompleta ({reason}): quedan {remaining:.8f} BTC en posición, se reintenta")
+            if not self.protection.protect(SYMBOL, remaining, position['stop_loss'], position['take_profit']):
+                log_event("⚠️  Sin OCO en el exchange: SL/TP por polling")
+            self.save_state('partial_close')
+            self.risk.sync([{'id': SYMBOL, 'symbol': SYMBOL, 'notional': remaining * price, 'price': price}],
+                           equity=self.balance + remaining * price)
+            return
         
-        if executed_price:
-            profit_loss = (executed_price - position['entry_price']) * position['quantity']
-            profit_pct = (executed_price / position['entry_price'] - 1) * 100
+        profit_loss = position.get('realized_pnl', 0.0)
+        sold_qty = position.get('sold_qty', 0.0)
+        if sold_qty > 0:
+            profit_pct = profit_loss / (position['entry_price'] * sold_qty) * 100
             time_in_position = datetime.datetime.now() - position['entry_time']
             
-            self.balance += (position['quantity'] * executed_price)
             self.total_profit += profit_loss
             self.total_trades += 1
             
@@ -369,6 +525,8 @@ class RealMLBot:
             log_event(f"💰 Balance actualizado: ${self.balance:.4f} USD | ROI: {((self.balance/INITIAL_BALANCE-1)*100):+.2f}%")
             
         self.current_position = None
+        self.save_state('close')
+        self.risk.closed(SYMBOL, profit_loss, equity=self.balance)
     
     def print_periodic_statistics(self):
         """Estadísticas periódicas para dinero real"""
@@ -381,7 +539,7 @@ class RealMLBot:
         if len(self.predictions_history) >= 10:
             recent_confidence = [p['confidence'] for p in self.predictions_history[-10:]]
             avg_confidence = np.mean(recent_confidence)
-            log_event(f"🧠 [ML REAL] Confianza promedio: {avg_confidence*100:.1f}% | Umbral: {MIN_CONFIDENCE*100}%")
+            log_event(f"🧠 [ML REAL] Confianza promedio: {avg_confidence*100:.1f}% | Umbral: {params.MIN_CONFIDENCE*100}%")
     
     def print_final_statistics(self):
         """Estadísticas finales para dinero real"""
@@ -404,22 +562,43 @@ class RealMLBot:
         log_event(f"🧠 Predicciones generadas: {len(self.predictions_history)}")
         log_event("=" * 60)
     
+    def publish_metrics(self, **fields):
+        """Publica el estado actual en el endpoint de métricas"""
+        self.metrics.update(
+            balance=self.balance,
+            position=self.current_position,
+            total_trades=self.total_trades,
+            winning_trades=self.winning_trades,
+            total_profit=self.total_profit,
+            api=client.snapshot(),
+            **fields
+        )
+    
     def run_real_ml_bot(self):
         """Ejecuta bot ML REAL con configuración conservadora"""
         log_event("🚀 Iniciando Bot ML REAL en Google Cloud")
         log_event(f"💰 Balance inicial: ${self.balance:.2f} USD")
         log_event(f"🎯 Par de trading: {SYMBOL}")
-        log_event(f"₿ Cantidad por trade: {QUANTITY} BTC (~${QUANTITY * 65000:.2f} USD aprox)")
-        log_event(f"🧠 Confianza mínima: {MIN_CONFIDENCE*100}% (CONSERVADOR)")
-        log_event(f"🛡️  Stop Loss: {BASE_STOP_LOSS*100}% (CONSERVADOR)")
-        log_event(f"🎯 Take Profit: {BASE_TAKE_PROFIT*100}% (CONSERVADOR)")
+        log_event(f"₿ Cantidad por trade: {params.QUANTITY} BTC (~${params.QUANTITY * 65000:.2f} USD aprox)")
+        log_event(f"🧠 Confianza mínima: {params.MIN_CONFIDENCE*100}% (CONSERVADOR)")
+        log_event(f"🛡️  Stop Loss: {params.BASE_STOP_LOSS*100}% (CONSERVADOR)")
+        log_event(f"🎯 Take Profit: {params.BASE_TAKE_PROFIT*100}% (CONSERVADOR)")
         log_event(f"⚠️  MODO: TRADING REAL ACTIVADO")
         
+        try:
+            metrics_port = get_metrics_port('ml_real')
+            self.metrics.start_server(metrics_port)
+            log_event(f"📡 Métricas en vivo: http://127.0.0.1:{metrics_port}/metrics")
+        except OSError as e:
+            log_event(f"⚠️  No se pudo iniciar servidor de métricas: {e}")
+        self.publish_metrics()
+        
         iteration = 0
         
         while True:
             try:
-                iteration += 1
+                # Aplicar parámetros editados (sin reiniciar ni cerrar la posición)
+                params.poll()
                 
                 # Heartbeat cada hora
                 now = datetime.datetime.now()
@@ -428,16 +607,35 @@ class RealMLBot:
                     runtime = now - self.start_time
                     log_event(f"💓 [HEARTBEAT REAL] Bot ML ejecutándose hace {runtime} | Balance: ${self.balance:.4f} USD")
                 
+                # Salidas que el exchange ejecutó desde la última iteración (haya o no vela nueva)
+                self.check_exchange_exits()
+                
+                # Sin una vela cerrada nueva (todavía no publicada) no hay nada nuevo que decidir
+                with self.metrics.stage('market_data'):
+                    candles = self.get_market_data(SYMBOL, INTERVAL, limit=60)
+                closed = self.scheduler.closed_count(candles['timestamp']) if candles is not None else 0
+                if not closed or not self.scheduler.is_new(int(candles['timestamp'].iloc[closed - 1])):
+                    self.metrics.update(scheduler=self.scheduler.summary())
+                    self.scheduler.wait()
+                    continue
+                iteration += 1
+                
                 # Obtener precio actual
-                ticker = client.get_symbol_ticker(symbol=SYMBOL)
+                with self.metrics.stage('ticker'):
+                    ticker = client.get_symbol_ticker(symbol=SYMBOL)
                 current_price = float(ticker['price'])
+                self.risk.mark({SYMBOL: current_price})
                 
                 # Generar predicción ML
-                prediction, confidence = self.enhanced_ml_prediction()
+                with self.metrics.stage('prediction'):
+                    prediction, confidence = self.enhanced_ml_prediction(candles, closed)
+                
+                self.publish_metrics(iteration=iteration, last_price=current_price,
+                                     last_prediction=prediction, last_confidence=confidence)
                 
                 if prediction is not None:
                     # Log cada 15 iteraciones para dinero real
-                    if iteration % 15 == 0 or confidence > MIN_CONFIDENCE:
+                    if iteration % 15 == 0 or confidence > params.MIN_CONFIDENCE:
                         log_event(f"[{iteration}] Precio BTC: ${current_price:.2f} | Pred: {prediction:+.4f} | Conf: {confidence*100:.1f}%")
                     
                     if self.current_position:
@@ -446,21 +644,29 @@ class RealMLBot:
                             log_event(f"📍 Posición REAL activa: {self.current_position['type']} desde ${self.current_position['entry_price']:.2f} | Tiempo: {time_in_pos}")
                     
                     # Ejecutar estrategia ML REAL
-                    self.execute_real_ml_strategy(prediction, confidence, current_price)
+                    with self.metrics.stage('strategy'):
+                        self.execute_real_ml_strategy(prediction, confidence, current_price)
+                    self.publish_metrics()
                 
-                # Estadísticas cada 150 iteraciones
+                # Estadísticas cada 150 iteraciones (150 velas)
                 if iteration % 150 == 0:
                     self.print_periodic_statistics()
                 
-                # Esperar más tiempo para dinero real (45 segundos)
-                time.sleep(45)
+                self.error_backoff.reset()
+                
+                # Próximo ciclo al cierre de la siguiente vela
+                self.metrics.update(scheduler=self.scheduler.summary())
+                self.scheduler.wait()
                 
             except KeyboardInterrupt:
                 log_event("🛑 Bot ML REAL detenido manualmente")
                 break
             except Exception as e:
                 log_event(f"❌ Error en bot ML REAL: {e}")
-                time.sleep(90)  # Esperar más en caso de error
+                self.metrics.record_error('loop')
+                delay = self.error_backoff.next_delay(e)
+                log_event(f"⏳ Reintentando en {delay:.0f}s")
+                time.sleep(delay)
         
         # Cleanup final
         if self.current_position:
@@ -471,7 +677,10 @@ class RealMLBot:
             except Exception as e:
                 log_event(f"Error cerrando posición final: {e}")
         
+        if self.user_stream is not None:
+            self.user_stream.stop()
         self.print_final_statistics()
+        self.journal.close()
 
 if __name__ == "__main__":
     print("🚀 INICIANDO BOT ML REAL")
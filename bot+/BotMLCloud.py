@@ -13,6 +13,20 @@ import warnings
 import os
 import signal
 import sys
+from metrics_server import BotMetrics, get_metrics_port
+from param_store import ParamStore
+from state_journal import StateJournal
+from rate_limiter import RateLimitedClient, Backoff
+from market_data_sidecar import MarketDataClient, KLINES_MAX_AGE
+from candle_ring import read_candles, candles_frame
+from indicators import add_indicator_columns
+from ml_models import make_backend, ML_SIGNAL_FEATURES
+from calibration import PredictionLog
+from execution import fetch_order_book, estimate_fill
+from risk_service import RiskClient
+from volatility import VolatilityBook
+from fill_model import first_exits, EXIT_STOP, STOP_FIRST
+from scheduler import CandleScheduler
 warnings.filterwarnings('ignore')
 
 def log_event(text, log_file="ml_btc_trading_log.txt"):
@@ -46,13 +60,44 @@ INITIAL_BALANCE = 100.0
 # Parámetros de ML simplificado
 LOOKBACK_PERIOD = 30
 MIN_CONFIDENCE = 0.65
+# Modelo: 'heuristic' (puntaje ponderado) o 'forest' / 'gbt' / 'logistic' entrenados al iniciar (ml_models.py)
+ML_BACKEND = os.getenv('ML_BACKEND', 'heuristic')
+ML_TRAIN_CANDLES = 1000     # Velas para entrenar los backends
+ML_TARGET_HORIZON = 5       # Velas hacia adelante del target (sube / baja)
 
 # Parámetros de gestión de riesgo para BTC
 BASE_STOP_LOSS = 0.003      # 0.3% stop loss (más conservador para BTC)
 BASE_TAKE_PROFIT = 0.008    # 0.8% take profit (ajustado para BTC)
 MAX_POSITION_SIZE = 0.3
 
-client = Client(API_KEY, API_SECRET)
+# Simulación de SL/TP con máximo y mínimo de cada vela (fill_model.py)
+INTRABAR_ORDERING = STOP_FIRST  # Si una vela toca SL y TP: 'stop_first', 'target_first' u 'ohlc_path'
+STOP_SLIPPAGE_BPS = 2.0         # El stop sale a mercado: slippage en contra
+
+# Ciclo alineado al cierre de cada vela; en calma (volatilidad por vela < referencia) cada más velas
+CYCLE_REFERENCE_VOLATILITY = 0.0008
+CYCLE_MAX_STRIDE = 3
+
+# Parámetros ajustables en caliente (ml_params.json, se aplican entre iteraciones)
+params = ParamStore('ml', {
+    'QUANTITY': QUANTITY,
+    'MIN_CONFIDENCE': MIN_CONFIDENCE,
+    'BASE_STOP_LOSS': BASE_STOP_LOSS,
+    'BASE_TAKE_PROFIT': BASE_TAKE_PROFIT,
+    'MAX_POSITION_SIZE': MAX_POSITION_SIZE
+}, ranges={
+    'QUANTITY': (0.00001, 0.01),
+    'MIN_CONFIDENCE': (0.5, 1.0),
+    'BASE_STOP_LOSS': (0.001, 0.05),
+    'BASE_TAKE_PROFIT': (0.001, 0.1),
+    'MAX_POSITION_SIZE': (0.01, 1.0)
+}, log=log_event)
+
+# Exchange alternativo (ej: fake_exchange.py local): BINANCE_API_URL=http://127.0.0.1:8800/api
+if os.getenv('BINANCE_API_URL'):
+    Client.API_URL = os.getenv('BINANCE_API_URL')
+# Velas y ticker por el sidecar local si está corriendo (un solo fetch para todos los bots de la VM)
+client = MarketDataClient(RateLimitedClient(Client(API_KEY, API_SECRET), log=log_event), log=log_event)
 
 class CloudMLBot:
     def __init__(self):
@@ -67,6 +112,33 @@ class CloudMLBot:
         self.start_time = datetime.datetime.now()
         self.last_heartbeat = datetime.datetime.now()
         
+        # Modelo de predicción (el puntaje ponderado si no se eligió otro backend)
+        self.model = make_backend('heuristic')
+        # Todas las predicciones a CSV para calibrar la confianza (calibration.py)
+        self.prediction_log = PredictionLog()
+        # Volatilidad EWMA + ATR incremental con las velas que ya se piden para predecir
+        self.volatility = VolatilityBook(span=50, atr_period=25)
+        # Últimas velas pedidas (para resolver SL/TP intravela sin otra descarga)
+        self.recent_candles = None
+        # Un ciclo por vela cerrada (no cada 30 s sobre la misma vela)
+        self.scheduler = CandleScheduler(INTERVAL, reference_volatility=CYCLE_REFERENCE_VOLATILITY,
+                                         max_stride=CYCLE_MAX_STRIDE, log=log_event)
+        
+        # Métricas en vivo (consultables por HTTP local)
+        self.metrics = BotMetrics('ml')
+        # Espera creciente tras errores consecutivos del loop (se reinicia al completar una iteración)
+        self.error_backoff = Backoff(base=5.0, cap=300.0)
+        
+        # Diario de estado: recuperar posición y contadores tras una caída
+        self.journal = StateJournal('ml')
+        self.restore_state()
+        
+        # Riesgo de toda la flota: el servicio conoce la posición restaurada (o que no hay ninguna)
+        self.risk = RiskClient('ml', log=log_event)
+        position = self.current_position
+        self.risk.sync([{'id': SYMBOL, 'symbol': SYMBOL, 'notional': position['quantity'] * position['entry_price'],
+                         'price': position['entry_price']}] if position else [], equity=self.balance)
+        
         # Setup signal handlers para shutdown limpio
         signal.signal(signal.SIGINT, self.signal_handler)
         signal.signal(signal.SIGTERM, self.signal_handler)
@@ -83,12 +155,47 @@ class CloudMLBot:
                 log_event(f"Error cerrando posición en shutdown: {e}")
         
         self.print_final_statistics()
+        self.journal.close()
+        self.prediction_log.close()
         log_event("Bot ML Cloud detenido limpiamente")
         sys.exit(0)
         
+    def restore_state(self):
+        """Restaurar posición y contadores desde el diario de estado (tras una caída)"""
+        state = self.journal.restore()
+        if not state:
+            return
+        
+        self.balance = state.get('balance', self.balance)
+        self.current_position = state.get('current_position')
+        self.total_trades = state.get('total_trades', 0)
+        self.winning_trades = state.get('winning_trades', 0)
+        self.total_profit = state.get('total_profit', 0.0)
+        
+        log_event(f"💾 Estado restaurado: Balance {self.balance:.4f} | Trades: {self.total_trades} | Ganadores: {self.winning_trades}")
+        if self.current_position:
+            log_event(f"📍 Posición restaurada: {self.current_position['type']} desde ${self.current_position['entry_price']:.2f} | SL: ${self.current_position['stop_loss']:.2f} | TP: ${self.current_position['take_profit']:.2f}")
+    
+    def save_state(self, event):
+        """Registrar el estado actual en el diario antes de continuar"""
+        self.journal.record(
+            event,
+            balance=self.balance,
+            current_position=self.current_position,
+            total_trades=self.total_trades,
+            winning_trades=self.winning_trades,
+            total_profit=self.total_profit
+        )
+    
     def get_market_data(self, symbol, interval, limit=100):
         """Obtiene datos del mercado con retry logic"""
+        # Velas publicadas por el sidecar en memoria compartida (sin request ni socket)
+        candles = read_candles(symbol, interval, limit, max_age=KLINES_MAX_AGE)
+        if candles is not None:
+            return candles_frame(candles)
+        
         max_retries = 3
+        backoff = Backoff(base=2.0, cap=30.0)
         for attempt in range(max_retries):
             try:
                 klines = client.get_klines(symbol=symbol, interval=interval, limit=limit)
@@ -106,208 +213,93 @@ class CloudMLBot:
                 return df
             except Exception as e:
                 log_event(f"Error obteniendo datos (intento {attempt+1}): {e}")
+                self.metrics.record_error('market_data')
                 if attempt < max_retries - 1:
-                    time.sleep(5)
+                    time.sleep(backoff.next_delay(e))
                 else:
                     return None
     
     def calculate_advanced_features(self, df):
         """Calcula características avanzadas para predicción"""
-        # Medias móviles
-        df['ma_5'] = df['close'].rolling(window=5).mean()
-        df['ma_10'] = df['close'].rolling(window=10).mean()
-        df['ma_20'] = df['close'].rolling(window=20).mean()
-        
-        # RSI
-        delta = df['close'].diff()
-        gain = (delta.where(delta > 0, 0)).rolling(window=14).mean()
-        loss = (-delta.where(delta < 0, 0)).rolling(window=14).mean()
-        rs = gain / loss
-        df['rsi'] = 100 - (100 / (1 + rs))
-        
-        # MACD
-        exp1 = df['close'].ewm(span=12).mean()
-        exp2 = df['close'].ewm(span=26).mean()
-        df['macd'] = exp1 - exp2
-        df['macd_signal'] = df['macd'].ewm(span=9).mean()
-        
-        # Bollinger Bands
-        df['bb_middle'] = df['close'].rolling(window=20).mean()
-        bb_std = df['close'].rolling(window=20).std()
-        df['bb_upper'] = df['bb_middle'] + (bb_std * 2)
-        df['bb_lower'] = df['bb_middle'] - (bb_std * 2)
-        df['bb_position'] = (df['close'] - df['bb_lower']) / (df['bb_upper'] - df['bb_lower'])
-        
-        # Volatilidad
-        df['volatility'] = df['close'].rolling(window=10).std()
-        
-        # Momentum
-        df['momentum'] = df['close'] / df['close'].shift(5) - 1
-        
-        # Price rate of change
-        df['roc'] = df['close'].pct_change(periods=10)
-        
-        # Volume features
-        df['volume_ma'] = df['volume'].rolling(window=10).mean()
-        df['volume_ratio'] = df['volume'] / df['volume_ma']
-        
-        return df
+        # Medias, RSI, MACD, Bollinger, volatilidad, momentum (5 velas), ROC y volumen en un solo paso
+        return add_indicator_columns(df, momentum_period=5, volume_window=10)
     
-    def enhanced_ml_prediction(self):
-        """Algoritmo ML simplificado mejorado"""
-        df = self.get_market_data(SYMBOL, INTERVAL, limit=60)
+    def train_model(self, name):
+        """Entrenar un backend de ml_models con las últimas velas; si falla se sigue con la heurística"""
+        if name == 'heuristic':
+            return True
+        df = self.get_market_data(SYMBOL, INTERVAL, limit=ML_TRAIN_CANDLES)
         if df is None:
-            return None, 0
+            log_event(f"⚠️  Sin datos para entrenar el modelo {name}: usando heurística")
+            return False
         
         df = self.calculate_advanced_features(df)
+        close = df['close'].to_numpy(dtype=float)
+        future = np.full(len(close), np.nan)
+        future[:-ML_TARGET_HORIZON] = close[ML_TARGET_HORIZON:] / close[:-ML_TARGET_HORIZON] - 1
+        X = df[list(ML_SIGNAL_FEATURES)].to_numpy(dtype=float)
+        valid = np.isfinite(X).all(axis=1) & np.isfinite(future)
+        if valid.sum() < 100:
+            log_event(f"⚠️  Insuficientes velas para entrenar el modelo {name}: usando heurística")
+            return False
+        
+        y = (future[valid] > 0).astype(int)
+        self.model = make_backend(name, features=ML_SIGNAL_FEATURES).fit(X[valid], y)
+        log_event(f"🧠 Modelo {name} entrenado con {len(y)} velas - Accuracy: {self.model.score(X[valid], y):.1%}")
+        return True
+    
+    def enhanced_ml_prediction(self, df=None, closed=None):
+        """Algoritmo ML simplificado mejorado (closed: velas cerradas de df; la predicción no usa la vela en formación)"""
+        if df is None:
+            df = self.get_market_data(SYMBOL, INTERVAL, limit=60)
+        if df is None:
+            return None, 0
+        self.volatility.update_frame(SYMBOL, df)
+        self.recent_candles = df
+        
+        df = self.calculate_advanced_features(df if closed is None else df.iloc[:closed])
         
         # Obtener últimos valores
         latest_data = df.iloc[-1]
-        prev_data = df.iloc[-2] if len(df) > 1 else latest_data
-        
-        current_price = latest_data['close']
-        ma_5 = latest_data['ma_5']
-        ma_10 = latest_data['ma_10']
-        ma_20 = latest_data['ma_20']
-        rsi = latest_data['rsi']
-        macd = latest_data['macd']
-        macd_signal = latest_data['macd_signal']
-        bb_position = latest_data['bb_position']
-        momentum = latest_data['momentum']
-        volume_ratio = latest_data['volume_ratio']
-        
-        # Algoritmo ML mejorado con más factores
-        prediction_score = 0
-        confidence_factors = []
-        
-        # Factor 1: Convergencia de medias móviles (peso: 25%)
-        if not np.isnan(ma_5) and not np.isnan(ma_10) and not np.isnan(ma_20):
-            # Tendencia alcista: MA5 > MA10 > MA20
-            if ma_5 > ma_10 > ma_20:
-                ma_strength = (ma_5 - ma_20) / ma_20
-                prediction_score += ma_strength * 0.25
-                confidence_factors.append(min(ma_strength * 5, 1))
-            # Tendencia bajista: MA5 < MA10 < MA20
-            elif ma_5 < ma_10 < ma_20:
-                ma_weakness = (ma_20 - ma_5) / ma_20
-                prediction_score -= ma_weakness * 0.25
-                confidence_factors.append(min(ma_weakness * 5, 1))
-        
-        # Factor 2: RSI con zonas mejoradas (peso: 20%)
-        if not np.isnan(rsi):
-            if rsi < 25:  # Sobreventa extrema
-                prediction_score += 0.20
-                confidence_factors.append(0.9)
-            elif rsi < 35:  # Sobreventa
-                prediction_score += 0.15
-                confidence_factors.append(0.7)
-            elif rsi > 75:  # Sobrecompra extrema
-                prediction_score -= 0.20
-                confidence_factors.append(0.9)
-            elif rsi > 65:  # Sobrecompra
-                prediction_score -= 0.15
-                confidence_factors.append(0.7)
-            else:  # Zona neutral
-                rsi_factor = (rsi - 50) / 50
-                prediction_score += rsi_factor * 0.10
-                confidence_factors.append(abs(rsi_factor) * 0.5)
-        
-        # Factor 3: MACD con divergencia (peso: 20%)
-        if not np.isnan(macd) and not np.isnan(macd_signal):
-            macd_diff = macd - macd_signal
-            if macd > 0 and macd_diff > 0:  # Señal alcista fuerte
-                prediction_score += 0.15
-                confidence_factors.append(0.8)
-            elif macd < 0 and macd_diff < 0:  # Señal bajista fuerte
-                prediction_score -= 0.15
-                confidence_factors.append(0.8)
-            else:
-                macd_factor = np.tanh(macd_diff * 1000)
-                prediction_score += macd_factor * 0.10
-                confidence_factors.append(abs(macd_factor) * 0.6)
-        
-        # Factor 4: Bollinger Bands con squeeze detection (peso: 15%)
-        if not np.isnan(bb_position):
-            bb_width = (latest_data['bb_upper'] - latest_data['bb_lower']) / latest_data['bb_middle']
-            
-            if bb_width < 0.02:  # Bollinger Squeeze
-                if bb_position < 0.3:
-                    prediction_score += 0.12  # Probable breakout alcista
-                    confidence_factors.append(0.75)
-                elif bb_position > 0.7:
-                    prediction_score -= 0.12  # Probable breakout bajista
-                    confidence_factors.append(0.75)
-            else:
-                if bb_position < 0.15:  # Cerca del límite inferior
-                    prediction_score += 0.10
-                    confidence_factors.append(0.7)
-                elif bb_position > 0.85:  # Cerca del límite superior
-                    prediction_score -= 0.10
-                    confidence_factors.append(0.7)
-        
-        # Factor 5: Momentum con aceleración (peso: 10%)
-        if not np.isnan(momentum):
-            momentum_factor = np.tanh(momentum * 10)
-            prediction_score += momentum_factor * 0.10
-            confidence_factors.append(abs(momentum_factor) * 0.8)
-        
-        # Factor 6: Volume confirmation mejorado (peso: 10%)
-        if not np.isnan(volume_ratio):
-            if volume_ratio > 1.5:  # Volumen alto
-                volume_strength = min((volume_ratio - 1) / 2, 1)
-                if prediction_score > 0:
-                    prediction_score += volume_strength * 0.08
-                else:
-                    prediction_score -= volume_strength * 0.08
-                confidence_factors.append(volume_strength)
-            elif volume_ratio < 0.5:  # Volumen muy bajo
-                confidence_factors.append(0.3)  # Reduce confianza
-        
-        # Calcular confianza final
-        if confidence_factors:
-            base_confidence = np.mean(confidence_factors)
-            consistency = 1 - np.std(confidence_factors)  # Más consistencia = más confianza
-            confidence = min(base_confidence * consistency * 1.5, 1.0)
-        else:
-            confidence = 0
+        
+        # Puntaje del backend elegido sobre la última vela
+        scores, confidences = self.model.signal(df[list(self.model.features)].to_numpy(dtype=float)[-1:])
+        prediction_score, confidence = float(scores[0]), float(confidences[0])
         
         # Guardar en historial para análisis
         self.predictions_history.append({
             'timestamp': datetime.datetime.now(),
-            'price': current_price,
+            'price': latest_data['close'],
             'prediction': prediction_score,
             'confidence': confidence,
-            'rsi': rsi,
-            'macd': macd,
-            'bb_position': bb_position,
-            'volume_ratio': volume_ratio
+            'rsi': latest_data['rsi'],
+            'macd': latest_data['macd'],
+            'bb_position': latest_data['bb_position'],
+            'volume_ratio': latest_data['volume_ratio']
         })
         
-        # Mantener solo últimas 100 predicciones
+        # Mantener solo últimas 100 predicciones (el historial completo queda en el CSV)
         if len(self.predictions_history) > 100:
             self.predictions_history.pop(0)
+        self.prediction_log.record(latest_data['close'], prediction_score, confidence,
+                                   candle_time=latest_data['timestamp'], model=self.model.name)
         
         return prediction_score, confidence
     
     def adaptive_risk_management(self, current_price):
         """Gestión de riesgo adaptativa mejorada"""
-        df = self.get_market_data(SYMBOL, INTERVAL, limit=50)
-        if df is None:
-            return BASE_STOP_LOSS, BASE_TAKE_PROFIT
+        estimator = self.volatility.get(SYMBOL)
+        if estimator is None:
+            return params.BASE_STOP_LOSS, params.BASE_TAKE_PROFIT
         
-        # Calcular volatilidad usando múltiples métodos
-        returns = df['close'].pct_change().dropna()
-        volatility_std = returns.std()
-        volatility_range = (df['high'] - df['low']).mean() / df['close'].mean()
-        
-        # Volatilidad combinada
-        combined_volatility = (volatility_std + volatility_range) / 2
+        # Volatilidad combinada: EWMA de retornos + ATR relativo (estimaciones incrementales, sin descargar velas)
+        combined_volatility = (estimator.ewma_vol + estimator.atr_pct) / 2
         
         # Ajustar parámetros basado en volatilidad y tiempo en posición
         volatility_multiplier = 1 + (combined_volatility * 8)
         
-        dynamic_stop = BASE_STOP_LOSS * volatility_multiplier
-        dynamic_take_profit = BASE_TAKE_PROFIT * (1 + combined_volatility * 4)
+        dynamic_stop = params.BASE_STOP_LOSS * volatility_multiplier
+        dynamic_take_profit = params.BASE_TAKE_PROFIT * (1 + combined_volatility * 4)
         
         # Límites adaptativos
         dynamic_stop = max(0.003, min(dynamic_stop, 0.03))
@@ -319,8 +311,8 @@ class CloudMLBot:
         """Ejecuta estrategia ML con lógica mejorada"""
         stop_loss_pct, take_profit_pct = self.adaptive_risk_management(current_price)
         
-        # Umbral dinámico basado en volatilidad
-        df = self.get_market_data(SYMBOL, INTERVAL, limit=20)
+        # Umbral dinámico basado en volatilidad (con las velas ya pedidas para predecir)
+        df = self.recent_candles.tail(20) if self.recent_candles is not None else self.get_market_data(SYMBOL, INTERVAL, limit=20)
         if df is not None:
             recent_volatility = df['close'].pct_change().std()
             prediction_threshold = max(0.015, min(0.025, recent_volatility * 100))
@@ -328,25 +320,37 @@ class CloudMLBot:
             prediction_threshold = 0.02
         
         # Señal de compra con confianza alta
-        if prediction > prediction_threshold and confidence > MIN_CONFIDENCE and not self.current_position:
-            position_size = min(QUANTITY, self.balance * MAX_POSITION_SIZE / current_price)
+        if prediction > prediction_threshold and confidence > params.MIN_CONFIDENCE and not self.current_position:
+            position_size = min(params.QUANTITY, self.balance * params.MAX_POSITION_SIZE / current_price)
+            
+            # El servicio de riesgo reserva la posición o la achica/bloquea según el resto de la flota
+            approved, reason = self.risk.allow_open(SYMBOL, position_size * current_price, SYMBOL,
+                                                    equity=self.balance, price=current_price)
+            if not approved:
+                log_event(f"🛡️ Compra ML BTC bloqueada por riesgo de la flota: {reason}")
+                return
+            if approved < position_size * current_price:
+                log_event(f"🛡️ Tamaño reducido por riesgo de la flota ({reason}): ${approved:.2f} USD")
+                position_size = approved / current_price
             
             log_event(f"🟢 COMPRA ML BTC - Pred: +{prediction*100:.2f}% | Conf: {confidence*100:.1f}% | Precio: ${current_price:.2f}")
             log_event(f"   📊 SL: ${current_price * (1 - stop_loss_pct):.2f} | TP: ${current_price * (1 + take_profit_pct):.2f}")
             
             self.current_position = {
                 'type': 'LONG',
-                'entry_price': current_price,
+                'entry_price': self.simulate_fill_price('BUY', position_size, current_price),
                 'quantity': position_size,
                 'stop_loss': current_price * (1 - stop_loss_pct),
                 'take_profit': current_price * (1 + take_profit_pct),
                 'entry_time': datetime.datetime.now(),
+                'levels_since': int(time.time() * 1000),  # Velas que abren después se revisan intravela
                 'prediction': prediction,
                 'confidence': confidence
             }
+            self.save_state('open')
             
         # Señal de venta
-        elif prediction < -prediction_threshold and confidence > MIN_CONFIDENCE and self.current_position:
+        elif prediction < -prediction_threshold and confidence > params.MIN_CONFIDENCE and self.current_position:
             log_event(f"🔴 Señal ML de venta BTC - Pred: {prediction*100:.2f}% | Conf: {confidence*100:.1f}%")
             self.close_position(current_price, "Señal ML de venta")
             
@@ -362,6 +366,10 @@ class CloudMLBot:
             time_in_position = datetime.datetime.now() - position['entry_time']
             hours_in_position = time_in_position.total_seconds() / 3600
             
+            # SL/TP tocados por el máximo o mínimo de alguna vela desde la última revisión
+            if self.check_intrabar_exit(position):
+                return
+            
             # Stop Loss
             if current_price <= position['stop_loss']:
                 self.close_position(current_price, "Stop Loss")
@@ -376,6 +384,8 @@ class CloudMLBot:
                 new_stop = current_price * (1 - trailing_pct)
                 if new_stop > position['stop_loss']:
                     position['stop_loss'] = new_stop
+                    position['levels_since'] = int(time.time() * 1000)
+                    self.save_state('trailing_stop')
                     log_event(f"🔄 Trailing Stop actualizado: {new_stop:.6f}")
             
             # Stop Loss por tiempo (24 horas máximo)
@@ -383,19 +393,59 @@ class CloudMLBot:
                 log_event(f"⏰ Cerrando posición por tiempo límite (24h)")
                 self.close_position(current_price, "Tiempo límite")
     
-    def close_position(self, current_price, reason):
-        """Cierra posición con logging detallado"""
+    def check_intrabar_exit(self, position):
+        """Cerrar si alguna vela abierta después del último cambio de SL/TP tocó un nivel"""
+        df = self.recent_candles
+        if df is None:
+            return False
+        # Posiciones restauradas de antes de este campo: desde la entrada
+        since = position.get('levels_since') or int(position['entry_time'].timestamp() * 1000)
+        bar, code, price = first_exits(df['timestamp'].to_numpy(dtype=np.int64), df['open'].to_numpy(dtype=float),
+                                       df['high'].to_numpy(dtype=float), df['low'].to_numpy(dtype=float),
+                                       df['close'].to_numpy(dtype=float), since, position['stop_loss'],
+                                       position['take_profit'], ordering=INTRABAR_ORDERING,
+                                       stop_slippage_bps=STOP_SLIPPAGE_BPS)
+        if bar[0] < 0:
+            return False
+        candle_time = datetime.datetime.fromtimestamp(df['timestamp'].iloc[bar[0]] / 1000).strftime('%H:%M')
+        reason = "Stop Loss" if code[0] == EXIT_STOP else "Take Profit"
+        self.close_position(float(price[0]), f"{reason} intravela ({candle_time})", exit_price=float(price[0]))
+        return True
+    
+    def simulate_fill_price(self, side, quantity, current_price):
+        """Precio al que se habría ejecutado la orden simulada según el libro real"""
+        try:
+            estimate = estimate_fill(fetch_order_book(client, SYMBOL), side, quantity)
+        except Exception as e:
+            log_event(f"⚠️  Libro de órdenes no disponible, se usa el precio del ticker: {e}")
+            self.metrics.record_error('order_book')
+            return current_price
+        if estimate is None:
+            return current_price
+        
+        # Costo de ejecución contra el ticker (positivo = peor precio)
+        direction = 1 if side == 'BUY' else -1
+        cost = direction * (estimate['avg_price'] - current_price) * quantity
+        self.metrics.increment('simulated_execution_cost', cost)
+        log_event(f"   ⚖️  Ejecución simulada {side}: ${estimate['avg_price']:.2f} (ticker ${current_price:.2f} | spread {estimate['spread_bps']:.2f} bps | {estimate['levels_used']} niveles)")
+        return estimate['avg_price']
+    
+    def close_position(self, current_price, reason, exit_price=None):
+        """Cierra posición con logging detallado (exit_price: precio ya resuelto por el modelo intravela)"""
         if not self.current_position:
             return
         
         position = self.current_position
-        profit_loss = (current_price - position['entry_price']) * position['quantity']
-        profit_pct = (current_price / position['entry_price'] - 1) * 100
+        if exit_price is None:
+            exit_price = self.simulate_fill_price('SELL', position['quantity'], current_price)
+        profit_loss = (exit_price - position['entry_price']) * position['quantity']
+        profit_pct = (exit_price / position['entry_price'] - 1) * 100
         time_in_position = datetime.datetime.now() - position['entry_time']
         
         self.balance += profit_loss
         self.total_profit += profit_loss
         self.total_trades += 1
+        self.risk.closed(SYMBOL, profit_loss, equity=self.balance)
         
         if profit_loss > 0:
             self.winning_trades += 1
@@ -406,6 +456,7 @@ class CloudMLBot:
         log_event(f"💰 Balance actualizado: ${self.balance:.2f} USD | Predicción original: {position.get('prediction', 0)*100:.2f}%")
         
         self.current_position = None
+        self.save_state('close')
     
     def print_periodic_statistics(self):
         """Imprime estadísticas periódicas"""
@@ -451,31 +502,70 @@ class CloudMLBot:
             runtime = now - self.start_time
             log_event(f"💓 [HEARTBEAT] Bot ML ejecutándose hace {runtime} | Balance: {self.balance:.2f} USDT")
     
+    def publish_metrics(self, **fields):
+        """Publica el estado actual en el endpoint de métricas"""
+        self.metrics.update(
+            balance=self.balance,
+            position=self.current_position,
+            total_trades=self.total_trades,
+            winning_trades=self.winning_trades,
+            total_profit=self.total_profit,
+            api=client.snapshot(),
+            **fields
+        )
+    
     def run_cloud_ml_bot(self):
         """Ejecuta bot ML optimizado para cloud"""
         log_event("🚀 Iniciando Bot ML BTC en Google Cloud")
         log_event(f"💰 Balance inicial: ${self.balance:.2f} USD")
         log_event(f"🎯 Par de trading: {SYMBOL}")
-        log_event(f"₿ Cantidad por trade: {QUANTITY} BTC (~${QUANTITY * 65000:.2f} USD aprox)")
-        log_event(f"🧠 Confianza mínima: {MIN_CONFIDENCE*100}%")
-        log_event(f"🛡️  Stop Loss base: {BASE_STOP_LOSS*100}%")
-        log_event(f"🎯 Take Profit base: {BASE_TAKE_PROFIT*100}%")
+        log_event(f"₿ Cantidad por trade: {params.QUANTITY} BTC (~${params.QUANTITY * 65000:.2f} USD aprox)")
+        log_event(f"🧠 Confianza mínima: {params.MIN_CONFIDENCE*100}%")
+        log_event(f"🛡️  Stop Loss base: {params.BASE_STOP_LOSS*100}%")
+        log_event(f"🎯 Take Profit base: {params.BASE_TAKE_PROFIT*100}%")
+        log_event(f"🧠 Modelo: {ML_BACKEND}")
+        self.train_model(ML_BACKEND)
+        
+        try:
+            metrics_port = get_metrics_port('ml')
+            self.metrics.start_server(metrics_port)
+            log_event(f"📡 Métricas en vivo: http://127.0.0.1:{metrics_port}/metrics")
+        except OSError as e:
+            log_event(f"⚠️  No se pudo iniciar servidor de métricas: {e}")
+        self.publish_metrics()
         
         iteration = 0
         
         while True:
             try:
-                iteration += 1
+                # Aplicar parámetros editados (sin reiniciar ni cerrar la posición)
+                params.poll()
                 
                 # Heartbeat periódico
                 self.heartbeat()
                 
+                # Sin una vela cerrada nueva (todavía no publicada) no hay nada nuevo que decidir
+                with self.metrics.stage('market_data'):
+                    candles = self.get_market_data(SYMBOL, INTERVAL, limit=60)
+                closed = self.scheduler.closed_count(candles['timestamp']) if candles is not None else 0
+                if not closed or not self.scheduler.is_new(int(candles['timestamp'].iloc[closed - 1])):
+                    self.metrics.update(scheduler=self.scheduler.summary())
+                    self.scheduler.wait()
+                    continue
+                iteration += 1
+                
                 # Obtener precio actual
-                ticker = client.get_symbol_ticker(symbol=SYMBOL)
+                with self.metrics.stage('ticker'):
+                    ticker = client.get_symbol_ticker(symbol=SYMBOL)
                 current_price = float(ticker['price'])
+                self.risk.mark({SYMBOL: current_price})
                 
                 # Generar predicción ML
-                prediction, confidence = self.enhanced_ml_prediction()
+                with self.metrics.stage('prediction'):
+                    prediction, confidence = self.enhanced_ml_prediction(candles, closed)
+                
+                self.publish_metrics(iteration=iteration, last_price=current_price,
+                                     last_prediction=prediction, last_confidence=confidence)
                 
                 if prediction is not None:
                     # Log cada 10 iteraciones o si hay alta confianza
@@ -488,21 +578,31 @@ class CloudMLBot:
                             log_event(f"📍 Posición BTC activa: {self.current_position['type']} desde ${self.current_position['entry_price']:.2f} | Tiempo: {time_in_pos}")
                     
                     # Ejecutar estrategia ML
-                    self.execute_ml_strategy(prediction, confidence, current_price)
+                    with self.metrics.stage('strategy'):
+                        self.execute_ml_strategy(prediction, confidence, current_price)
+                    self.publish_metrics()
                 
-                # Estadísticas cada 100 iteraciones (50 minutos aprox)
+                # Estadísticas cada 100 iteraciones (100 velas o más)
                 if iteration % 100 == 0:
                     self.print_periodic_statistics()
                 
-                # Esperar 30 segundos
-                time.sleep(30)
+                self.error_backoff.reset()
+                
+                # Próximo ciclo al cierre de la siguiente vela (o de varias si el mercado está en calma)
+                estimator = self.volatility.get(SYMBOL)
+                self.scheduler.adapt(estimator.ewma_vol if estimator else None, busy=self.current_position is not None)
+                self.metrics.update(scheduler=self.scheduler.summary())
+                self.scheduler.wait()
                 
             except KeyboardInterrupt:
                 log_event("🛑 Bot ML detenido manualmente")
                 break
             except Exception as e:
                 log_event(f"❌ Error en bot ML: {e}")
-                time.sleep(60)  # Esperar más tiempo en caso de error
+                self.metrics.record_error('loop')
+                delay = self.error_backoff.next_delay(e)
+                log_event(f"⏳ Reintentando en {delay:.0f}s")
+                time.sleep(delay)
         
         # Cleanup final
         if self.current_position:
@@ -514,6 +614,8 @@ class CloudMLBot:
                 log_event(f"Error cerrando posición final: {e}")
         
         self.print_final_statistics()
+        self.journal.close()
+        self.prediction_log.close()
 
 if __name__ == "__main__":
     bot = CloudMLBot()
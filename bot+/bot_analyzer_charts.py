@@ -0,0 +1,151 @@
+"""
+📊 GRÁFICOS DEL ANALIZADOR DE BOTS
+===================================
+Dibujo de las figuras sobre un matplotlib.figure.Figure, sin elegir
+backend: la interfaz las muestra con TkAgg y el modo consola las
+guarda como PNG con Agg.
+"""
+
+import numpy as np
+import matplotlib.dates as mdates
+
+from bot_analyzer_core import (
+    MAX_PLOT_POINTS, ROLLING_WIN_RATE_WINDOW, lttb_downsample, build_time_series
+)
+
+# Verde para básico, morado para ML
+BOT_COLORS = {'basic': '#4CAF50', 'ml': '#9C27B0'}
+
+
+def style_axes(ax):
+    """Fondo oscuro y ejes blancos, igual que la interfaz"""
+    ax.set_facecolor('#3b3b3b')
+    ax.tick_params(colors='white')
+    for spine in ax.spines.values():
+        spine.set_color('white')
+
+
+def draw_comparison_charts(fig, basic_data, ml_data):
+    """Gráficos de comparación (trades, ganancia, tasa de éxito, ganadores/perdedores)"""
+    fig.patch.set_facecolor('#2b2b2b')
+    (ax1, ax2), (ax3, ax4) = fig.subplots(2, 2)
+    colors = [BOT_COLORS['basic'], BOT_COLORS['ml']]
+
+    # Gráfico 1: Trades por bot
+    basic_trades = basic_data['total_trades']
+    ml_trades = ml_data['total_trades']
+
+    if basic_trades > 0 or ml_trades > 0:
+        ax1.bar(['Bot Básico', 'Bot ML'], [basic_trades, ml_trades], color=colors)
+        ax1.set_title('Total de Trades', color='white', fontweight='bold')
+        ax1.set_ylabel('Número de Trades', color='white')
+
+    # Gráfico 2: Rentabilidad
+    basic_profit = basic_data['total_profit']
+    ml_profit = ml_data['total_profit']
+
+    if basic_profit != 0 or ml_profit != 0:
+        ax2.bar(['Bot Básico', 'Bot ML'], [basic_profit, ml_profit], color=colors)
+        ax2.set_title('Ganancia Total (USDT)', color='white', fontweight='bold')
+        ax2.set_ylabel('USDT', color='white')
+
+    # Gráfico 3: Tasa de éxito
+    basic_win_rate = (basic_data['winning_trades'] / basic_trades * 100) if basic_trades > 0 else 0
+    ml_win_rate = (ml_data['winning_trades'] / ml_trades * 100) if ml_trades > 0 else 0
+
+    if basic_win_rate > 0 or ml_win_rate > 0:
+        ax3.bar(['Bot Básico', 'Bot ML'], [basic_win_rate, ml_win_rate], color=colors)
+        ax3.set_title('Tasa de Éxito (%)', color='white', fontweight='bold')
+        ax3.set_ylabel('Porcentaje', color='white')
+
+    # Gráfico 4: Distribución ganadores vs perdedores
+    if basic_trades > 0 and ml_trades > 0:
+        basic_counts = [basic_data['winning_trades'], basic_data['losing_trades']]
+        ml_counts = [ml_data['winning_trades'], ml_data['losing_trades']]
+
+        width = 0.35
+        x_pos = [0, 1]
+
+        ax4.bar([p - width/2 for p in x_pos], basic_counts, width, label='Bot Básico', color=colors[0])
+        ax4.bar([p + width/2 for p in x_pos], ml_counts, width, label='Bot ML', color=colors[1])
+
+        ax4.set_title('Trades Ganadores vs Perdedores', color='white', fontweight='bold')
+        ax4.set_ylabel('Número de Trades', color='white')
+        ax4.set_xticks(x_pos)
+        ax4.set_xticklabels(['Ganadores', 'Perdedores'])
+        ax4.legend()
+
+    for ax in (ax1, ax2, ax3, ax4):
+        style_axes(ax)
+
+    fig.tight_layout()
+    return fig
+
+
+def add_downsampled_line(ax, x, y, color, label):
+    """Dibujar una serie reducida y volver a muestrear el tramo visible al hacer zoom"""
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    idx = lttb_downsample(x, y, MAX_PLOT_POINTS)
+    line, = ax.plot(x[idx], y[idx], color=color, label=label, linewidth=1)
+
+    def on_xlim_changed(changed_ax):
+        x_min, x_max = changed_ax.get_xlim()
+        start = max(np.searchsorted(x, x_min) - 1, 0)
+        end = min(np.searchsorted(x, x_max) + 1, len(x))
+        if end - start < 2:
+            return
+        visible = lttb_downsample(x[start:end], y[start:end], MAX_PLOT_POINTS) + start
+        line.set_data(x[visible], y[visible])
+
+    ax.callbacks.connect('xlim_changed', on_xlim_changed)
+    return line
+
+
+def draw_time_series_charts(fig, basic_data, ml_data):
+    """Equity, drawdown, tasa de éxito móvil y predicción ML vs precio.
+
+    Devuelve las líneas dibujadas (se mantienen vivas mientras viva la figura).
+    """
+    basic_series = build_time_series(basic_data)
+    ml_series = build_time_series(ml_data)
+
+    fig.patch.set_facecolor('#2b2b2b')
+    ax_equity = fig.add_subplot(2, 2, 1)
+    ax_drawdown = fig.add_subplot(2, 2, 2, sharex=ax_equity)
+    ax_win_rate = fig.add_subplot(2, 2, 3, sharex=ax_equity)
+    ax_prediction = fig.add_subplot(2, 2, 4)
+    ax_price = ax_prediction.twinx()
+
+    lines = []
+    for key, series, label in (('basic', basic_series, 'Bot Básico'), ('ml', ml_series, 'Bot ML')):
+        if 'time' not in series:
+            continue
+        lines.append(add_downsampled_line(ax_equity, series['time'], series['equity'], BOT_COLORS[key], label))
+        lines.append(add_downsampled_line(ax_drawdown, series['time'], series['drawdown'], BOT_COLORS[key], label))
+        lines.append(add_downsampled_line(ax_win_rate, series['time'], series['rolling_win_rate'],
+                                          BOT_COLORS[key], label))
+
+    if 'prediction_time' in ml_series:
+        lines.append(add_downsampled_line(ax_prediction, ml_series['prediction_time'], ml_series['prediction'],
+                                          BOT_COLORS['ml'], 'Predicción'))
+        lines.append(add_downsampled_line(ax_price, ml_series['prediction_time'], ml_series['price'],
+                                          '#FFC107', 'Precio BTC'))
+        ax_price.set_ylabel('Precio (USDT)', color='white')
+        ax_price.tick_params(colors='white')
+
+    ax_equity.set_title('Curva de Equity (USDT)', color='white', fontweight='bold')
+    ax_drawdown.set_title('Drawdown (USDT)', color='white', fontweight='bold')
+    ax_win_rate.set_title(f'Tasa de Éxito Móvil ({ROLLING_WIN_RATE_WINDOW} trades, %)',
+                          color='white', fontweight='bold')
+    ax_prediction.set_title('Predicción ML vs Precio', color='white', fontweight='bold')
+
+    for ax in (ax_equity, ax_drawdown, ax_win_rate, ax_prediction):
+        style_axes(ax)
+        ax.xaxis.set_major_formatter(mdates.DateFormatter('%m-%d %H:%M'))
+        if ax.get_lines():
+            ax.legend(loc='upper left')
+
+    fig.autofmt_xdate()
+    fig.tight_layout()
+    return lines
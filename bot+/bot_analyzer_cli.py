@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+🖥️ ANALIZADOR DE BOTS - MODO CONSOLA
+=====================================
+Reportes del analizador sin interfaz gráfica, para las VMs sin pantalla.
+No importa tkinter; matplotlib solo se carga (con backend Agg) si se
+piden gráficos PNG.
+
+Uso:
+    python bot_analyzer_cli.py logs/                      # reporte de texto
+    python bot_analyzer_cli.py logs/ --format json -o reporte.json
+    python bot_analyzer_cli.py bot.log ml_bot.log --format csv
+    python bot_analyzer_cli.py logs/ --charts reportes/   # + PNG por bot
+"""
+
+import io
+import os
+import sys
+import csv
+import json
+import argparse
+import datetime
+
+from bot_analyzer_core import (
+    CSV_COLUMNS, analyze_log_batch, find_log_files, generate_fleet_report,
+    summarize_results, summary_rows
+)
+
+
+def collect_paths(inputs, pattern):
+    """Expandir directorios a sus archivos de log"""
+    paths = []
+    for item in inputs:
+        if os.path.isdir(item):
+            paths.extend(find_log_files(item, pattern))
+        elif os.path.isfile(item):
+            paths.append(item)
+        else:
+            print(f"⚠️ No existe: {item}", file=sys.stderr)
+    return paths
+
+
+def write_output(content, output):
+    """Escribir en archivo o en la salida estándar"""
+    if output:
+        with open(output, 'w', encoding='utf-8', newline='') as f:
+            f.write(content)
+    else:
+        sys.stdout.write(content)
+
+
+def render_csv(results):
+    """Resumen por bot en CSV"""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=CSV_COLUMNS)
+    writer.writeheader()
+    writer.writerows(summary_rows(results))
+    return buffer.getvalue()
+
+
+def save_charts(results, directory):
+    """Guardar gráficos PNG de cada bot (importa matplotlib solo aquí)"""
+    import matplotlib
+    matplotlib.use('Agg')
+    from matplotlib.figure import Figure
+    from bot_analyzer_charts import draw_comparison_charts, draw_time_series_charts
+    from bot_analyzer_core import init_bot_data
+
+    os.makedirs(directory, exist_ok=True)
+    stamp = datetime.datetime.now().strftime('%Y%m%d')
+    saved = []
+
+    for key, result in sorted(results.items()):
+        if not result['stats']:
+            continue
+        empty = init_bot_data()
+        if result['type'] == 'ml':
+            basic_data, ml_data = empty, result['data']
+        else:
+            basic_data, ml_data = result['data'], empty
+
+        name = key.replace('/', '_')
+        path = os.path.join(directory, f"{name}_series_{stamp}.png")
+        fig = Figure(figsize=(12, 8))
+        draw_time_series_charts(fig, basic_data, ml_data)
+        fig.savefig(path, facecolor=fig.get_facecolor())
+        saved.append(path)
+
+    # Comparación básico vs ML cuando hay exactamente un bot de cada tipo
+    by_type = {}
+    for result in results.values():
+        if result['stats']:
+            by_type.setdefault(result['type'], []).append(result['data'])
+    if len(by_type.get('basic', [])) == 1 and len(by_type.get('ml', [])) == 1:
+        path = os.path.join(directory, f"comparison_{stamp}.png")
+        fig = draw_comparison_charts(Figure(figsize=(12, 8)), by_type['basic'][0], by_type['ml'][0])
+        fig.savefig(path, facecolor=fig.get_facecolor())
+        saved.append(path)
+
+    return saved
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Reportes de bots de trading sin interfaz gráfica")
+    parser.add_argument('inputs', nargs='+', help="Archivos de log o directorios")
+    parser.add_argument('--pattern', default='**/*log*.txt',
+                        help="Patrón glob dentro de los directorios (default: **/*log*.txt)")
+    parser.add_argument('--format', choices=['text', 'json', 'csv'], default='text',
+                        help="Formato del reporte (default: text)")
+    parser.add_argument('-o', '--output', help="Archivo de salida (default: consola)")
+    parser.add_argument('--charts', metavar='DIR', help="Guardar gráficos PNG en este directorio")
+    parser.add_argument('--workers', type=int, help="Procesos para el análisis por lotes")
+    args = parser.parse_args(argv)
+
+    paths = collect_paths(args.inputs, args.pattern)
+    if not paths:
+        print("❌ No se encontraron logs para analizar", file=sys.stderr)
+        return 1
+
+    # Con un único directorio, las claves de bot son relativas a él (VM/bot)
+    root = args.inputs[0] if len(args.inputs) == 1 and os.path.isdir(args.inputs[0]) else None
+    results = analyze_log_batch(paths, root=root, max_workers=args.workers)
+
+    if args.format == 'json':
+        content = json.dumps(summarize_results(results), indent=2, ensure_ascii=False) + "\n"
+    elif args.format == 'csv':
+        content = render_csv(results)
+    else:
+        content = generate_fleet_report(results) + "\n"
+    write_output(content, args.output)
+
+    if args.charts:
+        for path in save_charts(results, args.charts):
+            print(f"🖼️ Gráfico guardado: {path}", file=sys.stderr)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
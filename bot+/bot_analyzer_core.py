@@ -0,0 +1,720 @@
+"""
+🧮 MOTOR DE ANÁLISIS DE BOTS DE TRADING
+========================================
+Parseo de logs, estadísticas, reportes y series temporales sin
+dependencias gráficas: lo usan la interfaz (bot_analyzer_gui.py) y
+el modo consola (bot_analyzer_cli.py) en las VMs sin pantalla.
+"""
+
+import re
+import os
+import glob
+import datetime
+from datetime import datetime as dt
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+
+from calibration import calibrate, predictions_from_trades
+
+# Intervalo de refresco del modo en vivo (milisegundos)
+LIVE_REFRESH_MS = 2000
+
+# Puntos máximos por serie dibujada (el resto se reduce con MinMax-LTTB)
+MAX_PLOT_POINTS = 2000
+
+# Trades y predicciones retenidos en memoria por bot en el modo en vivo (sesiones de varios días)
+LIVE_MAX_TRADES = 5000
+
+# Ventana (en trades) para la tasa de éxito móvil
+ROLLING_WIN_RATE_WINDOW = 20
+
+def minmax_downsample(x, y, n_buckets):
+    """Índices del mínimo y máximo de cada bucket (vectorizado)"""
+    n = len(y)
+    if n <= 2 * n_buckets:
+        return np.arange(n)
+    
+    # Buckets de igual tamaño sobre el interior; primer y último punto fijos
+    bucket_size = (n - 2) // n_buckets
+    usable = bucket_size * n_buckets
+    inner = np.asarray(y[1:1 + usable]).reshape(n_buckets, bucket_size)
+    offsets = 1 + np.arange(n_buckets) * bucket_size
+    
+    idx_min = offsets + inner.argmin(axis=1)
+    idx_max = offsets + inner.argmax(axis=1)
+    return np.unique(np.concatenate(([0], idx_min, idx_max, np.arange(1 + usable, n))))
+
+def lttb_downsample(x, y, n_out):
+    """Largest-Triangle-Three-Buckets sobre una preselección MinMax.
+    
+    Devuelve los índices de los puntos a dibujar: conserva picos y valles
+    y la forma visual de la serie con n_out puntos.
+    """
+    n = len(x)
+    if n <= n_out or n_out < 3:
+        return np.arange(n)
+    
+    # Preselección MinMax (4 candidatos por bucket final) para que LTTB sea O(n_out)
+    candidates = minmax_downsample(x, y, n_out * 2)
+    cx = np.asarray(x, dtype=float)[candidates]
+    cy = np.asarray(y, dtype=float)[candidates]
+    m = len(candidates)
+    if m <= n_out:
+        return candidates
+    
+    every = (m - 2) / (n_out - 2)
+    selected = np.empty(n_out, dtype=int)
+    selected[0] = 0
+    selected[-1] = m - 1
+    prev = 0
+    
+    for i in range(n_out - 2):
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        # Promedio del bucket siguiente como tercer vértice del triángulo
+        next_end = min(int((i + 2) * every) + 1, m)
+        avg_x = cx[end:next_end].mean()
+        avg_y = cy[end:next_end].mean()
+        
+        area = np.abs((cx[prev] - avg_x) * (cy[start:end] - cy[prev]) -
+                      (cx[prev] - cx[start:end]) * (avg_y - cy[prev]))
+        prev = start + int(area.argmax())
+        selected[i + 1] = prev
+    
+    return candidates[selected]
+
+def init_bot_data():
+    """Inicializar estructura de datos del bot"""
+    return {
+        'trades': [],
+        'total_profit': 0,
+        'total_trades': 0,
+        'winning_trades': 0,
+        'losing_trades': 0,
+        'start_time': None,
+        'end_time': None,
+        'predictions': [],
+        'confidence_levels': [],
+        'session_starts': [],
+        'session_ends': []
+    }
+
+def parse_log_timestamp(timestamp_str):
+    """Convertir 'YYYY-MM-DD HH:MM:SS[.ffffff]' a datetime.
+    
+    fromisoformat es mucho más rápido que strptime y domina el costo
+    de analizar logs grandes; strptime queda como respaldo.
+    """
+    try:
+        return dt.fromisoformat(timestamp_str)
+    except ValueError:
+        if '.' in timestamp_str:
+            return dt.strptime(timestamp_str, '%Y-%m-%d %H:%M:%S.%f')
+        return dt.strptime(timestamp_str, '%Y-%m-%d %H:%M:%S')
+
+def parse_basic_line(data, line):
+    """Analizar una línea del log del bot básico sobre data"""
+    session_starts = data['session_starts']
+    session_ends = data['session_ends']
+    
+    # Extraer timestamp con formato más preciso
+    timestamp_match = re.search(r'\[([\d-]+\s[\d:]+\.?\d*)\]', line)
+    timestamp = None
+    if timestamp_match:
+        timestamp_str = timestamp_match.group(1)
+        try:
+            timestamp = parse_log_timestamp(timestamp_str)
+            
+            if not data['start_time']:
+                data['start_time'] = timestamp
+                session_starts.append(timestamp)
+            data['end_time'] = timestamp
+        except:
+            pass
+    
+    # Detectar inicio de nueva sesión (cuando el bot se reinicia)
+    if 'COMPRA BTC a $' in line and timestamp:
+        # Si hay un gap de más de 10 minutos, es una nueva sesión
+        if session_starts and data['end_time']:
+            time_gap = (timestamp - data['end_time']).total_seconds() / 60
+            if time_gap > 10:  # Más de 10 minutos = nueva sesión
+                session_starts.append(timestamp)
+    
+    # Detectar fin de sesión
+    if 'Bot BTC detenido' in line and timestamp:
+        session_ends.append(timestamp)
+    
+    # Detectar compras (formato: "COMPRA BTC a $115444.99")
+    if 'COMPRA BTC a $' in line or ('COMPRA' in line and ('agresiva' in line or 'BÁSICA' in line)):
+        price_match = re.search(r'\$(\d+\.\d+)', line)
+        if not price_match:
+            price_match = re.search(r'(\d+\.\d+)', line)
+        if price_match:
+            price = float(price_match.group(1))
+            data['trades'].append({
+                'type': 'BUY',
+                'price': price,
+                'timestamp': timestamp
+            })
+    
+    # Detectar ventas con P&L (formatos: "Ganancia/Pérdida: $-0.01 USD" o "P&L: +0.01")
+    if any(keyword in line for keyword in ['STOP LOSS', 'TAKE PROFIT', 'VENTA', 'Ganancia/Pérdida']):
+        profit_match = re.search(r'P&L[:\s]+([+-]?\d+\.\d+)', line)
+        if not profit_match:
+            profit_match = re.search(r'Ganancia/Pérdida[:\s]+\$([+-]?\d+\.\d+)', line)
+        if not profit_match:
+            profit_match = re.search(r'Ganancia/Pérdida[:\s]+([+-]?\d+\.\d+)', line)
+        
+        if profit_match:
+            profit = float(profit_match.group(1))
+            data['total_profit'] += profit
+            data['total_trades'] += 1
+            
+            if profit > 0:
+                data['winning_trades'] += 1
+            else:
+                data['losing_trades'] += 1
+            
+            trade_type = 'SELL'
+            if 'STOP LOSS' in line:
+                trade_type = 'STOP_LOSS'
+            elif 'TAKE PROFIT' in line:
+                trade_type = 'TAKE_PROFIT'
+            
+            price_match = re.search(r'\$(\d+\.\d+)', line)
+            if not price_match:
+                price_match = re.search(r'(\d+\.\d+)', line)
+            price = float(price_match.group(1)) if price_match else 0
+            
+            data['trades'].append({
+                'type': trade_type,
+                'price': price,
+                'profit': profit,
+                'timestamp': timestamp
+            })
+
+def update_basic_runtime(data):
+    """Calcular tiempo real considerando múltiples sesiones"""
+    session_starts = data['session_starts']
+    session_ends = data['session_ends']
+    if session_starts and session_ends:
+        total_runtime = 0
+        # Emparejar inicios con finales de sesión
+        for i in range(min(len(session_starts), len(session_ends))):
+            session_time = (session_ends[i] - session_starts[i]).total_seconds() / 3600
+            total_runtime += session_time
+        
+        # Si hay más inicios que finales, la última sesión aún está activa
+        if len(session_starts) > len(session_ends) and data['end_time']:
+            last_session_time = (data['end_time'] - session_starts[-1]).total_seconds() / 3600
+            total_runtime += last_session_time
+        
+        # Guardar el tiempo real calculado
+        data['real_runtime_hours'] = total_runtime
+
+def parse_ml_line(data, line):
+    """Analizar una línea del log del bot ML sobre data"""
+    # Extraer timestamp
+    timestamp_match = re.search(r'\[([\d-]+\s[\d:]+)\]', line)
+    timestamp = None
+    if timestamp_match:
+        timestamp_str = timestamp_match.group(1)
+        try:
+            timestamp = parse_log_timestamp(timestamp_str)
+            if not data['start_time']:
+                data['start_time'] = timestamp
+            data['end_time'] = timestamp
+        except:
+            pass
+    
+    # Detectar predicciones y confianza - FORMATO ACTUALIZADO
+    pred_match = re.search(r'Pred:\s*([+-]?\d+\.\d+).*Conf:\s*(\d+\.\d+)%', line)
+    if pred_match:
+        prediction = float(pred_match.group(1))
+        confidence = float(pred_match.group(2))
+        data['predictions'].append(prediction)
+        data['confidence_levels'].append(confidence)
+        
+        # Extraer precio BTC del mismo log
+        price_match = re.search(r'Precio BTC:\s*\$(\d+\.\d+)', line)
+        if price_match:
+            price = float(price_match.group(1))
+            # Agregar como predicción con datos
+            data['trades'].append({
+                'type': 'PREDICTION',
+                'price': price,
+                'prediction': prediction,
+                'confidence': confidence,
+                'timestamp': timestamp
+            })
+    
+    # Detectar compras ML - FORMATO ACTUALIZADO PARA LOGS REALES
+    if any(keyword in line for keyword in ['COMPRA ML', '🟢 COMPRA ML BTC', '🟢 COMPRA ML']):
+        # Buscar precio en el formato: Precio: $115588.50
+        price_match = re.search(r'Precio:\s*\$(\d+\.?\d*)', line)
+        if not price_match:
+            # Formato alternativo: cualquier número decimal
+            price_match = re.search(r'(\d+\.\d+)', line)
+        
+        conf_match = re.search(r'Conf[:\s]+(\d+\.\d+)%', line)
+        
+        if price_match:
+            price = float(price_match.group(1))
+            confidence = float(conf_match.group(1)) if conf_match else 0
+            
+            data['trades'].append({
+                'type': 'BUY',
+                'price': price,
+                'confidence': confidence,
+                'timestamp': timestamp
+            })
+    
+    # Detectar estadísticas ML
+    if 'ESTADÍSTICAS ML' in line:
+        # Extraer balance, ROI, trades, etc.
+        balance_match = re.search(r'Balance:\s*(\d+\.\d+)\s*USDT', line)
+        roi_match = re.search(r'ROI:\s*([+-]?\d+\.\d+)%', line)
+        trades_match = re.search(r'Trades:\s*(\d+)', line)
+        winrate_match = re.search(r'Win Rate:\s*(\d+\.\d+)%', line)
+        
+        if balance_match:
+            data['balance'] = float(balance_match.group(1))
+        if roi_match:
+            data['roi'] = float(roi_match.group(1))
+        if trades_match:
+            data['total_trades'] = int(trades_match.group(1))
+        if winrate_match:
+            data['win_rate'] = float(winrate_match.group(1))
+    
+    # Detectar ventas ML con P&L - ACTUALIZADO PARA NUEVOS FORMATOS
+    if any(keyword in line for keyword in ['STOP LOSS', 'TAKE PROFIT', '✅ VENTA EXITOSA', '❌ PÉRDIDA']):
+        profit_match = re.search(r'P&L[:\s]+([+-]?\$?\d+\.\d+)', line)
+        
+        if profit_match:
+            profit_str = profit_match.group(1).replace('$', '').replace('+', '')
+            profit = float(profit_str)
+            data['total_profit'] += profit
+            data['total_trades'] += 1
+            
+            if profit > 0:
+                data['winning_trades'] += 1
+            else:
+                data['losing_trades'] += 1
+            
+            # Determinar tipo de trade
+            if 'STOP LOSS' in line:
+                trade_type = 'STOP_LOSS'
+            elif 'TAKE PROFIT' in line:
+                trade_type = 'TAKE_PROFIT'
+            elif '✅' in line:
+                trade_type = 'WIN'
+            else:
+                trade_type = 'LOSS'
+            
+            price_match = re.search(r'(\d+\.\d+)', line)
+            price = float(price_match.group(1)) if price_match else 0
+            
+            data['trades'].append({
+                'type': trade_type,
+                'price': price,
+                'profit': profit,
+                'timestamp': timestamp
+            })
+
+def calculate_runtime(start_time, end_time):
+    """Calcular el tiempo de ejecución en horas"""
+    if start_time and end_time:
+        delta = end_time - start_time
+        return delta.total_seconds() / 3600
+    return 0
+
+def calculate_bot_statistics(data, is_ml=False):
+    """Estadísticas de un bot (None si no tiene trades cerrados)"""
+    if data['total_trades'] <= 0:
+        return None
+    
+    # Usar tiempo real calculado si está disponible, sino usar el cálculo estándar
+    runtime = data.get('real_runtime_hours', calculate_runtime(data['start_time'], data['end_time']))
+    stats = {
+        'total_trades': data['total_trades'],
+        'winning_trades': data['winning_trades'],
+        'losing_trades': data['losing_trades'],
+        'win_rate': (data['winning_trades'] / data['total_trades']) * 100,
+        'total_profit': data['total_profit'],
+        'avg_profit_per_trade': data['total_profit'] / data['total_trades'],
+        'runtime_hours': runtime
+    }
+    
+    if is_ml:
+        confidence_levels = data['confidence_levels']
+        stats['avg_confidence'] = sum(confidence_levels) / len(confidence_levels) if confidence_levels else 0
+        stats['total_predictions'] = len(data['predictions'])
+        
+        # Calibración con los precios logueados: ¿desde qué confianza pagan las señales? (calibration.py)
+        calibration = calibrate(predictions_from_trades(data['trades']))
+        if calibration['signals']:
+            stats['calibration_error'] = calibration['ece'] * 100
+        if calibration['best'] and calibration['best']['total_return'] > 0:
+            stats['best_min_confidence'] = calibration['best']['threshold'] * 100
+            stats['best_threshold_hit_rate'] = calibration['best']['hit_rate'] * 100
+    
+    return stats
+
+def calibration_lines(stats):
+    """Líneas de calibración de confianza para los reportes (vacío si no hay datos)"""
+    lines = []
+    if 'calibration_error' in stats:
+        lines.append(f"📏 Error de calibración: {stats['calibration_error']:.1f}%")
+    if 'best_min_confidence' in stats:
+        lines.append(f"🎚️ Confianza mínima recomendada: {stats['best_min_confidence']:.0f}% "
+                     f"(acierto {stats['best_threshold_hit_rate']:.1f}%)")
+    return lines
+
+# ------------------ ANÁLISIS POR LOTES ------------------
+
+# Sufijos de fecha/hora en los nombres de log rotados (ej: _20251001, _20251001_1530)
+DATE_SUFFIX_PATTERN = re.compile(r'[_-]\d{8}([_-]\d{4,6})?$')
+
+def bot_key_from_path(path, root=None):
+    """Identificador de bot a partir de la ruta: carpeta (VM) + nombre sin fecha"""
+    stem = DATE_SUFFIX_PATTERN.sub('', os.path.splitext(os.path.basename(path))[0])
+    folder = os.path.dirname(os.path.relpath(path, root)) if root else ''
+    return f"{folder}/{stem}" if folder else stem
+
+def parse_log_file(path):
+    """Analizar un archivo de log completo (se ejecuta en los procesos del pool)"""
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        head = f.read(4096)
+        f.seek(0)
+        
+        is_ml = '[ML-' in head or 'ml' in os.path.basename(path).lower()
+        parser = parse_ml_line if is_ml else parse_basic_line
+        data = init_bot_data()
+        for line in f:
+            parser(data, line.rstrip('\n'))
+    
+    if not is_ml:
+        update_basic_runtime(data)
+    data['real_runtime_hours'] = data.get('real_runtime_hours',
+                                          calculate_runtime(data['start_time'], data['end_time']))
+    return path, ('ml' if is_ml else 'basic'), data
+
+def merge_bot_data(parts):
+    """Unir los datos de varios archivos (días) del mismo bot"""
+    parts = sorted(parts, key=lambda d: d['start_time'] or dt.min)
+    merged = init_bot_data()
+    merged['real_runtime_hours'] = 0.0
+    
+    for data in parts:
+        for key in ('trades', 'predictions', 'confidence_levels', 'session_starts', 'session_ends'):
+            merged[key].extend(data[key])
+        for key in ('total_profit', 'total_trades', 'winning_trades', 'losing_trades', 'real_runtime_hours'):
+            merged[key] += data.get(key, 0)
+        
+        if data['start_time'] and (not merged['start_time'] or data['start_time'] < merged['start_time']):
+            merged['start_time'] = data['start_time']
+        if data['end_time'] and (not merged['end_time'] or data['end_time'] > merged['end_time']):
+            merged['end_time'] = data['end_time']
+        
+        # Valores reportados por el propio bot: quedarse con los más recientes
+        for key in ('balance', 'roi', 'win_rate'):
+            if key in data:
+                merged[key] = data[key]
+    
+    return merged
+
+def analyze_log_batch(paths, root=None, max_workers=None):
+    """Analizar muchos logs en paralelo y agrupar resultados por bot"""
+    paths = sorted(paths)
+    grouped = {}
+    
+    if len(paths) > 1:
+        # chunksize > 1 reduce el overhead de IPC con miles de archivos pequeños
+        workers = max_workers or os.cpu_count() or 1
+        chunksize = max(1, len(paths) // (workers * 4))
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            parsed = list(executor.map(parse_log_file, paths, chunksize=chunksize))
+    else:
+        parsed = [parse_log_file(path) for path in paths]
+    
+    for path, bot_type, data in parsed:
+        key = bot_key_from_path(path, root)
+        entry = grouped.setdefault(key, {'type': bot_type, 'files': [], 'parts': []})
+        entry['files'].append(path)
+        entry['parts'].append(data)
+    
+    results = {}
+    for key, entry in grouped.items():
+        data = merge_bot_data(entry['parts'])
+        results[key] = {
+            'type': entry['type'],
+            'files': entry['files'],
+            'data': data,
+            'stats': calculate_bot_statistics(data, is_ml=entry['type'] == 'ml')
+        }
+    return results
+
+def find_log_files(directory, pattern='**/*log*.txt'):
+    """Buscar logs en un directorio con un patrón glob"""
+    return [path for path in glob.glob(os.path.join(directory, pattern), recursive=True)
+            if os.path.isfile(path)]
+
+def generate_fleet_report(results):
+    """Reporte comparativo para N bots"""
+    report = []
+    report.append("🤖 REPORTE COMPARATIVO DE LA FLOTA DE BOTS")
+    report.append("=" * 50)
+    report.append(f"📅 Fecha de análisis: {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    report.append(f"🗂️ Bots analizados: {len(results)} | Archivos: {sum(len(r['files']) for r in results.values())}")
+    report.append("")
+    
+    active = {key: r for key, r in results.items() if r['stats']}
+    
+    for key, result in sorted(active.items(), key=lambda item: item[1]['stats']['total_profit'], reverse=True):
+        stats = result['stats']
+        icon = "🟣" if result['type'] == 'ml' else "🔵"
+        report.append(f"{icon} {key} ({len(result['files'])} archivos)")
+        report.append("-" * 30)
+        report.append(f"📊 Trades totales: {stats['total_trades']}")
+        report.append(f"✅ Trades ganadores: {stats['winning_trades']}")
+        report.append(f"❌ Trades perdedores: {stats['losing_trades']}")
+        report.append(f"🎯 Tasa de éxito: {stats['win_rate']:.1f}%")
+        report.append(f"💰 Ganancia total: {stats['total_profit']:.6f} USDT")
+        report.append(f"📈 Ganancia promedio: {stats['avg_profit_per_trade']:.6f} USDT")
+        if 'avg_confidence' in stats:
+            report.append(f"🧠 Confianza promedio: {stats['avg_confidence']:.1f}%")
+            report.append(f"🔮 Predicciones generadas: {stats['total_predictions']}")
+            report.extend(calibration_lines(stats))
+        report.append(f"⏱️ Tiempo ejecutándose: {stats['runtime_hours']:.1f} horas")
+        report.append("")
+    
+    inactive = sorted(set(results) - set(active))
+    if inactive:
+        report.append(f"⚪ Sin trades cerrados: {', '.join(inactive)}")
+        report.append("")
+    
+    if len(active) >= 2:
+        def frequency(stats):
+            return stats['total_trades'] / stats['runtime_hours'] if stats['runtime_hours'] > 0 else 0
+        
+        best_profit = max(active, key=lambda k: active[k]['stats']['total_profit'])
+        worst_profit = min(active, key=lambda k: active[k]['stats']['total_profit'])
+        best_win_rate = max(active, key=lambda k: active[k]['stats']['win_rate'])
+        most_active = max(active, key=lambda k: frequency(active[k]['stats']))
+        
+        report.append("🏆 COMPARACIÓN DE LA FLOTA")
+        report.append("-" * 25)
+        report.append(f"💰 Más rentable: {best_profit} ({active[best_profit]['stats']['total_profit']:.6f} USDT)")
+        report.append(f"📉 Menos rentable: {worst_profit} ({active[worst_profit]['stats']['total_profit']:.6f} USDT)")
+        report.append(f"🎯 Mejor tasa de éxito: {best_win_rate} ({active[best_win_rate]['stats']['win_rate']:.1f}%)")
+        report.append(f"⚡ Más activo: {most_active} ({frequency(active[most_active]['stats']):.2f} trades/hora)")
+        report.append(f"💵 Ganancia total de la flota: {sum(r['stats']['total_profit'] for r in active.values()):.6f} USDT")
+    else:
+        report.append("⚠️ Necesitas al menos dos bots con trades para comparar")
+    
+    return "\n".join(report)
+
+def calculate_comparison_statistics(basic, ml):
+    """Estadísticas del bot básico, del bot ML y su comparación directa"""
+    stats = {}
+    
+    # Estadísticas Bot Básico
+    if basic['total_trades'] > 0:
+        stats['basic_bot'] = calculate_bot_statistics(basic)
+    
+    # Estadísticas Bot ML
+    if ml['total_trades'] > 0:
+        stats['ml_bot'] = calculate_bot_statistics(ml, is_ml=True)
+    
+    # Comparación
+    if basic['total_trades'] > 0 and ml['total_trades'] > 0:
+        stats['comparison'] = {
+            'more_active': 'Basic' if basic['total_trades'] > ml['total_trades'] else 'ML',
+            'better_win_rate': 'Basic' if stats['basic_bot']['win_rate'] > stats['ml_bot']['win_rate'] else 'ML',
+            'more_profitable': 'Basic' if basic['total_profit'] > ml['total_profit'] else 'ML',
+            'profit_difference': abs(basic['total_profit'] - ml['total_profit']),
+            'trade_frequency_basic': basic['total_trades'] / stats['basic_bot']['runtime_hours'] if stats['basic_bot']['runtime_hours'] > 0 else 0,
+            'trade_frequency_ml': ml['total_trades'] / stats['ml_bot']['runtime_hours'] if stats['ml_bot']['runtime_hours'] > 0 else 0
+        }
+    
+    return stats
+
+def generate_comparison_report(stats):
+    """Reporte de texto comparando el bot básico con el bot ML"""
+    report = []
+    report.append("🤖 REPORTE COMPARATIVO DE BOTS DE TRADING")
+    report.append("=" * 50)
+    report.append(f"📅 Fecha de análisis: {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    report.append("")
+    
+    # Bot Básico
+    if 'basic_bot' in stats and stats['basic_bot']:
+        basic = stats['basic_bot']
+        report.append("🔵 BOT BÁSICO (Medias Móviles)")
+        report.append("-" * 30)
+        report.append(f"📊 Trades totales: {basic['total_trades']}")
+        report.append(f"✅ Trades ganadores: {basic['winning_trades']}")
+        report.append(f"❌ Trades perdedores: {basic['losing_trades']}")
+        report.append(f"🎯 Tasa de éxito: {basic['win_rate']:.1f}%")
+        report.append(f"💰 Ganancia total: {basic['total_profit']:.6f} USDT")
+        report.append(f"📈 Ganancia promedio: {basic['avg_profit_per_trade']:.6f} USDT")
+        report.append(f"⏱️ Tiempo ejecutándose: {basic['runtime_hours']:.1f} horas")
+        report.append("")
+    
+    # Bot ML
+    if 'ml_bot' in stats and stats['ml_bot']:
+        ml = stats['ml_bot']
+        report.append("🟣 BOT ML (Machine Learning)")
+        report.append("-" * 30)
+        report.append(f"📊 Trades totales: {ml['total_trades']}")
+        report.append(f"✅ Trades ganadores: {ml['winning_trades']}")
+        report.append(f"❌ Trades perdedores: {ml['losing_trades']}")
+        report.append(f"🎯 Tasa de éxito: {ml['win_rate']:.1f}%")
+        report.append(f"💰 Ganancia total: {ml['total_profit']:.6f} USDT")
+        report.append(f"📈 Ganancia promedio: {ml['avg_profit_per_trade']:.6f} USDT")
+        report.append(f"🧠 Confianza promedio: {ml['avg_confidence']:.1f}%")
+        report.append(f"🔮 Predicciones generadas: {ml['total_predictions']}")
+        report.extend(calibration_lines(ml))
+        report.append(f"⏱️ Tiempo ejecutándose: {ml['runtime_hours']:.1f} horas")
+        report.append("")
+    
+    # Comparación
+    if 'comparison' in stats and stats['comparison']:
+        comp = stats['comparison']
+        report.append("🏆 COMPARACIÓN DIRECTA")
+        report.append("-" * 20)
+        report.append(f"🔄 Más activo: Bot {comp['more_active']}")
+        report.append(f"🎯 Mejor tasa de éxito: Bot {comp['better_win_rate']}")
+        report.append(f"💰 Más rentable: Bot {comp['more_profitable']}")
+        report.append(f"💵 Diferencia de ganancia: {comp['profit_difference']:.6f} USDT")
+        report.append(f"⚡ Frecuencia Basic: {comp['trade_frequency_basic']:.2f} trades/hora")
+        report.append(f"⚡ Frecuencia ML: {comp['trade_frequency_ml']:.2f} trades/hora")
+        report.append("")
+    
+    # Recomendaciones
+    report.append("💡 RECOMENDACIONES")
+    report.append("-" * 18)
+    
+    if 'comparison' in stats and stats['comparison']:
+        if stats['comparison']['more_profitable'] == 'ML':
+            report.append("🟣 El Bot ML mostró mejor rendimiento general")
+            report.append("   ✅ Considera usar estrategia ML para futuras operaciones")
+            report.append("   ✅ La selectividad del ML fue efectiva")
+        else:
+            report.append("🔵 El Bot Básico mostró mejor rendimiento")
+            report.append("   ✅ La estrategia simple fue más efectiva en este período")
+            report.append("   ✅ Mayor frecuencia de trading compensó la menor precisión")
+        
+        if 'ml_bot' in stats and stats['ml_bot']:
+            if stats['ml_bot']['win_rate'] > 60:
+                report.append("   🧠 El ML muestra buen potencial, considera ajustar confianza mínima")
+    else:
+        report.append("⚠️ Necesitas más datos para una comparación definitiva")
+        report.append("   📊 Ejecuta los bots por al menos 24 horas")
+    
+    return "\n".join(report)
+
+# ------------------ EXPORTACIÓN (JSON / CSV) ------------------
+
+# Columnas del CSV de resumen (una fila por bot)
+CSV_COLUMNS = ['bot', 'type', 'files', 'total_trades', 'winning_trades', 'losing_trades',
+               'win_rate', 'total_profit', 'avg_profit_per_trade', 'runtime_hours',
+               'avg_confidence', 'total_predictions', 'calibration_error', 'best_min_confidence']
+
+def summarize_results(results):
+    """Resumen serializable de los resultados por bot (sin listas de trades)"""
+    summary = {
+        'generated_at': datetime.datetime.now().isoformat(timespec='seconds'),
+        'bots': {}
+    }
+    for key, result in sorted(results.items()):
+        data = result['data']
+        summary['bots'][key] = {
+            'type': result['type'],
+            'files': result['files'],
+            'start_time': data['start_time'].isoformat() if data['start_time'] else None,
+            'end_time': data['end_time'].isoformat() if data['end_time'] else None,
+            'stats': result['stats']
+        }
+    return summary
+
+def summary_rows(results):
+    """Filas del CSV de resumen"""
+    rows = []
+    for key, result in sorted(results.items()):
+        stats = result['stats'] or {}
+        row = {'bot': key, 'type': result['type'], 'files': len(result['files'])}
+        for column in CSV_COLUMNS[3:]:
+            value = stats.get(column, '')
+            row[column] = round(value, 6) if isinstance(value, float) else value
+        rows.append(row)
+    return rows
+
+def to_plot_dates(timestamps):
+    """Fechas a días desde 1970-01-01 (mismo valor que matplotlib.dates.date2num)"""
+    return np.array(timestamps, dtype='datetime64[us]').astype(np.int64) / 86400e6
+
+def build_time_series(bot_data):
+    """Series temporales de un bot: equity, drawdown, win rate móvil y predicciones"""
+    closed = [t for t in bot_data['trades'] if 'profit' in t and t['timestamp']]
+    predictions = [t for t in bot_data['trades']
+                   if t['type'] == 'PREDICTION' and t['timestamp']]
+    
+    series = {}
+    if closed:
+        times = to_plot_dates([t['timestamp'] for t in closed])
+        profits = np.array([t['profit'] for t in closed], dtype=float)
+        equity = np.cumsum(profits)
+        
+        wins = (profits > 0).astype(float)
+        window = min(ROLLING_WIN_RATE_WINDOW, len(wins))
+        cumulative_wins = np.concatenate(([0.0], np.cumsum(wins)))
+        counts = np.minimum(np.arange(1, len(wins) + 1), window)
+        rolling_wins = cumulative_wins[1:] - cumulative_wins[np.arange(1, len(wins) + 1) - counts]
+        
+        series['time'] = times
+        series['equity'] = equity
+        series['drawdown'] = equity - np.maximum.accumulate(np.maximum(equity, 0))
+        series['rolling_win_rate'] = rolling_wins / counts * 100
+    
+    if predictions:
+        series['prediction_time'] = to_plot_dates([t['timestamp'] for t in predictions])
+        series['prediction'] = np.array([t['prediction'] for t in predictions], dtype=float)
+        series['price'] = np.array([t['price'] for t in predictions], dtype=float)
+    
+    return series
+
+class LogTailer:
+    """Lee solo las líneas nuevas de un log que sigue creciendo"""
+    
+    def __init__(self, path):
+        self.path = path
+        self.offset = 0
+        self.inode = None
+        self.partial = b''
+    
+    def read_new_lines(self):
+        """Devolver las líneas completas escritas desde la última lectura"""
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return []
+        
+        # Archivo rotado o truncado: volver a leer desde el principio
+        if stat.st_ino != self.inode or stat.st_size < self.offset:
+            self.inode = stat.st_ino
+            self.offset = 0
+            self.partial = b''
+        
+        if stat.st_size == self.offset:
+            return []
+        
+        with open(self.path, 'rb') as f:
+            f.seek(self.offset)
+            chunk = f.read()
+            self.offset = f.tell()
+        
+        # Guardar la última línea incompleta para la próxima lectura
+        lines = (self.partial + chunk).split(b'\n')
+        self.partial = lines.pop()
+        return [line.decode('utf-8', errors='replace') for line in lines if line.strip()]
@@ -6,13 +6,19 @@ Interfaz gráfica para analizar y comparar bots
 
 import tkinter as tk
 from tkinter import ttk, scrolledtext, messagebox, filedialog
-import re
 import datetime
 from datetime import datetime as dt
-import json
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 import matplotlib.dates as mdates
+from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+from matplotlib.figure import Figure
+from concurrent.futures import ThreadPoolExecutor
+
+from bot_analyzer_core import (
+    LIVE_REFRESH_MS, LIVE_MAX_TRADES, MAX_PLOT_POINTS, lttb_downsample, init_bot_data, parse_basic_line, update_basic_runtime, parse_ml_line,
+    calculate_runtime, calculate_comparison_statistics, generate_comparison_report,
+    analyze_log_batch, find_log_files, generate_fleet_report, calibration_lines, LogTailer
+)
+from bot_analyzer_charts import draw_comparison_charts, draw_time_series_charts
 
 class TradingBotAnalyzerGUI:
     def __init__(self, root):
@@ -28,6 +34,12 @@ class TradingBotAnalyzerGUI:
         self.basic_bot_data = self.init_bot_data()
         self.ml_bot_data = self.init_bot_data()
         
+        # Estado del modo en vivo
+        self.live_running = False
+        self.live_after_id = None
+        self.live_tailers = {}
+        self.live_background = None
+        
         # Crear interfaz
         self.create_widgets()
         
@@ -57,17 +69,7 @@ class TradingBotAnalyzerGUI:
     
     def init_bot_data(self):
         """Inicializar estructura de datos del bot"""
-        return {
-            'trades': [],
-            'total_profit': 0,
-            'total_trades': 0,
-            'winning_trades': 0,
-            'losing_trades': 0,
-            'start_time': None,
-            'end_time': None,
-            'predictions': [],
-            'confidence_levels': []
-        }
+        return init_bot_data()
     
     def create_widgets(self):
         """Crear todos los widgets de la interfaz"""
@@ -94,8 +96,14 @@ class TradingBotAnalyzerGUI:
         # Pestaña 3: Gráficos
         self.create_charts_tab()
         
-        # Pestaña 4: Reporte
+        # Pestaña 4: Series temporales
+        self.create_time_series_tab()
+        
+        # Pestaña 5: Reporte
         self.create_report_tab()
+        
+        # Pestaña 6: Modo en vivo
+        self.create_live_tab()
     
     def create_data_tab(self):
         """Crear pestaña para cargar datos"""
@@ -151,7 +159,18 @@ class TradingBotAnalyzerGUI:
         # Botón de análisis completo
         ttk.Button(data_frame, text="📈 ANALIZAR TODO", 
                   command=self.analyze_all,
-                  style='Custom.TButton').pack(pady=20)
+                  style='Custom.TButton').pack(pady=(20, 5))
+        
+        # Análisis por lotes: directorio + patrón glob, N bots
+        batch_frame = ttk.Frame(data_frame)
+        batch_frame.pack(pady=(0, 20))
+        
+        ttk.Label(batch_frame, text="Patrón:", style='Header.TLabel').pack(side=tk.LEFT)
+        self.batch_pattern = tk.StringVar(value='**/*log*.txt')
+        ttk.Entry(batch_frame, textvariable=self.batch_pattern, width=25).pack(side=tk.LEFT, padx=5)
+        ttk.Button(batch_frame, text="🗂️ ANÁLISIS POR LOTES", 
+                  command=self.analyze_batch,
+                  style='Custom.TButton').pack(side=tk.LEFT)
     
     def create_stats_tab(self):
         """Crear pestaña de estadísticas"""
@@ -188,10 +207,20 @@ class TradingBotAnalyzerGUI:
                  text="📈 Los gráficos aparecerán aquí después del análisis", 
                  style='Info.TLabel').pack(pady=50)
     
+    def create_time_series_tab(self):
+        """Crear pestaña de series temporales"""
+        self.time_series_frame = ttk.Frame(self.notebook)
+        self.notebook.add(self.time_series_frame, text="📉 Series Temporales")
+        
+        ttk.Label(self.time_series_frame, 
+                 text="📉 Equity, drawdown y predicciones aparecerán aquí después del análisis", 
+                 style='Info.TLabel').pack(pady=50)
+    
     def create_report_tab(self):
         """Crear pestaña de reporte"""
         report_frame = ttk.Frame(self.notebook)
         self.notebook.add(report_frame, text="📄 Reporte")
+        self.report_frame = report_frame
         
         # Área de texto para el reporte
         self.report_text = scrolledtext.ScrolledText(report_frame, 
@@ -211,6 +240,248 @@ class TradingBotAnalyzerGUI:
                   command=self.generate_report,
                   style='Custom.TButton').pack(side=tk.LEFT)
     
+    def create_live_tab(self):
+        """Crear pestaña del dashboard en vivo"""
+        live_frame = ttk.Frame(self.notebook)
+        self.notebook.add(live_frame, text="📡 En Vivo")
+        
+        controls = ttk.Frame(live_frame)
+        controls.pack(fill=tk.X, padx=10, pady=5)
+        
+        self.live_paths = {'basic': tk.StringVar(), 'ml': tk.StringVar()}
+        
+        ttk.Button(controls, text="🔵 Log Básico",
+                  command=lambda: self.choose_live_log('basic'),
+                  style='Custom.TButton').grid(row=0, column=0, sticky=tk.W, padx=(0, 10), pady=2)
+        ttk.Label(controls, textvariable=self.live_paths['basic'],
+                 style='Info.TLabel').grid(row=0, column=1, sticky=tk.W)
+        
+        ttk.Button(controls, text="🟣 Log ML",
+                  command=lambda: self.choose_live_log('ml'),
+                  style='Custom.TButton').grid(row=1, column=0, sticky=tk.W, padx=(0, 10), pady=2)
+        ttk.Label(controls, textvariable=self.live_paths['ml'],
+                 style='Info.TLabel').grid(row=1, column=1, sticky=tk.W)
+        
+        btn_frame = ttk.Frame(live_frame)
+        btn_frame.pack(fill=tk.X, padx=10, pady=5)
+        
+        ttk.Button(btn_frame, text="▶️ Iniciar modo en vivo",
+                  command=self.start_live_mode,
+                  style='Custom.TButton').pack(side=tk.LEFT, padx=(0, 10))
+        ttk.Button(btn_frame, text="⏹️ Detener",
+                  command=self.stop_live_mode,
+                  style='Custom.TButton').pack(side=tk.LEFT)
+        
+        self.live_summary = tk.StringVar(value="📡 Elige los logs y pulsa iniciar")
+        ttk.Label(live_frame, textvariable=self.live_summary,
+                 style='Info.TLabel').pack(anchor=tk.W, padx=10)
+        
+        # Figura persistente: los artistas se actualizan con set_data y blitting
+        self.live_fig = Figure(figsize=(12, 6))
+        self.live_fig.patch.set_facecolor('#2b2b2b')
+        self.live_ax_profit = self.live_fig.add_subplot(1, 2, 1)
+        self.live_ax_trades = self.live_fig.add_subplot(1, 2, 2)
+        
+        colors = {'basic': '#4CAF50', 'ml': '#9C27B0'}
+        labels = {'basic': 'Bot Básico', 'ml': 'Bot ML'}
+        
+        self.live_series = {'basic': ([], []), 'ml': ([], [])}
+        # Mínimo y máximo acumulados de cada curva (no se recorren las series en cada tick)
+        self.live_extent = {'basic': None, 'ml': None}
+        self.live_trade_index = {'basic': 0, 'ml': 0}
+        self.live_lines = {}
+        for key in ('basic', 'ml'):
+            line, = self.live_ax_profit.plot([], [], color=colors[key], label=labels[key],
+                                             animated=True)
+            self.live_lines[key] = line
+        
+        self.live_bars = self.live_ax_trades.bar([labels['basic'], labels['ml']], [0, 0],
+                                                 color=[colors['basic'], colors['ml']])
+        for bar in self.live_bars:
+            bar.set_animated(True)
+        
+        self.live_ax_profit.set_title('Ganancia Acumulada (USDT)', color='white', fontweight='bold')
+        self.live_ax_profit.xaxis.set_major_formatter(mdates.DateFormatter('%m-%d %H:%M'))
+        self.live_ax_profit.legend(loc='upper left')
+        self.live_ax_trades.set_title('Total de Trades', color='white', fontweight='bold')
+        self.live_ax_profit.set_xlim(mdates.date2num(dt.now()), mdates.date2num(dt.now()) + 1 / 24)
+        self.live_ax_profit.set_ylim(-1, 1)
+        self.live_ax_trades.set_ylim(0, 10)
+        
+        for ax in (self.live_ax_profit, self.live_ax_trades):
+            ax.set_facecolor('#3b3b3b')
+            ax.tick_params(colors='white')
+            for spine in ax.spines.values():
+                spine.set_color('white')
+        
+        self.live_fig.tight_layout()
+        
+        self.live_canvas = FigureCanvasTkAgg(self.live_fig, live_frame)
+        self.live_canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
+        self.live_canvas.mpl_connect('draw_event', self.on_live_draw)
+    
+    def choose_live_log(self, key):
+        """Elegir archivo de log a seguir en vivo"""
+        filename = filedialog.askopenfilename(
+            title="Seleccionar archivo de log",
+            filetypes=[("Archivos de texto", "*.txt"), ("Todos los archivos", "*.*")]
+        )
+        if filename:
+            self.live_paths[key].set(filename)
+    
+    def start_live_mode(self):
+        """Iniciar seguimiento en vivo de los logs"""
+        paths = {key: var.get() for key, var in self.live_paths.items() if var.get()}
+        if not paths:
+            messagebox.showwarning("Advertencia", "Elige al menos un log para seguir")
+            return
+        
+        self.stop_live_mode()
+        
+        # Reiniciar datos: el primer tick lee el histórico completo, luego solo lo nuevo
+        self.basic_bot_data = self.init_bot_data()
+        self.ml_bot_data = self.init_bot_data()
+        self.live_tailers = {key: LogTailer(path) for key, path in paths.items()}
+        for key in ('basic', 'ml'):
+            self.live_series[key][0].clear()
+            self.live_series[key][1].clear()
+            self.live_extent[key] = None
+            self.live_trade_index[key] = 0
+        
+        self.live_running = True
+        self.live_tick()
+    
+    def stop_live_mode(self):
+        """Detener seguimiento en vivo"""
+        self.live_running = False
+        if self.live_after_id is not None:
+            self.root.after_cancel(self.live_after_id)
+            self.live_after_id = None
+    
+    def live_tick(self):
+        """Leer líneas nuevas, actualizar datos y redibujar solo lo que cambió"""
+        if not self.live_running:
+            return
+        
+        changed = False
+        for key, tailer in self.live_tailers.items():
+            lines = tailer.read_new_lines()
+            if not lines:
+                continue
+            changed = True
+            
+            if key == 'basic':
+                for line in lines:
+                    self.parse_basic_bot_line(line)
+                self.update_basic_runtime()
+            else:
+                for line in lines:
+                    self.parse_ml_bot_line(line)
+            self.extend_live_series(key)
+        
+        if changed:
+            self.update_live_artists()
+        
+        self.live_after_id = self.root.after(LIVE_REFRESH_MS, self.live_tick)
+    
+    def extend_live_series(self, key):
+        """Agregar a la curva de ganancia solo los trades nuevos"""
+        data = self.basic_bot_data if key == 'basic' else self.ml_bot_data
+        xs, ys = self.live_series[key]
+        cumulative = ys[-1] if ys else 0.0
+        
+        extent = self.live_extent[key] or [cumulative, cumulative]
+        
+        trades = data['trades']
+        for trade in trades[self.live_trade_index[key]:]:
+            if 'profit' not in trade:
+                continue
+            timestamp = trade['timestamp'] or data['end_time'] or dt.now()
+            cumulative += trade['profit']
+            xs.append(mdates.date2num(timestamp))
+            ys.append(cumulative)
+            extent[0] = min(extent[0], cumulative)
+            extent[1] = max(extent[1], cumulative)
+        if ys:
+            self.live_extent[key] = extent
+        
+        # Memoria acotada: los trades ya volcados a la curva (y las predicciones viejas) se descartan
+        for field in ('trades', 'predictions', 'confidence_levels'):
+            del data[field][:-LIVE_MAX_TRADES]
+        self.live_trade_index[key] = len(trades)
+        
+        # Curva acotada: al duplicar el máximo se reduce con LTTB (costo amortizado constante por punto)
+        if len(xs) > 2 * MAX_PLOT_POINTS:
+            keep = lttb_downsample(xs, ys, MAX_PLOT_POINTS)
+            xs[:] = [xs[i] for i in keep]
+            ys[:] = [ys[i] for i in keep]
+    
+    def update_live_artists(self):
+        """Actualizar artistas con set_data; redibujo completo solo si cambian los ejes"""
+        rescale = False
+        
+        for key, line in self.live_lines.items():
+            xs, ys = self.live_series[key]
+            line.set_data(xs, ys)
+            if xs:
+                x_min, x_max = self.live_ax_profit.get_xlim()
+                y_min, y_max = self.live_ax_profit.get_ylim()
+                low, high = self.live_extent[key]
+                if xs[0] < x_min or xs[-1] > x_max or low < y_min or high > y_max:
+                    rescale = True
+        
+        counts = [self.basic_bot_data['total_trades'], self.ml_bot_data['total_trades']]
+        for bar, count in zip(self.live_bars, counts):
+            bar.set_height(count)
+        if max(counts) > self.live_ax_trades.get_ylim()[1]:
+            # Crecer con margen para no redibujar los ejes en cada trade
+            self.live_ax_trades.set_ylim(0, max(counts) * 1.5)
+            rescale = True
+        
+        if rescale:
+            self.rescale_live_profit_axis()
+        
+        self.live_summary.set(
+            f"🔵 Básico: {counts[0]} trades, {self.basic_bot_data['total_profit']:.6f} USDT | "
+            f"🟣 ML: {counts[1]} trades, {self.ml_bot_data['total_profit']:.6f} USDT | "
+            f"⏰ {dt.now().strftime('%H:%M:%S')}"
+        )
+        
+        if rescale or self.live_background is None:
+            # Redibujo completo: on_live_draw guarda el nuevo fondo
+            self.live_canvas.draw_idle()
+        else:
+            self.live_canvas.restore_region(self.live_background)
+            self.draw_live_artists()
+            self.live_canvas.blit(self.live_fig.bbox)
+    
+    def rescale_live_profit_axis(self):
+        """Ajustar límites de la curva de ganancia con margen"""
+        all_x = [x for xs, _ in self.live_series.values() for x in xs[:1] + xs[-1:]]
+        all_y = [y for extent in self.live_extent.values() if extent for y in extent]
+        if not all_x or not all_y:
+            return
+        
+        x_min, x_max = min(all_x), max(all_x)
+        x_span = max(x_max - x_min, 1 / 24)
+        self.live_ax_profit.set_xlim(x_min, x_max + x_span * 0.5)
+        
+        y_min, y_max = min(all_y), max(all_y)
+        y_margin = max((y_max - y_min) * 0.5, abs(y_max) * 0.1, 1e-6)
+        self.live_ax_profit.set_ylim(y_min - y_margin, y_max + y_margin)
+    
+    def on_live_draw(self, event):
+        """Guardar el fondo estático tras un redibujo completo"""
+        self.live_background = self.live_canvas.copy_from_bbox(self.live_fig.bbox)
+        self.draw_live_artists()
+    
+    def draw_live_artists(self):
+        """Dibujar solo los artistas animados"""
+        for line in self.live_lines.values():
+            self.live_ax_profit.draw_artist(line)
+        for bar in self.live_bars:
+            self.live_ax_trades.draw_artist(bar)
+    
     def load_from_file(self, text_widget):
         """Cargar log desde archivo"""
         filename = filedialog.askopenfilename(
@@ -253,218 +524,29 @@ class TradingBotAnalyzerGUI:
         """Analizar el log del bot básico"""
         lines = log_content.strip().split('\n')
         
-        # Variables para seguimiento de sesiones
-        session_starts = []
-        session_ends = []
-        
         for line in lines:
-            # Extraer timestamp con formato más preciso
-            timestamp_match = re.search(r'\[([\d-]+\s[\d:]+\.?\d*)\]', line)
-            timestamp = None
-            if timestamp_match:
-                timestamp_str = timestamp_match.group(1)
-                try:
-                    # Intentar con microsegundos primero
-                    if '.' in timestamp_str:
-                        timestamp = dt.strptime(timestamp_str, '%Y-%m-%d %H:%M:%S.%f')
-                    else:
-                        timestamp = dt.strptime(timestamp_str, '%Y-%m-%d %H:%M:%S')
-                    
-                    if not self.basic_bot_data['start_time']:
-                        self.basic_bot_data['start_time'] = timestamp
-                        session_starts.append(timestamp)
-                    self.basic_bot_data['end_time'] = timestamp
-                except:
-                    pass
-            
-            # Detectar inicio de nueva sesión (cuando el bot se reinicia)
-            if 'COMPRA BTC a $' in line and timestamp:
-                # Si hay un gap de más de 10 minutos, es una nueva sesión
-                if session_starts and self.basic_bot_data['end_time']:
-                    time_gap = (timestamp - self.basic_bot_data['end_time']).total_seconds() / 60
-                    if time_gap > 10:  # Más de 10 minutos = nueva sesión
-                        session_starts.append(timestamp)
-            
-            # Detectar fin de sesión
-            if 'Bot BTC detenido' in line and timestamp:
-                session_ends.append(timestamp)
-            
-            # Detectar compras (formato: "COMPRA BTC a $115444.99")
-            if 'COMPRA BTC a $' in line or ('COMPRA' in line and ('agresiva' in line or 'BÁSICA' in line)):
-                price_match = re.search(r'\$(\d+\.\d+)', line)
-                if not price_match:
-                    price_match = re.search(r'(\d+\.\d+)', line)
-                if price_match:
-                    price = float(price_match.group(1))
-                    self.basic_bot_data['trades'].append({
-                        'type': 'BUY',
-                        'price': price,
-                        'timestamp': timestamp
-                    })
-            
-            # Detectar ventas con P&L (formatos: "Ganancia/Pérdida: $-0.01 USD" o "P&L: +0.01")
-            if any(keyword in line for keyword in ['STOP LOSS', 'TAKE PROFIT', 'VENTA', 'Ganancia/Pérdida']):
-                profit_match = re.search(r'P&L[:\s]+([+-]?\d+\.\d+)', line)
-                if not profit_match:
-                    profit_match = re.search(r'Ganancia/Pérdida[:\s]+\$([+-]?\d+\.\d+)', line)
-                if not profit_match:
-                    profit_match = re.search(r'Ganancia/Pérdida[:\s]+([+-]?\d+\.\d+)', line)
-                
-                if profit_match:
-                    profit = float(profit_match.group(1))
-                    self.basic_bot_data['total_profit'] += profit
-                    self.basic_bot_data['total_trades'] += 1
-                    
-                    if profit > 0:
-                        self.basic_bot_data['winning_trades'] += 1
-                    else:
-                        self.basic_bot_data['losing_trades'] += 1
-                    
-                    trade_type = 'SELL'
-                    if 'STOP LOSS' in line:
-                        trade_type = 'STOP_LOSS'
-                    elif 'TAKE PROFIT' in line:
-                        trade_type = 'TAKE_PROFIT'
-                    
-                    price_match = re.search(r'\$(\d+\.\d+)', line)
-                    if not price_match:
-                        price_match = re.search(r'(\d+\.\d+)', line)
-                    price = float(price_match.group(1)) if price_match else 0
-                    
-                    self.basic_bot_data['trades'].append({
-                        'type': trade_type,
-                        'price': price,
-                        'profit': profit,
-                        'timestamp': timestamp
-                    })
-        
-        # Calcular tiempo real considerando múltiples sesiones
-        if session_starts and session_ends:
-            total_runtime = 0
-            # Emparejar inicios con finales de sesión
-            for i in range(min(len(session_starts), len(session_ends))):
-                session_time = (session_ends[i] - session_starts[i]).total_seconds() / 3600
-                total_runtime += session_time
-            
-            # Si hay más inicios que finales, la última sesión aún está activa
-            if len(session_starts) > len(session_ends) and self.basic_bot_data['end_time']:
-                last_session_time = (self.basic_bot_data['end_time'] - session_starts[-1]).total_seconds() / 3600
-                total_runtime += last_session_time
-            
-            # Guardar el tiempo real calculado
-            self.basic_bot_data['real_runtime_hours'] = total_runtime
+            self.parse_basic_bot_line(line)
+        
+        self.update_basic_runtime()
+    
+    def parse_basic_bot_line(self, line):
+        """Analizar una línea del log del bot básico (permite procesar en vivo)"""
+        parse_basic_line(self.basic_bot_data, line)
+    
+    def update_basic_runtime(self):
+        """Calcular tiempo real considerando múltiples sesiones"""
+        update_basic_runtime(self.basic_bot_data)
     
     def parse_ml_bot_log(self, log_content):
         """Analizar el log del bot ML"""
         lines = log_content.strip().split('\n')
         
         for line in lines:
-            # Extraer timestamp
-            timestamp_match = re.search(r'\[([\d-]+\s[\d:]+)\]', line)
-            timestamp = None
-            if timestamp_match:
-                timestamp_str = timestamp_match.group(1)
-                try:
-                    timestamp = dt.strptime(timestamp_str, '%Y-%m-%d %H:%M:%S')
-                    if not self.ml_bot_data['start_time']:
-                        self.ml_bot_data['start_time'] = timestamp
-                    self.ml_bot_data['end_time'] = timestamp
-                except:
-                    pass
-            
-            # Detectar predicciones y confianza - FORMATO ACTUALIZADO
-            pred_match = re.search(r'Pred:\s*([+-]?\d+\.\d+).*Conf:\s*(\d+\.\d+)%', line)
-            if pred_match:
-                prediction = float(pred_match.group(1))
-                confidence = float(pred_match.group(2))
-                self.ml_bot_data['predictions'].append(prediction)
-                self.ml_bot_data['confidence_levels'].append(confidence)
-                
-                # Extraer precio BTC del mismo log
-                price_match = re.search(r'Precio BTC:\s*\$(\d+\.\d+)', line)
-                if price_match:
-                    price = float(price_match.group(1))
-                    # Agregar como predicción con datos
-                    self.ml_bot_data['trades'].append({
-                        'type': 'PREDICTION',
-                        'price': price,
-                        'prediction': prediction,
-                        'confidence': confidence,
-                        'timestamp': timestamp
-                    })
-            
-            # Detectar compras ML - FORMATO ACTUALIZADO PARA LOGS REALES
-            if any(keyword in line for keyword in ['COMPRA ML', '🟢 COMPRA ML BTC', '🟢 COMPRA ML']):
-                # Buscar precio en el formato: Precio: $115588.50
-                price_match = re.search(r'Precio:\s*\$(\d+\.?\d*)', line)
-                if not price_match:
-                    # Formato alternativo: cualquier número decimal
-                    price_match = re.search(r'(\d+\.\d+)', line)
-                
-                conf_match = re.search(r'Conf[:\s]+(\d+\.\d+)%', line)
-                
-                if price_match:
-                    price = float(price_match.group(1))
-                    confidence = float(conf_match.group(1)) if conf_match else 0
-                    
-                    self.ml_bot_data['trades'].append({
-                        'type': 'BUY',
-                        'price': price,
-                        'confidence': confidence,
-                        'timestamp': timestamp
-                    })
-            
-            # Detectar estadísticas ML
-            if 'ESTADÍSTICAS ML' in line:
-                # Extraer balance, ROI, trades, etc.
-                balance_match = re.search(r'Balance:\s*(\d+\.\d+)\s*USDT', line)
-                roi_match = re.search(r'ROI:\s*([+-]?\d+\.\d+)%', line)
-                trades_match = re.search(r'Trades:\s*(\d+)', line)
-                winrate_match = re.search(r'Win Rate:\s*(\d+\.\d+)%', line)
-                
-                if balance_match:
-                    self.ml_bot_data['balance'] = float(balance_match.group(1))
-                if roi_match:
-                    self.ml_bot_data['roi'] = float(roi_match.group(1))
-                if trades_match:
-                    self.ml_bot_data['total_trades'] = int(trades_match.group(1))
-                if winrate_match:
-                    self.ml_bot_data['win_rate'] = float(winrate_match.group(1))
-            
-            # Detectar ventas ML con P&L - ACTUALIZADO PARA NUEVOS FORMATOS
-            if any(keyword in line for keyword in ['STOP LOSS', 'TAKE PROFIT', '✅ VENTA EXITOSA', '❌ PÉRDIDA']):
-                profit_match = re.search(r'P&L[:\s]+([+-]?\$?\d+\.\d+)', line)
-                
-                if profit_match:
-                    profit_str = profit_match.group(1).replace('$', '').replace('+', '')
-                    profit = float(profit_str)
-                    self.ml_bot_data['total_profit'] += profit
-                    self.ml_bot_data['total_trades'] += 1
-                    
-                    if profit > 0:
-                        self.ml_bot_data['winning_trades'] += 1
-                    else:
-                        self.ml_bot_data['losing_trades'] += 1
-                    
-                    # Determinar tipo de trade
-                    if 'STOP LOSS' in line:
-                        trade_type = 'STOP_LOSS'
-                    elif 'TAKE PROFIT' in line:
-                        trade_type = 'TAKE_PROFIT'
-                    elif '✅' in line:
-                        trade_type = 'WIN'
-                    else:
-                        trade_type = 'LOSS'
-                    
-                    price_match = re.search(r'(\d+\.\d+)', line)
-                    price = float(price_match.group(1)) if price_match else 0
-                    
-                    self.ml_bot_data['trades'].append({
-                        'type': trade_type,
-                        'price': price,
-                        'profit': profit,
-                        'timestamp': timestamp
-                    })
+            self.parse_ml_bot_line(line)
+    
+    def parse_ml_bot_line(self, line):
+        """Analizar una línea del log del bot ML (permite procesar en vivo)"""
+        parse_ml_line(self.ml_bot_data, line)
     
     def analyze_all(self):
         """Realizar análisis completo"""
@@ -486,10 +568,48 @@ class TradingBotAnalyzerGUI:
         # Generar estadísticas y visualizaciones
         self.display_statistics()
         self.create_charts()
+        self.create_time_series_charts()
         self.generate_report()
         
         messagebox.showinfo("Éxito", "¡Análisis completo realizado!")
     
+    def analyze_batch(self):
+        """Analizar un directorio de logs de toda la flota en segundo plano"""
+        directory = filedialog.askdirectory(title="Seleccionar directorio de logs")
+        if not directory:
+            return
+        
+        paths = find_log_files(directory, self.batch_pattern.get() or '**/*log*.txt')
+        if not paths:
+            messagebox.showwarning("Advertencia", "No se encontraron logs con ese patrón")
+            return
+        
+        # El pool de procesos corre desde un hilo para no bloquear la interfaz
+        executor = ThreadPoolExecutor(max_workers=1)
+        self.batch_future = executor.submit(analyze_log_batch, paths, directory)
+        executor.shutdown(wait=False)
+        
+        self.report_text.delete(1.0, tk.END)
+        self.report_text.insert(1.0, f"⏳ Analizando {len(paths)} archivos de log...")
+        self.root.after(200, self.check_batch_result)
+    
+    def check_batch_result(self):
+        """Mostrar el resultado del análisis por lotes cuando termine"""
+        if not self.batch_future.done():
+            self.root.after(200, self.check_batch_result)
+            return
+        
+        try:
+            self.fleet_results = self.batch_future.result()
+        except Exception as e:
+            messagebox.showerror("Error", f"Error en análisis por lotes: {str(e)}")
+            return
+        
+        self.report_text.delete(1.0, tk.END)
+        self.report_text.insert(1.0, generate_fleet_report(self.fleet_results))
+        self.notebook.select(self.report_frame)
+        messagebox.showinfo("Éxito", f"¡Análisis por lotes completado! {len(self.fleet_results)} bots")
+    
     def display_statistics(self):
         """Mostrar estadísticas en la pestaña correspondiente"""
         # Limpiar contenido anterior
@@ -533,6 +653,7 @@ class TradingBotAnalyzerGUI:
                 f"📈 Ganancia promedio: {ml['avg_profit_per_trade']:.6f} USDT/trade",
                 f"🧠 Confianza promedio: {ml['avg_confidence']:.1f}%",
                 f"🔮 Predicciones generadas: {ml['total_predictions']}",
+                *calibration_lines(ml),
                 f"⏱️ Tiempo ejecutándose: {ml['runtime_hours']:.1f} horas"
             ]
             
@@ -559,58 +680,11 @@ class TradingBotAnalyzerGUI:
     
     def calculate_statistics(self):
         """Calcular estadísticas detalladas"""
-        stats = {}
-        
-        # Estadísticas Bot Básico
-        basic = self.basic_bot_data
-        if basic['total_trades'] > 0:
-            # Usar tiempo real calculado si está disponible, sino usar el cálculo estándar
-            real_runtime = basic.get('real_runtime_hours', self._calculate_runtime(basic['start_time'], basic['end_time']))
-            stats['basic_bot'] = {
-                'total_trades': basic['total_trades'],
-                'winning_trades': basic['winning_trades'],
-                'losing_trades': basic['losing_trades'],
-                'win_rate': (basic['winning_trades'] / basic['total_trades']) * 100,
-                'total_profit': basic['total_profit'],
-                'avg_profit_per_trade': basic['total_profit'] / basic['total_trades'],
-                'runtime_hours': real_runtime
-            }
-        
-        # Estadísticas Bot ML
-        ml = self.ml_bot_data
-        if ml['total_trades'] > 0:
-            avg_confidence = sum(ml['confidence_levels']) / len(ml['confidence_levels']) if ml['confidence_levels'] else 0
-            stats['ml_bot'] = {
-                'total_trades': ml['total_trades'],
-                'winning_trades': ml['winning_trades'],
-                'losing_trades': ml['losing_trades'],
-                'win_rate': (ml['winning_trades'] / ml['total_trades']) * 100,
-                'total_profit': ml['total_profit'],
-                'avg_profit_per_trade': ml['total_profit'] / ml['total_trades'],
-                'avg_confidence': avg_confidence,
-                'total_predictions': len(ml['predictions']),
-                'runtime_hours': self._calculate_runtime(ml['start_time'], ml['end_time'])
-            }
-        
-        # Comparación
-        if basic['total_trades'] > 0 and ml['total_trades'] > 0:
-            stats['comparison'] = {
-                'more_active': 'Basic' if basic['total_trades'] > ml['total_trades'] else 'ML',
-                'better_win_rate': 'Basic' if stats['basic_bot']['win_rate'] > stats['ml_bot']['win_rate'] else 'ML',
-                'more_profitable': 'Basic' if basic['total_profit'] > ml['total_profit'] else 'ML',
-                'profit_difference': abs(basic['total_profit'] - ml['total_profit']),
-                'trade_frequency_basic': basic['total_trades'] / stats['basic_bot']['runtime_hours'] if stats['basic_bot']['runtime_hours'] > 0 else 0,
-                'trade_frequency_ml': ml['total_trades'] / stats['ml_bot']['runtime_hours'] if stats['ml_bot']['runtime_hours'] > 0 else 0
-            }
-        
-        return stats
+        return calculate_comparison_statistics(self.basic_bot_data, self.ml_bot_data)
     
     def _calculate_runtime(self, start_time, end_time):
         """Calcular el tiempo de ejecución en horas"""
-        if start_time and end_time:
-            delta = end_time - start_time
-            return delta.total_seconds() / 3600
-        return 0
+        return calculate_runtime(start_time, end_time)
     
     def create_charts(self):
         """Crear gráficos de comparación"""
@@ -618,152 +692,32 @@ class TradingBotAnalyzerGUI:
         for widget in self.charts_frame.winfo_children():
             widget.destroy()
         
-        # Crear figura con subplots
-        fig, ((ax1, ax2), (ax3, ax4)) = plt.subplots(2, 2, figsize=(12, 8))
-        fig.patch.set_facecolor('#2b2b2b')
-        
-        # Configurar colores
-        colors = ['#4CAF50', '#9C27B0']  # Verde para básico, morado para ML
-        
-        # Gráfico 1: Trades por bot
-        basic_trades = self.basic_bot_data['total_trades']
-        ml_trades = self.ml_bot_data['total_trades']
-        
-        if basic_trades > 0 or ml_trades > 0:
-            ax1.bar(['Bot Básico', 'Bot ML'], [basic_trades, ml_trades], color=colors)
-            ax1.set_title('Total de Trades', color='white', fontweight='bold')
-            ax1.set_ylabel('Número de Trades', color='white')
-            ax1.tick_params(colors='white')
-        
-        # Gráfico 2: Rentabilidad
-        basic_profit = self.basic_bot_data['total_profit']
-        ml_profit = self.ml_bot_data['total_profit']
-        
-        if basic_profit != 0 or ml_profit != 0:
-            ax2.bar(['Bot Básico', 'Bot ML'], [basic_profit, ml_profit], color=colors)
-            ax2.set_title('Ganancia Total (USDT)', color='white', fontweight='bold')
-            ax2.set_ylabel('USDT', color='white')
-            ax2.tick_params(colors='white')
-        
-        # Gráfico 3: Tasa de éxito
-        basic_win_rate = (self.basic_bot_data['winning_trades'] / basic_trades * 100) if basic_trades > 0 else 0
-        ml_win_rate = (self.ml_bot_data['winning_trades'] / ml_trades * 100) if ml_trades > 0 else 0
-        
-        if basic_win_rate > 0 or ml_win_rate > 0:
-            ax3.bar(['Bot Básico', 'Bot ML'], [basic_win_rate, ml_win_rate], color=colors)
-            ax3.set_title('Tasa de Éxito (%)', color='white', fontweight='bold')
-            ax3.set_ylabel('Porcentaje', color='white')
-            ax3.tick_params(colors='white')
-        
-        # Gráfico 4: Distribución ganadores vs perdedores
-        if basic_trades > 0 and ml_trades > 0:
-            basic_data = [self.basic_bot_data['winning_trades'], self.basic_bot_data['losing_trades']]
-            ml_data = [self.ml_bot_data['winning_trades'], self.ml_bot_data['losing_trades']]
-            
-            x = ['Ganadores', 'Perdedores']
-            width = 0.35
-            x_pos = [0, 1]
-            
-            ax4.bar([p - width/2 for p in x_pos], basic_data, width, label='Bot Básico', color=colors[0])
-            ax4.bar([p + width/2 for p in x_pos], ml_data, width, label='Bot ML', color=colors[1])
-            
-            ax4.set_title('Trades Ganadores vs Perdedores', color='white', fontweight='bold')
-            ax4.set_ylabel('Número de Trades', color='white')
-            ax4.set_xticks(x_pos)
-            ax4.set_xticklabels(x)
-            ax4.legend()
-            ax4.tick_params(colors='white')
-        
-        # Configurar fondo de todos los subplots
-        for ax in [ax1, ax2, ax3, ax4]:
-            ax.set_facecolor('#3b3b3b')
-            for spine in ax.spines.values():
-                spine.set_color('white')
-        
-        plt.tight_layout()
+        fig = draw_comparison_charts(Figure(figsize=(12, 8)), self.basic_bot_data, self.ml_bot_data)
         
         # Agregar a tkinter
         canvas = FigureCanvasTkAgg(fig, self.charts_frame)
         canvas.draw()
         canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
     
-    def generate_report(self):
-        """Generar reporte completo"""
-        stats = self.calculate_statistics()
-        
-        report = []
-        report.append("🤖 REPORTE COMPARATIVO DE BOTS DE TRADING")
-        report.append("=" * 50)
-        report.append(f"📅 Fecha de análisis: {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-        report.append("")
+    def create_time_series_charts(self):
+        """Crear gráficos temporales con reducción de puntos y re-muestreo al hacer zoom"""
+        for widget in self.time_series_frame.winfo_children():
+            widget.destroy()
         
-        # Bot Básico
-        if 'basic_bot' in stats and stats['basic_bot']:
-            basic = stats['basic_bot']
-            report.append("🔵 BOT BÁSICO (Medias Móviles)")
-            report.append("-" * 30)
-            report.append(f"📊 Trades totales: {basic['total_trades']}")
-            report.append(f"✅ Trades ganadores: {basic['winning_trades']}")
-            report.append(f"❌ Trades perdedores: {basic['losing_trades']}")
-            report.append(f"🎯 Tasa de éxito: {basic['win_rate']:.1f}%")
-            report.append(f"💰 Ganancia total: {basic['total_profit']:.6f} USDT")
-            report.append(f"📈 Ganancia promedio: {basic['avg_profit_per_trade']:.6f} USDT")
-            report.append(f"⏱️ Tiempo ejecutándose: {basic['runtime_hours']:.1f} horas")
-            report.append("")
-        
-        # Bot ML
-        if 'ml_bot' in stats and stats['ml_bot']:
-            ml = stats['ml_bot']
-            report.append("🟣 BOT ML (Machine Learning)")
-            report.append("-" * 30)
-            report.append(f"📊 Trades totales: {ml['total_trades']}")
-            report.append(f"✅ Trades ganadores: {ml['winning_trades']}")
-            report.append(f"❌ Trades perdedores: {ml['losing_trades']}")
-            report.append(f"🎯 Tasa de éxito: {ml['win_rate']:.1f}%")
-            report.append(f"💰 Ganancia total: {ml['total_profit']:.6f} USDT")
-            report.append(f"📈 Ganancia promedio: {ml['avg_profit_per_trade']:.6f} USDT")
-            report.append(f"🧠 Confianza promedio: {ml['avg_confidence']:.1f}%")
-            report.append(f"🔮 Predicciones generadas: {ml['total_predictions']}")
-            report.append(f"⏱️ Tiempo ejecutándose: {ml['runtime_hours']:.1f} horas")
-            report.append("")
-        
-        # Comparación
-        if 'comparison' in stats and stats['comparison']:
-            comp = stats['comparison']
-            report.append("🏆 COMPARACIÓN DIRECTA")
-            report.append("-" * 20)
-            report.append(f"🔄 Más activo: Bot {comp['more_active']}")
-            report.append(f"🎯 Mejor tasa de éxito: Bot {comp['better_win_rate']}")
-            report.append(f"💰 Más rentable: Bot {comp['more_profitable']}")
-            report.append(f"💵 Diferencia de ganancia: {comp['profit_difference']:.6f} USDT")
-            report.append(f"⚡ Frecuencia Basic: {comp['trade_frequency_basic']:.2f} trades/hora")
-            report.append(f"⚡ Frecuencia ML: {comp['trade_frequency_ml']:.2f} trades/hora")
-            report.append("")
-        
-        # Recomendaciones
-        report.append("💡 RECOMENDACIONES")
-        report.append("-" * 18)
+        fig = Figure(figsize=(12, 8))
+        self.time_series_lines = draw_time_series_charts(fig, self.basic_bot_data, self.ml_bot_data)
         
-        if 'comparison' in stats and stats['comparison']:
-            if stats['comparison']['more_profitable'] == 'ML':
-                report.append("🟣 El Bot ML mostró mejor rendimiento general")
-                report.append("   ✅ Considera usar estrategia ML para futuras operaciones")
-                report.append("   ✅ La selectividad del ML fue efectiva")
-            else:
-                report.append("🔵 El Bot Básico mostró mejor rendimiento")
-                report.append("   ✅ La estrategia simple fue más efectiva en este período")
-                report.append("   ✅ Mayor frecuencia de trading compensó la menor precisión")
-            
-            if 'ml_bot' in stats and stats['ml_bot']:
-                if stats['ml_bot']['win_rate'] > 60:
-                    report.append("   🧠 El ML muestra buen potencial, considera ajustar confianza mínima")
-        else:
-            report.append("⚠️ Necesitas más datos para una comparación definitiva")
-            report.append("   📊 Ejecuta los bots por al menos 24 horas")
+        canvas = FigureCanvasTkAgg(fig, self.time_series_frame)
+        canvas.draw()
+        canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
+    
+    def generate_report(self):
+        """Generar reporte completo"""
+        report = generate_comparison_report(self.calculate_statistics())
         
         # Mostrar en la interfaz
         self.report_text.delete(1.0, tk.END)
-        self.report_text.insert(1.0, "\n".join(report))
+        self.report_text.insert(1.0, report)
     
     def save_report(self):
         """Guardar reporte en archivo"""
@@ -42,6 +42,24 @@ run_ml_bot() {
     echo "✅ Bot ML ejecutándose (PID: $(cat ~/trading_logs/ml_bot.pid))"
 }
 
+# Función para ejecutar el sidecar de datos (un solo fetch de velas para ambos bots)
+run_sidecar() {
+    echo "🛰️  Iniciando sidecar de datos de mercado..."
+    cd ~/
+    nohup python3 market_data_sidecar.py > ~/trading_logs/market_data_sidecar.log 2>&1 &
+    echo $! > ~/trading_logs/market_data_sidecar.pid
+    echo "✅ Sidecar ejecutándose (PID: $(cat ~/trading_logs/market_data_sidecar.pid))"
+}
+
+# Función para ejecutar el servicio de riesgo (límites de exposición y pérdida de toda la flota)
+run_risk_service() {
+    echo "🛡️  Iniciando servicio de riesgo..."
+    cd ~/
+    nohup python3 risk_service.py > ~/trading_logs/risk_service.log 2>&1 &
+    echo $! > ~/trading_logs/risk_service.pid
+    echo "✅ Servicio de riesgo ejecutándose (PID: $(cat ~/trading_logs/risk_service.pid))"
+}
+
 # Función para mostrar estado
 show_status() {
     echo "📊 Estado de los bots:"
@@ -70,19 +88,38 @@ show_status() {
     fi
     
     echo ""
-    echo "📈 Últimas líneas de logs:"
-    echo "========================="
-    if [ -f ~/trading_logs/basic_bot.log ]; then
-        echo "🔵 Bot Básico (últimas 3 líneas):"
-        tail -3 ~/trading_logs/basic_bot.log
-        echo ""
-    fi
+    echo "🛡️  Riesgo de la flota:"
+    python3 ~/risk_service.py --status 2>/dev/null || echo "   ⚪ Servicio de riesgo no disponible"
     
-    if [ -f ~/trading_logs/ml_bot.log ]; then
-        echo "🟣 Bot ML (últimas 3 líneas):"
-        tail -3 ~/trading_logs/ml_bot.log
-        echo ""
+    echo ""
+    echo "📡 Métricas en vivo:"
+    echo "==================="
+    show_metrics "🔵 Bot Básico" 8701 ~/trading_logs/basic_bot.log
+    show_metrics "🟣 Bot ML" 8711 ~/trading_logs/ml_bot.log
+    
+    echo "💵 Bots REALES (dinero real):"
+    echo "============================"
+    show_metrics "🔵 Bot Básico REAL" 8702 ~/btc_trading_log.txt
+    show_metrics "🟣 Bot ML REAL" 8712 ~/ml_btc_trading_real_log.txt
+}
+
+# Función para leer métricas del endpoint local (con fallback al log)
+show_metrics() {
+    name=$1
+    port=$2
+    log_file=$3
+    
+    echo "$name:"
+    metrics=$(curl -s --max-time 2 http://127.0.0.1:$port/metrics)
+    if [ -n "$metrics" ]; then
+        echo "$metrics" | python3 -m json.tool
+    elif [ -f $log_file ]; then
+        echo "   ⚠️  Sin endpoint de métricas, últimas 3 líneas del log:"
+        tail -3 $log_file
+    else
+        echo "   ⚪ Sin endpoint de métricas ni log (¿bot no iniciado?)"
     fi
+    echo ""
 }
 
 # Función para detener bots
@@ -106,6 +143,24 @@ stop_bots() {
         fi
         rm -f ~/trading_logs/ml_bot.pid
     fi
+    
+    if [ -f ~/trading_logs/market_data_sidecar.pid ]; then
+        sidecar_pid=$(cat ~/trading_logs/market_data_sidecar.pid)
+        if ps -p $sidecar_pid > /dev/null 2>&1; then
+            kill $sidecar_pid
+            echo "🛰️  Sidecar de datos detenido"
+        fi
+        rm -f ~/trading_logs/market_data_sidecar.pid
+    fi
+    
+    if [ -f ~/trading_logs/risk_service.pid ]; then
+        risk_pid=$(cat ~/trading_logs/risk_service.pid)
+        if ps -p $risk_pid > /dev/null 2>&1; then
+            kill $risk_pid
+            echo "🛡️  Servicio de riesgo detenido"
+        fi
+        rm -f ~/trading_logs/risk_service.pid
+    fi
 }
 
 # Función para mostrar logs en tiempo real
@@ -167,6 +222,9 @@ compare_performance() {
 case "$1" in
     "start")
         echo "🚀 Iniciando ambos bots..."
+        run_sidecar
+        run_risk_service
+        sleep 2
         run_basic_bot
         sleep 5
         run_ml_bot
@@ -192,6 +250,9 @@ case "$1" in
         echo "🔄 Reiniciando bots..."
         stop_bots
         sleep 5
+        run_sidecar
+        run_risk_service
+        sleep 2
         run_basic_bot
         sleep 5
         run_ml_bot
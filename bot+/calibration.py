@@ -0,0 +1,336 @@
+#!/usr/bin/env python3
+"""
+🎯 CALIBRACIÓN DE CONFIANZA Y CALIDAD DE SEÑALES
+=================================================
+Cruza cada predicción registrada con el retorno de las N velas siguientes
+y responde: ¿la confianza que reporta el modelo se cumple?, ¿desde qué
+confianza las señales pagan después de comisiones?
+
+- Curva de confiabilidad: confianza media vs tasa de acierto por tramo.
+- Tasa de acierto y retorno medio por tramo de confianza.
+- MIN_CONFIDENCE óptimo: el umbral que maximiza el retorno total de las
+  señales que lo superan (con un mínimo de señales para que sea confiable).
+
+Todo vectorizado con NumPy (searchsorted, bincount, cumsum): meses de
+predicciones de 1 minuto se procesan en milisegundos.
+
+Fuentes de predicciones:
+    --predictions ml_predictions.csv   # lo que graba CloudMLBot en cada iteración
+    --logs ml_btc_trading_log.txt      # líneas "Pred: ... | Conf: ...%" del log
+    --replay velas.csv                 # puntaje ponderado sobre todo el historial
+
+Uso:
+    python calibration.py --predictions ml_predictions.csv --horizon 5
+    python calibration.py --replay btc_1m.csv --horizon 5 --format json
+"""
+
+import os
+import csv
+import json
+import time
+import argparse
+import numpy as np
+
+# Velas hacia adelante para medir el resultado de cada predicción
+DEFAULT_HORIZON = 5
+INTERVAL_SECONDS = 60
+
+# Comisión de ida y vuelta (0.1% por lado en Binance spot)
+ROUND_TRIP_COST = 0.002
+
+# Mínimo de señales por encima del umbral para considerarlo
+MIN_SIGNALS = 30
+
+# Puntaje mínimo con que CloudMLBot abre posición (su umbral dinámico nunca baja de 0.015)
+MIN_PREDICTION = 0.015
+
+PREDICTION_COLUMNS = ('timestamp', 'candle_time', 'price', 'prediction', 'confidence', 'model')
+
+DEFAULT_PREDICTIONS_FILE = 'ml_predictions.csv'
+
+
+class PredictionLog:
+    """Registro de predicciones en CSV (una fila por iteración, solo se agrega)"""
+
+    def __init__(self, path=DEFAULT_PREDICTIONS_FILE):
+        self.path = path
+        new_file = not os.path.exists(path) or os.path.getsize(path) == 0
+        self._file = open(path, 'a', encoding='utf-8', newline='')
+        self._writer = csv.writer(self._file)
+        if new_file:
+            self._writer.writerow(PREDICTION_COLUMNS)
+            self._file.flush()
+
+    def record(self, price, prediction, confidence, candle_time=None, model='', timestamp=None):
+        timestamp = time.time() if timestamp is None else timestamp
+        self._writer.writerow([f"{timestamp:.3f}", '' if candle_time is None else int(candle_time),
+                               f"{price:.8f}", f"{prediction:.8f}", f"{confidence:.6f}", model])
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+# ------------------------------------------------------------------ carga de datos
+
+def load_predictions(path):
+    """CSV de PredictionLog -> {'time', 'price', 'prediction', 'confidence'} como arrays"""
+    with open(path, 'r', encoding='utf-8') as f:
+        rows = [row for row in csv.DictReader(f) if row.get('price')]
+    return {
+        'time': np.array([float(r['timestamp']) for r in rows]),
+        'price': np.array([float(r['price']) for r in rows]),
+        'prediction': np.array([float(r['prediction']) for r in rows]),
+        'confidence': np.array([float(r['confidence']) for r in rows])
+    }
+
+
+def load_log_predictions(paths):
+    """Predicciones de los logs del bot ML (líneas 'Precio BTC: $... | Pred: ... | Conf: ...%')"""
+    from bot_analyzer_core import init_bot_data, parse_ml_line
+
+    data = init_bot_data()
+    for path in paths:
+        with open(path, 'r', encoding='utf-8', errors='replace') as f:
+            for line in f:
+                parse_ml_line(data, line.rstrip('\n'))
+    return predictions_from_trades(data['trades'])
+
+
+def predictions_from_trades(trades):
+    """Entradas PREDICTION de bot_analyzer_core -> arrays (confianza en 0-1)"""
+    events = [t for t in trades if t.get('type') == 'PREDICTION' and t.get('timestamp')]
+    events.sort(key=lambda t: t['timestamp'])
+    return {
+        'time': np.array([t['timestamp'].timestamp() for t in events]),
+        'price': np.array([t['price'] for t in events], dtype=np.float64),
+        'prediction': np.array([t['prediction'] for t in events], dtype=np.float64),
+        'confidence': np.array([t['confidence'] / 100 for t in events], dtype=np.float64)
+    }
+
+
+def load_candle_closes(path):
+    """CSV de velas (open_time,open,high,low,close,volume) -> (cierre en segundos, close, volume)"""
+    data = np.genfromtxt(path, delimiter=',', usecols=(0, 4, 5), invalid_raise=False)
+    data = data[~np.isnan(data).any(axis=1)]
+    return data[:, 0] / 1000 + INTERVAL_SECONDS, data[:, 1], data[:, 2]
+
+
+def replay_predictions(close, volume, times):
+    """Puntaje ponderado de CloudMLBot para cada vela del historial (ml_models.weighted_scores)"""
+    import pandas as pd
+    from indicators import add_indicator_columns
+    from ml_models import weighted_scores
+
+    features = add_indicator_columns(pd.DataFrame({'close': close, 'volume': volume}))
+    scores, confidences = weighted_scores(features)
+    return {'time': times, 'price': close, 'prediction': scores, 'confidence': confidences}
+
+
+# ------------------------------------------------------------------ cálculo
+
+def forward_returns(times, prices, series_times, series_prices, horizon_seconds, tolerance=None):
+    """Retorno desde cada predicción hasta el primer precio de la serie a horizon_seconds.
+
+    NaN si la serie termina antes o si el siguiente precio está más de
+    `tolerance` segundos después del objetivo (bot caído, hueco en los datos).
+    """
+    if not len(series_times):
+        return np.full(len(times), np.nan)
+    tolerance = horizon_seconds if tolerance is None else tolerance
+    target = times + horizon_seconds
+    index = np.searchsorted(series_times, target, side='left')
+    inside = index < len(series_times)
+    index = np.minimum(index, len(series_times) - 1)
+    on_time = inside & (series_times[index] - target <= tolerance)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        returns = series_prices[index] / prices - 1
+    return np.where(on_time, returns, np.nan)
+
+
+def signal_outcomes(prediction, returns, min_prediction=MIN_PREDICTION, long_only=True, cost=ROUND_TRIP_COST):
+    """Señales operables y su resultado: (máscara, acierto, retorno neto de comisiones)"""
+    direction = np.sign(prediction)
+    signal = np.abs(prediction) > min_prediction
+    if long_only:
+        # CloudMLBot solo abre largos: la señal de venta cierra, no abre cortos
+        signal &= direction > 0
+    signal &= ~np.isnan(returns)
+    edge = direction * returns - cost
+    return signal, direction * returns > 0, edge
+
+
+def reliability_curve(confidence, hit, edge, bins=10):
+    """Por tramo de confianza: señales, confianza media, tasa de acierto y retorno medio"""
+    edges = np.linspace(0.0, 1.0, bins + 1).round(6)
+    bucket = np.clip(np.digitize(confidence, edges[1:-1]), 0, bins - 1)
+    count = np.bincount(bucket, minlength=bins)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return {
+            'lower': edges[:-1],
+            'upper': edges[1:],
+            'count': count,
+            'mean_confidence': np.bincount(bucket, weights=confidence, minlength=bins) / count,
+            'hit_rate': np.bincount(bucket, weights=hit.astype(np.float64), minlength=bins) / count,
+            'mean_return': np.bincount(bucket, weights=edge, minlength=bins) / count
+        }
+
+
+def expected_calibration_error(curve):
+    """Diferencia media |confianza - acierto| ponderada por señales de cada tramo"""
+    count = curve['count']
+    used = count > 0
+    if not used.any():
+        return float('nan')
+    gap = np.abs(curve['mean_confidence'][used] - curve['hit_rate'][used])
+    return float((gap * count[used]).sum() / count[used].sum())
+
+
+def threshold_curve(confidence, hit, edge):
+    """Para cada umbral posible: señales con confianza >= umbral, acierto y retorno acumulado"""
+    order = np.argsort(-confidence, kind='stable')
+    sorted_confidence = confidence[order]
+    cumulative_hits = np.cumsum(hit[order])
+    cumulative_edge = np.cumsum(edge[order])
+    # Quedarse con la última posición de cada valor de confianza (empates entran juntos)
+    last = np.r_[sorted_confidence[1:] != sorted_confidence[:-1], True]
+    count = np.arange(1, len(order) + 1)[last]
+    return {
+        'threshold': sorted_confidence[last],
+        'count': count,
+        'hit_rate': cumulative_hits[last] / count,
+        'total_return': cumulative_edge[last],
+        'mean_return': cumulative_edge[last] / count
+    }
+
+
+def optimal_threshold(curve, min_signals=MIN_SIGNALS):
+    """Umbral con mayor retorno total entre los que dejan al menos min_signals señales"""
+    candidates = np.flatnonzero(curve['count'] >= min_signals)
+    if not len(candidates):
+        return None
+    best = candidates[np.argmax(curve['total_return'][candidates])]
+    return {name: (float(values[best]) if name != 'count' else int(values[best]))
+            for name, values in curve.items()}
+
+
+def calibrate(events, series=None, horizon=DEFAULT_HORIZON, interval_seconds=INTERVAL_SECONDS,
+              bins=10, min_prediction=MIN_PREDICTION, long_only=True, cost=ROUND_TRIP_COST,
+              min_signals=MIN_SIGNALS):
+    """Reporte completo de calibración.
+
+    events: {'time' (s), 'price', 'prediction', 'confidence'} de las predicciones.
+    series: (tiempos, precios) para los retornos; por defecto los precios de las propias predicciones.
+    """
+    series_times, series_prices = series if series is not None else (events['time'], events['price'])
+    returns = forward_returns(events['time'], events['price'], series_times, series_prices,
+                              horizon * interval_seconds)
+    signal, hit, edge = signal_outcomes(events['prediction'], returns, min_prediction, long_only, cost)
+    confidence = events['confidence'][signal]
+    hit, edge = hit[signal], edge[signal]
+
+    curve = reliability_curve(confidence, hit, edge, bins)
+    thresholds = threshold_curve(confidence, hit, edge)
+    return {
+        'predictions': int(len(events['time'])),
+        'with_outcome': int((~np.isnan(returns)).sum()),
+        'signals': int(signal.sum()),
+        'horizon': horizon,
+        'cost': cost,
+        'hit_rate': float(hit.mean()) if len(hit) else float('nan'),
+        'mean_return': float(edge.mean()) if len(edge) else float('nan'),
+        'ece': expected_calibration_error(curve),
+        'reliability': curve,
+        'thresholds': thresholds,
+        'best': optimal_threshold(thresholds, min_signals)
+    }
+
+
+def format_report(report):
+    """Reporte de texto para consola / Telegram"""
+    lines = [
+        "🎯 CALIBRACIÓN DE CONFIANZA",
+        "=" * 40,
+        f"🧠 Predicciones: {report['predictions']} | Con resultado: {report['with_outcome']} | "
+        f"Señales: {report['signals']}",
+        f"⏱️ Horizonte: {report['horizon']} velas | Comisión ida y vuelta: {report['cost']:.2%}",
+    ]
+    if not report['signals']:
+        lines.append("😴 No hay señales con resultado para calibrar")
+        return "\n".join(lines)
+
+    lines += [
+        f"✅ Acierto global: {report['hit_rate']:.1%} | Retorno medio neto: {report['mean_return']:+.3%}",
+        f"📏 Error de calibración (ECE): {report['ece']:.1%}",
+        "",
+        "📊 Confianza       Señales  Conf.media  Acierto  Retorno",
+    ]
+    curve = report['reliability']
+    for i in np.flatnonzero(curve['count']):
+        lines.append(f"   {curve['lower'][i]:.0%}-{curve['upper'][i]:.0%}".ljust(18) +
+                     f"{curve['count'][i]:>7}  {curve['mean_confidence'][i]:>9.1%}  "
+                     f"{curve['hit_rate'][i]:>7.1%}  {curve['mean_return'][i]:>+7.3%}")
+    best = report['best']
+    lines.append("")
+    if best is None:
+        lines.append(f"⚠️ Menos de {MIN_SIGNALS} señales: sin umbral recomendado")
+    else:
+        lines.append(f"🏆 MIN_CONFIDENCE recomendado: {best['threshold']:.2f} → {best['count']} señales, "
+                     f"acierto {best['hit_rate']:.1%}, retorno total {best['total_return']:+.2%}")
+        if best['total_return'] <= 0:
+            lines.append("⚠️ Ningún umbral deja retorno positivo después de comisiones")
+    return "\n".join(lines)
+
+
+def report_to_json(report):
+    """Reporte con arrays convertidos a listas (la curva de umbrales se omite por tamaño)"""
+    def clean(value):
+        if isinstance(value, np.ndarray):
+            return [clean(v) for v in value.tolist()]
+        if isinstance(value, float) and np.isnan(value):
+            return None
+        if isinstance(value, dict):
+            return {k: clean(v) for k, v in value.items()}
+        return value
+
+    return clean({k: v for k, v in report.items() if k != 'thresholds'})
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Calibración de la confianza de las predicciones ML")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--predictions', help="CSV de predicciones grabado por CloudMLBot")
+    source.add_argument('--logs', nargs='+', help="Logs del bot ML")
+    source.add_argument('--replay', metavar='VELAS', help="CSV de velas: recalcular el puntaje sobre todo el historial")
+    parser.add_argument('--candles', help="CSV de velas para los retornos (default: precios de las predicciones)")
+    parser.add_argument('--horizon', type=int, default=DEFAULT_HORIZON, help="Velas hacia adelante")
+    parser.add_argument('--cost', type=float, default=ROUND_TRIP_COST, help="Comisión de ida y vuelta")
+    parser.add_argument('--min-prediction', type=float, default=MIN_PREDICTION)
+    parser.add_argument('--both-sides', action='store_true', help="Contar también las señales de venta como cortos")
+    parser.add_argument('--bins', type=int, default=10)
+    parser.add_argument('--format', choices=['text', 'json'], default='text')
+    args = parser.parse_args(argv)
+
+    series = None
+    if args.replay:
+        times, close, volume = load_candle_closes(args.replay)
+        events = replay_predictions(close, volume, times)
+    elif args.logs:
+        events = load_log_predictions(args.logs)
+    else:
+        events = load_predictions(args.predictions)
+    if args.candles:
+        times, close, _ = load_candle_closes(args.candles)
+        series = (times, close)
+
+    report = calibrate(events, series, horizon=args.horizon, bins=args.bins,
+                       min_prediction=args.min_prediction, long_only=not args.both_sides, cost=args.cost)
+    if args.format == 'json':
+        print(json.dumps(report_to_json(report), indent=2, ensure_ascii=False))
+    else:
+        print(format_report(report))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+"""
+🧵 VELAS EN MEMORIA COMPARTIDA ENTRE PROCESOS
+==============================================
+Un ring buffer por (símbolo, intervalo) en multiprocessing.shared_memory:
+un solo escritor (el sidecar de datos) y muchos lectores sin locks (los
+bots). Las velas se leen como arrays NumPy directamente sobre la memoria
+compartida, sin serializar ni copiar por socket.
+
+Estructura del segmento:
+    cabecera (64 bytes): seq, velas escritas, capacidad, columnas, updated_at
+    datos: float64 (2 x capacidad, 6) = open_time, open, high, low, close, volume
+
+Cada vela se escribe dos veces (posición i e i + capacidad), así las últimas
+N velas siempre son un bloque contiguo y se pueden ver sin copiar. Si entre
+la última vela guardada y las nuevas falta alguna (el escritor estuvo parado
+más que su ventana de fetch), el ring se vacía antes de escribir: nunca
+devuelve una serie con un hueco.
+
+Consistencia con seqlock: el escritor pone seq impar mientras escribe y par
+al terminar. Un lector toma seq antes de leer y verifica que no cambió
+después; si cambió, repite la lectura. (Supone el orden de escrituras de
+x86-64, donde corren las VMs de los bots.)
+
+Uso (lector):
+    candles = read_candles('BTCUSDT', '1m', 100, max_age=15)   # None si no hay ring fresco
+    ring = attach_ring('BTCUSDT', '1m')
+    view, token = ring.view(100)        # sin copia
+    ...cálculos sobre view...
+    if not ring.valid(token): ...        # el escritor la modificó: repetir
+"""
+
+import time
+import numpy as np
+from multiprocessing import shared_memory, resource_tracker
+
+COLUMNS = ('open_time', 'open', 'high', 'low', 'close', 'volume')
+COLUMN_INDEX = {name: i for i, name in enumerate(COLUMNS)}
+
+DEFAULT_CAPACITY = 1000          # Máximo de velas por request de Binance
+HEADER_BYTES = 64
+
+# Índices de la cabecera int64
+_SEQ, _COUNT, _CAPACITY, _FIELDS = range(4)
+
+# Segmentos creados por este proceso (su resource_tracker los tiene registrados)
+_owned = set()
+
+
+def ring_name(symbol, interval):
+    """Nombre del segmento de memoria compartida"""
+    return f"botia_{symbol}_{interval}"
+
+
+def _segment_size(capacity):
+    return HEADER_BYTES + 2 * capacity * len(COLUMNS) * 8
+
+
+class CandleRing:
+    """Ring buffer de velas sobre un segmento de memoria compartida"""
+
+    def __init__(self, shm, owner=False):
+        self.shm = shm
+        self.owner = owner
+        self._header = np.ndarray((4,), dtype=np.int64, buffer=shm.buf)
+        self._updated_at = np.ndarray((1,), dtype=np.float64, buffer=shm.buf, offset=32)
+        capacity = int(self._header[_CAPACITY])
+        self.capacity = capacity
+        self._data = np.ndarray((2 * capacity, len(COLUMNS)), dtype=np.float64,
+                                buffer=shm.buf, offset=HEADER_BYTES)
+
+    @classmethod
+    def create(cls, symbol, interval, capacity=DEFAULT_CAPACITY):
+        """Crear (o reutilizar) el segmento como escritor"""
+        name = ring_name(symbol, interval)
+        try:
+            shm = shared_memory.SharedMemory(name=name, create=True, size=_segment_size(capacity))
+        except FileExistsError:
+            # Segmento de una ejecución anterior del escritor: reutilizar si tiene el tamaño correcto
+            shm = shared_memory.SharedMemory(name=name)
+            if shm.size < _segment_size(capacity):
+                shm.close()
+                shm.unlink()
+                shm = shared_memory.SharedMemory(name=name, create=True, size=_segment_size(capacity))
+        header = np.ndarray((4,), dtype=np.int64, buffer=shm.buf)
+        header[:] = (0, 0, capacity, len(COLUMNS))
+        np.ndarray((1,), dtype=np.float64, buffer=shm.buf, offset=32)[0] = 0.0
+        del header
+        _owned.add(name)
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, symbol, interval):
+        """Abrir un segmento existente como lector (FileNotFoundError si no existe)"""
+        name = ring_name(symbol, interval)
+        shm = shared_memory.SharedMemory(name=name)
+        # En Python < 3.13 el resource_tracker borraría el segmento al salir el lector
+        if name not in _owned:
+            try:
+                resource_tracker.unregister(shm._name, 'shared_memory')
+            except Exception:
+                pass
+        return cls(shm)
+
+    @property
+    def count(self):
+        return int(self._header[_COUNT])
+
+    @property
+    def updated_at(self):
+        return float(self._updated_at[0])
+
+    def _interval(self, rows, count):
+        """Duración de la vela en ms: de las filas nuevas o de las dos últimas guardadas (0 si no se sabe)"""
+        if len(rows) >= 2:
+            return float(np.diff(rows[:, 0]).min())
+        if count >= 2:
+            return float(self._data[(count - 1) % self.capacity, 0] - self._data[(count - 2) % self.capacity, 0])
+        return 0.0
+
+    def write(self, rows):
+        """Agregar velas nuevas (ordenadas por open_time); la última vela abierta se sobrescribe"""
+        rows = np.asarray(rows, dtype=np.float64)[:, :len(COLUMNS)]
+        count = int(self._header[_COUNT])
+        gap = False
+        if count:
+            last_time = self._data[(count - 1) % self.capacity, 0]
+            interval = self._interval(rows, count)
+            rows = rows[rows[:, 0] >= last_time]
+            gap = bool(rows.size) and interval > 0 and rows[0, 0] > last_time + interval
+        if rows.size == 0:
+            self._updated_at[0] = time.time()
+            return 0
+
+        self._header[_SEQ] += 1  # impar: escritura en curso
+        try:
+            if gap:
+                # Faltan velas entre las guardadas y las nuevas: empezar de nuevo con las nuevas
+                count = 0
+                self._header[_COUNT] = 0
+            if count and rows[0, 0] == last_time:
+                slot = (count - 1) % self.capacity
+                self._data[slot] = rows[0]
+                self._data[slot + self.capacity] = rows[0]
+                rows = rows[1:]
+            rows = rows[-self.capacity:]
+            if len(rows):
+                slots = (count + np.arange(len(rows))) % self.capacity
+                self._data[slots] = rows
+                self._data[slots + self.capacity] = rows
+                self._header[_COUNT] = count + len(rows)
+            self._updated_at[0] = time.time()
+        finally:
+            self._header[_SEQ] += 1  # par: consistente
+        return len(rows)
+
+    def view(self, n):
+        """Últimas n velas como vista NumPy sin copia + token para validar después"""
+        while True:
+            token = int(self._header[_SEQ])
+            if token & 1:
+                time.sleep(0)
+                continue
+            count = int(self._header[_COUNT])
+            n = min(n, count, self.capacity)
+            start = (count - n) % self.capacity
+            return self._data[start:start + n], token
+
+    def valid(self, token):
+        """True si el escritor no tocó el ring desde que se tomó el token"""
+        return int(self._header[_SEQ]) == token
+
+    def read(self, n):
+        """Copia consistente de las últimas n velas"""
+        while True:
+            view, token = self.view(n)
+            candles = view.copy()
+            if self.valid(token):
+                return candles
+
+    def close(self):
+        # Soltar las vistas antes de cerrar el segmento
+        self._header = self._updated_at = self._data = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+            _owned.discard(self.shm.name)
+
+
+_readers = {}
+
+
+def attach_ring(symbol, interval):
+    """Lector cacheado por proceso (None si el escritor no creó el ring)"""
+    key = (symbol, interval)
+    ring = _readers.get(key)
+    if ring is None:
+        try:
+            ring = _readers[key] = CandleRing.attach(symbol, interval)
+        except (FileNotFoundError, OSError):
+            return None
+    return ring
+
+
+def read_candles(symbol, interval, limit, max_age=None):
+    """Últimas `limit` velas (n, 6) si el ring existe, tiene suficientes y está fresco; si no None"""
+    ring = attach_ring(symbol, interval)
+    if ring is None or ring.count < limit:
+        return None
+    if max_age is not None and time.time() - ring.updated_at > max_age:
+        # Puede ser un segmento viejo de un escritor reiniciado: volver a abrir la próxima vez
+        _readers.pop((symbol, interval), None)
+        ring.close()
+        return None
+    return ring.read(limit)
+
+
+def klines_to_rows(klines):
+    """Respuesta de get_klines de Binance -> array (n, 6) float64"""
+    return np.array([k[:len(COLUMNS)] for k in klines], dtype=np.float64)
+
+
+def candles_frame(candles):
+    """DataFrame con las columnas que usan los bots (timestamp, open, high, low, close, volume)"""
+    import pandas as pd
+
+    frame = pd.DataFrame(candles, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
+    frame['timestamp'] = frame['timestamp'].astype(np.int64)
+    return frame
+
+
+if __name__ == "__main__":
+    # Microbenchmark local: python candle_ring.py
+    writer = CandleRing.create('BENCH', '1m', capacity=1000)
+    base = int(time.time() // 60) * 60000
+    rows = np.column_stack([base + np.arange(1000) * 60000.0, np.random.rand(1000, 5) * 100])
+    writer.write(rows)
+
+    reader = CandleRing.attach('BENCH', '1m')
+    loops = 20000
+    start = time.perf_counter()
+    for _ in range(loops):
+        view, token = reader.view(100)
+        close_mean = view[:, COLUMN_INDEX['close']].mean()
+        reader.valid(token)
+    view_us = (time.perf_counter() - start) / loops * 1e6
+
+    start = time.perf_counter()
+    for _ in range(loops):
+        reader.read(100)
+    read_us = (time.perf_counter() - start) / loops * 1e6
+
+    start = time.perf_counter()
+    for i in range(loops):
+        writer.write(rows[-1:] + [0, 0, 0, 0, i, 0])
+    write_us = (time.perf_counter() - start) / loops * 1e6
+
+    print(f"🧵 view(100)+media: {view_us:.2f} µs | read(100) copia: {read_us:.2f} µs | "
+          f"write(1 vela): {write_us:.2f} µs")
+
+    # Escritor parado más que su ventana: las velas nuevas no se pegan a las viejas
+    later = rows[-100:] + [1500 * 60000.0, 0, 0, 0, 0, 0]
+    writer.write(later)
+    times = reader.read(1000)[:, COLUMN_INDEX['open_time']]
+    assert reader.count == 100 and np.all(np.diff(times) == 60000.0), reader.count
+    print(f"✅ Hueco de {1500 - 100} velas: el ring se reinicia con las {reader.count} nuevas (sin serie cortada)")
+    reader.close()
+    writer.close()
@@ -0,0 +1,391 @@
+#!/usr/bin/env python3
+"""
+⚖️ EJECUCIÓN DE ÓRDENES CONSCIENTE DEL LIBRO
+=============================================
+Antes de enviar una orden se lee la profundidad del libro y se estima el
+precio promedio que tendría la cantidad pedida (slippage contra el precio
+medio). Si el costo estimado es aceptable se envía MARKET; si no, una orden
+LIMIT IOC con un precio tope. El precio ejecutado es el promedio ponderado
+por volumen de TODOS los fills, no solo el primero.
+
+La cantidad devuelta es la que queda en la cuenta: sin la comisión cobrada
+en el activo base (BTC en las compras sin BNB) y redondeada al stepSize, así
+la OCO y la venta de salida no fallan por saldo insuficiente. Un fill
+parcial de LIMIT IOC por debajo del mínimo del exchange (NOTIONAL/LOT_SIZE)
+no se podría proteger ni vender: se completa con una MARKET. Cantidad y precio
+viajan como texto en punto fijo (format_step): Binance rechaza 9e-05.
+
+También sirve para simular: estimate_fill() da el precio al que se habría
+ejecutado una orden simulada contra el libro real.
+"""
+
+import math
+import time
+
+from symbol_filters import round_step, format_step
+
+# Modos de ejecución
+MODE_MARKET = 'market'          # Siempre MARKET (comportamiento anterior)
+MODE_LIMIT_IOC = 'limit_ioc'    # Siempre LIMIT IOC con precio tope
+MODE_AUTO = 'auto'              # MARKET si el slippage estimado es aceptable, si no LIMIT IOC
+
+# Slippage máximo aceptado contra el precio medio (puntos básicos)
+DEFAULT_MAX_SLIPPAGE_BPS = 5.0
+
+# Niveles del libro que se leen (peso 1 en Binance hasta 100 niveles)
+DEFAULT_DEPTH_LIMIT = 20
+
+
+def fetch_order_book(client, symbol, limit=DEFAULT_DEPTH_LIMIT):
+    """Libro de órdenes como listas de (precio, cantidad) en float"""
+    book = client.get_order_book(symbol=symbol, limit=limit)
+    return {
+        'bids': [(float(price), float(qty)) for price, qty in book['bids']],
+        'asks': [(float(price), float(qty)) for price, qty in book['asks']]
+    }
+
+
+def estimate_fill(book, side, quantity):
+    """Estimar la ejecución de una orden MARKET recorriendo los niveles del libro.
+
+    Devuelve precio promedio esperado, mejor precio, precio medio, spread y
+    slippage estimado en puntos básicos contra el precio medio.
+    """
+    levels = book['asks'] if side == 'BUY' else book['bids']
+    if not levels or not book['bids'] or not book['asks']:
+        return None
+
+    best_bid = book['bids'][0][0]
+    best_ask = book['asks'][0][0]
+    mid = (best_bid + best_ask) / 2
+
+    remaining = quantity
+    notional = 0.0
+    levels_used = 0
+    worst_price = levels[0][0]
+    for price, qty in levels:
+        take = min(remaining, qty)
+        notional += take * price
+        remaining -= take
+        levels_used += 1
+        worst_price = price
+        if remaining <= 1e-12:
+            break
+
+    filled = quantity - max(remaining, 0.0)
+    avg_price = notional / filled if filled > 0 else levels[0][0]
+    direction = 1 if side == 'BUY' else -1
+
+    return {
+        'side': side,
+        'quantity': quantity,
+        'fillable_quantity': filled,
+        'fully_fillable': remaining <= 1e-12,
+        'avg_price': avg_price,
+        'best_price': levels[0][0],
+        'worst_price': worst_price,
+        'mid_price': mid,
+        'spread_bps': (best_ask - best_bid) / mid * 10000,
+        'slippage_bps': direction * (avg_price - mid) / mid * 10000,
+        'levels_used': levels_used
+    }
+
+
+def fills_vwap(order):
+    """Precio promedio ponderado por volumen y cantidad ejecutada de una respuesta de orden"""
+    fills = order.get('fills') or []
+    quantity = sum(float(fill['qty']) for fill in fills)
+    if quantity > 0:
+        notional = sum(float(fill['price']) * float(fill['qty']) for fill in fills)
+        return notional / quantity, quantity
+
+    # Sin fills detallados: usar los acumulados de la orden
+    executed = float(order.get('executedQty', 0) or 0)
+    quote = float(order.get('cummulativeQuoteQty', 0) or 0)
+    if executed > 0 and quote > 0:
+        return quote / executed, executed
+    return None, 0.0
+
+
+def base_commission(order, base_asset):
+    """Comisión cobrada en el activo base (reduce la cantidad recibida en una compra)"""
+    return sum(float(fill.get('commission') or 0) for fill in order.get('fills') or []
+               if fill.get('commissionAsset') == base_asset)
+
+
+def merge_orders(order, extra):
+    """Respuesta combinada de una orden y su complemento (fills y acumulados)"""
+    merged = dict(order)
+    merged['fills'] = (order.get('fills') or []) + (extra.get('fills') or [])
+    for field in ('executedQty', 'cummulativeQuoteQty'):
+        merged[field] = f"{float(order.get(field) or 0) + float(extra.get(field) or 0):.8f}"
+    return merged
+
+
+def round_to_tick(price, tick_size, side):
+    """Redondear el precio tope hacia el lado conservador del tick"""
+    if not tick_size:
+        return price
+    steps = price / tick_size
+    steps = math.floor(steps + 1e-9) if side == 'BUY' else math.ceil(steps - 1e-9)
+    decimals = max(0, -int(math.floor(math.log10(tick_size))))
+    return round(steps * tick_size, decimals)
+
+
+class OrderExecutor:
+    """Envía órdenes mirando el libro y mide el costo real de ejecución"""
+
+    def __init__(self, client, symbol, mode=MODE_AUTO, max_slippage_bps=DEFAULT_MAX_SLIPPAGE_BPS,
+                 depth_limit=DEFAULT_DEPTH_LIMIT, log=print):
+        self.client = client
+        self.symbol = symbol
+        self.mode = mode
+        self.max_slippage_bps = max_slippage_bps
+        self.depth_limit = depth_limit
+        self.log = log
+        self._filters = None
+        self.stats = {
+            'orders': 0,
+            'partial_fills': 0,
+            'top_ups': 0,
+            'rejected': 0,
+            'notional': 0.0,
+            'cost_vs_mid': 0.0,        # USD pagados contra el precio medio
+            'estimated_cost_vs_mid': 0.0
+        }
+
+    def filters(self):
+        """Filtros del símbolo: tick, step, cantidad y nocional mínimos, activo base (una sola consulta)"""
+        if self._filters is None:
+            filters = {'tick': 0.0, 'step': 0.0, 'min_qty': 0.0, 'min_notional': 0.0, 'base_asset': None}
+            try:
+                info = self.client.get_symbol_info(self.symbol) or {}
+                filters['base_asset'] = info.get('baseAsset')
+                for symbol_filter in info.get('filters', []):
+                    filter_type = symbol_filter.get('filterType')
+                    if filter_type == 'PRICE_FILTER':
+                        filters['tick'] = float(symbol_filter['tickSize'])
+                    elif filter_type == 'LOT_SIZE':
+                        filters['step'] = float(symbol_filter['stepSize'])
+                        filters['min_qty'] = float(symbol_filter['minQty'])
+                    elif filter_type in ('NOTIONAL', 'MIN_NOTIONAL'):
+                        filters['min_notional'] = float(symbol_filter['minNotional'])
+            except Exception as e:
+                self.log(f"⚠️  No se pudieron obtener los filtros de {self.symbol}: {e}")
+            self._filters = filters
+        return self._filters
+
+    def tick_size(self):
+        """Tick de precio del símbolo"""
+        return self.filters()['tick']
+
+    def below_minimum(self, quantity, price):
+        """¿La cantidad no alcanza para una orden válida (LOT_SIZE o NOTIONAL)?"""
+        filters = self.filters()
+        return quantity < filters['min_qty'] or quantity * price < filters['min_notional']
+
+    def top_up(self, side, remaining, held, price):
+        """MARKET por el resto pedido (al menos lo que falta para el mínimo); None si falla"""
+        filters = self.filters()
+        missing = max(filters['min_notional'] / price - held, filters['min_qty'] - held, 0.0)
+        quantity = format_step(max(remaining, missing * 1.01), filters['step'], up=True)
+        try:
+            return self.client.create_order(symbol=self.symbol, side=side, type='MARKET', quantity=quantity)
+        except Exception as e:
+            self.log(f"⚠️  No se pudo completar la orden {side} bajo el mínimo: {e}")
+            return None
+
+    def limit_price(self, estimate, side):
+        """Precio tope para LIMIT IOC: precio medio +/- slippage máximo"""
+        tolerance = self.max_slippage_bps / 10000
+        if side == 'BUY':
+            price = estimate['mid_price'] * (1 + tolerance)
+        else:
+            price = estimate['mid_price'] * (1 - tolerance)
+        return round_to_tick(price, self.tick_size(), side)
+
+    def execute(self, side, quantity, mode=None):
+        """Ejecutar una orden; devuelve el resultado con precio VWAP o None si no se ejecutó.
+
+        mode permite forzar el modo en una orden puntual (ej: salidas por stop loss en MARKET).
+        """
+        mode = mode or self.mode
+        filters = self.filters()
+        quantity = round_step(quantity, filters['step'])
+        estimate = None
+        try:
+            estimate = estimate_fill(fetch_order_book(self.client, self.symbol, self.depth_limit),
+                                     side, quantity)
+        except Exception as e:
+            self.log(f"⚠️  No se pudo leer el libro de {self.symbol}: {e}")
+
+        use_limit = mode == MODE_LIMIT_IOC or (
+            mode == MODE_AUTO and estimate is not None and
+            (estimate['slippage_bps'] > self.max_slippage_bps or not estimate['fully_fillable']))
+
+        order_params = {'symbol': self.symbol, 'side': side, 'quantity': format_step(quantity, filters['step'])}
+        if use_limit and estimate is not None:
+            order_params.update(type='LIMIT', timeInForce='IOC',
+                                price=format_step(self.limit_price(estimate, side), filters['tick']))
+        else:
+            order_params['type'] = 'MARKET'
+
+        start = time.perf_counter()
+        order = self.client.create_order(**order_params)
+        latency_ms = (time.perf_counter() - start) * 1000
+
+        price, executed_qty = fills_vwap(order)
+        if not price or executed_qty <= 0:
+            self.stats['rejected'] += 1
+            self.log(f"⚠️  Orden {order_params['type']} {side} sin ejecución (estado: {order.get('status')})")
+            return None
+
+        topped_up = False
+        held = executed_qty - base_commission(order, filters['base_asset'])
+        if side == 'BUY' and executed_qty < quantity - 1e-12 and self.below_minimum(held, price):
+            # Parcial bajo el mínimo del exchange: sin completar no se podría poner la OCO ni vender
+            extra = self.top_up(side, quantity - executed_qty, held, price)
+            if extra is not None and fills_vwap(extra)[1] > 0:
+                order = merge_orders(order, extra)
+                price, executed_qty = fills_vwap(order)
+                topped_up = True
+                self.stats['top_ups'] += 1
+                self.log(f"🔁 Fill parcial bajo el mínimo completado con MARKET: {executed_qty:.8f} en total")
+        commission = base_commission(order, filters['base_asset'])
+        # Lo que queda en la cuenta, en múltiplos del step (lo que se puede volver a vender)
+        net_qty = round_step(executed_qty - commission, filters['step'])
+        if side == 'BUY' and self.below_minimum(net_qty, price):
+            self.log(f"⚠️  Compra de {net_qty:.8f} por debajo del mínimo del exchange: no se podrá vender")
+
+        result = {
+            'side': side,
+            'order_type': order_params['type'],
+            'requested_qty': quantity,
+            'executed_qty': net_qty,
+            'gross_qty': executed_qty,
+            'commission_qty': commission,
+            'topped_up': topped_up,
+            'price': price,
+            'fills': len(order.get('fills') or []),
+            'latency_ms': latency_ms,
+            'order_id': order.get('orderId')
+        }
+        if estimate is not None:
+            direction = 1 if side == 'BUY' else -1
+            result['mid_price'] = estimate['mid_price']
+            result['expected_price'] = estimate['avg_price']
+            result['spread_bps'] = estimate['spread_bps']
+            result['estimated_slippage_bps'] = estimate['slippage_bps']
+            result['slippage_bps'] = direction * (price - estimate['mid_price']) / estimate['mid_price'] * 10000
+            result['cost_vs_mid'] = direction * (price - estimate['mid_price']) * executed_qty
+            self.stats['cost_vs_mid'] += result['cost_vs_mid']
+            self.stats['estimated_cost_vs_mid'] += direction * (estimate['avg_price'] - estimate['mid_price']) * executed_qty
+
+        self.stats['orders'] += 1
+        self.stats['notional'] += price * executed_qty
+        if executed_qty < quantity - 1e-12:
+            self.stats['partial_fills'] += 1
+        return result
+
+    def summary(self):
+        """Costo de ejecución acumulado (para métricas)"""
+        notional = self.stats['notional']
+        summary = dict(self.stats)
+        summary['avg_cost_bps'] = self.stats['cost_vs_mid'] / notional * 10000 if notional else 0.0
+        return summary
+
+
+def _book_demo():
+    """Prueba rápida contra un libro sintético en memoria"""
+    class _BookClient:
+        def __init__(self):
+            mid = 65000.0
+            self.asks = [[mid + 0.5 + i * 2, 0.00006 + i * 0.00002] for i in range(20)]
+            self.bids = [[mid - 0.5 - i * 2, 0.00006 + i * 0.00002] for i in range(20)]
+
+        def get_order_book(self, symbol, limit=100):
+            return {'bids': [[str(p), str(q)] for p, q in self.bids[:limit]],
+                    'asks': [[str(p), str(q)] for p, q in self.asks[:limit]]}
+
+        def get_symbol_info(self, symbol):
+            return {'filters': [{'filterType': 'PRICE_FILTER', 'tickSize': '0.01'}]}
+
+        def create_order(self, symbol, side, type, quantity, timeInForce=None, price=None):
+            levels = self.asks if side == 'BUY' else self.bids
+            limit = float(price) if price else None
+            fills, remaining = [], float(quantity)
+            for level_price, qty in levels:
+                if remaining <= 1e-12:
+                    break
+                if limit is not None and (level_price > limit if side == 'BUY' else level_price < limit):
+                    break
+                take = min(remaining, qty)
+                fills.append({'price': str(level_price), 'qty': f"{take:.8f}", 'commission': '0'})
+                remaining -= take
+            status = 'FILLED' if remaining <= 1e-12 else ('PARTIALLY_FILLED' if fills else 'EXPIRED')
+            return {'orderId': 1, 'status': status, 'fills': fills}
+
+    client = _BookClient()
+    for mode in (MODE_MARKET, MODE_AUTO):
+        executor = OrderExecutor(client, 'BTCUSDT', mode=mode, max_slippage_bps=0.5)
+        result = executor.execute('BUY', 0.0003)
+        print(f"{mode:>9}: {result['order_type']:<6} qty={result['executed_qty']:.8f} "
+              f"VWAP=${result['price']:.2f} (primer fill ${client.asks[0][0]:.2f}) "
+              f"slippage={result['slippage_bps']:.2f} bps fills={result['fills']}")
+
+
+def check_fake_exchange(port=8832):
+    """MARKET y LIMIT IOC por HTTP contra fake_exchange.py: VWAP, comisión en BTC, fill parcial bajo el mínimo"""
+    from fake_exchange import start_fake_exchange, generate_candles, FakeClient, COMMISSION_RATE, MIN_NOTIONAL
+
+    class _RecordingClient(FakeClient):
+        # Parámetros tal como salen hacia el exchange
+        def create_order(self, **params):
+            self.sent.append(params)
+            return super().create_order(**params)
+
+    # Libro normal: la MARKET se llena entera y la cantidad neta descuenta la comisión en BTC
+    server, exchange = start_fake_exchange(port=port, candles=generate_candles(1000, seed=5))
+    try:
+        client = _RecordingClient(f'http://127.0.0.1:{port}/api')
+        client.sent = []
+        executor = OrderExecutor(client, 'BTCUSDT', mode=MODE_MARKET, log=lambda text: None)
+        buy = executor.execute('BUY', 0.0001)
+        assert buy['order_type'] == 'MARKET' and abs(buy['gross_qty'] - 0.0001) < 1e-12, buy
+        assert abs(buy['commission_qty'] - 0.0001 * COMMISSION_RATE) < 1e-12, buy
+        assert buy['executed_qty'] == round_step(0.0001 * (1 - COMMISSION_RATE), 0.00001) == 0.00009, buy
+        # Vender lo devuelto funciona: cantidad en step y disponible en la cuenta
+        sell = executor.execute('SELL', buy['executed_qty'])
+        assert sell is not None and sell['executed_qty'] == buy['executed_qty'], sell
+        # En punto fijo: con un float urlencode enviaría 9e-05 y Binance responde -1100
+        assert [params['quantity'] for params in client.sent] == ['0.00010', '0.00009'], client.sent
+        print(f"✅ MARKET: compra {buy['gross_qty']:.8f} - comisión {buy['commission_qty']:.8f} BTC = "
+              f"{buy['executed_qty']:.5f} vendible | VWAP ${buy['price']:.2f} ({buy['fills']} fills)")
+    finally:
+        server.shutdown()
+
+    # Libro finito: la LIMIT IOC con tope en el primer nivel se llena en parte, por debajo de MIN_NOTIONAL
+    server, exchange = start_fake_exchange(port=port + 1, candles=generate_candles(1000, seed=5), depth_scale=0.001)
+    try:
+        client = _RecordingClient(f'http://127.0.0.1:{port + 1}/api')
+        client.sent = []
+        executor = OrderExecutor(client, 'BTCUSDT', mode=MODE_LIMIT_IOC, max_slippage_bps=0.1, log=lambda text: None)
+        book = fetch_order_book(executor.client, 'BTCUSDT')
+        first_level = book['asks'][0][0] * book['asks'][0][1]
+        buy = executor.execute('BUY', 0.0002)
+        assert first_level < MIN_NOTIONAL and buy['topped_up'], (first_level, buy)
+        limit, top_up = client.sent
+        assert limit['quantity'] == '0.00020' and limit['price'].count('.') == 1 and 'e' not in limit['price'], limit
+        assert top_up['type'] == 'MARKET' and top_up['quantity'] == format_step(float(top_up['quantity']), 0.00001)
+        assert not executor.below_minimum(buy['executed_qty'], buy['price']), buy
+        assert executor.execute('SELL', buy['executed_qty'], mode=MODE_MARKET) is not None
+        print(f"✅ LIMIT IOC: primer nivel ${first_level:.2f} < mínimo ${MIN_NOTIONAL:.2f} -> completada con MARKET: "
+              f"{buy['executed_qty']:.5f} BTC (${buy['executed_qty'] * buy['price']:.2f}) vendible")
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    # python execution.py
+    _book_demo()
+    check_fake_exchange()
@@ -0,0 +1,782 @@
+#!/usr/bin/env python3
+"""
+🧪 EXCHANGE BINANCE SIMULADO (LOCAL)
+=====================================
+Servidor HTTP local que imita los endpoints REST de Binance que usan los
+bots (klines, ticker, depth, order, exchangeInfo, ping/time), para medir
+rendimiento y probar el manejo de límites sin red ni dinero.
+
+- Reproduce velas grabadas (CSV) o una caminata aleatoria con semilla, a la
+  velocidad que se elija (--speed 60 = una vela de 1m por segundo).
+- Inyecta latencia (--latency-ms / --jitter-ms) y errores (--error-rate).
+- Aplica límites de peso por minuto como Binance: cabecera
+  X-MBX-USED-WEIGHT-1M, 429 al superar el límite y 418 (ban) si se insiste.
+- Filtros LOT_SIZE y NOTIONAL como Binance (rechazo con 400) y comisión de
+  0.1% cobrada en BTC en las compras y en USDT en las ventas.
+- Órdenes que quedan en el libro (LIMIT GTC, LIMIT_MAKER, STOP_LOSS,
+  STOP_LOSS_LIMIT y OCO) se ejecutan contra el máximo/mínimo de cada vela
+  reproducida; los cambios de estado se publican como eventos
+  executionReport en /api/v3/fake/userDataStream (el user-data stream).
+
+Uso:
+    python fake_exchange.py serve --port 8800 --speed 60 --latency-ms 30
+    BINANCE_API_URL=http://127.0.0.1:8800/api python BotMLCloud.py
+    python fake_exchange.py bench --port 8800 --requests 2000 --concurrency 8
+"""
+
+import csv
+import json
+import time
+import random
+import argparse
+import threading
+from urllib.parse import urlparse, parse_qs, urlencode
+from urllib.request import Request, urlopen
+from urllib.error import HTTPError
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8800
+
+# Límites por defecto de Binance spot
+REQUEST_WEIGHT_LIMIT = 6000     # peso por minuto
+BAN_SECONDS = 120               # duración del primer ban (418)
+
+# Filtros del símbolo y comisión (como BTCUSDT spot sin BNB)
+LOT_STEP = 0.00001
+MIN_NOTIONAL = 5.0
+COMMISSION_RATE = 0.001
+
+# Órdenes que quedan en el libro hasta que el precio las alcanza
+RESTING_TYPES = ('LIMIT_MAKER', 'STOP_LOSS', 'STOP_LOSS_LIMIT')
+
+INTERVAL_MINUTES = {'1m': 1, '3m': 3, '5m': 5, '15m': 15, '30m': 30,
+                    '1h': 60, '2h': 120, '4h': 240, '6h': 360, '12h': 720, '1d': 1440}
+
+
+def klines_weight(limit):
+    """Peso de /api/v3/klines según el límite pedido"""
+    if limit < 100:
+        return 1
+    if limit < 500:
+        return 2
+    if limit <= 1000:
+        return 5
+    return 10
+
+
+def depth_weight(limit):
+    """Peso de /api/v3/depth según el límite pedido"""
+    if limit <= 100:
+        return 5
+    if limit <= 500:
+        return 25
+    if limit <= 1000:
+        return 50
+    return 250
+
+
+def generate_candles(count=5000, start_price=65000.0, seed=42, start_ms=None):
+    """Velas de 1m de una caminata aleatoria reproducible (formato Binance)"""
+    rng = random.Random(seed)
+    start_ms = start_ms or (int(time.time() // 60) * 60 - count * 60) * 1000
+    candles = []
+    price = start_price
+    for i in range(count):
+        open_price = price
+        moves = [open_price]
+        for _ in range(4):
+            moves.append(moves[-1] * (1 + rng.gauss(0, 0.0006)))
+        price = moves[-1]
+        open_time = start_ms + i * 60000
+        candles.append([open_time, open_price, max(moves), min(moves), price,
+                        round(rng.uniform(5, 50), 5), open_time + 59999])
+    return candles
+
+
+def load_candles(path):
+    """Velas grabadas: CSV con open_time,open,high,low,close,volume (cabecera opcional)"""
+    candles = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for row in csv.reader(f):
+            if not row or not row[0].strip().isdigit():
+                continue
+            open_time = int(row[0])
+            o, h, l, c, v = (float(value) for value in row[1:6])
+            candles.append([open_time, o, h, l, c, v, open_time + 59999])
+    return candles
+
+
+class MarketReplay:
+    """Reloj de simulación sobre una serie de velas de 1m"""
+
+    def __init__(self, candles, speed=1.0, symbol='BTCUSDT', depth_scale=1.0):
+        self.candles = candles
+        self.speed = speed
+        self.symbol = symbol
+        self.depth_scale = depth_scale  # < 1: libro finito (fills parciales de LIMIT IOC)
+        self.wall_start = time.time()
+        # Arrancar con historial suficiente para los indicadores de los bots
+        self.start_index = min(200, len(candles) - 1)
+
+    def current_index(self):
+        elapsed_minutes = (time.time() - self.wall_start) * self.speed / 60
+        return min(self.start_index + int(elapsed_minutes), len(self.candles) - 1)
+
+    def klines(self, interval='1m', limit=500):
+        minutes = INTERVAL_MINUTES.get(interval)
+        if minutes is None:
+            raise ValueError(f"Intervalo no soportado: {interval}")
+        end = self.current_index() + 1
+        if minutes == 1:
+            selected = self.candles[max(0, end - limit):end]
+        else:
+            selected = []
+            start = max(0, end - limit * minutes)
+            start -= start % minutes
+            for i in range(start, end, minutes):
+                group = self.candles[i:min(i + minutes, end)]
+                selected.append([group[0][0], group[0][1], max(c[2] for c in group),
+                                 min(c[3] for c in group), group[-1][4],
+                                 sum(c[5] for c in group), group[0][0] + minutes * 60000 - 1])
+            selected = selected[-limit:]
+
+        # Formato de Binance: números como texto
+        return [[c[0], f"{c[1]:.2f}", f"{c[2]:.2f}", f"{c[3]:.2f}", f"{c[4]:.2f}", f"{c[5]:.5f}",
+                 c[6], f"{c[4] * c[5]:.2f}", 100, f"{c[5] / 2:.5f}", f"{c[4] * c[5] / 2:.2f}", "0"]
+                for c in selected]
+
+    def price(self):
+        return self.candles[self.current_index()][4]
+
+    def order_book(self, limit=100, tick=0.01):
+        """Libro sintético alrededor del precio actual (determinista por vela)"""
+        index = self.current_index()
+        rng = random.Random(index)
+        mid = self.price()
+        half_spread = max(tick, round(mid * 0.00001, 2))
+        bids, asks = [], []
+        for level in range(limit):
+            offset = half_spread + level * tick * 50
+            size = self.depth_scale * (1 + level / 4)
+            bids.append([round(mid - offset, 2), round(rng.uniform(0.0001, 0.05) * size, 8)])
+            asks.append([round(mid + offset, 2), round(rng.uniform(0.0001, 0.05) * size, 8)])
+        return bids, asks
+
+
+class FakeExchange:
+    """Estado del exchange simulado: mercado, pesos, bans, fallas y órdenes"""
+
+    def __init__(self, replay, latency_ms=0.0, jitter_ms=0.0, error_rate=0.0,
+                 weight_limit=REQUEST_WEIGHT_LIMIT, ban_seconds=BAN_SECONDS, seed=7):
+        self.replay = replay
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.weight_limit = weight_limit
+        self.ban_seconds = ban_seconds
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.window_minute = None
+        self.used_weight = 0
+        self.limited = False
+        self.banned_until = 0.0
+        self.next_order_id = 1
+        self.next_list_id = 1
+        # Órdenes en el libro, listas OCO y eventos del user-data stream
+        self.open_orders = {}
+        self.orders = {}
+        self.order_lists = {}
+        self.events = []
+        self.matched_index = None
+        self.stats = {'requests': 0, 'orders': 0, 'errors_injected': 0, 'http_429': 0, 'http_418': 0,
+                      'resting_fills': 0}
+
+    def charge(self, weight):
+        """Cobrar peso a la ventana del minuto actual. Devuelve (status, peso usado, retry_after)"""
+        now = time.time()
+        with self.lock:
+            self.stats['requests'] += 1
+            minute = int(now // 60)
+            if minute != self.window_minute:
+                self.window_minute = minute
+                self.used_weight = 0
+                self.limited = False
+
+            if now < self.banned_until:
+                self.stats['http_418'] += 1
+                return 418, self.used_weight, int(self.banned_until - now) + 1
+
+            self.used_weight += weight
+            if self.used_weight > self.weight_limit:
+                retry_after = 60 - int(now % 60)
+                if self.limited:
+                    # Seguir pidiendo después de un 429 termina en ban, como en Binance
+                    self.banned_until = now + self.ban_seconds
+                    self.stats['http_418'] += 1
+                    return 418, self.used_weight, self.ban_seconds
+                self.limited = True
+                self.stats['http_429'] += 1
+                return 429, self.used_weight, retry_after
+            return 200, self.used_weight, 0
+
+    def inject_latency(self):
+        delay = self.latency_ms
+        if self.jitter_ms:
+            with self.lock:
+                delay += self.rng.uniform(0, self.jitter_ms)
+        if delay > 0:
+            time.sleep(delay / 1000)
+
+    def should_fail(self):
+        if not self.error_rate:
+            return False
+        with self.lock:
+            failed = self.rng.random() < self.error_rate
+            if failed:
+                self.stats['errors_injected'] += 1
+        return failed
+
+    def _fill(self, side, price, quantity):
+        """Fill con comisión: en el activo recibido (BTC al comprar, USDT al vender)"""
+        if side == 'BUY':
+            commission, asset = quantity * COMMISSION_RATE, self.replay.symbol[:-4]
+        else:
+            commission, asset = quantity * price * COMMISSION_RATE, self.replay.symbol[-4:]
+        return {'price': f"{price:.2f}", 'qty': f"{quantity:.8f}",
+                'commission': f"{commission:.8f}", 'commissionAsset': asset}
+
+    def _check_filters(self, quantity, price):
+        """LOT_SIZE y NOTIONAL del símbolo, como Binance"""
+        steps = quantity / LOT_STEP
+        if quantity < LOT_STEP or abs(steps - round(steps)) > 1e-6:
+            raise ValueError("Filter failure: LOT_SIZE")
+        if quantity * price < MIN_NOTIONAL:
+            raise ValueError("Filter failure: NOTIONAL")
+
+    def create_order(self, params):
+        """Ejecutar MARKET o LIMIT (GTC/IOC/FOK) contra el libro sintético; LIMIT GTC, LIMIT_MAKER
+        y las órdenes stop quedan en el libro hasta que una vela las alcance"""
+        self.advance()
+        order_type = params.get('type', 'MARKET').upper()
+        self._check_filters(float(params.get('quantity', 0)),
+                            float(params['price']) if params.get('price') else self.replay.price())
+        if order_type in RESTING_TYPES:
+            return self._place_resting(params, order_type)
+
+        symbol = params.get('symbol', self.replay.symbol)
+        side = params.get('side', 'BUY').upper()
+        quantity = float(params.get('quantity', 0))
+        limit_price = float(params['price']) if params.get('price') else None
+        time_in_force = params.get('timeInForce', 'GTC')
+
+        bids, asks = self.replay.order_book(100)
+        levels = asks if side == 'BUY' else bids
+        fills, remaining = [], quantity
+        for price, qty in levels:
+            if remaining <= 1e-12:
+                break
+            if limit_price is not None and (price > limit_price if side == 'BUY' else price < limit_price):
+                break
+            take = min(remaining, qty)
+            fills.append(self._fill(side, price, take))
+            remaining -= take
+
+        executed = quantity - remaining
+        if order_type == 'LIMIT' and time_in_force == 'FOK' and remaining > 1e-12:
+            fills, executed = [], 0.0
+        if executed <= 1e-12:
+            status = 'EXPIRED' if order_type == 'LIMIT' and time_in_force in ('IOC', 'FOK') else 'NEW'
+        elif remaining > 1e-12:
+            status = 'PARTIALLY_FILLED' if time_in_force == 'GTC' and order_type == 'LIMIT' else (
+                'EXPIRED' if order_type == 'LIMIT' else 'FILLED')
+        else:
+            status = 'FILLED'
+
+        with self.lock:
+            order_id = self.next_order_id
+            self.next_order_id += 1
+            self.stats['orders'] += 1
+
+        quote = sum(float(f['price']) * float(f['qty']) for f in fills)
+        order = {
+            'symbol': symbol, 'orderId': order_id, 'orderListId': -1,
+            'clientOrderId': params.get('newClientOrderId', f"fake{order_id}"),
+            'transactTime': int(time.time() * 1000), 'price': params.get('price', '0.00000000'),
+            'origQty': f"{quantity:.8f}", 'executedQty': f"{executed:.8f}",
+            'cummulativeQuoteQty': f"{quote:.8f}", 'status': status, 'timeInForce': time_in_force,
+            'type': order_type, 'side': side, 'stopPrice': '0.00000000', 'fills': fills
+        }
+        last_price = float(fills[-1]['price']) if fills else 0.0
+        with self.lock:
+            self.orders[order_id] = order
+            self._emit(order, 'TRADE' if executed > 0 else 'NEW', executed, last_price)
+            if order_type == 'LIMIT' and time_in_force == 'GTC' and status in ('NEW', 'PARTIALLY_FILLED'):
+                # El resto de una LIMIT GTC queda en el libro
+                self._rest(order, quantity, limit_price, None)
+        return order
+
+    def _new_order(self, params, order_type, side, quantity, price, stop_price, list_id=-1, client_id=None):
+        with self.lock:
+            order_id = self.next_order_id
+            self.next_order_id += 1
+            self.stats['orders'] += 1
+        return {
+            'symbol': params.get('symbol', self.replay.symbol), 'orderId': order_id, 'orderListId': list_id,
+            'clientOrderId': client_id or f"fake{order_id}", 'transactTime': int(time.time() * 1000),
+            'price': f"{price or 0:.8f}", 'origQty': f"{quantity:.8f}", 'executedQty': '0.00000000',
+            'cummulativeQuoteQty': '0.00000000', 'status': 'NEW',
+            'timeInForce': params.get('timeInForce', 'GTC') if order_type != 'LIMIT_MAKER' else 'GTC',
+            'type': order_type, 'side': side, 'stopPrice': f"{stop_price or 0:.8f}", 'fills': []
+        }
+
+    def _validate_resting(self, order_type, side, price, stop_price):
+        """Rechazar órdenes que se ejecutarían al instante, como Binance"""
+        last = self.replay.price()
+        if order_type in ('STOP_LOSS', 'STOP_LOSS_LIMIT'):
+            if stop_price is None:
+                raise ValueError("stopPrice es obligatorio")
+            if (stop_price >= last) if side == 'SELL' else (stop_price <= last):
+                raise ValueError("Stop price would trigger immediately.")
+            if order_type == 'STOP_LOSS_LIMIT' and price is None:
+                raise ValueError("price es obligatorio en STOP_LOSS_LIMIT")
+        elif order_type == 'LIMIT_MAKER' and ((price <= last) if side == 'SELL' else (price >= last)):
+            raise ValueError("Order would immediately match and take.")
+
+    def _place_resting(self, params, order_type):
+        side = params.get('side', 'SELL').upper()
+        quantity = float(params.get('quantity', 0))
+        price = float(params['price']) if params.get('price') else None
+        stop_price = float(params['stopPrice']) if params.get('stopPrice') else None
+        self._validate_resting(order_type, side, price, stop_price)
+        order = self._new_order(params, order_type, side, quantity, price, stop_price,
+                                client_id=params.get('newClientOrderId'))
+        with self.lock:
+            self.orders[order['orderId']] = order
+            self._emit(order, 'NEW', 0.0, 0.0)
+            self._rest(order, quantity, price, stop_price)
+        return {key: value for key, value in order.items() if key != 'fills'}
+
+    def create_oco_order(self, params):
+        """OCO de salida: LIMIT_MAKER (take profit) + STOP_LOSS_LIMIT; al ejecutarse una se cancela la otra"""
+        self.advance()
+        side = params.get('side', 'SELL').upper()
+        quantity = float(params.get('quantity', 0))
+        price = float(params['price'])
+        stop_price = float(params['stopPrice'])
+        stop_limit = float(params['stopLimitPrice']) if params.get('stopLimitPrice') else None
+        self._check_filters(quantity, stop_limit or stop_price)
+        last = self.replay.price()
+        if not ((price > last > stop_price) if side == 'SELL' else (price < last < stop_price)):
+            raise ValueError("The relationship of the prices for the orders is not correct.")
+
+        with self.lock:
+            list_id = self.next_list_id
+            self.next_list_id += 1
+        limit_order = self._new_order(params, 'LIMIT_MAKER', side, quantity, price, None, list_id,
+                                      params.get('limitClientOrderId'))
+        stop_order = self._new_order(params, 'STOP_LOSS_LIMIT' if stop_limit else 'STOP_LOSS', side, quantity,
+                                     stop_limit, stop_price, list_id, params.get('stopClientOrderId'))
+        stop_order['timeInForce'] = params.get('stopLimitTimeInForce', 'GTC')
+        legs = (stop_order, limit_order)
+        with self.lock:
+            self.order_lists[list_id] = [order['orderId'] for order in legs]
+            for order in legs:
+                self.orders[order['orderId']] = order
+                self._emit(order, 'NEW', 0.0, 0.0)
+            self._rest(stop_order, quantity, stop_limit, stop_price)
+            self._rest(limit_order, quantity, price, None)
+        return {
+            'orderListId': list_id, 'contingencyType': 'OCO', 'listStatusType': 'EXEC_STARTED',
+            'listOrderStatus': 'EXECUTING', 'listClientOrderId': params.get('listClientOrderId', f"list{list_id}"),
+            'transactionTime': int(time.time() * 1000), 'symbol': limit_order['symbol'],
+            'orders': [{'symbol': o['symbol'], 'orderId': o['orderId'], 'clientOrderId': o['clientOrderId']}
+                       for o in legs],
+            'orderReports': [{key: value for key, value in o.items() if key != 'fills'} for o in legs]
+        }
+
+    def _rest(self, order, quantity, price, stop_price):
+        """Dejar la orden en el libro (se llama con el lock tomado)"""
+        if self.matched_index is None:
+            self.matched_index = self.replay.current_index()
+        executed = float(order['executedQty'])
+        self.open_orders[order['orderId']] = {
+            'order': order, 'remaining': quantity - executed, 'price': price, 'stop_price': stop_price,
+            'triggered': order['type'] in ('LIMIT', 'LIMIT_MAKER')
+        }
+
+    def _emit(self, order, exec_type, last_qty, last_price):
+        """Evento executionReport del user-data stream (se llama con el lock tomado)"""
+        self.events.append({
+            'e': 'executionReport', 'E': int(time.time() * 1000), 's': order['symbol'],
+            'c': order['clientOrderId'], 'S': order['side'], 'o': order['type'], 'f': order['timeInForce'],
+            'q': order['origQty'], 'p': order['price'], 'P': order['stopPrice'], 'x': exec_type,
+            'X': order['status'], 'i': order['orderId'], 'l': f"{last_qty:.8f}", 'z': order['executedQty'],
+            'L': f"{last_price:.2f}", 'Z': order['cummulativeQuoteQty'], 'T': order['transactTime'],
+            'g': order['orderListId']
+        })
+
+    def advance(self):
+        """Ejecutar las órdenes del libro contra las velas reproducidas desde la última vez"""
+        with self.lock:
+            if self.matched_index is None or not self.open_orders:
+                self.matched_index = self.replay.current_index() if self.open_orders else None
+                return
+            current = self.replay.current_index()
+            for index in range(self.matched_index + 1, current + 1):
+                self._match_candle(self.replay.candles[index])
+                if not self.open_orders:
+                    break
+            self.matched_index = current
+
+    def _match_candle(self, candle):
+        """Una vela contra las órdenes abiertas; si el stop y el take profit caen en la misma vela
+        se asume que el stop se tocó primero (lo conservador)"""
+        open_time, open_price, high, low = candle[0], candle[1], candle[2], candle[3]
+        resting = sorted(self.open_orders.items(), key=lambda item: item[1]['triggered'])
+        for order_id, entry in resting:
+            if order_id not in self.open_orders:
+                continue  # Cancelada por su OCO en esta misma vela
+            order = entry['order']
+            sell = order['side'] == 'SELL'
+            if not entry['triggered']:
+                stop = entry['stop_price']
+                if not ((low <= stop) if sell else (high >= stop)):
+                    continue
+                entry['triggered'] = True
+                trigger_price = min(open_price, stop) if sell else max(open_price, stop)
+                if order['type'] == 'STOP_LOSS' or (
+                        (trigger_price >= entry['price']) if sell else (trigger_price <= entry['price'])):
+                    self._fill_resting(order_id, trigger_price, open_time)
+                continue
+            # LIMIT en el libro (o stop ya disparado con el límite sin alcanzar)
+            limit = entry['price']
+            if (high >= limit) if sell else (low <= limit):
+                self._fill_resting(order_id, max(limit, open_price) if sell else min(limit, open_price), open_time)
+
+    def _fill_resting(self, order_id, price, open_time):
+        entry = self.open_orders.pop(order_id)
+        order = entry['order']
+        quantity = entry['remaining']
+        executed = float(order['executedQty']) + quantity
+        quote = float(order['cummulativeQuoteQty']) + quantity * price
+        order.update(status='FILLED', executedQty=f"{executed:.8f}", cummulativeQuoteQty=f"{quote:.8f}",
+                     transactTime=int(open_time) + 30000)
+        order['fills'].append(self._fill(order['side'], price, quantity))
+        self.stats['resting_fills'] += 1
+        self._emit(order, 'TRADE', quantity, price)
+        # La otra pata del OCO se cancela
+        for sibling_id in self.order_lists.get(order['orderListId'], ()):
+            if sibling_id != order_id and sibling_id in self.open_orders:
+                self._cancel_locked(sibling_id, 'EXPIRED')
+
+    def _cancel_locked(self, order_id, status='CANCELED'):
+        entry = self.open_orders.pop(order_id, None)
+        if entry is None:
+            return None
+        order = entry['order']
+        order['status'] = status
+        self._emit(order, 'CANCELED' if status == 'CANCELED' else 'EXPIRED', 0.0, 0.0)
+        return order
+
+    def _find_order(self, params):
+        if params.get('orderId'):
+            return self.orders.get(int(params['orderId']))
+        client_id = params.get('origClientOrderId')
+        return next((o for o in self.orders.values() if o['clientOrderId'] == client_id), None)
+
+    def cancel_order(self, params):
+        """Cancelar una orden; si es parte de un OCO se cancela la lista entera (como Binance)"""
+        self.advance()
+        with self.lock:
+            order = self._find_order(params)
+            if order is None or order['orderId'] not in self.open_orders:
+                raise ValueError("Unknown order sent.")
+            list_id = order['orderListId']
+            for order_id in self.order_lists.get(list_id, [order['orderId']]):
+                self._cancel_locked(order_id)
+            return {key: value for key, value in order.items() if key != 'fills'}
+
+    def cancel_order_list(self, params):
+        self.advance()
+        with self.lock:
+            order_ids = self.order_lists.get(int(params.get('orderListId', -1)))
+            if not order_ids or not any(order_id in self.open_orders for order_id in order_ids):
+                raise ValueError("Order list does not exist.")
+            orders = [self._cancel_locked(order_id) or self.orders[order_id] for order_id in order_ids]
+            return {'orderListId': int(params['orderListId']), 'listOrderStatus': 'ALL_DONE',
+                    'orderReports': [{key: value for key, value in o.items() if key != 'fills'} for o in orders]}
+
+    def get_order(self, params):
+        self.advance()
+        with self.lock:
+            order = self._find_order(params)
+            if order is None:
+                raise ValueError("Order does not exist.")
+            return {key: value for key, value in order.items() if key != 'fills'}
+
+    def get_open_orders(self, params):
+        self.advance()
+        with self.lock:
+            return [{key: value for key, value in entry['order'].items() if key != 'fills'}
+                    for entry in self.open_orders.values()]
+
+    def user_events(self, params):
+        """Eventos del user-data stream desde `after` (lo que el websocket habría empujado)"""
+        self.advance()
+        after = int(params.get('after', 0))
+        with self.lock:
+            return {'events': self.events[after:], 'next': len(self.events)}
+
+    def exchange_info(self):
+        return {
+            'timezone': 'UTC', 'serverTime': int(time.time() * 1000),
+            'rateLimits': [{'rateLimitType': 'REQUEST_WEIGHT', 'interval': 'MINUTE',
+                            'intervalNum': 1, 'limit': self.weight_limit}],
+            'symbols': [{
+                'symbol': self.replay.symbol, 'status': 'TRADING',
+                'baseAsset': self.replay.symbol[:-4], 'quoteAsset': self.replay.symbol[-4:],
+                'filters': [
+                    {'filterType': 'PRICE_FILTER', 'minPrice': '0.01', 'maxPrice': '1000000.00', 'tickSize': '0.01'},
+                    {'filterType': 'LOT_SIZE', 'minQty': f"{LOT_STEP:.8f}", 'maxQty': '9000.00',
+                     'stepSize': f"{LOT_STEP:.8f}"},
+                    {'filterType': 'NOTIONAL', 'minNotional': f"{MIN_NOTIONAL:.2f}", 'applyMinToMarket': True,
+                     'maxNotional': '9000000.00', 'applyMaxToMarket': False, 'avgPriceMins': 5}
+                ]
+            }]
+        }
+
+
+def make_handler(exchange):
+    """Handler HTTP ligado a una instancia de FakeExchange"""
+
+    routes = {
+        ('GET', '/api/v3/ping'): (1, lambda params: {}),
+        ('GET', '/api/v3/time'): (1, lambda params: {'serverTime': int(time.time() * 1000)}),
+        ('GET', '/api/v3/exchangeInfo'): (20, lambda params: exchange.exchange_info()),
+        ('GET', '/api/v3/klines'): (
+            lambda params: klines_weight(int(params.get('limit', 500))),
+            lambda params: exchange.replay.klines(params.get('interval', '1m'), int(params.get('limit', 500)))),
+        ('GET', '/api/v3/ticker/price'): (
+            lambda params: 2 if 'symbol' in params else 4,
+            lambda params: {'symbol': params.get('symbol', exchange.replay.symbol),
+                            'price': f"{exchange.replay.price():.2f}"}),
+        ('GET', '/api/v3/depth'): (
+            lambda params: depth_weight(int(params.get('limit', 100))),
+            lambda params: dict(zip(('bids', 'asks'), (
+                [[f"{p:.2f}", f"{q:.8f}"] for p, q in side]
+                for side in exchange.replay.order_book(min(int(params.get('limit', 100)), 1000)))),
+                lastUpdateId=exchange.replay.current_index())),
+        ('POST', '/api/v3/order'): (1, exchange.create_order),
+        ('POST', '/api/v3/order/test'): (1, lambda params: {}),
+        ('POST', '/api/v3/order/oco'): (1, exchange.create_oco_order),
+        ('DELETE', '/api/v3/order'): (1, exchange.cancel_order),
+        ('DELETE', '/api/v3/orderList'): (1, exchange.cancel_order_list),
+        ('GET', '/api/v3/order'): (4, exchange.get_order),
+        ('GET', '/api/v3/openOrders'): (lambda params: 6 if 'symbol' in params else 80, exchange.get_open_orders),
+        ('GET', '/api/v3/fake/userDataStream'): (0, exchange.user_events),
+        ('GET', '/api/v3/account'): (20, lambda params: {'balances': [
+            {'asset': 'USDT', 'free': '1000.00000000', 'locked': '0.00000000'},
+            {'asset': 'BTC', 'free': '0.01000000', 'locked': '0.00000000'}]})
+    }
+
+    class FakeExchangeHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def handle_request(self, method):
+            parsed = urlparse(self.path)
+            params = {key: values[-1] for key, values in parse_qs(parsed.query).items()}
+            if method in ('POST', 'DELETE'):
+                length = int(self.headers.get('Content-Length', 0) or 0)
+                if length:
+                    body = self.rfile.read(length).decode('utf-8')
+                    params.update({key: values[-1] for key, values in parse_qs(body).items()})
+
+            route = routes.get((method, parsed.path))
+            if route is None:
+                self.send_json(404, {'code': -1100, 'msg': f"Endpoint no simulado: {parsed.path}"})
+                return
+
+            weight, action = route
+            weight = weight(params) if callable(weight) else weight
+            status, used_weight, retry_after = exchange.charge(weight)
+            exchange.inject_latency()
+
+            if status == 429:
+                self.send_json(429, {'code': -1003, 'msg': 'Too much request weight used; please use the websocket.'},
+                               used_weight, retry_after)
+                return
+            if status == 418:
+                self.send_json(418, {'code': -1003, 'msg': 'Way too much request weight used; IP banned.'},
+                               used_weight, retry_after)
+                return
+            if exchange.should_fail():
+                self.send_json(503, {'code': -1001, 'msg': 'Internal error; unable to process your request.'},
+                               used_weight)
+                return
+
+            try:
+                body = action(params)
+            except (ValueError, KeyError) as e:
+                self.send_json(400, {'code': -1100, 'msg': str(e)}, used_weight)
+                return
+            self.send_json(200, body, used_weight)
+
+        def send_json(self, status, body, used_weight=0, retry_after=0):
+            payload = json.dumps(body).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            self.send_header('X-MBX-USED-WEIGHT-1M', str(used_weight))
+            if retry_after:
+                self.send_header('Retry-After', str(retry_after))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_GET(self):
+            self.handle_request('GET')
+
+        def do_POST(self):
+            self.handle_request('POST')
+
+        def do_DELETE(self):
+            self.handle_request('DELETE')
+
+        def log_message(self, format, *args):
+            pass
+
+    return FakeExchangeHandler
+
+
+def start_fake_exchange(port=DEFAULT_PORT, host=DEFAULT_HOST, candles=None, speed=1.0, depth_scale=1.0, **options):
+    """Iniciar el exchange simulado en un hilo daemon (para usar desde otros scripts)"""
+    replay = MarketReplay(candles or generate_candles(), speed=speed, depth_scale=depth_scale)
+    exchange = FakeExchange(replay, **options)
+    server = ThreadingHTTPServer((host, port), make_handler(exchange))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='fake-exchange', daemon=True).start()
+    return server, exchange
+
+
+class FakeClient:
+    """Lo mínimo del Client de python-binance sobre HTTP, para probar módulos contra el exchange simulado"""
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+
+    def _call(self, method, path, **params):
+        query = urlencode(params)
+        request = Request(f"{self.base_url}/v3/{path}?{query}", method=method)
+        try:
+            with urlopen(request, timeout=5) as response:
+                return json.loads(response.read())
+        except HTTPError as e:
+            # Como BinanceAPIException: el mensaje del exchange en la excepción
+            raise RuntimeError(f"APIError {e.code}: {json.loads(e.read()).get('msg')}") from None
+
+    def get_symbol_info(self, symbol):
+        return next(info for info in self._call('GET', 'exchangeInfo')['symbols'] if info['symbol'] == symbol)
+
+    def get_symbol_ticker(self, symbol):
+        return self._call('GET', 'ticker/price', symbol=symbol)
+
+    def get_order_book(self, symbol, limit=100):
+        return self._call('GET', 'depth', symbol=symbol, limit=limit)
+
+    def create_order(self, **params):
+        return self._call('POST', 'order', **params)
+
+    def create_oco_order(self, **params):
+        return self._call('POST', 'order/oco', **params)
+
+    def cancel_order(self, **params):
+        return self._call('DELETE', 'order', **params)
+
+    def get_order(self, **params):
+        return self._call('GET', 'order', **params)
+
+
+def run_benchmark(base_url, requests_count, concurrency, path):
+    """Carga concurrente contra el exchange: throughput, latencias y códigos HTTP"""
+    from urllib.error import URLError
+    from concurrent.futures import ThreadPoolExecutor
+
+    def one_request(_):
+        start = time.perf_counter()
+        try:
+            with urlopen(base_url + path, timeout=10) as response:
+                response.read()
+                status = response.status
+        except HTTPError as e:
+            status = e.code
+        except URLError:
+            status = 0
+        return status, (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(one_request, range(requests_count)))
+    elapsed = time.perf_counter() - start
+
+    latencies = sorted(latency for _, latency in results)
+    statuses = {}
+    for status, _ in results:
+        statuses[status] = statuses.get(status, 0) + 1
+
+    def percentile(p):
+        return latencies[min(len(latencies) - 1, int(len(latencies) * p))]
+
+    print(f"📊 {requests_count} requests a {path} con {concurrency} hilos en {elapsed:.2f}s "
+          f"({requests_count / elapsed:.0f} req/s)")
+    print(f"⏱️  p50: {percentile(0.50):.1f} ms | p95: {percentile(0.95):.1f} ms | "
+          f"p99: {percentile(0.99):.1f} ms | máx: {latencies[-1]:.1f} ms")
+    print(f"📨 Códigos HTTP: {dict(sorted(statuses.items()))}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exchange Binance simulado para pruebas locales")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    serve = subparsers.add_parser('serve', help="Iniciar el servidor")
+    serve.add_argument('--host', default=DEFAULT_HOST)
+    serve.add_argument('--port', type=int, default=DEFAULT_PORT)
+    serve.add_argument('--candles', help="CSV de velas grabadas (open_time,open,high,low,close,volume)")
+    serve.add_argument('--symbol', default='BTCUSDT')
+    serve.add_argument('--speed', type=float, default=1.0, help="Velocidad de reproducción (60 = 1 vela/s)")
+    serve.add_argument('--latency-ms', type=float, default=0.0)
+    serve.add_argument('--jitter-ms', type=float, default=0.0)
+    serve.add_argument('--error-rate', type=float, default=0.0, help="Fracción de requests con 503")
+    serve.add_argument('--weight-limit', type=int, default=REQUEST_WEIGHT_LIMIT)
+    serve.add_argument('--ban-seconds', type=int, default=BAN_SECONDS)
+    serve.add_argument('--seed', type=int, default=42)
+
+    bench = subparsers.add_parser('bench', help="Medir throughput y latencia contra el servidor")
+    bench.add_argument('--host', default=DEFAULT_HOST)
+    bench.add_argument('--port', type=int, default=DEFAULT_PORT)
+    bench.add_argument('--requests', type=int, default=1000)
+    bench.add_argument('--concurrency', type=int, default=8)
+    bench.add_argument('--path', default='/api/v3/klines?symbol=BTCUSDT&interval=1m&limit=100')
+
+    args = parser.parse_args()
+
+    if args.command == 'bench':
+        run_benchmark(f"http://{args.host}:{args.port}", args.requests, args.concurrency, args.path)
+        return
+
+    candles = load_candles(args.candles) if args.candles else generate_candles(seed=args.seed)
+    replay = MarketReplay(candles, speed=args.speed, symbol=args.symbol)
+    exchange = FakeExchange(replay, latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+                            error_rate=args.error_rate, weight_limit=args.weight_limit,
+                            ban_seconds=args.ban_seconds, seed=args.seed)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(exchange))
+    server.daemon_threads = True
+    print(f"🧪 Exchange simulado en http://{args.host}:{args.port}/api ({len(candles)} velas, x{args.speed})")
+    print(f"💡 Bots: BINANCE_API_URL=http://{args.host}:{args.port}/api")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(f"\n🛑 Exchange detenido | {exchange.stats}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+🕯️ STOP LOSS / TAKE PROFIT INTRAVELA PARA SIMULACIÓN Y BACKTESTS
+================================================================
+Los bots simulados comparaban un solo precio (ticker o último cierre) con el
+stop y el take profit: si entre dos consultas el precio tocaba el stop y
+volvía, la posición seguía abierta, y las salidas se registraban al precio
+de la consulta en vez del nivel. Acá cada vela se resuelve con su máximo y
+su mínimo:
+
+- Toca el stop si el mínimo llega al nivel (largos; el máximo en cortos), el
+  take profit si el máximo llega al suyo. Si la vela abre más allá de un
+  nivel (gap), la salida es a la apertura.
+- Si la vela toca los dos niveles, el orden se elige con ordering:
+  STOP_FIRST (pesimista, por defecto), TARGET_FIRST u OHLC_PATH (vela alcista
+  recorre apertura → mínimo → máximo, bajista apertura → máximo → mínimo).
+- El stop sale a mercado con slippage en contra; el take profit es límite
+  (sin slippage salvo que se configure).
+
+Todo es vectorizado: first_exits() resuelve muchas posiciones contra muchas
+velas en una matriz posiciones x velas, sin loop de Python por vela, así que
+sirve igual para el paper trading de los bots y para backtests.
+
+Uso:
+    bar, code, price = first_exits(times, open_, high, low, close,
+                                   since=entry_ms, stop=stop_loss, target=take_profit)
+    if bar[0] >= 0: cerrar a price[0] por EXIT_REASONS[code[0]]
+"""
+
+import numpy as np
+
+STOP_FIRST = 'stop_first'
+TARGET_FIRST = 'target_first'
+OHLC_PATH = 'ohlc_path'
+ORDERINGS = (STOP_FIRST, TARGET_FIRST, OHLC_PATH)
+
+DEFAULT_STOP_SLIPPAGE_BPS = 2.0
+DEFAULT_TARGET_SLIPPAGE_BPS = 0.0
+
+NO_EXIT = 0
+EXIT_STOP = 1
+EXIT_TARGET = 2
+EXIT_REASONS = {EXIT_STOP: 'STOP_LOSS', EXIT_TARGET: 'TAKE_PROFIT'}
+
+
+def bar_exits(open_, high, low, close, stop, target, side=1, ordering=STOP_FIRST,
+              stop_slippage_bps=DEFAULT_STOP_SLIPPAGE_BPS, target_slippage_bps=DEFAULT_TARGET_SLIPPAGE_BPS):
+    """Salida de cada vela por separado (con broadcasting): (código, precio; NaN sin salida)
+
+    side: 1 largo, -1 corto. target NaN = sin take profit.
+    """
+    if ordering not in ORDERINGS:
+        raise ValueError(f"ordering debe ser uno de {ORDERINGS}: {ordering}")
+    long = np.asarray(side) > 0
+    open_, high, low, close = (np.asarray(values, dtype=np.float64) for values in (open_, high, low, close))
+    stop = np.asarray(stop, dtype=np.float64)
+    target = np.asarray(target, dtype=np.float64)
+
+    with np.errstate(invalid='ignore'):
+        stop_hit = np.where(long, low <= stop, high >= stop)
+        target_hit = np.where(long, high >= target, low <= target)
+        stop_gap = np.where(long, open_ <= stop, open_ >= stop)
+        target_gap = np.where(long, open_ >= target, open_ <= target)
+
+    if ordering == STOP_FIRST:
+        stop_wins = True
+    elif ordering == TARGET_FIRST:
+        stop_wins = False
+    else:
+        # El stop de un largo está abajo: en una vela alcista el mínimo llega primero
+        bullish = close >= open_
+        stop_wins = np.where(long, bullish, ~bullish)
+
+    take_stop = stop_hit & ~target_gap & (stop_gap | ~target_hit | stop_wins)
+    take_target = target_hit & ~take_stop
+    code = np.where(take_stop, EXIT_STOP, np.where(take_target, EXIT_TARGET, NO_EXIT))
+
+    direction = np.where(long, 1.0, -1.0)
+    # Stop: al nivel o peor si abrió más allá; take profit: al nivel o mejor si abrió más allá
+    stop_price = np.where(long, np.minimum(open_, stop), np.maximum(open_, stop)) * (1 - direction * stop_slippage_bps / 10000)
+    target_price = np.where(long, np.maximum(open_, target), np.minimum(open_, target)) * (1 - direction * target_slippage_bps / 10000)
+    price = np.where(take_stop, stop_price, np.where(take_target, target_price, np.nan))
+    return code, price
+
+
+def first_exits(times, open_, high, low, close, since, stop, target=np.nan, side=1, **options):
+    """Primera vela que cierra cada posición (vectorizado posiciones x velas)
+
+    times: apertura de cada vela, ordenadas (T,). Por posición (escalares o
+    (P,)): since (solo cuentan velas que abren después: entrada o último cambio
+    de niveles), stop, target, side. Devuelve (índice de vela o -1, código,
+    precio) de (P,).
+    """
+    times = np.asarray(times)
+    open_, high, low, close = (np.asarray(values, dtype=np.float64) for values in (open_, high, low, close))
+    since, stop, target, side = np.broadcast_arrays(*(np.atleast_1d(np.asarray(values)) for values in (since, stop, target, side)))
+    stop = stop.astype(np.float64)
+    target = target.astype(np.float64)
+    long = side > 0
+
+    # En la matriz posiciones x velas solo se compara si la vela toca algún nivel;
+    # el orden y el precio se resuelven después solo en la primera vela de cada posición
+    column = np.s_[:, None]
+    touched = np.empty((len(since), len(times)), dtype=bool)
+    with np.errstate(invalid='ignore'):
+        touched[long] = (low <= stop[long][column]) | (high >= target[long][column])
+        touched[~long] = (high >= stop[~long][column]) | (low <= target[~long][column])
+    touched &= np.arange(len(times)) >= np.searchsorted(times, since, side='right')[column]
+
+    first = touched.argmax(axis=1)
+    exited = touched[np.arange(len(since)), first]
+    code, price = bar_exits(open_[first], high[first], low[first], close[first], stop, target, side, **options)
+    return np.where(exited, first, -1), np.where(exited, code, NO_EXIT), np.where(exited, price, np.nan)
+
+
+def first_exits_loop(times, open_, high, low, close, since, stop, target, side, ordering=STOP_FIRST,
+                     stop_slippage_bps=DEFAULT_STOP_SLIPPAGE_BPS, target_slippage_bps=DEFAULT_TARGET_SLIPPAGE_BPS):
+    """Referencia vela por vela (la forma habitual de un backtest) para comparar resultados y tiempos"""
+    results = []
+    for p in range(len(since)):
+        long = side[p] > 0
+        result = (-1, NO_EXIT, np.nan)
+        for t in range(len(times)):
+            if times[t] <= since[p]:
+                continue
+            o = open_[t]
+            if long:
+                stop_hit, target_hit = low[t] <= stop[p], high[t] >= target[p]
+                stop_gap, target_gap = o <= stop[p], o >= target[p]
+            else:
+                stop_hit, target_hit = high[t] >= stop[p], low[t] <= target[p]
+                stop_gap, target_gap = o >= stop[p], o <= target[p]
+            if not (stop_hit or target_hit):
+                continue
+            if ordering == OHLC_PATH:
+                stop_wins = (close[t] >= o) == long
+            else:
+                stop_wins = ordering == STOP_FIRST
+            if stop_hit and not target_gap and (stop_gap or not target_hit or stop_wins):
+                level = min(o, stop[p]) if long else max(o, stop[p])
+                slippage = stop_slippage_bps
+                result = (t, EXIT_STOP, level * (1 - (1 if long else -1) * slippage / 10000))
+            else:
+                level = max(o, target[p]) if long else min(o, target[p])
+                slippage = target_slippage_bps
+                result = (t, EXIT_TARGET, level * (1 - (1 if long else -1) * slippage / 10000))
+            break
+        results.append(result)
+    bar, code, price = zip(*results)
+    return np.array(bar), np.array(code), np.array(price)
+
+
+def _synthetic_trades(candles=2000, positions=500, seed=0):
+    """Velas sintéticas de 1m y posiciones largas/cortas abiertas en velas al azar"""
+    from volatility import _synthetic_frame
+
+    df = _synthetic_frame(candles, seed)
+    rng = np.random.default_rng(seed)
+    entry_bar = rng.integers(0, candles - 1, positions)
+    entry = df['close'].to_numpy()[entry_bar]
+    side = np.where(rng.random(positions) < 0.7, 1, -1)
+    stop = entry * (1 - side * rng.uniform(0.002, 0.01, positions))
+    target = entry * (1 + side * rng.uniform(0.004, 0.02, positions))
+    return df, df['timestamp'].to_numpy()[entry_bar], entry, side, stop, target
+
+
+def check_equivalence():
+    """Vectorizado = referencia vela por vela en los tres órdenes"""
+    df, since, _, side, stop, target = _synthetic_trades(candles=600, positions=300, seed=1)
+    arrays = [df[column].to_numpy() for column in ('timestamp', 'open', 'high', 'low', 'close')]
+    for ordering in ORDERINGS:
+        expected = first_exits_loop(*arrays, since, stop, target, side, ordering=ordering)
+        result = first_exits(*arrays, since, stop, target, side, ordering=ordering)
+        assert np.array_equal(result[0], expected[0]) and np.array_equal(result[1], expected[1]), ordering
+        assert np.allclose(result[2], expected[2], equal_nan=True), ordering
+    print(f"✅ Salidas vectorizadas iguales a la referencia vela por vela ({len(since)} posiciones, {ORDERINGS})")
+
+
+def compare_close_only():
+    """Cuánto cambian las salidas frente a mirar solo el cierre de cada vela"""
+    df, since, entry, side, stop, target = _synthetic_trades()
+    arrays = [df[column].to_numpy() for column in ('timestamp', 'open', 'high', 'low', 'close')]
+    close = arrays[4]
+    bar, code, price = first_exits(*arrays, since, stop, target, side)
+    # Solo cierre: open = high = low = close y salida al cierre (así chequeaban los bots)
+    close_bar, close_code, close_price = first_exits(arrays[0], close, close, close, close, since, stop, target, side,
+                                                     stop_slippage_bps=0.0)
+    both = (bar >= 0) & (close_bar >= 0)
+    earlier = (bar < close_bar) | ((bar >= 0) & (close_bar < 0))
+    pnl = np.nansum(side * (price / entry - 1))
+    close_pnl = np.nansum(side * (close_price / entry - 1))
+    print(f"🕯️ Intravela: {int((bar >= 0).sum())} salidas | solo cierre: {int((close_bar >= 0).sum())} | "
+          f"{int(earlier.sum())} salen antes | {int((code != close_code)[both].sum())} cambian de motivo")
+    print(f"   P&L sumado (retornos): intravela {pnl:+.4f} vs solo cierre {close_pnl:+.4f}")
+
+
+def run_benchmark(repeat=3):
+    """Vectorizado vs loop de Python vela por vela"""
+    import time
+
+    df, since, _, side, stop, target = _synthetic_trades()
+    arrays = [df[column].to_numpy() for column in ('timestamp', 'open', 'high', 'low', 'close')]
+    start = time.perf_counter()
+    first_exits_loop(*arrays, since, stop, target, side)
+    loop_ms = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        first_exits(*arrays, since, stop, target, side)
+    vector_ms = (time.perf_counter() - start) / repeat * 1000
+    print(f"⚡ {len(since)} posiciones x {len(df)} velas: loop {loop_ms:.1f} ms | vectorizado {vector_ms:.1f} ms "
+          f"(x{loop_ms / vector_ms:.0f})")
+
+
+if __name__ == "__main__":
+    check_equivalence()
+    compare_close_only()
+    run_benchmark()
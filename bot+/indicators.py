@@ -0,0 +1,581 @@
+#!/usr/bin/env python3
+"""
+📐 INDICADORES TÉCNICOS COMPARTIDOS (NUMPY / NUMBA)
+====================================================
+RSI, MACD, Bollinger, medias móviles, volatilidad, momentum, ROC, volumen
+y soporte/resistencia, calculados todos juntos sobre arrays float64
+contiguos. Reemplaza las dos copias con pandas (CloudMLBot y BotFinanciero)
+y deja explícitos los parámetros que antes diferían entre bots:
+
+    Bots ML:        momentum_period=5,  volume_window=10
+    BotFinanciero:  momentum_period=10, volume_window=20
+
+Dos motores con el mismo resultado:
+- 'numpy': ventanas con sliding_window_view (sin copias) y EWM por bloques.
+- 'numba': un solo recorrido fusionado compilado con JIT (si numba está
+  instalado). 'auto' usa numba cuando está disponible.
+
+Los kernels numpy trabajan sobre el último eje: con una matriz (símbolos x
+velas) calculan todo el universo de una vez (universe_features), y el
+resultado sale como tensor (símbolos, velas, features) listo para un
+predict_proba por lotes.
+
+python indicators.py  -> verifica equivalencia contra las fórmulas pandas
+                         originales y corre el microbenchmark.
+"""
+
+import time
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+# Orden de las filas que produce el kernel fusionado
+FEATURES = ('ma_5', 'ma_10', 'ma_20', 'ema_12', 'ema_26', 'macd', 'macd_signal', 'macd_histogram',
+            'rsi', 'bb_middle', 'bb_upper', 'bb_lower', 'bb_position', 'volatility', 'momentum',
+            'roc', 'volume_ma', 'volume_ratio', 'support', 'resistance')
+
+# Features del modelo de BotFinanciero, en el orden de prepare_ml_features
+FINANCIERO_FEATURES = ('rsi', 'macd', 'macd_histogram', 'bb_position', 'volume_ratio', 'momentum',
+                       'sma_10_gap', 'sma_20_gap', 'support_gap', 'resistance_gap')
+
+RSI_WINDOW = 14
+BB_WINDOW = 20
+BB_STDS = 2
+VOLATILITY_WINDOW = 10
+ROC_PERIOD = 10
+LEVELS_WINDOW = 20
+
+
+# ------------------------------------------------------------------ motor numpy
+
+def _rolling(x, window):
+    """Ventanas (..., n - window + 1, window) sobre el último eje como vista, sin copiar"""
+    return sliding_window_view(x, window, axis=-1)
+
+
+def _empty_like(x):
+    return np.full(x.shape, np.nan)
+
+
+def rolling_mean(x, window):
+    out = _empty_like(x)
+    if x.shape[-1] < window:
+        return out
+    if np.isnan(x).any():
+        # Un NaN solo debe anular las ventanas que lo contienen (la suma acumulada lo arrastraría)
+        out[..., window - 1:] = _rolling(x, window).mean(axis=-1)
+        return out
+    sums = np.cumsum(x, axis=-1)
+    out[..., window - 1] = sums[..., window - 1]
+    np.subtract(sums[..., window:], sums[..., :-window], out=out[..., window:])
+    out[..., window - 1:] /= window
+    return out
+
+
+def rolling_std(x, window):
+    """Desvío estándar muestral (ddof=1), como pandas rolling().std()"""
+    out = _empty_like(x)
+    if x.shape[-1] >= window:
+        out[..., window - 1:] = _rolling(x, window).std(axis=-1, ddof=1)
+    return out
+
+
+def rolling_min(x, window):
+    out = _empty_like(x)
+    if x.shape[-1] >= window:
+        out[..., window - 1:] = _rolling(x, window).min(axis=-1)
+    return out
+
+
+def rolling_max(x, window):
+    out = _empty_like(x)
+    if x.shape[-1] >= window:
+        out[..., window - 1:] = _rolling(x, window).max(axis=-1)
+    return out
+
+
+def _decayed_cumsum(x, decay):
+    """s_t = decay * s_(t-1) + x_t sobre el último eje, sin loop por vela.
+
+    Por bloques: s_(b+k) = d^k * (d*s_(b-1) + sum_j d^-j * x_(b+j)); el largo
+    del bloque mantiene d^-k lejos del overflow.
+    """
+    n = x.shape[-1]
+    out = np.empty(x.shape)
+    block = max(1, int(300 / -np.log(decay)))
+    carry = np.zeros(x.shape[:-1])
+    for start in range(0, n, block):
+        chunk = x[..., start:start + block]
+        k = np.arange(chunk.shape[-1])
+        out[..., start:start + chunk.shape[-1]] = decay ** k * (
+            (decay * carry)[..., None] + np.cumsum(chunk * decay ** -k, axis=-1))
+        carry = out[..., start + chunk.shape[-1] - 1]
+    return out
+
+
+def ewm_mean(x, span):
+    """Media exponencial con adjust=True e ignore_na=False (pandas ewm(span).mean()).
+
+    Numerador y suma de pesos son la misma recurrencia; un NaN no aporta valor
+    ni peso pero el tiempo sigue decayendo, como hace pandas.
+    """
+    decay = 1.0 - 2.0 / (span + 1.0)
+    valid = ~np.isnan(x)
+    if valid.all():
+        # Suma de pesos cerrada: (1 - d^(t+1)) / (1 - d)
+        weights = (1.0 - decay ** (np.arange(x.shape[-1]) + 1.0)) / (1.0 - decay)
+        return _decayed_cumsum(x, decay) / weights
+    weights = _decayed_cumsum(valid.astype(np.float64), decay)
+    values = _decayed_cumsum(np.where(valid, x, 0.0), decay)
+    with np.errstate(invalid='ignore'):
+        return np.where(weights > 0, values / weights, np.nan)
+
+
+def shift_ratio(x, period):
+    """x_t / x_(t-period) - 1 (momentum / pct_change)"""
+    out = _empty_like(x)
+    if x.shape[-1] > period:
+        out[..., period:] = x[..., period:] / x[..., :-period] - 1
+    return out
+
+
+def _numpy_indicators(close, volume, high, low, momentum_period, volume_window):
+    out = {}
+    with np.errstate(divide='ignore', invalid='ignore'):
+        out['ma_5'] = rolling_mean(close, 5)
+        out['ma_10'] = rolling_mean(close, 10)
+        out['ma_20'] = rolling_mean(close, BB_WINDOW)
+
+        ema_12 = ewm_mean(close, 12)
+        ema_26 = ewm_mean(close, 26)
+        out['ema_12'] = ema_12
+        out['ema_26'] = ema_26
+        out['macd'] = ema_12 - ema_26
+        out['macd_signal'] = ewm_mean(out['macd'], 9)
+        out['macd_histogram'] = out['macd'] - out['macd_signal']
+
+        # El primer delta es NaN y cuenta como 0 (igual que delta.where(delta > 0, 0))
+        delta = np.empty_like(close)
+        delta[..., 0] = 0.0
+        np.subtract(close[..., 1:], close[..., :-1], out=delta[..., 1:])
+        gain = rolling_mean(np.where(delta > 0, delta, 0.0), RSI_WINDOW)
+        loss = rolling_mean(np.where(delta < 0, -delta, 0.0), RSI_WINDOW)
+        out['rsi'] = 100 - 100 / (1 + gain / loss)
+
+        bb_std = rolling_std(close, BB_WINDOW)
+        out['bb_middle'] = out['ma_20']
+        out['bb_upper'] = out['ma_20'] + bb_std * BB_STDS
+        out['bb_lower'] = out['ma_20'] - bb_std * BB_STDS
+        out['bb_position'] = (close - out['bb_lower']) / (out['bb_upper'] - out['bb_lower'])
+
+        out['volatility'] = rolling_std(close, VOLATILITY_WINDOW)
+        out['momentum'] = shift_ratio(close, momentum_period)
+        out['roc'] = shift_ratio(close, ROC_PERIOD)
+
+        if volume is not None:
+            out['volume_ma'] = rolling_mean(volume, volume_window)
+            out['volume_ratio'] = volume / out['volume_ma']
+        if low is not None:
+            out['support'] = rolling_min(low, LEVELS_WINDOW)
+        if high is not None:
+            out['resistance'] = rolling_max(high, LEVELS_WINDOW)
+    return out
+
+
+# ------------------------------------------------------------------ motor fusionado
+
+def _window_mean(x, t, window):
+    total = 0.0
+    for i in range(t - window + 1, t + 1):
+        total += x[i]
+    return total / window
+
+
+def _window_std(x, t, window, mean):
+    total = 0.0
+    for i in range(t - window + 1, t + 1):
+        diff = x[i] - mean
+        total += diff * diff
+    return np.sqrt(total / (window - 1))
+
+
+def _fused_kernel(close, volume, high, low, momentum_period, volume_window, out):
+    """Todas las filas de FEATURES en un recorrido; out (len(FEATURES), n) viene lleno de NaN"""
+    n = close.shape[0]
+    d12 = 1.0 - 2.0 / 13.0
+    d26 = 1.0 - 2.0 / 27.0
+    d9 = 1.0 - 2.0 / 10.0
+    s12 = s26 = s9 = 0.0
+    w12 = w26 = w9 = 0.0
+    gains = np.zeros(n)
+    losses = np.zeros(n)
+
+    for t in range(n):
+        x = close[t]
+        # EMAs con adjust=True: numerador y suma de pesos recursivos
+        s12 = d12 * s12 + x
+        w12 = d12 * w12 + 1.0
+        s26 = d26 * s26 + x
+        w26 = d26 * w26 + 1.0
+        ema_12 = s12 / w12
+        ema_26 = s26 / w26
+        macd = ema_12 - ema_26
+        s9 = d9 * s9 + macd
+        w9 = d9 * w9 + 1.0
+        out[3, t] = ema_12
+        out[4, t] = ema_26
+        out[5, t] = macd
+        out[6, t] = s9 / w9
+        out[7, t] = macd - s9 / w9
+
+        if t > 0:
+            delta = x - close[t - 1]
+            if delta > 0:
+                gains[t] = delta
+            elif delta < 0:
+                losses[t] = -delta
+
+        if t >= 4:
+            out[0, t] = _window_mean(close, t, 5)
+        if t >= 9:
+            ma_10 = _window_mean(close, t, 10)
+            out[1, t] = ma_10
+            out[13, t] = _window_std(close, t, VOLATILITY_WINDOW, ma_10)
+        if t >= RSI_WINDOW - 1:
+            gain = _window_mean(gains, t, RSI_WINDOW)
+            loss = _window_mean(losses, t, RSI_WINDOW)
+            if loss != 0.0:
+                out[8, t] = 100.0 - 100.0 / (1.0 + gain / loss)
+            elif gain != 0.0:
+                out[8, t] = 100.0
+        if t >= BB_WINDOW - 1:
+            ma_20 = _window_mean(close, t, BB_WINDOW)
+            std_20 = _window_std(close, t, BB_WINDOW, ma_20)
+            upper = ma_20 + std_20 * BB_STDS
+            lower = ma_20 - std_20 * BB_STDS
+            out[2, t] = ma_20
+            out[9, t] = ma_20
+            out[10, t] = upper
+            out[11, t] = lower
+            if upper != lower:
+                out[12, t] = (x - lower) / (upper - lower)
+        if t >= momentum_period:
+            out[14, t] = x / close[t - momentum_period] - 1.0
+        if t >= ROC_PERIOD:
+            out[15, t] = x / close[t - ROC_PERIOD] - 1.0
+        if volume.shape[0] and t >= volume_window - 1:
+            volume_ma = _window_mean(volume, t, volume_window)
+            out[16, t] = volume_ma
+            if volume_ma != 0.0:
+                out[17, t] = volume[t] / volume_ma
+        if low.shape[0] and t >= LEVELS_WINDOW - 1:
+            level = low[t]
+            for i in range(t - LEVELS_WINDOW + 1, t):
+                level = min(level, low[i])
+            out[18, t] = level
+        if high.shape[0] and t >= LEVELS_WINDOW - 1:
+            level = high[t]
+            for i in range(t - LEVELS_WINDOW + 1, t):
+                level = max(level, high[i])
+            out[19, t] = level
+
+
+if NUMBA_AVAILABLE:
+    _window_mean = njit(cache=True)(_window_mean)
+    _window_std = njit(cache=True)(_window_std)
+    _fused_kernel = njit(cache=True)(_fused_kernel)
+
+
+def _fused_indicators(close, volume, high, low, momentum_period, volume_window):
+    empty = np.empty((close.shape[0], 0)) if close.ndim == 2 else np.empty(0)
+    out = np.full((len(FEATURES),) + close.shape, np.nan)
+    inputs = [close, empty if volume is None else volume, empty if high is None else high,
+              empty if low is None else low]
+    if close.ndim == 1:
+        _fused_kernel(*inputs, momentum_period, volume_window, out)
+    else:
+        # Matriz (símbolos x velas): un recorrido compilado por símbolo
+        for row in range(close.shape[0]):
+            _fused_kernel(*(values[row] for values in inputs), momentum_period, volume_window, out[:, row])
+    indicators = dict(zip(FEATURES, out))
+    # Misma semántica que pandas para divisiones por cero (inf en volume_ratio / bb_position)
+    if volume is not None:
+        with np.errstate(divide='ignore', invalid='ignore'):
+            indicators['volume_ratio'] = volume / indicators['volume_ma']
+    else:
+        del indicators['volume_ma'], indicators['volume_ratio']
+    if low is None:
+        del indicators['support']
+    if high is None:
+        del indicators['resistance']
+    return indicators
+
+
+# ------------------------------------------------------------------ API
+
+def _as_array(values):
+    if values is None:
+        return None
+    return np.ascontiguousarray(np.asarray(values, dtype=np.float64))
+
+
+def compute_indicators(close, volume=None, high=None, low=None, momentum_period=5, volume_window=10,
+                       engine='auto'):
+    """Todos los indicadores como {nombre: array float64 con la forma de close}.
+
+    close puede ser una serie (velas,) o una matriz (símbolos, velas); el
+    tiempo siempre es el último eje.
+    """
+    close = _as_array(close)
+    volume, high, low = _as_array(volume), _as_array(high), _as_array(low)
+    if engine == 'auto':
+        has_gaps = any(np.isnan(a).any() for a in (close, volume, high, low) if a is not None)
+        engine = 'numba' if NUMBA_AVAILABLE and not has_gaps else 'numpy'
+    if engine == 'numba':
+        if not NUMBA_AVAILABLE:
+            raise ImportError("numba no está instalado (pip install numba)")
+        return _fused_indicators(close, volume, high, low, momentum_period, volume_window)
+    return _numpy_indicators(close, volume, high, low, momentum_period, volume_window)
+
+
+def add_indicator_columns(df, momentum_period=5, volume_window=10, engine='auto'):
+    """Agregar al DataFrame de velas (close, volume) las columnas que usan los bots ML"""
+    indicators = compute_indicators(df['close'], df['volume'], momentum_period=momentum_period,
+                                    volume_window=volume_window, engine=engine)
+    for name in ('ma_5', 'ma_10', 'ma_20', 'rsi', 'macd', 'macd_signal', 'bb_middle', 'bb_upper',
+                 'bb_lower', 'bb_position', 'volatility', 'momentum', 'roc', 'volume_ma', 'volume_ratio'):
+        df[name] = indicators[name]
+    return df
+
+
+def technical_indicators(data, momentum_period=10, volume_window=20, engine='auto'):
+    """Indicadores de BotFinanciero como Series con el índice de `data` (Close, Volume, High, Low)"""
+    import pandas as pd
+
+    indicators = compute_indicators(data['Close'], data['Volume'], data['High'], data['Low'],
+                                    momentum_period=momentum_period, volume_window=volume_window,
+                                    engine=engine)
+    names = {'rsi': 'rsi', 'macd': 'macd', 'macd_signal': 'macd_signal', 'macd_histogram': 'macd_histogram',
+             'bb_upper': 'bb_upper', 'bb_lower': 'bb_lower', 'bb_middle': 'bb_middle', 'sma_10': 'ma_10',
+             'sma_20': 'ma_20', 'ema_12': 'ema_12', 'volume_sma': 'volume_ma', 'volume_ratio': 'volume_ratio',
+             'momentum': 'momentum', 'support': 'support', 'resistance': 'resistance'}
+    return {name: pd.Series(indicators[source], index=data.index, name=name)
+            for name, source in names.items()}
+
+
+def financiero_feature_tensor(close, indicators):
+    """Features de BotFinanciero (FINANCIERO_FEATURES) como tensor (..., velas, 10)"""
+    close = np.asarray(close, dtype=np.float64)
+    values = {name: np.asarray(series, dtype=np.float64) for name, series in indicators.items()}
+    sma_10 = values.get('sma_10', values.get('ma_10'))
+    sma_20 = values.get('sma_20', values.get('ma_20'))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        columns = [
+            values['rsi'],
+            values['macd'],
+            values['macd_histogram'],
+            (close - values['bb_lower']) / (values['bb_upper'] - values['bb_lower']),
+            values['volume_ratio'],
+            values['momentum'],
+            (close - sma_10) / sma_10,
+            (close - sma_20) / sma_20,
+            (close - values['support']) / close,
+            (values['resistance'] - close) / close
+        ]
+    return np.stack(columns, axis=-1)
+
+
+def align_universe(frames, columns=('Close', 'Volume', 'High', 'Low')):
+    """{símbolo: DataFrame OHLCV} -> (símbolos, índice unión, {columna: matriz símbolos x velas}).
+
+    Las velas que le faltan a un símbolo quedan en NaN; con el mismo
+    calendario (acciones de EE.UU.) no hay huecos y el resultado es idéntico
+    al cálculo por símbolo.
+    """
+    symbols = [symbol for symbol, frame in frames.items() if frame is not None and len(frame)]
+    if not symbols:
+        return [], None, {}
+    index = frames[symbols[0]].index
+    for symbol in symbols[1:]:
+        if not frames[symbol].index.equals(index):
+            index = index.union(frames[symbol].index)
+
+    matrices = {}
+    for column in columns:
+        matrix = np.empty((len(symbols), len(index)))
+        for row, symbol in enumerate(symbols):
+            series = frames[symbol][column]
+            if not series.index.equals(index):
+                series = series.reindex(index)
+            matrix[row] = series.to_numpy(dtype=np.float64)
+        matrices[column] = matrix
+    return symbols, index, matrices
+
+
+def universe_features(frames, momentum_period=10, volume_window=20, engine='auto', return_indicators=False):
+    """Indicadores de todo el universo en una pasada vectorizada por eje temporal.
+
+    Devuelve (símbolos, índice, tensor (símbolos, velas, 10), matriz de cierres)
+    y, con return_indicators, también {indicador: matriz símbolos x velas}.
+    tensor[:, -1, :] son las features actuales de cada símbolo para un solo
+    predict_proba por lotes.
+    """
+    symbols, index, matrices = align_universe(frames)
+    if not symbols:
+        empty = ([], None, np.empty((0, 0, len(FINANCIERO_FEATURES))), np.empty((0, 0)))
+        return empty + ({},) if return_indicators else empty
+    close = matrices['Close']
+    indicators = compute_indicators(close, matrices['Volume'], matrices['High'], matrices['Low'],
+                                    momentum_period=momentum_period, volume_window=volume_window,
+                                    engine=engine)
+    result = (symbols, index, financiero_feature_tensor(close, indicators), close)
+    return result + (indicators,) if return_indicators else result
+
+
+# ------------------------------------------------------------------ verificación y benchmark
+
+def reference_ml_features(df):
+    """Fórmulas pandas originales de CloudMLBot.calculate_advanced_features (referencia)"""
+    df = df.copy()
+    df['ma_5'] = df['close'].rolling(window=5).mean()
+    df['ma_10'] = df['close'].rolling(window=10).mean()
+    df['ma_20'] = df['close'].rolling(window=20).mean()
+    delta = df['close'].diff()
+    gain = (delta.where(delta > 0, 0)).rolling(window=14).mean()
+    loss = (-delta.where(delta < 0, 0)).rolling(window=14).mean()
+    df['rsi'] = 100 - (100 / (1 + gain / loss))
+    df['macd'] = df['close'].ewm(span=12).mean() - df['close'].ewm(span=26).mean()
+    df['macd_signal'] = df['macd'].ewm(span=9).mean()
+    df['bb_middle'] = df['close'].rolling(window=20).mean()
+    bb_std = df['close'].rolling(window=20).std()
+    df['bb_upper'] = df['bb_middle'] + (bb_std * 2)
+    df['bb_lower'] = df['bb_middle'] - (bb_std * 2)
+    df['bb_position'] = (df['close'] - df['bb_lower']) / (df['bb_upper'] - df['bb_lower'])
+    df['volatility'] = df['close'].rolling(window=10).std()
+    df['momentum'] = df['close'] / df['close'].shift(5) - 1
+    df['roc'] = df['close'].pct_change(periods=10)
+    df['volume_ma'] = df['volume'].rolling(window=10).mean()
+    df['volume_ratio'] = df['volume'] / df['volume_ma']
+    return df
+
+
+def reference_technical_indicators(data):
+    """Fórmulas pandas originales de BotFinanciero.calculate_technical_indicators (referencia)"""
+    indicators = {}
+    delta = data['Close'].diff()
+    gain = (delta.where(delta > 0, 0)).rolling(window=14).mean()
+    loss = (-delta.where(delta < 0, 0)).rolling(window=14).mean()
+    indicators['rsi'] = 100 - (100 / (1 + gain / loss))
+    exp1 = data['Close'].ewm(span=12).mean()
+    exp2 = data['Close'].ewm(span=26).mean()
+    indicators['macd'] = exp1 - exp2
+    indicators['macd_signal'] = indicators['macd'].ewm(span=9).mean()
+    indicators['macd_histogram'] = indicators['macd'] - indicators['macd_signal']
+    sma_20 = data['Close'].rolling(window=20).mean()
+    std_20 = data['Close'].rolling(window=20).std()
+    indicators['bb_upper'] = sma_20 + (std_20 * 2)
+    indicators['bb_lower'] = sma_20 - (std_20 * 2)
+    indicators['bb_middle'] = sma_20
+    indicators['sma_10'] = data['Close'].rolling(window=10).mean()
+    indicators['sma_20'] = data['Close'].rolling(window=20).mean()
+    indicators['ema_12'] = data['Close'].ewm(span=12).mean()
+    indicators['volume_sma'] = data['Volume'].rolling(window=20).mean()
+    indicators['volume_ratio'] = data['Volume'] / indicators['volume_sma']
+    indicators['momentum'] = data['Close'] / data['Close'].shift(10) - 1
+    indicators['support'] = data['Low'].rolling(window=20).min()
+    indicators['resistance'] = data['High'].rolling(window=20).max()
+    return indicators
+
+
+def synthetic_candles(n, seed=0, start_price=65000.0):
+    """Velas aleatorias reproducibles (close, volume, high, low) para pruebas"""
+    rng = np.random.default_rng(seed)
+    close = start_price * np.exp(np.cumsum(rng.normal(0, 0.002, n)))
+    spread = np.abs(rng.normal(0, 0.001, n)) * close
+    return close, rng.uniform(1, 50, n), close + spread, close - spread
+
+
+def check_equivalence(sizes=(20, 60, 500, 5000), rtol=1e-9, atol=1e-9):
+    """Comparar cada motor contra las fórmulas pandas; devuelve la lista de diferencias"""
+    import pandas as pd
+
+    engines = ['numpy'] + (['numba'] if NUMBA_AVAILABLE else [])
+    failures = []
+    for n in sizes:
+        close, volume, high, low = synthetic_candles(n, seed=n)
+        # Incluir tramos planos (RSI 0/0 y bandas de ancho cero)
+        close[n // 2:n // 2 + 16] = close[n // 2]
+        ml_ref = reference_ml_features(pd.DataFrame({'close': close, 'volume': volume}))
+        stock = pd.DataFrame({'Close': close, 'Volume': volume, 'High': high, 'Low': low})
+        stock_ref = reference_technical_indicators(stock)
+
+        for engine in engines:
+            ml = add_indicator_columns(pd.DataFrame({'close': close, 'volume': volume}), engine=engine)
+            pairs = [(f"ml/{col}", ml[col], ml_ref[col]) for col in ml.columns]
+            stock_out = technical_indicators(stock, engine=engine)
+            pairs += [(f"financiero/{name}", stock_out[name], stock_ref[name]) for name in stock_ref]
+            # Universo completo de una vez == cálculo por símbolo
+            tensor = universe_features({'A': stock, 'B': stock * 1.5}, engine=engine)[2]
+            single = financiero_feature_tensor(close, stock_ref)
+            pairs += [(f"universo/{FINANCIERO_FEATURES[i]}", pd.Series(tensor[0, :, i]), pd.Series(single[:, i]))
+                      for i in range(len(FINANCIERO_FEATURES))]
+            for name, got, expected in pairs:
+                if not np.allclose(got.to_numpy(dtype=float), expected.to_numpy(dtype=float),
+                                   rtol=rtol, atol=atol, equal_nan=True):
+                    failures.append(f"{engine} n={n} {name}")
+    return failures
+
+
+def _time_call(func, loops):
+    func()  # calentar (JIT / caches)
+    start = time.perf_counter()
+    for _ in range(loops):
+        func()
+    return (time.perf_counter() - start) / loops * 1e6
+
+
+def run_benchmark(sizes=(60, 500, 5000), repeat=200, universe_size=200):
+    """Tiempo por llamada (µs) de pandas vs cada motor, y del universo completo"""
+    import pandas as pd
+
+    engines = ['numpy'] + (['numba'] if NUMBA_AVAILABLE else [])
+    results = []
+    for n in sizes:
+        close, volume, high, low = synthetic_candles(n)
+        frame = pd.DataFrame({'close': close, 'volume': volume})
+        stock = pd.DataFrame({'Close': close, 'Volume': volume, 'High': high, 'Low': low})
+        loops = max(5, repeat * 60 // n)
+        candidates = [('pandas ml', lambda: reference_ml_features(frame)),
+                      ('pandas financiero', lambda: reference_technical_indicators(stock))]
+        for engine in engines:
+            candidates.append((f"{engine} (todos)", lambda e=engine: compute_indicators(
+                close, volume, high, low, engine=e)))
+        for name, func in candidates:
+            results.append((n, name, _time_call(func, loops)))
+
+    # Universo de acciones (velas diarias): una llamada por símbolo vs una sola matriz
+    for n in (60, 250):
+        close, volume, high, low = synthetic_candles(n)
+        stock = pd.DataFrame({'Close': close, 'Volume': volume, 'High': high, 'Low': low})
+        universe = {f"S{i}": stock * (1 + i / 100) for i in range(universe_size)}
+        results.append((n, f"{universe_size} símb. pandas", _time_call(
+            lambda: [reference_technical_indicators(f) for f in universe.values()], 3)))
+        results.append((n, f"{universe_size} símb. matriz", _time_call(
+            lambda: universe_features(universe, engine='numpy'), 3)))
+    return results
+
+
+if __name__ == "__main__":
+    print(f"📐 Motores: numpy{' + numba' if NUMBA_AVAILABLE else ' (numba no instalado)'}")
+    failures = check_equivalence()
+    if failures:
+        print(f"❌ Diferencias contra pandas: {', '.join(failures)}")
+        raise SystemExit(1)
+    print("✅ Equivalencia con las fórmulas pandas originales (ML y Financiero)")
+    for n, name, micros in run_benchmark():
+        print(f"   n={n:<5} {name:<20} {micros / 1000:>10.2f} ms")
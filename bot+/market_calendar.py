@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""
+📅 CALENDARIO DE LA BOLSA DE NUEVA YORK (NYSE / NASDAQ)
+======================================================
+BotFinanciero decidía si el mercado estaba abierto con 9:30-16:00 de lunes a
+viernes: analizaba y simulaba trades en feriados y no sabía de los cierres
+temprano (13:00). Acá las sesiones de varios años se calculan una vez con
+las reglas de la NYSE y se guardan como timestamps UTC:
+
+- Feriados: Año Nuevo, Martin Luther King, Presidentes, Viernes Santo,
+  Memorial Day, Juneteenth (desde 2022), Independencia, Labor Day, Acción de
+  Gracias y Navidad, con el traslado a viernes/lunes si caen en fin de
+  semana (Año Nuevo en sábado no se traslada), más cierres extraordinarios.
+- Medio día (cierre 13:00): 3 de julio, viernes después de Acción de Gracias
+  y 24 de diciembre cuando caen de lunes a jueves.
+
+is_open() guarda el tramo actual (sesión o cierre hasta la próxima apertura):
+mientras no se cruce un límite la respuesta sale del cache sin cálculo de
+fechas ni zonas horarias; al cruzarlo se busca el siguiente con bisect.
+
+Uso:
+    calendar = MarketCalendar()
+    calendar.is_open()                    # ahora
+    calendar.seconds_until_open()         # 0 si está abierto
+    calendar.session(date(2025, 11, 28))  # (apertura, cierre) o None si es feriado
+"""
+
+import time
+import bisect
+from datetime import date, datetime, timedelta
+from zoneinfo import ZoneInfo
+
+MARKET_TIMEZONE = 'America/New_York'
+OPEN_TIME = (9, 30)
+CLOSE_TIME = (16, 0)
+EARLY_CLOSE_TIME = (13, 0)
+
+# Años calculados alrededor del actual (se extiende solo si se consulta fuera)
+YEARS_BEFORE = 1
+YEARS_AFTER = 2
+
+# Cierres no regulares (duelo nacional, emergencias)
+SPECIAL_CLOSURES = {
+    date(2018, 12, 5),   # Funeral de George H. W. Bush
+    date(2025, 1, 9),    # Funeral de Jimmy Carter
+}
+
+
+def easter(year):
+    """Domingo de Pascua (algoritmo gregoriano anónimo)"""
+    a = year % 19
+    b, c = divmod(year, 100)
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month, day = divmod(h + l - 7 * m + 114, 31)
+    return date(year, month, day + 1)
+
+
+def nth_weekday(year, month, weekday, n):
+    """n-ésimo día de la semana del mes (n=-1: el último)"""
+    if n > 0:
+        first = date(year, month, 1)
+        return first + timedelta(days=(weekday - first.weekday()) % 7 + 7 * (n - 1))
+    last = date(year + month // 12, month % 12 + 1, 1) - timedelta(days=1)
+    return last - timedelta(days=(last.weekday() - weekday) % 7)
+
+
+def observed(day):
+    """Feriado fijo trasladado: sábado -> viernes, domingo -> lunes"""
+    if day.weekday() == 5:
+        return day - timedelta(days=1)
+    if day.weekday() == 6:
+        return day + timedelta(days=1)
+    return day
+
+
+def nyse_holidays(year):
+    """Días hábiles sin sesión en el año"""
+    holidays = {
+        nth_weekday(year, 1, 0, 3),    # Martin Luther King Jr.
+        nth_weekday(year, 2, 0, 3),    # Washington's Birthday
+        easter(year) - timedelta(days=2),  # Viernes Santo
+        nth_weekday(year, 5, 0, -1),   # Memorial Day
+        observed(date(year, 7, 4)),    # Independencia
+        nth_weekday(year, 9, 0, 1),    # Labor Day
+        nth_weekday(year, 11, 3, 4),   # Acción de Gracias
+        observed(date(year, 12, 25)),  # Navidad
+    }
+    # Año Nuevo en sábado no cierra el viernes 31 anterior
+    if date(year, 1, 1).weekday() != 5:
+        holidays.add(observed(date(year, 1, 1)))
+    if year >= 2022:
+        holidays.add(observed(date(year, 6, 19)))  # Juneteenth
+    holidays.update(day for day in SPECIAL_CLOSURES if day.year == year)
+    return {day for day in holidays if day.weekday() < 5}
+
+
+def nyse_early_closes(year):
+    """Días con cierre a las 13:00"""
+    days = {nth_weekday(year, 11, 3, 4) + timedelta(days=1)}  # Viernes después de Acción de Gracias
+    for day in (date(year, 7, 3), date(year, 12, 24)):
+        if day.weekday() < 4:
+            days.add(day)
+    return days - nyse_holidays(year)
+
+
+class MarketCalendar:
+    """Sesiones precalculadas con consulta cacheada del estado actual"""
+
+    def __init__(self, timezone=MARKET_TIMEZONE, open_time=OPEN_TIME, close_time=CLOSE_TIME,
+                 early_close_time=EARLY_CLOSE_TIME, years=None):
+        self.timezone = ZoneInfo(timezone)
+        self.open_time = open_time
+        self.close_time = close_time
+        self.early_close_time = early_close_time
+        self.sessions = {}
+        self.opens = []
+        self.closes = []
+        self.years = set()
+        # Tramo cacheado: [desde, hasta) con el mismo estado
+        self._segment = (0.0, 0.0, False, None)
+        if years is None:
+            current = date.today().year
+            years = range(current - YEARS_BEFORE, current + YEARS_AFTER + 1)
+        self._build(years)
+
+    def _build(self, years):
+        """Calcular las sesiones de los años pedidos (timestamps UTC ordenados)"""
+        for year in set(years) - self.years:
+            holidays = nyse_holidays(year)
+            early_closes = nyse_early_closes(year)
+            day = date(year, 1, 1)
+            while day.year == year:
+                if day.weekday() < 5 and day not in holidays:
+                    close_time = self.early_close_time if day in early_closes else self.close_time
+                    self.sessions[day] = (self._timestamp(day, self.open_time), self._timestamp(day, close_time))
+                day += timedelta(days=1)
+            self.years.add(year)
+        ordered = sorted(self.sessions.values())
+        self.opens = [session_open for session_open, _ in ordered]
+        self.closes = [session_close for _, session_close in ordered]
+        self._segment = (0.0, 0.0, False, None)
+
+    def _timestamp(self, day, hour_minute):
+        return datetime(day.year, day.month, day.day, *hour_minute, tzinfo=self.timezone).timestamp()
+
+    def _ensure(self, when):
+        year = datetime.fromtimestamp(when, self.timezone).year
+        if year not in self.years or year + 1 not in self.years:
+            self._build(range(min(self.years | {year}), year + 2))
+
+    def _resolve(self, when):
+        """Tramo que contiene when: (desde, hasta, abierto, próxima apertura)"""
+        self._ensure(when)
+        index = bisect.bisect_right(self.opens, when) - 1
+        if index >= 0 and when < self.closes[index]:
+            next_open = self.opens[index + 1] if index + 1 < len(self.opens) else None
+            return self.opens[index], self.closes[index], True, next_open
+        start = self.closes[index] if index >= 0 else float('-inf')
+        next_open = self.opens[index + 1]
+        return start, next_open, False, next_open
+
+    def _current(self, when):
+        start, end, is_open, next_open = self._segment
+        if not start <= when < end:
+            self._segment = self._resolve(when)
+            start, end, is_open, next_open = self._segment
+        return is_open, end, next_open
+
+    @staticmethod
+    def _epoch(when):
+        if when is None:
+            return time.time()
+        if isinstance(when, datetime):
+            return when.timestamp()
+        return float(when)
+
+    def is_open(self, when=None):
+        """¿Hay sesión regular en ese momento? (epoch, datetime con zona o None = ahora)"""
+        return self._current(self._epoch(when))[0]
+
+    def next_open(self, when=None):
+        """Próxima apertura posterior (datetime en la zona del mercado)"""
+        is_open, end, next_open = self._current(self._epoch(when))
+        return datetime.fromtimestamp(next_open, self.timezone)
+
+    def next_close(self, when=None):
+        """Cierre de la sesión en curso, o de la próxima si está cerrado"""
+        when = self._epoch(when)
+        is_open, end, next_open = self._current(when)
+        if is_open:
+            return datetime.fromtimestamp(end, self.timezone)
+        return datetime.fromtimestamp(self.closes[bisect.bisect_right(self.opens, next_open) - 1], self.timezone)
+
+    def seconds_until_open(self, when=None):
+        """0 si está abierto; si no, segundos hasta la próxima apertura"""
+        when = self._epoch(when)
+        is_open, end, next_open = self._current(when)
+        return 0.0 if is_open else max(0.0, end - when)
+
+    def session(self, day):
+        """(apertura, cierre) del día en la zona del mercado, o None si no hay sesión"""
+        self._ensure(datetime(day.year, day.month, day.day, 12, tzinfo=self.timezone).timestamp())
+        session = self.sessions.get(day)
+        if session is None:
+            return None
+        return tuple(datetime.fromtimestamp(moment, self.timezone) for moment in session)
+
+
+def _weekday_hours_open(timezone):
+    """La verificación anterior de BotFinanciero (para comparar tiempos)"""
+    now = datetime.now(timezone)
+    if now.weekday() >= 5:
+        return False
+    market_open = now.replace(hour=9, minute=30, second=0, microsecond=0)
+    market_close = now.replace(hour=16, minute=0, second=0, microsecond=0)
+    return market_open <= now <= market_close
+
+
+def check_known_sessions(calendar):
+    """Feriados y medios días publicados por la NYSE"""
+    known_holidays = [date(2024, 1, 1), date(2024, 3, 29), date(2024, 6, 19), date(2024, 7, 4), date(2024, 11, 28),
+                      date(2025, 1, 9), date(2025, 4, 18), date(2025, 7, 4), date(2025, 12, 25),
+                      date(2026, 1, 19), date(2026, 4, 3), date(2026, 7, 3), date(2026, 9, 7), date(2027, 6, 18),
+                      date(2027, 12, 24)]
+    known_early_closes = [date(2024, 7, 3), date(2024, 11, 29), date(2024, 12, 24), date(2025, 7, 3),
+                          date(2025, 11, 28), date(2025, 12, 24), date(2026, 11, 27), date(2026, 12, 24)]
+    for day in known_holidays:
+        assert calendar.session(day) is None, day
+    # Año Nuevo 2022 cayó sábado: el viernes 31 hubo sesión
+    assert calendar.session(date(2021, 12, 31)) is not None
+    for day in known_early_closes:
+        assert calendar.session(day)[1].hour == 13, day
+    assert calendar.session(date(2026, 7, 2))[1].hour == 16
+    print(f"✅ {len(known_holidays)} feriados y {len(known_early_closes)} medios días conocidos OK")
+
+
+if __name__ == "__main__":
+    calendar = MarketCalendar()
+    check_known_sessions(calendar)
+
+    year = date.today().year
+    print(f"📅 Feriados NYSE {year}: {', '.join(day.strftime('%d/%m') for day in sorted(nyse_holidays(year)))}")
+    print(f"🕐 Cierre 13:00 en {year}: {', '.join(day.strftime('%d/%m') for day in sorted(nyse_early_closes(year)))}")
+    state = "ABIERTO" if calendar.is_open() else f"cerrado, abre {calendar.next_open():%a %d/%m %H:%M %Z}"
+    print(f"📈 Mercado ahora: {state}")
+
+    loops = 100000
+    timezone = ZoneInfo(MARKET_TIMEZONE)
+    start = time.perf_counter()
+    for _ in range(loops):
+        _weekday_hours_open(timezone)
+    naive_us = (time.perf_counter() - start) / loops * 1e6
+    start = time.perf_counter()
+    for _ in range(loops):
+        calendar.is_open()
+    cached_us = (time.perf_counter() - start) / loops * 1e6
+    print(f"⚡ is_open: datetime con zona por llamada {naive_us:.2f} µs | calendario cacheado {cached_us:.2f} µs")
@@ -0,0 +1,332 @@
+#!/usr/bin/env python3
+"""
+🛰️ SIDECAR DE DATOS DE MERCADO (UN FETCH PARA TODOS LOS BOTS)
+==============================================================
+Cuando varios bots corren en la misma VM sobre BTCUSDT, cada uno pide las
+mismas velas a Binance por su cuenta. El sidecar es un proceso local que
+pide cada (símbolo, intervalo) una sola vez y lo sirve a todos los bots por
+un socket Unix:
+
+- Caché con antigüedad máxima por tipo de dato (velas / ticker).
+- Single-flight: si varios bots piden la misma clave a la vez, solo uno
+  llega a Binance y el resto espera ese resultado.
+- Las velas se piden con el mayor límite que algún bot pidió en los últimos
+  LIMIT_DECAY_SECONDS y a cada uno se le entrega su porción (un pedido grande
+  aislado, como el entrenamiento del bot ML, no encarece los refetch).
+- Cada fetch de velas también se publica en un ring de memoria compartida
+  (candle_ring.py) que los bots leen sin pasar por el socket.
+
+El tráfico hacia Binance crece con los símbolos distintos, no con
+símbolos x bots. Si el sidecar no está corriendo, los bots piden directo.
+
+Uso:
+    python market_data_sidecar.py                 # iniciar el sidecar
+    python market_data_sidecar.py --status        # estadísticas
+    client = MarketDataClient(RateLimitedClient(Client(...)))   # en el bot
+"""
+
+import os
+import json
+import time
+import socket
+import argparse
+import threading
+import socketserver
+
+from rate_limiter import RateLimitedClient
+from candle_ring import CandleRing, klines_to_rows
+
+DEFAULT_SOCKET = os.getenv('MARKET_DATA_SOCKET', '/tmp/botia_market_data.sock')
+
+# Antigüedad máxima de lo cacheado (segundos)
+KLINES_MAX_AGE = 15.0
+TICKER_MAX_AGE = 2.0
+
+# Un límite de velas deja de contar para los refetch si nadie lo volvió a pedir en este tiempo
+LIMIT_DECAY_SECONDS = 120.0
+
+# Tras una falla de conexión, los bots piden directo durante este tiempo antes de reintentar
+RECONNECT_SECONDS = 30
+
+INTERVAL_SECONDS = {'1m': 60, '3m': 180, '5m': 300, '15m': 900, '30m': 1800,
+                    '1h': 3600, '2h': 7200, '4h': 14400, '6h': 21600, '12h': 43200, '1d': 86400}
+
+
+class MarketDataError(Exception):
+    """Error de Binance reportado por el sidecar (conserva status y Retry-After)"""
+
+    def __init__(self, message, status_code=None, retry_after=None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class _CacheEntry:
+    def __init__(self):
+        # El lock por clave es el single-flight: quien llega mientras otro pide, espera y reutiliza
+        self.lock = threading.Lock()
+        self.data = None
+        self.fetched_at = 0.0
+        self.limit = 0
+        self.requested = {}  # límite pedido -> última vez que se pidió
+
+
+class MarketDataCache:
+    """Caché por clave con single-flight sobre el cliente de Binance"""
+
+    def __init__(self, client, klines_max_age=KLINES_MAX_AGE, ticker_max_age=TICKER_MAX_AGE,
+                 limit_decay_seconds=LIMIT_DECAY_SECONDS):
+        self.client = client
+        self.klines_max_age = klines_max_age
+        self.ticker_max_age = ticker_max_age
+        self.limit_decay_seconds = limit_decay_seconds
+        self._entries = {}
+        self._entries_lock = threading.Lock()
+        self.rings = {}
+        self.stats = {'requests': 0, 'hits': 0, 'upstream_calls': 0, 'upstream_errors': 0}
+
+    def _entry(self, key):
+        with self._entries_lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._entries[key] = _CacheEntry()
+            return entry
+
+    def get_klines(self, symbol, interval, limit=500, **_):
+        limit = int(limit)
+        # Nunca más viejo que una fracción de la vela (la última vela está en formación)
+        max_age = min(self.klines_max_age, INTERVAL_SECONDS.get(interval, 60) / 4)
+        entry = self._entry(('klines', symbol, interval))
+        self.stats['requests'] += 1
+        with entry.lock:
+            now = time.time()
+            entry.requested[limit] = now
+            entry.requested = {size: at for size, at in entry.requested.items()
+                               if now - at <= self.limit_decay_seconds}
+            fresh = now - entry.fetched_at <= max_age and entry.limit >= limit
+            if not fresh:
+                # Límite del refetch: lo que pidieron los bots hace poco, no el máximo histórico
+                entry.limit = max(entry.requested)
+                self._fetch(entry, self.client.get_klines, symbol=symbol, interval=interval, limit=entry.limit)
+                self._publish(symbol, interval, entry.data)
+            else:
+                self.stats['hits'] += 1
+            return entry.data[-limit:], time.time() - entry.fetched_at
+
+    def get_symbol_ticker(self, symbol, **_):
+        entry = self._entry(('ticker', symbol))
+        self.stats['requests'] += 1
+        with entry.lock:
+            if time.time() - entry.fetched_at > self.ticker_max_age:
+                self._fetch(entry, self.client.get_symbol_ticker, symbol=symbol)
+            else:
+                self.stats['hits'] += 1
+            return entry.data, time.time() - entry.fetched_at
+
+    def _fetch(self, entry, method, **kwargs):
+        self.stats['upstream_calls'] += 1
+        try:
+            entry.data = method(**kwargs)
+        except Exception:
+            self.stats['upstream_errors'] += 1
+            raise
+        entry.fetched_at = time.time()
+
+    def _publish(self, symbol, interval, klines):
+        # El sidecar es el único escritor de cada ring (se llama con el lock de la clave tomado)
+        ring = self.rings.get((symbol, interval))
+        if ring is None:
+            ring = self.rings[(symbol, interval)] = CandleRing.create(symbol, interval)
+        ring.write(klines_to_rows(klines))
+
+    def close(self):
+        """Liberar los rings de memoria compartida"""
+        for ring in self.rings.values():
+            ring.close()
+        self.rings.clear()
+
+    def snapshot(self):
+        with self._entries_lock:
+            keys = ['/'.join(key) for key in self._entries]
+        hit_rate = self.stats['hits'] / self.stats['requests'] if self.stats['requests'] else 0.0
+        return {**self.stats, 'hit_rate': round(hit_rate, 3), 'keys': keys}
+
+
+def make_handler(cache):
+    """Handler de líneas JSON: {"method": ..., "params": {...}} -> {"ok": ..., "result": ...}"""
+
+    methods = {
+        'get_klines': cache.get_klines,
+        'get_symbol_ticker': cache.get_symbol_ticker,
+    }
+
+    class SidecarHandler(socketserver.StreamRequestHandler):
+        def handle(self):
+            for line in self.rfile:
+                try:
+                    request = json.loads(line)
+                    if request.get('method') == 'status':
+                        response = {'ok': True, 'result': cache.snapshot()}
+                    else:
+                        result, age = methods[request['method']](**request.get('params', {}))
+                        response = {'ok': True, 'result': result, 'age': round(age, 3)}
+                except KeyError as e:
+                    response = {'ok': False, 'error': f"Método o parámetro inválido: {e}"}
+                except Exception as e:
+                    status = getattr(e, 'status_code', None)
+                    retry_after = getattr(e, 'retry_after', None)
+                    headers = getattr(getattr(e, 'response', None), 'headers', None)
+                    if retry_after is None and headers:
+                        retry_after = headers.get('Retry-After')
+                    response = {'ok': False, 'error': str(e), 'status': status, 'retry_after': retry_after}
+                self.wfile.write(json.dumps(response, separators=(',', ':')).encode('utf-8') + b"\n")
+                self.wfile.flush()
+
+    return SidecarHandler
+
+
+def _socket_in_use(path):
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(path)
+        return True
+    except OSError:
+        return False
+    finally:
+        sock.close()
+
+
+def start_sidecar(client, socket_path=DEFAULT_SOCKET, **cache_options):
+    """Iniciar el sidecar en un hilo daemon; devuelve (server, cache)"""
+    if os.path.exists(socket_path):
+        if _socket_in_use(socket_path):
+            raise OSError(f"Ya hay un sidecar escuchando en {socket_path}")
+        os.unlink(socket_path)
+
+    cache = MarketDataCache(client, **cache_options)
+    server = socketserver.ThreadingUnixStreamServer(socket_path, make_handler(cache))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='market-data-sidecar', daemon=True).start()
+    return server, cache
+
+
+class MarketDataClient:
+    """Cliente para los bots: velas y ticker por el sidecar, el resto directo.
+
+    Si el sidecar no responde, pide directo al cliente envuelto y vuelve a
+    probar el sidecar pasados RECONNECT_SECONDS.
+    """
+
+    def __init__(self, client, socket_path=DEFAULT_SOCKET, timeout=30.0, log=print):
+        self.client = client
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self.log = log
+        self._sock = None
+        self._reader = None
+        self._lock = threading.Lock()
+        self._retry_at = 0.0
+        self.stats = {'sidecar_calls': 0, 'direct_calls': 0}
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+    def get_klines(self, **params):
+        return self._call('get_klines', params)
+
+    def get_symbol_ticker(self, **params):
+        return self._call('get_symbol_ticker', params)
+
+    def _call(self, method, params):
+        if time.time() >= self._retry_at:
+            try:
+                response = self._request({'method': method, 'params': params})
+            except OSError as e:
+                self._disconnect()
+                self._retry_at = time.time() + RECONNECT_SECONDS
+                if os.path.exists(self.socket_path):
+                    self.log(f"⚠️  Sidecar de datos no disponible ({e}): pidiendo directo a Binance")
+            else:
+                self.stats['sidecar_calls'] += 1
+                if not response['ok']:
+                    raise MarketDataError(response['error'], response.get('status'), response.get('retry_after'))
+                return response['result']
+
+        self.stats['direct_calls'] += 1
+        return getattr(self.client, method)(**params)
+
+    def _request(self, request):
+        with self._lock:
+            if self._sock is None:
+                sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                sock.settimeout(self.timeout)
+                try:
+                    sock.connect(self.socket_path)
+                except OSError:
+                    sock.close()
+                    raise
+                self._sock = sock
+                self._reader = sock.makefile('rb')
+            self._sock.sendall(json.dumps(request, separators=(',', ':')).encode('utf-8') + b"\n")
+            line = self._reader.readline()
+            if not line:
+                raise ConnectionResetError("el sidecar cerró la conexión")
+            return json.loads(line)
+
+    def _disconnect(self):
+        with self._lock:
+            if self._sock is not None:
+                try:
+                    self._reader.close()
+                    self._sock.close()
+                except OSError:
+                    pass
+            self._sock = None
+            self._reader = None
+
+    def snapshot(self):
+        """Estado del cliente (para métricas)"""
+        snapshot = self.client.snapshot() if hasattr(self.client, 'snapshot') else {}
+        return {**snapshot, **self.stats}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sidecar local de datos de mercado de Binance")
+    parser.add_argument('--socket', default=DEFAULT_SOCKET)
+    parser.add_argument('--klines-max-age', type=float, default=KLINES_MAX_AGE)
+    parser.add_argument('--ticker-max-age', type=float, default=TICKER_MAX_AGE)
+    parser.add_argument('--status', action='store_true', help="Mostrar estadísticas del sidecar en ejecución")
+    args = parser.parse_args()
+
+    if args.status:
+        status = MarketDataClient(None, args.socket)._request({'method': 'status'})
+        print(json.dumps(status['result'], indent=2))
+        return
+
+    from binance.client import Client
+
+    # Solo endpoints públicos: no hacen falta claves
+    if os.getenv('BINANCE_API_URL'):
+        Client.API_URL = os.getenv('BINANCE_API_URL')
+    client = RateLimitedClient(Client(), log=print)
+    server, cache = start_sidecar(client, args.socket, klines_max_age=args.klines_max_age,
+                                  ticker_max_age=args.ticker_max_age)
+    print(f"🛰️  Sidecar de datos escuchando en {args.socket}")
+    try:
+        while True:
+            time.sleep(300)
+            stats = cache.snapshot()
+            print(f"📊 Requests: {stats['requests']} | A Binance: {stats['upstream_calls']} | "
+                  f"Aciertos: {stats['hit_rate'] * 100:.1f}% | Peso: {client.scheduler.snapshot()['used_weight']}")
+    except KeyboardInterrupt:
+        print("🛑 Sidecar detenido")
+    finally:
+        server.shutdown()
+        server.server_close()
+        cache.close()
+        if os.path.exists(args.socket):
+            os.unlink(args.socket)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+📡 SERVIDOR DE MÉTRICAS EN VIVO
+================================
+Expone el estado actual de cada bot por HTTP local (JSON) para que el
+monitoreo sea una lectura barata en lugar de recorrer logs crecientes.
+
+Endpoints:
+    GET /metrics  -> snapshot completo del estado del bot
+    GET /health   -> estado resumido y antigüedad de la última actualización
+"""
+
+import os
+import json
+import time
+import datetime
+import threading
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Solo escuchar en localhost: las métricas no deben quedar expuestas a internet
+DEFAULT_HOST = '127.0.0.1'
+
+# Puerto por defecto de cada bot (se puede sobreescribir con METRICS_PORT_<BOT>)
+METRICS_PORTS = {
+    'basic': 8701,
+    'basic_real': 8702,
+    'ml': 8711,
+    'ml_real': 8712,
+    'financiero': 8721
+}
+
+
+def get_metrics_port(bot_key):
+    """Obtener puerto de métricas para un bot"""
+    env_value = os.getenv(f"METRICS_PORT_{bot_key.upper()}")
+    if env_value:
+        return int(env_value)
+    return METRICS_PORTS.get(bot_key, 8700)
+
+
+class BotMetrics:
+    """Estado en memoria de un bot, actualizado en O(1) y leído por HTTP"""
+
+    def __init__(self, bot_name):
+        self.bot_name = bot_name
+        self.start_time = time.time()
+        self._lock = threading.Lock()
+        self._server = None
+        self._state = {
+            'balance': None,
+            'position': None,
+            'last_price': None,
+            'last_prediction': None,
+            'last_confidence': None,
+            'iteration': 0,
+            'total_trades': 0,
+            'winning_trades': 0
+        }
+        self._errors = {}
+        self._latencies = {}
+        self._last_update = time.time()
+
+    def update(self, **fields):
+        """Actualizar uno o varios campos del estado"""
+        with self._lock:
+            self._state.update(fields)
+            self._last_update = time.time()
+
+    def increment(self, field, amount=1):
+        """Incrementar un contador del estado"""
+        with self._lock:
+            self._state[field] = (self._state.get(field) or 0) + amount
+            self._last_update = time.time()
+
+    def record_error(self, kind):
+        """Contar un error por tipo"""
+        with self._lock:
+            self._errors[kind] = self._errors.get(kind, 0) + 1
+            self._last_update = time.time()
+
+    def record_latency(self, stage, seconds):
+        """Registrar latencia de una etapa (última, promedio y máxima)"""
+        ms = seconds * 1000
+        with self._lock:
+            entry = self._latencies.get(stage)
+            if entry is None:
+                entry = {'count': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'last_ms': 0.0}
+                self._latencies[stage] = entry
+            entry['count'] += 1
+            entry['total_ms'] += ms
+            entry['last_ms'] = ms
+            if ms > entry['max_ms']:
+                entry['max_ms'] = ms
+
+    @contextmanager
+    def stage(self, name):
+        """Medir la duración de un bloque: with metrics.stage('prediction'): ..."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record_latency(name, time.perf_counter() - start)
+
+    def snapshot(self):
+        """Copia consistente del estado actual"""
+        now = time.time()
+        with self._lock:
+            latencies = {
+                stage: {
+                    'count': entry['count'],
+                    'last_ms': round(entry['last_ms'], 3),
+                    'avg_ms': round(entry['total_ms'] / entry['count'], 3),
+                    'max_ms': round(entry['max_ms'], 3)
+                }
+                for stage, entry in self._latencies.items()
+            }
+            return {
+                'bot': self.bot_name,
+                'pid': os.getpid(),
+                'uptime_seconds': round(now - self.start_time, 1),
+                'last_update_age_seconds': round(now - self._last_update, 1),
+                'state': dict(self._state),
+                'errors': dict(self._errors),
+                'latencies': latencies
+            }
+
+    def start_server(self, port, host=DEFAULT_HOST):
+        """Iniciar servidor HTTP de métricas en un hilo daemon"""
+        metrics = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.startswith('/metrics'):
+                    body = metrics.snapshot()
+                elif self.path.startswith('/health'):
+                    snapshot = metrics.snapshot()
+                    body = {
+                        'bot': snapshot['bot'],
+                        'status': 'ok',
+                        'uptime_seconds': snapshot['uptime_seconds'],
+                        'last_update_age_seconds': snapshot['last_update_age_seconds']
+                    }
+                else:
+                    self.send_error(404)
+                    return
+
+                payload = json.dumps(body, default=_json_default).encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                # No ensuciar la consola del bot con cada consulta
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), MetricsHandler)
+        self._server.daemon_threads = True
+        thread = threading.Thread(target=self._server.serve_forever,
+                                  name=f"metrics-{self.bot_name}", daemon=True)
+        thread.start()
+        return self._server
+
+    def stop_server(self):
+        """Detener servidor HTTP de métricas"""
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+def _json_default(value):
+    """Serializar fechas y tipos numpy en el JSON de métricas"""
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    if isinstance(value, datetime.timedelta):
+        return value.total_seconds()
+    if hasattr(value, 'item'):
+        return value.item()
+    return str(value)
+
+
+if __name__ == "__main__":
+    # Consulta rápida: python metrics_server.py [bot]
+    import sys
+    from urllib.request import urlopen
+
+    bot_keys = sys.argv[1:] or list(METRICS_PORTS)
+    for key in bot_keys:
+        port = get_metrics_port(key)
+        try:
+            with urlopen(f"http://{DEFAULT_HOST}:{port}/metrics", timeout=2) as response:
+                print(json.dumps(json.loads(response.read()), indent=2))
+        except OSError:
+            print(f"⚪ {key}: sin métricas en puerto {port}")
@@ -0,0 +1,640 @@
+#!/usr/bin/env python3
+"""
+🧠 MODELOS INTERCAMBIABLES PARA LOS BOTS (BACKENDS)
+====================================================
+Una sola interfaz para el modelo de BotFinanciero y el de CloudMLBot:
+
+    model = make_backend('forest')          # o 'gbt', 'logistic', 'heuristic'
+    model.fit(X, y)
+    model.predict_proba(X)                  # (n, 2) como sklearn
+    score, confidence = model.signal(X)     # puntaje con signo y confianza por fila
+
+Backends:
+- 'forest':    RandomForestClassifier (el modelo actual de BotFinanciero).
+- 'gbt':       GradientBoostingClassifier.
+- 'logistic':  LogisticRegression.
+- 'heuristic': el puntaje ponderado de CloudMLBot (no se entrena). Está en
+  dos versiones con el mismo resultado bit a bit: weighted_score (una vela,
+  la de referencia) y weighted_scores (todo el historial con np.where, para
+  backtests y calibración).
+
+Los ensambles de árboles entrenados se compilan a arrays planos (feature,
+umbral, hijos, valor de hoja) y se recorren sin pasar por sklearn: con
+numba el recorrido es un loop compilado (microsegundos por fila); sin numba
+se recorren todos los árboles a la vez con numpy. El resultado es el mismo
+que predict_proba de sklearn.
+
+python ml_models.py  -> verifica los árboles compilados contra sklearn y el
+                        puntaje vectorizado contra el escalar, y compara
+                        latencia y accuracy de cada backend.
+"""
+
+import time
+from abc import ABC, abstractmethod
+
+import numpy as np
+
+from indicators import NUMBA_AVAILABLE
+
+if NUMBA_AVAILABLE:
+    from numba import njit
+
+BACKENDS = ('forest', 'gbt', 'logistic', 'heuristic')
+
+# Columnas que usa el puntaje ponderado de CloudMLBot (salen de add_indicator_columns)
+HEURISTIC_FEATURES = ('ma_5', 'ma_10', 'ma_20', 'rsi', 'macd', 'macd_signal', 'bb_middle', 'bb_upper',
+                      'bb_lower', 'bb_position', 'momentum', 'volume_ratio')
+
+# Features estacionarias para los backends entrenados de CloudMLBot (columnas de add_indicator_columns)
+ML_SIGNAL_FEATURES = ('rsi', 'macd', 'macd_signal', 'bb_position', 'volatility', 'momentum',
+                      'roc', 'volume_ratio')
+
+# Sin numba, el recorrido numpy solo le gana a sklearn en lotes chicos (recorre siempre la profundidad máxima)
+COMPILED_NUMPY_MAX_ROWS = 32
+
+
+# ------------------------------------------------------------------ árboles compilados
+
+def _leaf_values_numpy(X, feature, threshold, left, right, value, roots, depth):
+    # Todas las filas x todos los árboles a la vez; las hojas apuntan a sí mismas
+    rows = np.arange(X.shape[0])[:, None]
+    node = np.repeat(roots[None, :], X.shape[0], axis=0)
+    for _ in range(depth):
+        go_left = X[rows, feature[node]] <= threshold[node]
+        node = np.where(go_left, left[node], right[node])
+    return value[node].sum(axis=1)
+
+
+def _leaf_values_kernel(X, feature, threshold, left, right, value, roots, out):
+    for i in range(X.shape[0]):
+        total = 0.0
+        for r in range(roots.shape[0]):
+            node = roots[r]
+            while left[node] != node:
+                if X[i, feature[node]] <= threshold[node]:
+                    node = left[node]
+                else:
+                    node = right[node]
+            total += value[node]
+        out[i] = total
+
+
+if NUMBA_AVAILABLE:
+    _leaf_values_kernel = njit(cache=True)(_leaf_values_kernel)
+
+
+class CompiledTrees:
+    """Ensamble de árboles en arrays planos: proba = link(bias + scale * suma de hojas)"""
+
+    def __init__(self, feature, threshold, left, right, value, roots, depth, bias=0.0, scale=1.0,
+                 link='identity', engine='auto'):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.roots = roots
+        self.depth = depth
+        self.bias = bias
+        self.scale = scale
+        self.link = link
+        self.engine = 'numba' if engine == 'auto' and NUMBA_AVAILABLE else engine
+        if self.engine == 'auto':
+            self.engine = 'numpy'
+
+    @classmethod
+    def from_estimator(cls, estimator, engine='auto'):
+        """Compilar un RandomForestClassifier o GradientBoostingClassifier binario ya entrenado"""
+        if hasattr(estimator, 'estimators_') and hasattr(estimator, 'learning_rate'):
+            trees = [stage[0] for stage in estimator.estimators_]
+            leaf = lambda tree: tree.tree_.value[:, 0, 0]
+            scale, link = estimator.learning_rate, 'logistic'
+        elif hasattr(estimator, 'estimators_'):
+            trees = list(estimator.estimators_)
+            # Probabilidad de la clase 1 en cada hoja (normalizada como en predict_proba)
+            leaf = lambda tree: tree.tree_.value[:, 0, 1] / tree.tree_.value[:, 0, :].sum(axis=1)
+            scale, link = 1.0 / len(trees), 'identity'
+        else:
+            raise TypeError(f"No se puede compilar {type(estimator).__name__}")
+        if len(estimator.classes_) != 2:
+            raise ValueError("Solo se compilan clasificadores binarios")
+
+        parts = {'feature': [], 'threshold': [], 'left': [], 'right': [], 'value': []}
+        roots = []
+        offset = 0
+        for tree in trees:
+            t = tree.tree_
+            nodes = np.arange(t.node_count)
+            is_leaf = t.children_left == -1
+            roots.append(offset)
+            parts['feature'].append(np.where(is_leaf, 0, t.feature))
+            parts['threshold'].append(np.where(is_leaf, np.inf, t.threshold))
+            parts['left'].append(np.where(is_leaf, nodes, t.children_left) + offset)
+            parts['right'].append(np.where(is_leaf, nodes, t.children_right) + offset)
+            parts['value'].append(np.where(is_leaf, leaf(tree), 0.0))
+            offset += t.node_count
+        depth = max(tree.tree_.max_depth for tree in trees)
+
+        compiled = cls(np.concatenate(parts['feature']).astype(np.int64),
+                       np.concatenate(parts['threshold']).astype(np.float64),
+                       np.concatenate(parts['left']).astype(np.int64),
+                       np.concatenate(parts['right']).astype(np.int64),
+                       np.concatenate(parts['value']).astype(np.float64),
+                       np.array(roots, dtype=np.int64), depth, scale=scale, link=link, engine=engine)
+        if link == 'logistic':
+            # Valor inicial del boosting (log-odds del prior): lo que falta para igualar decision_function
+            probe = np.zeros((1, compiled.feature.max() + 1))
+            compiled.bias = float(estimator.decision_function(probe)[0] - compiled.raw(probe)[0])
+        return compiled
+
+    def raw(self, X):
+        # sklearn compara en float32: redondear igual para caer en las mismas hojas
+        X = np.ascontiguousarray(np.asarray(X, dtype=np.float32), dtype=np.float64)
+        if self.engine == 'numba':
+            total = np.empty(X.shape[0])
+            _leaf_values_kernel(X, self.feature, self.threshold, self.left, self.right, self.value,
+                                self.roots, total)
+        else:
+            total = _leaf_values_numpy(X, self.feature, self.threshold, self.left, self.right,
+                                       self.value, self.roots, self.depth)
+        return self.bias + self.scale * total
+
+    def predict_proba(self, X):
+        raw = self.raw(X)
+        up = 1.0 / (1.0 + np.exp(-raw)) if self.link == 'logistic' else raw
+        return np.column_stack([1.0 - up, up])
+
+
+# ------------------------------------------------------------------ puntaje ponderado (CloudMLBot)
+
+def weighted_score(features):
+    """Puntaje ponderado de CloudMLBot para una vela: (puntaje, confianza).
+
+    Versión escalar de referencia; weighted_scores calcula lo mismo para todas las filas.
+    """
+    ma_5 = features['ma_5']
+    ma_10 = features['ma_10']
+    ma_20 = features['ma_20']
+    rsi = features['rsi']
+    macd = features['macd']
+    macd_signal = features['macd_signal']
+    bb_position = features['bb_position']
+    momentum = features['momentum']
+    volume_ratio = features['volume_ratio']
+    
+    # Algoritmo ML mejorado con más factores
+    prediction_score = 0
+    confidence_factors = []
+    
+    # Factor 1: Convergencia de medias móviles (peso: 25%)
+    if not np.isnan(ma_5) and not np.isnan(ma_10) and not np.isnan(ma_20):
+        # Tendencia alcista: MA5 > MA10 > MA20
+        if ma_5 > ma_10 > ma_20:
+            ma_strength = (ma_5 - ma_20) / ma_20
+            prediction_score += ma_strength * 0.25
+            confidence_factors.append(min(ma_strength * 5, 1))
+        # Tendencia bajista: MA5 < MA10 < MA20
+        elif ma_5 < ma_10 < ma_20:
+            ma_weakness = (ma_20 - ma_5) / ma_20
+            prediction_score -= ma_weakness * 0.25
+            confidence_factors.append(min(ma_weakness * 5, 1))
+    
+    # Factor 2: RSI con zonas mejoradas (peso: 20%)
+    if not np.isnan(rsi):
+        if rsi < 25:  # Sobreventa extrema
+            prediction_score += 0.20
+            confidence_factors.append(0.9)
+        elif rsi < 35:  # Sobreventa
+            prediction_score += 0.15
+            confidence_factors.append(0.7)
+        elif rsi > 75:  # Sobrecompra extrema
+            prediction_score -= 0.20
+            confidence_factors.append(0.9)
+        elif rsi > 65:  # Sobrecompra
+            prediction_score -= 0.15
+            confidence_factors.append(0.7)
+        else:  # Zona neutral
+            rsi_factor = (rsi - 50) / 50
+            prediction_score += rsi_factor * 0.10
+            confidence_factors.append(abs(rsi_factor) * 0.5)
+    
+    # Factor 3: MACD con divergencia (peso: 20%)
+    if not np.isnan(macd) and not np.isnan(macd_signal):
+        macd_diff = macd - macd_signal
+        if macd > 0 and macd_diff > 0:  # Señal alcista fuerte
+            prediction_score += 0.15
+            confidence_factors.append(0.8)
+        elif macd < 0 and macd_diff < 0:  # Señal bajista fuerte
+            prediction_score -= 0.15
+            confidence_factors.append(0.8)
+        else:
+            macd_factor = np.tanh(macd_diff * 1000)
+            prediction_score += macd_factor * 0.10
+            confidence_factors.append(abs(macd_factor) * 0.6)
+    
+    # Factor 4: Bollinger Bands con squeeze detection (peso: 15%)
+    if not np.isnan(bb_position):
+        bb_width = (features['bb_upper'] - features['bb_lower']) / features['bb_middle']
+        
+        if bb_width < 0.02:  # Bollinger Squeeze
+            if bb_position < 0.3:
+                prediction_score += 0.12  # Probable breakout alcista
+                confidence_factors.append(0.75)
+            elif bb_position > 0.7:
+                prediction_score -= 0.12  # Probable breakout bajista
+                confidence_factors.append(0.75)
+        else:
+            if bb_position < 0.15:  # Cerca del límite inferior
+                prediction_score += 0.10
+                confidence_factors.append(0.7)
+            elif bb_position > 0.85:  # Cerca del límite superior
+                prediction_score -= 0.10
+                confidence_factors.append(0.7)
+    
+    # Factor 5: Momentum con aceleración (peso: 10%)
+    if not np.isnan(momentum):
+        momentum_factor = np.tanh(momentum * 10)
+        prediction_score += momentum_factor * 0.10
+        confidence_factors.append(abs(momentum_factor) * 0.8)
+    
+    # Factor 6: Volume confirmation mejorado (peso: 10%)
+    if not np.isnan(volume_ratio):
+        if volume_ratio > 1.5:  # Volumen alto
+            volume_strength = min((volume_ratio - 1) / 2, 1)
+            if prediction_score > 0:
+                prediction_score += volume_strength * 0.08
+            else:
+                prediction_score -= volume_strength * 0.08
+            confidence_factors.append(volume_strength)
+        elif volume_ratio < 0.5:  # Volumen muy bajo
+            confidence_factors.append(0.3)  # Reduce confianza
+    
+    # Calcular confianza final
+    if confidence_factors:
+        base_confidence = np.mean(confidence_factors)
+        consistency = 1 - np.std(confidence_factors)  # Más consistencia = más confianza
+        confidence = min(base_confidence * consistency * 1.5, 1.0)
+    else:
+        confidence = 0
+    
+    return prediction_score, confidence
+
+
+def _add(score, condition, term):
+    # Sumar solo donde se cumple la condición (x + 0.0 == x: el orden de las sumas no cambia)
+    return np.where(condition, score + term, score)
+
+
+def _sub(score, condition, term):
+    return np.where(condition, score - term, score)
+
+
+def weighted_scores(features):
+    """weighted_score para todas las filas a la vez: (puntajes, confianzas) como arrays.
+
+    features: DataFrame de add_indicator_columns o {columna: array}. Reproduce
+    bit a bit la versión escalar: cada factor suma en el mismo orden y la
+    confianza se arma con la misma media/desvío (sumas secuenciales de hasta
+    6 factores, como np.mean/np.std sobre la lista).
+    """
+    columns = {name: np.asarray(features[name], dtype=np.float64) for name in HEURISTIC_FEATURES}
+    ma_5, ma_10, ma_20 = columns['ma_5'], columns['ma_10'], columns['ma_20']
+    rsi, macd, macd_signal = columns['rsi'], columns['macd'], columns['macd_signal']
+    bb_position, momentum, volume_ratio = columns['bb_position'], columns['momentum'], columns['volume_ratio']
+
+    score = np.zeros(ma_5.shape)
+    # Factores de confianza: (valor, presente) en el orden en que los agrega la versión escalar
+    factors = []
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # Factor 1: Convergencia de medias móviles (peso: 25%)
+        has_ma = ~np.isnan(ma_5) & ~np.isnan(ma_10) & ~np.isnan(ma_20)
+        ma_up = has_ma & (ma_5 > ma_10) & (ma_10 > ma_20)
+        ma_down = has_ma & ~ma_up & (ma_5 < ma_10) & (ma_10 < ma_20)
+        ma_strength = (ma_5 - ma_20) / ma_20
+        ma_weakness = (ma_20 - ma_5) / ma_20
+        score = _add(score, ma_up, ma_strength * 0.25)
+        score = _sub(score, ma_down, ma_weakness * 0.25)
+        factors.append((np.where(ma_up, np.minimum(ma_strength * 5, 1), np.minimum(ma_weakness * 5, 1)),
+                        ma_up | ma_down))
+
+        # Factor 2: RSI con zonas mejoradas (peso: 20%)
+        has_rsi = ~np.isnan(rsi)
+        zones = [has_rsi & (rsi < 25), has_rsi & (rsi < 35), has_rsi & (rsi > 75), has_rsi & (rsi > 65)]
+        rsi_factor = (rsi - 50) / 50
+        rsi_zone = np.select(zones, [1, 2, 3, 4], 0)
+        score = _add(score, rsi_zone == 1, 0.20)
+        score = _add(score, rsi_zone == 2, 0.15)
+        score = _sub(score, rsi_zone == 3, 0.20)
+        score = _sub(score, rsi_zone == 4, 0.15)
+        rsi_neutral = has_rsi & (rsi_zone == 0)
+        score = _add(score, rsi_neutral, rsi_factor * 0.10)
+        factors.append((np.select(zones, [0.9, 0.7, 0.9, 0.7], np.abs(rsi_factor) * 0.5), has_rsi))
+
+        # Factor 3: MACD con divergencia (peso: 20%)
+        has_macd = ~np.isnan(macd) & ~np.isnan(macd_signal)
+        macd_diff = macd - macd_signal
+        macd_up = has_macd & (macd > 0) & (macd_diff > 0)
+        macd_down = has_macd & ~macd_up & (macd < 0) & (macd_diff < 0)
+        macd_other = has_macd & ~macd_up & ~macd_down
+        macd_factor = np.tanh(macd_diff * 1000)
+        score = _add(score, macd_up, 0.15)
+        score = _sub(score, macd_down, 0.15)
+        score = _add(score, macd_other, macd_factor * 0.10)
+        factors.append((np.where(macd_other, np.abs(macd_factor) * 0.6, 0.8), has_macd))
+
+        # Factor 4: Bollinger Bands con squeeze detection (peso: 15%)
+        has_bb = ~np.isnan(bb_position)
+        bb_width = (columns['bb_upper'] - columns['bb_lower']) / columns['bb_middle']
+        squeeze = has_bb & (bb_width < 0.02)
+        wide = has_bb & ~(bb_width < 0.02)
+        bb_buy = (squeeze & (bb_position < 0.3)) | (wide & (bb_position < 0.15))
+        bb_sell = (squeeze & ~(bb_position < 0.3) & (bb_position > 0.7)) | \
+                  (wide & ~(bb_position < 0.15) & (bb_position > 0.85))
+        score = _add(score, bb_buy & squeeze, 0.12)
+        score = _sub(score, bb_sell & squeeze, 0.12)
+        score = _add(score, bb_buy & wide, 0.10)
+        score = _sub(score, bb_sell & wide, 0.10)
+        factors.append((np.where(squeeze, 0.75, 0.7), bb_buy | bb_sell))
+
+        # Factor 5: Momentum con aceleración (peso: 10%)
+        has_momentum = ~np.isnan(momentum)
+        momentum_factor = np.tanh(momentum * 10)
+        score = _add(score, has_momentum, momentum_factor * 0.10)
+        factors.append((np.abs(momentum_factor) * 0.8, has_momentum))
+
+        # Factor 6: Volume confirmation mejorado (peso: 10%)
+        high_volume = ~np.isnan(volume_ratio) & (volume_ratio > 1.5)
+        low_volume = ~np.isnan(volume_ratio) & ~high_volume & (volume_ratio < 0.5)
+        volume_strength = np.minimum((volume_ratio - 1) / 2, 1)
+        score = np.where(high_volume & (score > 0), score + volume_strength * 0.08,
+                         np.where(high_volume, score - volume_strength * 0.08, score))
+        factors.append((np.where(high_volume, volume_strength, 0.3), high_volume | low_volume))
+
+        # Confianza final: media * (1 - desvío) * 1.5 sobre los factores presentes
+        count = sum(present.astype(np.int64) for _, present in factors)
+        total = np.zeros(score.shape)
+        for value, present in factors:
+            total = np.where(present, total + value, total)
+        mean = total / count
+        squares = np.zeros(score.shape)
+        for value, present in factors:
+            deviation = value - mean
+            squares = np.where(present, squares + deviation * deviation, squares)
+        consistency = 1 - np.sqrt(squares / count)
+        confidence = np.where(count > 0, np.minimum(mean * consistency * 1.5, 1.0), 0.0)
+
+    return score, confidence
+
+
+# ------------------------------------------------------------------ backends
+
+class ModelBackend(ABC):
+    """Interfaz común: fit / predict_proba / predict / score / signal (predict_proba obligatorio)"""
+
+    name = 'base'
+    features = None
+
+    def __init__(self):
+        self.classes_ = np.array([0, 1])
+
+    def fit(self, X, y):
+        return self
+
+    @abstractmethod
+    def predict_proba(self, X):
+        """Probabilidades (n, 2): columna 1 = P(sube)"""
+
+    def predict(self, X):
+        return self.classes_[self.predict_proba(X).argmax(axis=1)]
+
+    def score(self, X, y):
+        """Accuracy, como en sklearn"""
+        return float(np.mean(self.predict(X) == np.asarray(y)))
+
+    def signal(self, X):
+        """(puntaje con signo, confianza) por fila: puntaje = P(sube) - 0.5"""
+        up = self.predict_proba(X)[:, 1]
+        return up - 0.5, np.maximum(up, 1.0 - up)
+
+
+class EstimatorBackend(ModelBackend):
+    """Clasificador de sklearn; los ensambles de árboles se compilan al entrenar"""
+
+    def __init__(self, name, estimator, compiled=True, engine='auto'):
+        super().__init__()
+        self.name = name
+        self.estimator = estimator
+        self.compiled = compiled
+        self.engine = engine
+        self.trees = None
+
+    def fit(self, X, y):
+        self.estimator.fit(X, y)
+        self.classes_ = self.estimator.classes_
+        self.trees = None
+        if self.compiled and hasattr(self.estimator, 'estimators_') and len(self.classes_) == 2:
+            self.trees = CompiledTrees.from_estimator(self.estimator, self.engine)
+        return self
+
+    def predict_proba(self, X):
+        X = np.atleast_2d(np.asarray(X, dtype=np.float64))
+        if self.trees is not None and (self.trees.engine == 'numba' or len(X) <= COMPILED_NUMPY_MAX_ROWS):
+            return self.trees.predict_proba(X)
+        return self.estimator.predict_proba(X)
+
+
+class HeuristicBackend(ModelBackend):
+    """Puntaje escrito a mano: score_fn(fila) -> (puntaje, confianza), o vector_fn para todas las filas"""
+
+    name = 'heuristic'
+
+    def __init__(self, score_fn=weighted_score, features=HEURISTIC_FEATURES, vector_fn=weighted_scores):
+        super().__init__()
+        self.score_fn = score_fn
+        self.features = tuple(features)
+        self.vector_fn = vector_fn
+
+    def signal(self, X):
+        rows = np.atleast_2d(np.asarray(X, dtype=np.float64))
+        if self.vector_fn is not None:
+            return self.vector_fn(dict(zip(self.features, rows.T)))
+        results = [self.score_fn(dict(zip(self.features, row))) for row in rows]
+        scores, confidences = zip(*results) if results else ((), ())
+        return np.array(scores, dtype=np.float64), np.array(confidences, dtype=np.float64)
+
+    def predict_proba(self, X):
+        scores, _ = self.signal(X)
+        up = np.clip(0.5 + scores, 0.0, 1.0)
+        return np.column_stack([1.0 - up, up])
+
+
+def make_backend(name='forest', n_jobs=None, random_state=42, compiled=True, score_fn=None,
+                 features=None, engine='auto'):
+    """Crear un backend por nombre (ver BACKENDS)"""
+    if name == 'heuristic':
+        if score_fn is None:
+            return HeuristicBackend(features=features or HEURISTIC_FEATURES)
+        # Puntaje propio: fila por fila
+        return HeuristicBackend(score_fn, features or HEURISTIC_FEATURES, vector_fn=None)
+
+    if name == 'forest':
+        from sklearn.ensemble import RandomForestClassifier
+        estimator = RandomForestClassifier(n_estimators=100, random_state=random_state, n_jobs=n_jobs)
+    elif name == 'gbt':
+        from sklearn.ensemble import GradientBoostingClassifier
+        estimator = GradientBoostingClassifier(n_estimators=100, max_depth=3, random_state=random_state)
+    elif name == 'logistic':
+        from sklearn.linear_model import LogisticRegression
+        estimator = LogisticRegression(max_iter=1000)
+    else:
+        raise ValueError(f"Backend desconocido: {name} (opciones: {', '.join(BACKENDS)})")
+
+    backend = EstimatorBackend(name, estimator, compiled=compiled, engine=engine)
+    if features is not None:
+        backend.features = tuple(features)
+    return backend
+
+
+# ------------------------------------------------------------------ verificación y benchmark
+
+def synthetic_dataset(n=5000, seed=0, horizon=3, threshold=0.0):
+    """Features de FINANCIERO_FEATURES sobre velas sintéticas con target 'sube más de threshold'"""
+    from indicators import synthetic_candles, compute_indicators, financiero_feature_tensor
+
+    close, volume, high, low = synthetic_candles(n, seed=seed)
+    indicators = compute_indicators(close, volume, high, low, momentum_period=10, volume_window=20)
+    X = financiero_feature_tensor(close, indicators)
+    future = np.full(n, np.nan)
+    future[:-horizon] = close[horizon:] / close[:-horizon] - 1
+    valid = np.isfinite(X).all(axis=1) & np.isfinite(future)
+    return X[valid], (future[valid] > threshold).astype(int)
+
+
+def check_compiled(X, y, X_test):
+    """Diferencia máxima entre predict_proba de sklearn y los árboles compilados"""
+    engines = ['numpy'] + (['numba'] if NUMBA_AVAILABLE else [])
+    failures = []
+    for name in ('forest', 'gbt'):
+        backend = make_backend(name).fit(X, y)
+        expected = backend.estimator.predict_proba(X_test)
+        for engine in engines:
+            backend.trees.engine = engine
+            got = backend.trees.predict_proba(X_test)
+            if not np.allclose(got, expected, rtol=0, atol=1e-12):
+                failures.append(f"{name}/{engine}: {np.abs(got - expected).max():.2e}")
+    return failures
+
+
+def check_weighted(n=20000, seed=0):
+    """Filas donde weighted_scores difiere de weighted_score (debe ser 0)"""
+    import pandas as pd
+    from indicators import add_indicator_columns
+
+    rng = np.random.default_rng(seed)
+    mismatches = 0
+    # Volatilidades distintas para pasar por squeeze, bandas anchas y RSI extremos
+    for volatility in (0.0005, 0.002, 0.01, 0.03):
+        close = 100 * np.exp(np.cumsum(rng.normal(0, volatility, n)))
+        df = add_indicator_columns(pd.DataFrame({'close': close, 'volume': rng.lognormal(0, 1, n)}))
+        df.loc[rng.random(n) < 0.02, 'rsi'] = np.nan
+        scores, confidences = weighted_scores(df)
+        columns = {name: df[name].to_numpy() for name in HEURISTIC_FEATURES}
+        for i in range(n):
+            expected = weighted_score({name: values[i] for name, values in columns.items()})
+            if not np.array_equal(expected, (scores[i], confidences[i]), equal_nan=True):
+                mismatches += 1
+    return mismatches
+
+
+def _time_call(func, loops):
+    func()  # calentar (JIT / caches)
+    start = time.perf_counter()
+    for _ in range(loops):
+        func()
+    return (time.perf_counter() - start) / loops * 1e6
+
+
+def run_benchmark(n=5000, batch=200, loops=200):
+    """Latencia (µs) de una fila y de un lote, y accuracy fuera de muestra, por backend"""
+    from sklearn.preprocessing import StandardScaler
+
+    X, y = synthetic_dataset(n)
+    split = int(len(X) * 0.8)
+    scaler = StandardScaler().fit(X[:split])
+    X_train, X_test = scaler.transform(X[:split]), scaler.transform(X[split:])
+    y_train, y_test = y[:split], y[split:]
+    row, rows = X_test[:1], X_test[:batch]
+
+    def rsi_score(features):
+        # Heurística mínima de referencia: RSI bajo -> sube
+        return (50.0 - features['rsi']) / 100.0, abs(50.0 - features['rsi']) / 50.0
+
+    variants = []
+    for name in ('forest', 'gbt', 'logistic'):
+        backend = make_backend(name).fit(X_train, y_train)
+        variants.append((f"{name} sklearn", backend.estimator.predict_proba, backend))
+        if backend.trees is not None:
+            for engine in ['numpy'] + (['numba'] if NUMBA_AVAILABLE else []):
+                trees = CompiledTrees.from_estimator(backend.estimator, engine)
+                variants.append((f"{name} compilado {engine}", trees.predict_proba, backend))
+    heuristic = make_backend('heuristic', score_fn=rsi_score,
+                             features=['rsi', 'macd', 'macd_histogram', 'bb_position', 'volume_ratio',
+                                       'momentum', 'sma_10_gap', 'sma_20_gap', 'support_gap',
+                                       'resistance_gap'])
+    variants.append(("heuristic (RSI)", heuristic.predict_proba, heuristic))
+
+    results = []
+    raw_test = X[split:]
+    for label, predict_proba, backend in variants:
+        # La heurística trabaja sobre features sin escalar
+        data = raw_test if backend is heuristic else X_test
+        accuracy = float(np.mean(predict_proba(data).argmax(axis=1) == y_test))
+        one = data[:1] if backend is heuristic else row
+        many = data[:batch] if backend is heuristic else rows
+        results.append((label, _time_call(lambda: predict_proba(one), loops),
+                        _time_call(lambda: predict_proba(many), max(5, loops // 10)), accuracy))
+    return results
+
+
+if __name__ == "__main__":
+    print(f"🧠 Árboles compilados: numpy{' + numba' if NUMBA_AVAILABLE else ' (numba no instalado)'}")
+    X, y = synthetic_dataset(3000, seed=1)
+    failures = check_compiled(X[:2000], y[:2000], X[2000:])
+    if failures:
+        print(f"❌ Diferencias contra sklearn: {', '.join(failures)}")
+        raise SystemExit(1)
+    print("✅ Árboles compilados == predict_proba de sklearn (forest y gbt)")
+    mismatches = check_weighted()
+    if mismatches:
+        print(f"❌ weighted_scores difiere de weighted_score en {mismatches} filas")
+        raise SystemExit(1)
+    print("✅ weighted_scores == weighted_score bit a bit (80000 velas)")
+
+    class _Incomplete(ModelBackend):
+        name = 'incompleto'
+    try:
+        _Incomplete()
+    except TypeError:
+        print("✅ Un backend sin predict_proba falla al construirse, no en la primera predicción")
+    else:
+        print("❌ ModelBackend permitió un backend sin predict_proba")
+        raise SystemExit(1)
+
+    import pandas as pd
+    from indicators import add_indicator_columns, synthetic_candles
+    close, volume, _, _ = synthetic_candles(500000)
+    history = add_indicator_columns(pd.DataFrame({'close': close, 'volume': volume}))
+    columns = {name: history[name].to_numpy() for name in HEURISTIC_FEATURES}
+    rows = [{name: values[i] for name, values in columns.items()} for i in range(20000)]
+    start = time.perf_counter()
+    for row in rows:
+        weighted_score(row)
+    scalar_us = (time.perf_counter() - start) / len(rows) * 1e6
+    start = time.perf_counter()
+    weighted_scores(history)
+    vector_s = time.perf_counter() - start
+    print(f"   puntaje de 500k velas: escalar {scalar_us * 0.5:.1f} s (estimado) | vectorizado {vector_s * 1000:.0f} ms")
+    print(f"   {'backend':<24} {'1 fila':>10} {'lote 200':>10} {'accuracy':>9}")
+    for label, single, batch, accuracy in run_benchmark():
+        print(f"   {label:<24} {single:>8.1f}µs {batch / 1000:>8.2f}ms {accuracy:>8.1%}")
@@ -22,12 +22,8 @@ echo "🔄 Últimas 10 líneas de actividad:"
 gcloud compute ssh rodrigomd123456@bot-trading-ml --zone=asia-southeast1-a --command="tail -10 ml_bot_log.txt"
 
 echo ""
-echo "💰 Estadísticas de trading:"
-gcloud compute ssh rodrigomd123456@bot-trading-ml --zone=asia-southeast1-a --command="echo 'Trades totales:'; grep -c 'BUY\|SELL' ml_bot_log.txt || echo '0'"
-
-echo ""
-echo "🚨 Errores recientes:"
-gcloud compute ssh rodrigomd123456@bot-trading-ml --zone=asia-southeast1-a --command="grep -i 'error\|exception' ml_bot_log.txt | tail -5 || echo 'Sin errores recientes'"
+echo "📡 Métricas en vivo (balance, posición, predicción, errores, latencias):"
+gcloud compute ssh rodrigomd123456@bot-trading-ml --zone=asia-southeast1-a --command="curl -s --max-time 3 http://127.0.0.1:8711/metrics | python3 -m json.tool || echo '⚠️  Endpoint de métricas no disponible'"
 
 echo ""
 echo "✅ Verificación completada - $(date)"
\ No newline at end of file
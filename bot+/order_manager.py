@@ -0,0 +1,460 @@
+#!/usr/bin/env python3
+"""
+🛑 STOPS Y TAKE PROFITS EN EL EXCHANGE (OCO + USER-DATA STREAM)
+================================================================
+Los bots revisaban el stop loss y el take profit en su loop (cada 30-60 s):
+entre una vuelta y otra el precio podía pasar de largo el stop. Con este
+módulo, al abrir una posición se deja en Binance una OCO de salida
+(LIMIT_MAKER en el take profit + STOP_LOSS_LIMIT en el stop) y el exchange
+la ejecuta apenas el precio la toca, sin importar el intervalo del bot.
+
+- Trailing stop: la OCO se cancela y se vuelve a colocar con el stop nuevo
+  (Binance no permite modificar precios); los movimientos chicos se ignoran
+  para no gastar peso.
+- Ejecuciones: llegan por el user-data stream (websocket de Binance o el
+  feed de eventos de fake_exchange.py) y el bot las toma con fills() en su
+  loop. Cada RECONCILE_SECONDS también se consulta el estado por REST, por
+  si el stream se cortó. Una OCO con todas las patas canceladas o expiradas
+  sin ejecución (cancelación manual, expiración) se olvida y el bot la toma
+  con dropped() para reponerla o seguir por polling.
+- Salidas del bot (señal, tiempo límite): cancel() quita la OCO antes de
+  vender y solo devuelve True si el exchange confirma las patas canceladas
+  sin ejecución. Si ya se había ejecutado la ejecución llega por fills(); si
+  la cancelación no se pudo confirmar (timeout, 5xx, 429) la OCO sigue
+  registrada. En los dos casos devuelve False y el bot no vende.
+
+El estado (ids de las órdenes por posición) se exporta al diario del bot
+para retomar la protección tras un reinicio.
+
+Uso:
+    orders = ProtectiveOrders(client, 'BTCUSDT', log=log_event)
+    stream = start_user_stream(orders.on_event, API_KEY, API_SECRET, testnet=IS_TESTNET)
+    orders.protect('BTCUSDT', qty, stop_price, take_profit)
+    orders.amend_stop('BTCUSDT', new_stop)
+    for fill in orders.fills(): ...              # salidas ejecutadas por el exchange
+    for position_id in orders.dropped(): ...     # salidas que ya no están en el exchange
+"""
+
+import os
+import json
+import time
+import threading
+from urllib.request import urlopen
+
+from symbol_filters import format_step
+
+# Límite del STOP_LOSS_LIMIT por debajo del stop: margen para llenarse si el precio sigue cayendo
+STOP_LIMIT_OFFSET_BPS = 20.0
+
+# El trailing stop solo se reemplaza si se mueve al menos esto (cada reemplazo son 2 requests)
+MIN_AMEND_BPS = 5.0
+
+# Consulta REST de las órdenes protegidas aunque el stream esté vivo
+RECONCILE_SECONDS = 30
+
+# Intervalo de consulta del feed de eventos del exchange simulado
+FAKE_STREAM_POLL_SECONDS = 0.25
+
+TERMINAL_STATUSES = ('FILLED', 'CANCELED', 'EXPIRED', 'REJECTED')
+CANCELLED_STATUSES = ('CANCELED', 'EXPIRED', 'REJECTED')
+
+
+class ProtectiveOrders:
+    """OCO de salida por posición, con trailing y conciliación de ejecuciones"""
+
+    def __init__(self, client, symbol, stop_limit_offset_bps=STOP_LIMIT_OFFSET_BPS,
+                 min_amend_bps=MIN_AMEND_BPS, reconcile_seconds=RECONCILE_SECONDS, log=print):
+        self.client = client
+        self.symbol = symbol
+        self.stop_limit_offset_bps = stop_limit_offset_bps
+        self.min_amend_bps = min_amend_bps
+        self.reconcile_seconds = reconcile_seconds
+        self.log = log
+        self.protections = {}
+        self._order_index = {}
+        self._fills = []
+        self._dropped = []
+        self._lock = threading.RLock()
+        self._filters = None
+        self._reconciled_at = 0.0
+        self.last_event_at = 0.0
+        self.stats = {'placed': 0, 'amended': 0, 'cancelled': 0, 'exchange_exits': 0,
+                      'stream_fills': 0, 'rest_fills': 0, 'dropped': 0, 'errors': 0}
+
+    # ---- filtros del símbolo -------------------------------------------------
+
+    def filters(self):
+        """(tickSize, stepSize) del símbolo (se consulta una sola vez)"""
+        if self._filters is None:
+            tick = step = 0.0
+            try:
+                info = self.client.get_symbol_info(self.symbol)
+                for symbol_filter in (info or {}).get('filters', []):
+                    if symbol_filter.get('filterType') == 'PRICE_FILTER':
+                        tick = float(symbol_filter['tickSize'])
+                    elif symbol_filter.get('filterType') == 'LOT_SIZE':
+                        step = float(symbol_filter['stepSize'])
+            except Exception as e:
+                self.log(f"⚠️  No se pudieron leer los filtros de {self.symbol}: {e}")
+            self._filters = (tick, step)
+        return self._filters
+
+    def _order_params(self, quantity, stop_price, take_profit):
+        tick, step = self.filters()
+        stop_limit = stop_price * (1 - self.stop_limit_offset_bps / 10000)
+        params = {
+            'symbol': self.symbol, 'side': 'SELL',
+            'quantity': format_step(quantity, step),
+            'stopPrice': format_step(stop_price, tick),
+            'stopLimitPrice': format_step(stop_limit, tick),
+            'stopLimitTimeInForce': 'GTC',
+        }
+        if take_profit:
+            params['price'] = format_step(take_profit, tick, up=True)
+        return params
+
+    # ---- colocar / reemplazar / cancelar -------------------------------------
+
+    def active(self, position_id):
+        with self._lock:
+            return position_id in self.protections
+
+    def protect(self, position_id, quantity, stop_price, take_profit=None):
+        """Colocar la salida en el exchange; False si no se pudo (el bot sigue con su stop por polling)"""
+        params = self._order_params(quantity, stop_price, take_profit)
+        try:
+            if take_profit:
+                response = self.client.create_oco_order(**params)
+                orders = response['orders']
+                legs = {'stop': orders[0]['orderId'], 'take_profit': orders[1]['orderId']}
+                for report in response.get('orderReports', []):
+                    if report.get('type') == 'LIMIT_MAKER':
+                        legs['take_profit'] = report['orderId']
+                    elif report.get('type', '').startswith('STOP_LOSS'):
+                        legs['stop'] = report['orderId']
+                list_id = response['orderListId']
+            else:
+                order = self.client.create_order(
+                    symbol=params['symbol'], side='SELL', type='STOP_LOSS_LIMIT', timeInForce='GTC',
+                    quantity=params['quantity'], price=params['stopLimitPrice'], stopPrice=params['stopPrice'])
+                legs = {'stop': order['orderId']}
+                list_id = -1
+        except Exception as e:
+            self.stats['errors'] += 1
+            self.log(f"⚠️  No se pudo colocar la salida en el exchange para {position_id}: {e}")
+            return False
+
+        with self._lock:
+            self.protections[position_id] = {
+                'quantity': float(params['quantity']), 'stop_price': float(params['stopPrice']),
+                'take_profit': float(params['price']) if take_profit else None,
+                'order_list_id': list_id, 'orders': legs
+            }
+            for leg, order_id in legs.items():
+                self._order_index[order_id] = (position_id, leg)
+            self.stats['placed'] += 1
+        self.log(f"🛑 Salida en el exchange: stop ${float(params['stopPrice']):,.2f}"
+                 + (f" | TP ${float(params['price']):,.2f}" if take_profit else "") + f" ({position_id})")
+        return True
+
+    def amend_stop(self, position_id, stop_price):
+        """Mover el stop (trailing): cancelar y volver a colocar la OCO con el stop nuevo"""
+        with self._lock:
+            protection = self.protections.get(position_id)
+            if protection is None:
+                return False
+            if abs(stop_price / protection['stop_price'] - 1) * 10000 < self.min_amend_bps:
+                return False
+            quantity, take_profit = protection['quantity'], protection['take_profit']
+
+        if not self.cancel(position_id):
+            # Se ejecutó justo antes de cancelar (fills() la entrega) o no se confirmó: la OCO vieja sigue
+            return False
+        if not self.protect(position_id, quantity, stop_price, take_profit):
+            # La OCO vieja ya no está: sin protección en el exchange hasta que el bot la reponga
+            self.log(f"⚠️  {position_id} quedó sin salida en el exchange al mover el stop: el bot vigila por polling")
+            return False
+        self.stats['amended'] += 1
+        return True
+
+    def cancel(self, position_id):
+        """Quitar la salida antes de que el bot cierre por su cuenta.
+
+        True solo si el exchange confirma todas las patas canceladas sin ejecución.
+        False si la OCO ya se había ejecutado (queda en fills(), el bot no debe
+        volver a vender) o si no se pudo confirmar: la protección sigue registrada
+        y el bot reintenta en la próxima iteración.
+        """
+        with self._lock:
+            protection = self.protections.get(position_id)
+            if protection is None:
+                return not self._has_fill(position_id)
+        pending = dict(protection['orders'])
+        try:
+            response = self.client.cancel_order(symbol=self.symbol, orderId=protection['orders']['stop'])
+            # Respuesta de la orden o de la lista OCO: las patas que confirma no hace falta consultarlas
+            for report in response.get('orderReports') or [response]:
+                if report.get('status') in CANCELLED_STATUSES and not float(report.get('executedQty') or 0):
+                    pending = {leg: order_id for leg, order_id in pending.items()
+                               if order_id != report.get('orderId')}
+        except Exception as e:
+            # Orden desconocida (ya ejecutada o cancelada) o falla de red: el estado real lo da get_order
+            self.log(f"⚠️  Error cancelando la salida de {position_id}: {e}")
+        confirmed = not pending or self._confirm_cancelled(position_id, pending)
+        with self._lock:
+            if self._has_fill(position_id):
+                # Se ejecutó antes de cancelar (stream o consulta REST)
+                return False
+            if not confirmed:
+                self.stats['errors'] += 1
+                self.log(f"⚠️  Cancelación de la salida de {position_id} sin confirmar: la OCO se mantiene")
+                return False
+            self._forget(position_id)
+            self.stats['cancelled'] += 1
+        return True
+
+    def _confirm_cancelled(self, position_id, legs):
+        """¿Todas las patas terminadas sin ejecución? Por REST; si alguna se ejecutó la registra en fills()"""
+        for leg, order_id in legs.items():
+            try:
+                order = self.client.get_order(symbol=self.symbol, orderId=order_id)
+            except Exception as e:
+                self.log(f"⚠️  No se pudo consultar la orden {order_id}: {e}")
+                return False
+            executed = float(order.get('executedQty') or 0)
+            if order.get('status') in TERMINAL_STATUSES and executed > 0:
+                quote = float(order.get('cummulativeQuoteQty') or 0)
+                with self._lock:
+                    self._record_fill(position_id, leg, quote / executed, executed,
+                                      order.get('updateTime') or order.get('transactTime'), 'rest_fills')
+                return False
+            if order.get('status') not in CANCELLED_STATUSES:
+                return False
+        return True
+
+    def _forget(self, position_id):
+        protection = self.protections.pop(position_id, None)
+        if protection is not None:
+            for order_id in protection['orders'].values():
+                self._order_index.pop(order_id, None)
+        return protection
+
+    # ---- ejecuciones ---------------------------------------------------------
+
+    def on_event(self, event):
+        """Callback del user-data stream (executionReport de Binance)"""
+        self.last_event_at = time.time()
+        if not isinstance(event, dict) or event.get('e') != 'executionReport':
+            return
+        with self._lock:
+            key = self._order_index.get(event.get('i'))
+            if key is None or event.get('X') not in ('FILLED', 'CANCELED', 'EXPIRED'):
+                return
+            executed = float(event.get('z') or 0)
+            if event['X'] == 'FILLED' or executed > 0:
+                quote = float(event.get('Z') or 0)
+                self._record_fill(key[0], key[1], quote / executed if executed else float(event.get('L') or 0),
+                                  executed, event.get('T'), 'stream_fills')
+
+    def _record_fill(self, position_id, leg, price, quantity, transact_time, source):
+        protection = self._forget(position_id)
+        if protection is None:
+            return
+        self._fills.append({
+            'position_id': position_id,
+            'reason': 'STOP_LOSS' if leg == 'stop' else 'TAKE_PROFIT',
+            'price': price,
+            'quantity': quantity,
+            'protected_quantity': protection['quantity'],
+            'time': transact_time
+        })
+        self.stats[source] += 1
+        self.stats['exchange_exits'] += 1
+
+    def _has_fill(self, position_id):
+        with self._lock:
+            return any(fill['position_id'] == position_id for fill in self._fills)
+
+    def fills(self):
+        """Salidas ejecutadas por el exchange desde la última llamada"""
+        with self._lock:
+            fills, self._fills = self._fills, []
+        return fills
+
+    def dropped(self):
+        """Posiciones cuya salida terminó en el exchange sin ejecutarse (quedaron sin protección)"""
+        with self._lock:
+            dropped, self._dropped = self._dropped, []
+        return dropped
+
+    def _query(self, position_id, protection):
+        """Estado por REST de las patas de una protección (si alguna se ejecutó, registrarla)"""
+        statuses = []
+        for leg, order_id in protection['orders'].items():
+            try:
+                order = self.client.get_order(symbol=self.symbol, orderId=order_id)
+            except Exception as e:
+                self.stats['errors'] += 1
+                self.log(f"⚠️  No se pudo consultar la orden {order_id}: {e}")
+                statuses.append(None)
+                continue
+            executed = float(order.get('executedQty') or 0)
+            if order.get('status') in TERMINAL_STATUSES and executed > 0:
+                quote = float(order.get('cummulativeQuoteQty') or 0)
+                with self._lock:
+                    self._record_fill(position_id, leg, quote / executed, executed,
+                                      order.get('updateTime') or order.get('transactTime'), 'rest_fills')
+                return
+            statuses.append(order.get('status'))
+        if all(status in CANCELLED_STATUSES for status in statuses):
+            # Cancelada a mano, expirada o evento perdido del stream: la posición ya no tiene salida
+            with self._lock:
+                if self.protections.get(position_id) is not protection:
+                    # Ya se canceló o se reemplazó (trailing) mientras se consultaba
+                    return
+                self._forget(position_id)
+                self._dropped.append(position_id)
+                self.stats['dropped'] += 1
+            self.log(f"⚠️  La salida de {position_id} ya no está en el exchange ({', '.join(statuses)})")
+
+    def reconcile(self, force=False):
+        """Consultar por REST las protecciones abiertas (cada reconcile_seconds o si force)"""
+        if not force and time.time() - self._reconciled_at < self.reconcile_seconds:
+            return
+        self._reconciled_at = time.time()
+        with self._lock:
+            pending = list(self.protections.items())
+        for position_id, protection in pending:
+            self._query(position_id, protection)
+
+    # ---- persistencia --------------------------------------------------------
+
+    def export(self):
+        """Estado para el diario del bot"""
+        with self._lock:
+            return {position_id: dict(protection, orders=dict(protection['orders']))
+                    for position_id, protection in self.protections.items()}
+
+    def restore(self, state):
+        """Retomar las protecciones del diario y conciliarlas (pudieron ejecutarse con el bot caído)"""
+        if not state:
+            return
+        with self._lock:
+            for position_id, protection in state.items():
+                protection['orders'] = {leg: int(order_id) for leg, order_id in protection['orders'].items()}
+                self.protections[position_id] = protection
+                for leg, order_id in protection['orders'].items():
+                    self._order_index[order_id] = (position_id, leg)
+        self.reconcile(force=True)
+
+    def summary(self):
+        with self._lock:
+            return {**self.stats, 'active': len(self.protections),
+                    'stream_age': round(time.time() - self.last_event_at, 1) if self.last_event_at else None}
+
+
+class FakeUserStream:
+    """User-data stream del exchange simulado: consulta su feed de eventos en un hilo"""
+
+    def __init__(self, base_url, callback, poll_seconds=FAKE_STREAM_POLL_SECONDS, log=print):
+        self.url = base_url.rstrip('/') + '/v3/fake/userDataStream'
+        self.callback = callback
+        self.poll_seconds = poll_seconds
+        self.log = log
+        self._next = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='fake-user-stream', daemon=True)
+
+    def start(self):
+        # Solo eventos desde ahora (como un websocket recién abierto)
+        self._next = self._fetch(0)['next']
+        self._thread.start()
+        return self
+
+    def _fetch(self, after):
+        with urlopen(f"{self.url}?after={after}", timeout=5) as response:
+            return json.loads(response.read())
+
+    def _run(self):
+        while not self._stop.wait(self.poll_seconds):
+            try:
+                batch = self._fetch(self._next)
+            except Exception as e:
+                self.log(f"⚠️  User stream simulado: {e}")
+                continue
+            self._next = batch['next']
+            for event in batch['events']:
+                self.callback(event)
+
+    def stop(self):
+        self._stop.set()
+
+
+def start_user_stream(callback, api_key=None, api_secret=None, testnet=False, log=print):
+    """Abrir el user-data stream: websocket de Binance o el feed de fake_exchange.py si BINANCE_API_URL apunta a él"""
+    base_url = os.getenv('BINANCE_API_URL')
+    if base_url:
+        return FakeUserStream(base_url, callback, log=log).start()
+
+    from binance import ThreadedWebsocketManager
+
+    manager = ThreadedWebsocketManager(api_key=api_key, api_secret=api_secret, testnet=testnet)
+    manager.start()
+    manager.start_user_socket(callback=callback)
+    return manager
+
+
+if __name__ == "__main__":
+    # Prueba contra el exchange simulado: python order_manager.py
+    from fake_exchange import start_fake_exchange, generate_candles, FakeClient
+
+    # Una vela de 1m cada 50 ms: el stop se prueba en segundos
+    server, exchange = start_fake_exchange(port=8831, candles=generate_candles(3000, seed=3), speed=1200)
+    base_url = 'http://127.0.0.1:8831/api'
+    os.environ['BINANCE_API_URL'] = base_url
+    client = FakeClient(base_url)
+    orders = ProtectiveOrders(client, 'BTCUSDT', min_amend_bps=1.0)
+    stream = start_user_stream(orders.on_event)
+
+    class _TimeoutClient(FakeClient):
+        def cancel_order(self, **params):
+            raise TimeoutError("read timed out")
+
+    # Cancelación sin confirmar (timeout): la OCO sigue viva y registrada, el bot no debe vender
+    price = float(client.get_symbol_ticker('BTCUSDT')['price'])
+    flaky = ProtectiveOrders(_TimeoutClient(base_url), 'BTCUSDT')
+    flaky.protect('check', 0.001, price * 0.99, price * 1.01)
+    assert not flaky.cancel('check') and flaky.active('check')
+    # Ya cancelada en el exchange: "orden desconocida" y get_order lo confirma
+    client.cancel_order(symbol='BTCUSDT', orderId=flaky.protections['check']['orders']['stop'])
+    flaky.client = client
+    assert flaky.cancel('check') and not flaky.active('check')
+    print(f"✅ Cancelación confirmada solo por el exchange | {flaky.summary()}")
+
+    # OCO cancelada fuera del bot: la conciliación la olvida y la entrega en dropped()
+    flaky.protect('manual', 0.001, price * 0.99, price * 1.01)
+    client.cancel_order(symbol='BTCUSDT', orderId=flaky.protections['manual']['orders']['take_profit'])
+    flaky.reconcile(force=True)
+    assert not flaky.active('manual') and flaky.dropped() == ['manual'] and not flaky.fills()
+    print(f"✅ OCO cancelada a mano detectada por REST | {flaky.summary()}")
+
+    orders.protect('demo', 0.001, price * 0.998, price * 1.004)
+    placed_at = time.time()
+    high_water = price
+    fills = []
+    while not fills and time.time() - placed_at < 30:
+        time.sleep(0.1)
+        price = float(client.get_symbol_ticker('BTCUSDT')['price'])
+        if price > high_water * 1.0005:
+            high_water = price
+            orders.amend_stop('demo', price * 0.998)
+        fills = orders.fills()
+
+    stream.stop()
+    server.shutdown()
+    if not fills:
+        print(f"⏳ Sin ejecución en 30 s | {orders.summary()}")
+    else:
+        fill = fills[0]
+        print(f"✅ {fill['reason']} ejecutado por el exchange a ${fill['price']:.2f} "
+              f"({fill['quantity']:.5f} BTC) en {time.time() - placed_at:.1f}s | {orders.summary()}")
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+🎛️ PARÁMETROS DE ESTRATEGIA RECARGABLES EN CALIENTE
+====================================================
+Cada bot declara sus parámetros con valores por defecto; un archivo JSON
+opcional (<bot>_params.json) los sobreescribe. El bot llama a poll() entre
+iteraciones: si el archivo cambió (mtime), se valida completo y se aplica
+de una sola vez, o se rechaza entero y siguen los valores anteriores.
+Cada cambio queda registrado en <bot>_params_audit.jsonl.
+
+Así se puede ajustar MIN_CONFIDENCE, stops, ventanas, etc. sin matar el
+bot (y sin cerrar la posición abierta ni perder el estado en memoria).
+"""
+
+import os
+import copy
+import json
+import datetime
+from pathlib import Path
+from types import MappingProxyType
+
+PARAMS_DIR = Path(__file__).parent
+
+
+def get_params_path(name):
+    """Ruta del archivo de parámetros (se puede sobreescribir con PARAMS_FILE_<BOT>)"""
+    env_value = os.getenv(f"PARAMS_FILE_{name.upper()}")
+    if env_value:
+        return Path(env_value)
+    return PARAMS_DIR / f"{name}_params.json"
+
+
+class ParamValidationError(ValueError):
+    """Archivo de parámetros rechazado (se mantienen los valores anteriores)"""
+
+
+class ParamStore:
+    """Parámetros de un bot: valores por defecto + archivo JSON vigilado"""
+
+    def __init__(self, name, defaults, ranges=None, check=None, path=None, log=print):
+        """
+        defaults: {'MIN_CONFIDENCE': 0.65, ...} (el tipo de cada valor es el esperado)
+        ranges:   {'MIN_CONFIDENCE': (0.0, 1.0), ...} límites inclusivos opcionales
+        check:    función(params) -> mensaje de error o None, para reglas entre parámetros
+        """
+        self.name = name
+        self.defaults = MappingProxyType(copy.deepcopy(dict(defaults)))
+        self.ranges = ranges or {}
+        self.check = check
+        self.path = Path(path) if path else get_params_path(name)
+        self.audit_path = self.path.with_name(f"{self.path.stem}_audit.jsonl")
+        self.log = log
+        self._current = self.defaults
+        self._file_stamp = None
+        self.poll()
+
+    @property
+    def current(self):
+        """Parámetros vigentes (solo lectura); tomar una vez por iteración"""
+        return self._current
+
+    def __getattr__(self, name):
+        try:
+            return self.__dict__['_current'][name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def __getitem__(self, name):
+        return self._current[name]
+
+    def _stat_stamp(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def poll(self):
+        """Aplicar el archivo si cambió desde la última vez.
+
+        Devuelve {parámetro: (anterior, nuevo)} con lo que cambió ({} si nada).
+        Solo hace un stat() cuando el archivo no cambió.
+        """
+        stamp = self._stat_stamp()
+        if stamp == self._file_stamp:
+            return {}
+        self._file_stamp = stamp
+
+        try:
+            overrides = self._read_overrides() if stamp else {}
+            candidate = self.validate(overrides)
+        except ParamValidationError as e:
+            self.log(f"⚠️  Parámetros rechazados ({self.path.name}): {e} - se mantienen los anteriores")
+            self._audit({'status': 'rejected', 'error': str(e)})
+            return {}
+
+        changes = {key: (self._current[key], value)
+                   for key, value in candidate.items() if value != self._current[key]}
+        if not changes:
+            return {}
+
+        # Reemplazo atómico: quien ya tomó `current` sigue viendo el conjunto anterior completo
+        self._current = MappingProxyType(candidate)
+        for key, (old, new) in changes.items():
+            self.log(f"🎛️  Parámetro actualizado: {key} {old} -> {new}")
+        self._audit({'status': 'applied',
+                     'changes': {key: {'old': old, 'new': new} for key, (old, new) in changes.items()}})
+        return changes
+
+    def _read_overrides(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                overrides = json.load(f)
+        except (OSError, ValueError) as e:
+            raise ParamValidationError(f"no se pudo leer: {e}")
+        if not isinstance(overrides, dict):
+            raise ParamValidationError("el archivo debe contener un objeto JSON")
+        return overrides
+
+    def validate(self, overrides):
+        """Combinar con los valores por defecto y validar tipos, rangos y reglas"""
+        unknown = sorted(set(overrides) - set(self.defaults))
+        if unknown:
+            raise ParamValidationError(f"parámetros desconocidos: {', '.join(unknown)}")
+
+        params = copy.deepcopy(dict(self.defaults))
+        for key, raw in overrides.items():
+            params[key] = self._coerce(key, raw, self.defaults[key])
+
+        for key, (low, high) in self.ranges.items():
+            value = params[key]
+            if (low is not None and value < low) or (high is not None and value > high):
+                raise ParamValidationError(f"{key}={value} fuera de rango [{low}, {high}]")
+
+        if self.check:
+            error = self.check(params)
+            if error:
+                raise ParamValidationError(error)
+        return params
+
+    @staticmethod
+    def _coerce(key, raw, default):
+        # bool es subclase de int: no aceptar true/false donde se espera un número
+        if isinstance(raw, bool) and not isinstance(default, bool):
+            raise ParamValidationError(f"{key} debe ser numérico")
+        if isinstance(default, bool):
+            if not isinstance(raw, bool):
+                raise ParamValidationError(f"{key} debe ser true/false")
+            return raw
+        if isinstance(default, int):
+            if not isinstance(raw, int):
+                raise ParamValidationError(f"{key} debe ser entero")
+            return raw
+        if isinstance(default, float):
+            if not isinstance(raw, (int, float)):
+                raise ParamValidationError(f"{key} debe ser numérico")
+            return float(raw)
+        if isinstance(default, dict) and not isinstance(raw, dict):
+            raise ParamValidationError(f"{key} debe ser un objeto")
+        if isinstance(default, list) and not isinstance(raw, list):
+            raise ParamValidationError(f"{key} debe ser una lista")
+        if isinstance(default, str) and not isinstance(raw, str):
+            raise ParamValidationError(f"{key} debe ser texto")
+        return raw
+
+    def _audit(self, entry):
+        record = {'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+                  'bot': self.name, 'pid': os.getpid(), 'file': str(self.path)}
+        record.update(entry)
+        try:
+            with open(self.audit_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        except OSError as e:
+            self.log(f"⚠️  No se pudo escribir auditoría de parámetros: {e}")
+
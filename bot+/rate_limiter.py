@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+"""
+🚦 LIMITADOR DE PESO PARA LA API REST DE BINANCE
+=================================================
+Binance cobra un "peso" por cada request (klines, depth, ticker...) y
+limita el peso usado por minuto y por IP: al pasarse responde 429 y, si se
+insiste, 418 con un ban. Este módulo envuelve el Client de python-binance:
+
+- Lleva la cuenta del peso del minuto y se sincroniza con la cabecera
+  X-MBX-USED-WEIGHT-1M que devuelve Binance (incluye a otros bots de la IP).
+- Las órdenes y cancelaciones tienen prioridad: los datos solo usan una
+  parte del presupuesto y esperan si hay órdenes en cola.
+- Requests de datos idénticos en vuelo se unen en uno solo.
+- Ante 429/418 se respeta Retry-After; ante otros errores los bots usan
+  Backoff (exponencial con jitter) en lugar de esperas fijas.
+
+Uso:
+    client = RateLimitedClient(Client(API_KEY, API_SECRET), log=log_event)
+    client.get_klines(symbol='BTCUSDT', interval='1m', limit=100)
+"""
+
+import time
+import random
+import threading
+
+# Límite de peso por minuto de Binance spot
+REQUEST_WEIGHT_LIMIT = 6000
+
+# Fracción del presupuesto que pueden usar los requests de datos (el resto queda para órdenes)
+DATA_WEIGHT_SHARE = 0.8
+
+PRIORITY_ORDER = 0
+PRIORITY_DATA = 1
+
+# Métodos del Client que envían o cancelan órdenes
+ORDER_METHODS = frozenset({
+    'create_order', 'create_test_order', 'cancel_order',
+    'order_market', 'order_market_buy', 'order_market_sell',
+    'order_limit', 'order_limit_buy', 'order_limit_sell',
+    'create_oco_order', 'order_oco_buy', 'order_oco_sell'
+})
+
+
+def klines_weight(kwargs):
+    limit = int(kwargs.get('limit', 500))
+    if limit < 100:
+        return 1
+    if limit < 500:
+        return 2
+    if limit <= 1000:
+        return 5
+    return 10
+
+
+def depth_weight(kwargs):
+    limit = int(kwargs.get('limit', 100))
+    if limit <= 100:
+        return 5
+    if limit <= 500:
+        return 25
+    if limit <= 1000:
+        return 50
+    return 250
+
+
+# Peso de cada método del Client (número o función de los argumentos)
+ENDPOINT_WEIGHTS = {
+    'ping': 1,
+    'get_server_time': 1,
+    'get_exchange_info': 20,
+    'get_symbol_info': 20,
+    'get_klines': klines_weight,
+    'get_symbol_ticker': lambda kwargs: 2 if 'symbol' in kwargs else 4,
+    'get_orderbook_ticker': lambda kwargs: 2 if 'symbol' in kwargs else 4,
+    'get_ticker': lambda kwargs: 2 if 'symbol' in kwargs else 80,
+    'get_order_book': depth_weight,
+    'get_account': 20,
+    'get_asset_balance': 20,
+    'get_order': 4,
+    'get_open_orders': lambda kwargs: 6 if 'symbol' in kwargs else 80,
+    'get_all_orders': 20,
+    'get_my_trades': 20,
+}
+ENDPOINT_WEIGHTS.update({name: 1 for name in ORDER_METHODS})
+
+
+def rate_limit_info(error):
+    """(status HTTP, segundos de Retry-After) de una excepción de la API, si los trae"""
+    status = getattr(error, 'status_code', None)
+    response = getattr(error, 'response', None)
+    retry_after = getattr(error, 'retry_after', None)
+    headers = getattr(response, 'headers', None)
+    if retry_after is not None:
+        try:
+            retry_after = float(retry_after)
+        except (TypeError, ValueError):
+            retry_after = None
+    elif headers:
+        try:
+            retry_after = float(headers.get('Retry-After'))
+        except (TypeError, ValueError):
+            retry_after = None
+    return status, retry_after
+
+
+class Backoff:
+    """Espera exponencial con jitter entre reintentos (respeta Retry-After si lo hay)"""
+
+    def __init__(self, base=1.0, cap=60.0, factor=2.0):
+        self.base = base
+        self.cap = cap
+        self.factor = factor
+        self.attempts = 0
+
+    def next_delay(self, error=None):
+        """Segundos a esperar antes del próximo intento"""
+        _, retry_after = rate_limit_info(error) if error is not None else (None, None)
+        ceiling = min(self.cap, self.base * self.factor ** self.attempts)
+        self.attempts += 1
+        if retry_after:
+            return max(retry_after, ceiling / 2)
+        # Mitad fija + mitad aleatoria: nunca 0 y sin reintentos sincronizados entre bots
+        return ceiling / 2 + random.uniform(0, ceiling / 2)
+
+    def reset(self):
+        self.attempts = 0
+
+
+class WeightScheduler:
+    """Presupuesto de peso por minuto compartido por todos los hilos del proceso"""
+
+    def __init__(self, weight_limit=REQUEST_WEIGHT_LIMIT, data_share=DATA_WEIGHT_SHARE):
+        self.weight_limit = weight_limit
+        self.data_limit = int(weight_limit * data_share)
+        self.used_weight = 0
+        self.blocked_until = 0.0
+        self.orders_waiting = 0
+        self._window = int(time.time() // 60)
+        self._cond = threading.Condition()
+        self.stats = {'waits': 0, 'wait_seconds': 0.0, 'http_429': 0, 'http_418': 0}
+
+    def _roll_window(self, now):
+        # Ventanas alineadas al minuto, como las cuenta Binance
+        window = int(now // 60)
+        if window != self._window:
+            self._window = window
+            self.used_weight = 0
+
+    def acquire(self, weight, priority=PRIORITY_DATA):
+        """Reservar peso; bloquea hasta que haya presupuesto"""
+        waited_since = None
+        with self._cond:
+            if priority == PRIORITY_ORDER:
+                self.orders_waiting += 1
+            try:
+                while True:
+                    now = time.time()
+                    self._roll_window(now)
+                    limit = self.weight_limit if priority == PRIORITY_ORDER else self.data_limit
+                    can_go = (now >= self.blocked_until and self.used_weight + weight <= limit and
+                              (priority == PRIORITY_ORDER or not self.orders_waiting))
+                    if can_go:
+                        self.used_weight += weight
+                        break
+                    if waited_since is None:
+                        waited_since = now
+                        self.stats['waits'] += 1
+                    if now < self.blocked_until:
+                        timeout = self.blocked_until - now
+                    else:
+                        timeout = (self._window + 1) * 60 - now
+                    self._cond.wait(max(0.01, timeout))
+            finally:
+                if priority == PRIORITY_ORDER:
+                    self.orders_waiting -= 1
+                    self._cond.notify_all()
+            if waited_since is not None:
+                self.stats['wait_seconds'] += time.time() - waited_since
+
+    def observe(self, used_weight):
+        """Sincronizar con el peso que informa Binance (cuenta todo lo de la IP)"""
+        with self._cond:
+            self._roll_window(time.time())
+            if used_weight > self.used_weight:
+                self.used_weight = used_weight
+
+    def penalize(self, status, retry_after=None):
+        """Bloquear todos los requests tras un 429/418"""
+        now = time.time()
+        with self._cond:
+            self.stats['http_418' if status == 418 else 'http_429'] += 1
+            pause = retry_after or (120 if status == 418 else 60 - now % 60)
+            self.blocked_until = max(self.blocked_until, now + pause)
+            self.used_weight = self.weight_limit
+            self._cond.notify_all()
+        return pause
+
+    def snapshot(self):
+        with self._cond:
+            self._roll_window(time.time())
+            return {
+                'used_weight': self.used_weight,
+                'weight_limit': self.weight_limit,
+                'blocked_for': max(0.0, round(self.blocked_until - time.time(), 1)),
+                **self.stats
+            }
+
+
+class _InFlight:
+    """Request de datos en curso al que se pueden sumar otros hilos"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+    def wait(self):
+        self.done.wait()
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+class RateLimitedClient:
+    """Envuelve el Client de Binance con presupuesto de peso, prioridades y unión de requests.
+
+    Los métodos sin peso conocido se delegan tal cual al Client original.
+    Los resultados unidos se comparten entre hilos: no modificarlos en el lugar.
+    """
+
+    def __init__(self, client, scheduler=None, max_retries=3, log=print):
+        self.client = client
+        self.scheduler = scheduler or WeightScheduler()
+        self.max_retries = max_retries
+        self.log = log
+        self._inflight = {}
+        self._inflight_lock = threading.Lock()
+        self.stats = {'calls': 0, 'coalesced': 0, 'retries': 0}
+
+    def __getattr__(self, name):
+        attr = getattr(self.client, name)
+        if name in ENDPOINT_WEIGHTS and callable(attr):
+            return lambda *args, **kwargs: self.call(name, *args, **kwargs)
+        return attr
+
+    def call(self, name, *args, **kwargs):
+        """Ejecutar un método del Client respetando el presupuesto de peso"""
+        self.stats['calls'] += 1
+        if name in ORDER_METHODS:
+            return self._execute(name, PRIORITY_ORDER, args, kwargs)
+
+        key = (name, args, tuple(sorted(kwargs.items())))
+        with self._inflight_lock:
+            pending = self._inflight.get(key)
+            leader = pending is None
+            if leader:
+                pending = self._inflight[key] = _InFlight()
+        if not leader:
+            self.stats['coalesced'] += 1
+            return pending.wait()
+
+        try:
+            pending.result = self._execute(name, PRIORITY_DATA, args, kwargs)
+            return pending.result
+        except Exception as e:
+            pending.error = e
+            raise
+        finally:
+            with self._inflight_lock:
+                del self._inflight[key]
+            pending.done.set()
+
+    def _execute(self, name, priority, args, kwargs):
+        weight = ENDPOINT_WEIGHTS[name]
+        weight = weight(kwargs) if callable(weight) else weight
+        method = getattr(self.client, name)
+
+        for attempt in range(self.max_retries):
+            self.scheduler.acquire(weight, priority)
+            try:
+                result = method(*args, **kwargs)
+            except Exception as e:
+                self._observe_headers(getattr(getattr(e, 'response', None), 'headers', None))
+                status, retry_after = rate_limit_info(e)
+                if status not in (429, 418):
+                    raise
+                pause = self.scheduler.penalize(status, retry_after)
+                self.log(f"🚦 Binance respondió {status} en {name}: pausa de {pause:.0f}s")
+                # Una orden rechazada por límite no se ejecutó, pero puede que ya no sirva: no reintentar
+                if priority == PRIORITY_ORDER or attempt == self.max_retries - 1:
+                    raise
+                self.stats['retries'] += 1
+                continue
+            self._observe_headers(getattr(getattr(self.client, 'response', None), 'headers', None))
+            return result
+
+    def _observe_headers(self, headers):
+        if not headers:
+            return
+        try:
+            used_weight = int(headers.get('X-MBX-USED-WEIGHT-1M') or headers.get('x-mbx-used-weight-1m'))
+        except (TypeError, ValueError):
+            return
+        self.scheduler.observe(used_weight)
+
+    def snapshot(self):
+        """Estado del limitador (para métricas)"""
+        return {**self.scheduler.snapshot(), **self.stats}
@@ -0,0 +1,614 @@
+#!/usr/bin/env python3
+"""
+🛡️ SERVICIO DE RIESGO DE PORTAFOLIO (TODOS LOS BOTS, TODOS LOS SÍMBOLOS)
+=========================================================================
+Cada bot controlaba su riesgo por su cuenta: nadie veía la exposición total
+de la flota y los límites de secure_config (max_position_size,
+stop_loss_limit, max_daily_trades) no los leía ningún bot. Este servicio es
+un proceso local que todos los bots consultan por un socket Unix antes de
+abrir una posición:
+
+- Capital de la flota: suma del capital que reporta cada bot.
+- Tamaño por posición: max_position_size x capital de la flota.
+- Exposición bruta: max_portfolio_exposure x capital de la flota.
+- Exposición correlacionada: las posiciones abiertas ponderadas por la
+  correlación de retornos con el símbolo nuevo (max_correlated_exposure).
+- Pérdida diaria: P&L realizado + no realizado del día contra
+  stop_loss_limit x capital de la flota; al pasarla no se abren posiciones.
+- Trades diarios de toda la flota contra max_daily_trades.
+
+`open` decide y reserva en un solo paso bajo un lock, así dos bots no pueden
+pasar el mismo límite a la vez. Si el límite que aprieta es de tamaño, la
+respuesta trae el nocional máximo permitido y el bot puede achicar la orden.
+
+Los precios llegan con cada consulta y con `mark`; la correlación se calcula
+con retornos en buckets de 5 minutos y se recalcula como mucho una vez por
+minuto, así cada respuesta es aritmética sobre unas pocas posiciones.
+
+Si el servicio no está corriendo, los bots siguen solo con sus límites
+locales (o bloquean aperturas con RISK_SERVICE_REQUIRED=1).
+
+Uso:
+    python risk_service.py                    # iniciar el servicio
+    python risk_service.py --status           # estado de la flota
+    python risk_service.py --bench            # latencia de una consulta por el socket
+    risk = RiskClient('ml')                   # en el bot
+    notional, reason = risk.allow_open('BTCUSDT', 65.0, 'ml:BTCUSDT', equity=100.0, price=65000.0)
+"""
+
+import os
+import json
+import time
+import socket
+import argparse
+import datetime
+import threading
+import socketserver
+from collections import deque
+
+import numpy as np
+
+DEFAULT_SOCKET = os.getenv('RISK_SERVICE_SOCKET', '/tmp/botia_risk.sock')
+
+# Sin servicio: False = abrir con los límites locales del bot, True = no abrir
+RISK_SERVICE_REQUIRED = os.getenv('RISK_SERVICE_REQUIRED', '0') == '1'
+
+# Tras una falla de conexión, los bots no reintentan el socket durante este tiempo
+RECONNECT_SECONDS = 30
+
+# Límites por defecto (secure_config los sobreescribe si está disponible)
+DEFAULT_LIMITS = {
+    'max_daily_trades': 50,            # Aperturas de toda la flota por día
+    'max_position_size': 0.1,          # Nocional de una posición / capital de la flota
+    'stop_loss_limit': 0.05,           # Pérdida diaria máxima / capital de la flota
+    'max_portfolio_exposure': 0.5,     # Suma de nocionales abiertos / capital de la flota
+    'max_correlated_exposure': 0.4,    # Exposición ponderada por correlación / capital de la flota
+}
+
+# Correlación de retornos
+RETURN_BUCKET_SECONDS = 300            # Un precio por símbolo cada 5 minutos
+CORRELATION_WINDOW = 288               # Un día de buckets
+MIN_CORRELATION_SAMPLES = 30           # Retornos comunes mínimos para confiar en la correlación
+UNKNOWN_CORRELATION = 0.5              # Supuesto para pares sin historia suficiente
+CORRELATION_REFRESH_SECONDS = 60
+
+SIDE_SIGN = {'LONG': 1.0, 'BUY': 1.0, 'SHORT': -1.0, 'SELL': -1.0}
+
+
+def load_limits():
+    """Límites de riesgo desde secure_config (o los valores por defecto)"""
+    limits = dict(DEFAULT_LIMITS)
+    try:
+        from secure_config import get_config
+        trading = get_config().get_trading_config()
+        limits.update({key: trading[key] for key in limits if key in trading})
+    except ImportError:
+        pass
+    return limits
+
+
+def pairwise_correlation(returns, min_samples=MIN_CORRELATION_SAMPLES, default=UNKNOWN_CORRELATION):
+    """Correlación por pares de filas con NaN (solo observaciones comunes a cada par).
+
+    returns: (símbolos, T) con NaN donde falta el retorno. Todas las sumas por
+    par salen de productos matriciales con la máscara de observaciones; los
+    pares con menos de min_samples retornos comunes usan `default`.
+    """
+    returns = np.asarray(returns, dtype=np.float64)
+    mask = np.isfinite(returns)
+    observed = mask.astype(np.float64)
+    values = np.where(mask, returns, 0.0)
+
+    count = observed @ observed.T
+    sums = values @ observed.T             # sums[i, j] = suma de i donde j también tiene dato
+    squares = (values * values) @ observed.T
+    products = values @ values.T
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        covariance = products - sums * sums.T / count
+        variance = squares - sums * sums / count
+        corr = covariance / np.sqrt(variance * variance.T)
+
+    corr = np.where((count >= min_samples) & np.isfinite(corr), np.clip(corr, -1.0, 1.0), default)
+    np.fill_diagonal(corr, 1.0)
+    return corr
+
+
+class PriceHistory:
+    """Último precio por símbolo y bucket de tiempo (para retornos y marcas)"""
+
+    def __init__(self, bucket_seconds=RETURN_BUCKET_SECONDS, window=CORRELATION_WINDOW):
+        self.bucket_seconds = bucket_seconds
+        self.window = window
+        self._buckets = {}
+        self.last = {}
+
+    def mark(self, symbol, price, now):
+        price = float(price)
+        if not price > 0:
+            return
+        self.last[symbol] = price
+        bucket = int(now // self.bucket_seconds)
+        history = self._buckets.get(symbol)
+        if history is None:
+            history = self._buckets[symbol] = deque(maxlen=self.window + 1)
+        if history and history[-1][0] == bucket:
+            history[-1] = (bucket, price)
+        else:
+            history.append((bucket, price))
+
+    def returns(self, symbols, now):
+        """Log-retornos (símbolos, window) alineados por bucket; NaN donde falta"""
+        last_bucket = int(now // self.bucket_seconds)
+        first_bucket = last_bucket - self.window
+        prices = np.full((len(symbols), self.window + 1), np.nan)
+        for row, symbol in enumerate(symbols):
+            history = self._buckets.get(symbol)
+            if not history:
+                continue
+            buckets, values = np.array(history).T
+            slots = buckets.astype(np.int64) - first_bucket
+            keep = slots >= 0
+            prices[row, slots[keep]] = values[keep]
+        return np.diff(np.log(prices), axis=1)
+
+
+class RiskEngine:
+    """Estado de riesgo de la flota (exposición, P&L diario, trades, correlaciones)"""
+
+    def __init__(self, limits=None, journal=None, clock=time.time):
+        self.limits = {**DEFAULT_LIMITS, **(limits or {})}
+        self.journal = journal
+        self.clock = clock
+        self.prices = PriceHistory()
+        self.capital = {}
+        self.positions = {}
+        self.day = datetime.date.today().isoformat()
+        self.realized_pnl = 0.0
+        self.trade_count = 0
+        self.stats = {'checks': 0, 'opens': 0, 'denied': 0, 'reduced': 0, 'closes': 0}
+        self._lock = threading.Lock()
+        self._corr_symbols = ()
+        self._corr = np.ones((0, 0))
+        self._corr_at = 0.0
+        if journal is not None:
+            self._restore(journal.restore())
+
+    def _restore(self, state):
+        if not state:
+            return
+        self.capital = state.get('capital', {})
+        self.positions = state.get('positions', {})
+        if state.get('day') == self.day:
+            self.realized_pnl = state.get('realized_pnl', 0.0)
+            self.trade_count = state.get('trade_count', 0)
+
+    def _save(self, event):
+        if self.journal is not None:
+            self.journal.record(event, day=self.day, realized_pnl=self.realized_pnl, trade_count=self.trade_count,
+                                capital=self.capital, positions=self.positions)
+
+    def _roll_day(self):
+        today = datetime.date.today().isoformat()
+        if today != self.day:
+            self.day = today
+            self.realized_pnl = 0.0
+            self.trade_count = 0
+
+    @property
+    def fleet_capital(self):
+        return sum(self.capital.values())
+
+    def _observe(self, bot, equity, symbol, price):
+        self._roll_day()
+        if equity is not None:
+            self.capital[bot] = float(equity)
+        if price is not None:
+            self.prices.mark(symbol, price, self.clock())
+
+    def _market_value(self, position):
+        """Nocional a precio actual (o al de entrada si no hay marca)"""
+        price = self.prices.last.get(position['symbol'])
+        if price is None or not position.get('quantity'):
+            return position['notional']
+        return position['quantity'] * price
+
+    def unrealized_pnl(self):
+        total = 0.0
+        for position in self.positions.values():
+            if position.get('quantity'):
+                total += SIDE_SIGN[position['side']] * (self._market_value(position) - position['notional'])
+        return total
+
+    def correlation(self, symbols):
+        """Matriz de correlación para `symbols` (cacheada CORRELATION_REFRESH_SECONDS)"""
+        now = self.clock()
+        symbols = tuple(symbols)
+        if symbols != self._corr_symbols or now - self._corr_at > CORRELATION_REFRESH_SECONDS:
+            self._corr = pairwise_correlation(self.prices.returns(symbols, now))
+            self._corr_symbols = symbols
+            self._corr_at = now
+        return self._corr
+
+    def _correlated_exposure(self, symbol, side):
+        """Exposición de las posiciones abiertas en la dirección del símbolo nuevo"""
+        if not self.positions:
+            return 0.0
+        # Todos los símbolos con precios: el conjunto casi no cambia y la matriz cacheada sirve para cualquier consulta
+        symbols = sorted(set(self.prices.last) | {position['symbol'] for position in self.positions.values()} | {symbol})
+        corr = self.correlation(symbols)
+        row = corr[symbols.index(symbol)]
+        index = {name: i for i, name in enumerate(symbols)}
+        sign = SIDE_SIGN[side]
+        exposure = sum(row[index[position['symbol']]] * SIDE_SIGN[position['side']] * sign * self._market_value(position)
+                       for position in self.positions.values())
+        return max(exposure, 0.0)
+
+    def _evaluate(self, symbol, notional, side):
+        """(nocional permitido, motivo si se redujo o bloqueó)"""
+        capital = self.fleet_capital
+        if capital <= 0:
+            return 0.0, "sin capital registrado en la flota"
+        limits = self.limits
+        if self.trade_count >= limits['max_daily_trades']:
+            return 0.0, f"límite diario de trades de la flota ({self.trade_count}/{limits['max_daily_trades']})"
+
+        daily_pnl = self.realized_pnl + self.unrealized_pnl()
+        max_loss = limits['stop_loss_limit'] * capital
+        if daily_pnl <= -max_loss:
+            return 0.0, f"pérdida diaria de la flota ${daily_pnl:.2f} (límite -${max_loss:.2f})"
+
+        gross = sum(self._market_value(position) for position in self.positions.values())
+        room = (
+            (notional, None),
+            (limits['max_position_size'] * capital, "tamaño máximo por posición"),
+            (limits['max_portfolio_exposure'] * capital - gross, "exposición total de la flota"),
+            (limits['max_correlated_exposure'] * capital - self._correlated_exposure(symbol, side),
+             "exposición correlacionada"),
+        )
+        allowed, reason = min(room, key=lambda item: item[0])
+        return max(allowed, 0.0), reason
+
+    def check(self, bot, symbol, notional, side='LONG', equity=None, price=None):
+        """Consultar sin reservar: {'notional': permitido, 'reason': motivo o None}"""
+        with self._lock:
+            self._observe(bot, equity, symbol, price)
+            self.stats['checks'] += 1
+            allowed, reason = self._evaluate(symbol, float(notional), side)
+            return {'notional': allowed, 'reason': reason}
+
+    def open(self, bot, symbol, notional, position_id, side='LONG', equity=None, price=None, min_notional=None):
+        """Decidir y reservar la posición; min_notional=None acepta cualquier nocional reducido"""
+        with self._lock:
+            self._observe(bot, equity, symbol, price)
+            self.stats['checks'] += 1
+            notional = float(notional)
+            allowed, reason = self._evaluate(symbol, notional, side)
+            if allowed <= 0 or (min_notional is not None and allowed < float(min_notional)):
+                self.stats['denied'] += 1
+                return {'notional': 0.0, 'reason': reason}
+
+            if allowed < notional:
+                self.stats['reduced'] += 1
+            self.positions[f"{bot}/{position_id}"] = {
+                'bot': bot, 'symbol': symbol, 'side': side, 'notional': allowed,
+                'quantity': allowed / float(price) if price else None, 'opened_at': self.clock()
+            }
+            self.trade_count += 1
+            self.stats['opens'] += 1
+            self._save('open')
+            return {'notional': allowed, 'reason': reason}
+
+    def close(self, bot, position_id, pnl=0.0, equity=None):
+        """Liberar la posición y sumar su P&L al día"""
+        with self._lock:
+            self._roll_day()
+            if equity is not None:
+                self.capital[bot] = float(equity)
+            known = self.positions.pop(f"{bot}/{position_id}", None) is not None
+            self.realized_pnl += float(pnl)
+            self.stats['closes'] += 1
+            self._save('close')
+            return {'known': known}
+
+    def sync(self, bot, positions, equity=None):
+        """Reemplazar las posiciones de un bot (al arrancar tras restaurar su estado)"""
+        with self._lock:
+            self._roll_day()
+            if equity is not None:
+                self.capital[bot] = float(equity)
+            self.positions = {key: position for key, position in self.positions.items() if position['bot'] != bot}
+            now = self.clock()
+            for position in positions:
+                price = position.get('price')
+                if price:
+                    self.prices.mark(position['symbol'], price, now)
+                self.positions[f"{bot}/{position['id']}"] = {
+                    'bot': bot, 'symbol': position['symbol'], 'side': position.get('side', 'LONG'),
+                    'notional': float(position['notional']),
+                    'quantity': float(position['notional']) / float(price) if price else None,
+                    'opened_at': now
+                }
+            self._save('sync')
+            return {'positions': len(positions)}
+
+    def mark(self, prices):
+        """Registrar precios {símbolo: precio} (marca a mercado y correlaciones)"""
+        with self._lock:
+            now = self.clock()
+            for symbol, price in prices.items():
+                self.prices.mark(symbol, price, now)
+            return {'symbols': len(prices)}
+
+    def snapshot(self):
+        with self._lock:
+            self._roll_day()
+            capital = self.fleet_capital
+            gross = sum(self._market_value(position) for position in self.positions.values())
+            by_bot = {}
+            for position in self.positions.values():
+                by_bot[position['bot']] = by_bot.get(position['bot'], 0) + 1
+            return {
+                'day': self.day,
+                'fleet_capital': round(capital, 2),
+                'capital': self.capital,
+                'gross_exposure': round(gross, 2),
+                'exposure_pct': round(gross / capital * 100, 2) if capital else 0.0,
+                'realized_pnl': round(self.realized_pnl, 4),
+                'unrealized_pnl': round(self.unrealized_pnl(), 4),
+                'trade_count': self.trade_count,
+                'open_positions': by_bot,
+                'limits': self.limits,
+                **self.stats
+            }
+
+
+def make_handler(engine):
+    """Handler de líneas JSON: {"method": ..., "params": {...}} -> {"ok": ..., "result": ...}"""
+
+    methods = {
+        'check': engine.check,
+        'open': engine.open,
+        'close': engine.close,
+        'sync': engine.sync,
+        'mark': engine.mark,
+        'status': engine.snapshot,
+    }
+
+    class RiskHandler(socketserver.StreamRequestHandler):
+        def handle(self):
+            for line in self.rfile:
+                try:
+                    request = json.loads(line)
+                    response = {'ok': True, 'result': methods[request['method']](**request.get('params', {}))}
+                except (KeyError, TypeError) as e:
+                    response = {'ok': False, 'error': f"Método o parámetro inválido: {e}"}
+                except Exception as e:
+                    response = {'ok': False, 'error': str(e)}
+                self.wfile.write(json.dumps(response, separators=(',', ':')).encode('utf-8') + b"\n")
+                self.wfile.flush()
+
+    return RiskHandler
+
+
+def _socket_in_use(path):
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(path)
+        return True
+    except OSError:
+        return False
+    finally:
+        sock.close()
+
+
+def start_service(socket_path=DEFAULT_SOCKET, engine=None):
+    """Iniciar el servicio en un hilo daemon; devuelve (server, engine)"""
+    if os.path.exists(socket_path):
+        if _socket_in_use(socket_path):
+            raise OSError(f"Ya hay un servicio de riesgo escuchando en {socket_path}")
+        os.unlink(socket_path)
+
+    engine = engine or RiskEngine(load_limits())
+    server = socketserver.ThreadingUnixStreamServer(socket_path, make_handler(engine))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='risk-service', daemon=True).start()
+    return server, engine
+
+
+class RiskServiceError(Exception):
+    """Error reportado por el servicio de riesgo"""
+
+
+class RiskClient:
+    """Cliente para los bots.
+
+    Si el servicio no responde, allow_open deja pasar el nocional pedido (o
+    lo bloquea con required=True) y vuelve a probar el socket pasados
+    RECONNECT_SECONDS. close/sync/mark sin servicio no hacen nada.
+    """
+
+    def __init__(self, bot, socket_path=DEFAULT_SOCKET, timeout=2.0, required=RISK_SERVICE_REQUIRED, log=print):
+        self.bot = bot
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self.required = required
+        self.log = log
+        self._sock = None
+        self._reader = None
+        self._lock = threading.Lock()
+        self._retry_at = 0.0
+        self.stats = {'service_calls': 0, 'unavailable': 0, 'denied': 0}
+
+    def allow_open(self, symbol, notional, position_id, side='LONG', equity=None, price=None, min_notional=None):
+        """Reservar la apertura: (nocional permitido, motivo); 0.0 si no se puede abrir"""
+        result = self._call('open', {'bot': self.bot, 'symbol': symbol, 'notional': float(notional),
+                                     'position_id': position_id, 'side': side,
+                                     'equity': None if equity is None else float(equity),
+                                     'price': None if price is None else float(price),
+                                     'min_notional': None if min_notional is None else float(min_notional)})
+        if result is None:
+            if self.required:
+                return 0.0, "servicio de riesgo no disponible"
+            return float(notional), None
+        if result['notional'] <= 0:
+            self.stats['denied'] += 1
+        return result['notional'], result['reason']
+
+    def closed(self, position_id, pnl=0.0, equity=None):
+        self._call('close', {'bot': self.bot, 'position_id': position_id, 'pnl': float(pnl),
+                             'equity': None if equity is None else float(equity)})
+
+    def sync(self, positions, equity=None):
+        """positions: [{'id', 'symbol', 'notional', 'price', 'side'}] abiertas por este bot"""
+        self._call('sync', {'bot': self.bot, 'positions': positions,
+                            'equity': None if equity is None else float(equity)})
+
+    def mark(self, prices):
+        self._call('mark', {'prices': {symbol: float(price) for symbol, price in prices.items()}})
+
+    def status(self):
+        return self._call('status', {})
+
+    def _call(self, method, params):
+        if time.time() < self._retry_at:
+            self.stats['unavailable'] += 1
+            return None
+        try:
+            response = self._request({'method': method, 'params': params})
+        except OSError as e:
+            self._disconnect()
+            self._retry_at = time.time() + RECONNECT_SECONDS
+            self.stats['unavailable'] += 1
+            if os.path.exists(self.socket_path) or self.required:
+                self.log(f"⚠️  Servicio de riesgo no disponible ({e}): "
+                         f"{'aperturas bloqueadas' if self.required else 'solo límites locales'}")
+            return None
+        self.stats['service_calls'] += 1
+        if not response['ok']:
+            raise RiskServiceError(response['error'])
+        return response['result']
+
+    def _request(self, request):
+        with self._lock:
+            if self._sock is None:
+                sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                sock.settimeout(self.timeout)
+                try:
+                    sock.connect(self.socket_path)
+                except OSError:
+                    sock.close()
+                    raise
+                self._sock = sock
+                self._reader = sock.makefile('rb')
+            self._sock.sendall(json.dumps(request, separators=(',', ':')).encode('utf-8') + b"\n")
+            line = self._reader.readline()
+            if not line:
+                raise ConnectionResetError("el servicio de riesgo cerró la conexión")
+            return json.loads(line)
+
+    def _disconnect(self):
+        with self._lock:
+            if self._sock is not None:
+                try:
+                    self._reader.close()
+                    self._sock.close()
+                except OSError:
+                    pass
+            self._sock = None
+            self._reader = None
+
+
+def run_benchmark(loops=5000):
+    """Latencia de check/open/close por el socket con una flota sintética"""
+    import tempfile
+
+    socket_path = os.path.join(tempfile.mkdtemp(), 'risk_bench.sock')
+    engine = RiskEngine({'max_daily_trades': 10 ** 9})
+    server, engine = start_service(socket_path, engine)
+    client = RiskClient('bench', socket_path)
+
+    # 20 símbolos con dos días de precios y 19 posiciones abiertas
+    rng = np.random.default_rng(7)
+    now = time.time()
+    symbols = [f"SYM{i}" for i in range(20)]
+    paths = 100 * np.exp(np.cumsum(rng.normal(0, 0.002, (len(symbols), 2 * CORRELATION_WINDOW)), axis=1))
+    for step in range(paths.shape[1]):
+        stamp = now - (paths.shape[1] - step) * RETURN_BUCKET_SECONDS
+        for symbol, price in zip(symbols, paths[:, step]):
+            engine.prices.mark(symbol, price, stamp)
+    client.sync([{'id': symbol, 'symbol': symbol, 'notional': 100.0, 'price': paths[i, -1]}
+                 for i, symbol in enumerate(symbols[:-1])], equity=100000.0)
+
+    timings = {}
+    for name, call in (
+            ('check', lambda i: client._call('check', {'bot': 'bench', 'symbol': 'SYM19', 'notional': 50.0,
+                                                       'price': paths[-1, -1]})),
+            ('open+close', lambda i: (client.allow_open('SYM19', 50.0, f"p{i}", price=paths[-1, -1]),
+                                      client.closed(f"p{i}", 0.0))),
+            ('mark', lambda i: client.mark({'SYM19': paths[-1, -1]}))):
+        call(0)
+        samples = np.empty(loops)
+        for i in range(loops):
+            start = time.perf_counter()
+            call(i)
+            samples[i] = time.perf_counter() - start
+        timings[name] = samples * 1e6
+
+    in_process = time.perf_counter()
+    for _ in range(loops):
+        engine.check('bench', 'SYM19', 50.0)
+    in_process_us = (time.perf_counter() - in_process) / loops * 1e6
+
+    print(f"🛡️  Flota sintética: {len(symbols)} símbolos, {len(engine.positions)} posiciones, "
+          f"{loops} consultas por operación")
+    for name, samples in timings.items():
+        print(f"   {name:<11} p50 {np.percentile(samples, 50):7.1f} µs | p99 {np.percentile(samples, 99):7.1f} µs")
+    print(f"   check en proceso (sin socket): {in_process_us:.1f} µs")
+    client._disconnect()
+    server.shutdown()
+    server.server_close()
+    os.unlink(socket_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servicio local de riesgo de portafolio para todos los bots")
+    parser.add_argument('--socket', default=DEFAULT_SOCKET)
+    parser.add_argument('--status', action='store_true', help="Mostrar el estado del servicio en ejecución")
+    parser.add_argument('--bench', action='store_true', help="Medir la latencia de las consultas")
+    args = parser.parse_args()
+
+    if args.status:
+        status = RiskClient('status', args.socket, required=True)._request({'method': 'status'})
+        print(json.dumps(status['result'], indent=2))
+        return
+    if args.bench:
+        run_benchmark()
+        return
+
+    from state_journal import StateJournal
+
+    # El día (P&L realizado, trades) y las posiciones sobreviven a un reinicio del servicio
+    journal = StateJournal('risk')
+    engine = RiskEngine(load_limits(), journal=journal)
+    server, engine = start_service(args.socket, engine)
+    print(f"🛡️  Servicio de riesgo escuchando en {args.socket} | Límites: {engine.limits}")
+    try:
+        while True:
+            time.sleep(300)
+            status = engine.snapshot()
+            print(f"📊 Capital: ${status['fleet_capital']:.2f} | Exposición: {status['exposure_pct']:.1f}% | "
+                  f"P&L día: ${status['realized_pnl'] + status['unrealized_pnl']:.2f} | "
+                  f"Trades: {status['trade_count']} | Bloqueadas: {status['denied']}")
+    except KeyboardInterrupt:
+        print("🛑 Servicio de riesgo detenido")
+    finally:
+        server.shutdown()
+        server.server_close()
+        journal.close()
+        if os.path.exists(args.socket):
+            os.unlink(args.socket)
+
+
+if __name__ == "__main__":
+    main()
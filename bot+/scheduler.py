@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+⏱️ CICLOS ALINEADOS AL CIERRE DE VELA
+=====================================
+Los bots dormían un tiempo fijo (30 s, 60 s, 5 min) desde que terminaba la
+iteración anterior: el ciclo caía en cualquier punto de la vela, a veces
+decidía con una vela a punto de cerrar y otras releía la misma vela sin
+cambios (requests y predicciones repetidas). CandleScheduler despierta la
+estrategia apenas cierra cada vela del intervalo y evita trabajo repetido:
+
+- wait() duerme hasta el cierre de la próxima vela + CLOSE_DELAY_SECONDS
+  (margen para que el exchange o el sidecar publiquen la vela cerrada).
+- is_new() dice si llegó una vela cerrada posterior a la última procesada;
+  si no llegó todavía, el próximo wait() reintenta a los pocos segundos
+  (hasta MAX_RETRIES) en vez de esperar una vela completa.
+- adapt() elige cada cuántas velas despertar según la volatilidad: todas con
+  volatilidad alta o una posición abierta, hasta max_stride en calma.
+
+Uso:
+    scheduler = CandleScheduler('1m', reference_volatility=0.0008, max_stride=3)
+    while True:
+        df = get_market_data(...)
+        closed = scheduler.closed_count(df['timestamp'])
+        if closed and scheduler.is_new(df['timestamp'].iloc[closed - 1]):
+            ...estrategia con df.iloc[:closed]...
+            scheduler.adapt(volatility, busy=position is not None)
+        scheduler.wait()
+"""
+
+import math
+import time
+import numpy as np
+
+INTERVAL_SECONDS = {
+    '1m': 60, '3m': 180, '5m': 300, '15m': 900, '30m': 1800,
+    '1h': 3600, '2h': 7200, '4h': 14400, '6h': 21600, '12h': 43200, '1d': 86400
+}
+
+CLOSE_DELAY_SECONDS = 2.0   # Margen tras el cierre para que la vela esté publicada
+RETRY_SECONDS = 2.0         # Reintento si la vela cerrada todavía no llegó
+MAX_RETRIES = 8            # 16 s: cubre el KLINES_MAX_AGE del sidecar (velas en memoria compartida)
+
+
+def interval_seconds(interval):
+    """Segundos de un intervalo de Binance ('1m', '1h') o un número de segundos"""
+    if isinstance(interval, str):
+        return INTERVAL_SECONDS[interval]
+    return float(interval)
+
+
+class CandleScheduler:
+    """Despierta la estrategia justo después del cierre de cada vela (o cada stride velas)"""
+
+    def __init__(self, interval, delay=CLOSE_DELAY_SECONDS, reference_volatility=None, max_stride=1,
+                 retry_seconds=RETRY_SECONDS, max_retries=MAX_RETRIES, running=None, log=print,
+                 clock=time.time, sleep=time.sleep):
+        self.seconds = interval_seconds(interval)
+        self.delay = delay
+        self.reference_volatility = reference_volatility
+        self.max_stride = max(1, int(max_stride))
+        self.retry_seconds = retry_seconds
+        self.max_retries = max_retries
+        self.running = running
+        self.log = log
+        self.clock = clock
+        self._sleep = sleep
+        self.stride = 1
+        self.last_candle = None
+        self.retries = 0
+        self._waiting_data = False
+        self.stats = {'wakeups': 0, 'new_candles': 0, 'skipped': 0, 'retries': 0, 'stride': 1}
+
+    def closed_count(self, times, unit=1000, now=None):
+        """Cuántas de las velas (aperturas ordenadas, en ms por defecto) ya cerraron.
+
+        La última fila es la vela en formación: si su hora de cierre ya pasó y no
+        hay otra después, la fuente todavía no publicó el cierre y no se cuenta.
+        """
+        now = self.clock() if now is None else now
+        times = np.asarray(times)
+        return min(int(np.searchsorted(times, (now - self.seconds) * unit, side='right')), max(len(times) - 1, 0))
+
+    def is_new(self, candle_time):
+        """¿La última vela cerrada es posterior a la última procesada? (si lo es, queda registrada)"""
+        self.stats['wakeups'] += 1
+        if candle_time is None or (self.last_candle is not None and candle_time <= self.last_candle):
+            self.stats['skipped'] += 1
+            self._waiting_data = True
+            return False
+        self.last_candle = candle_time
+        self.stats['new_candles'] += 1
+        self._waiting_data = False
+        self.retries = 0
+        return True
+
+    def adapt(self, volatility, busy=False):
+        """Velas entre ciclos: 1 con posición abierta o sin estimación; más en calma (hasta max_stride)"""
+        stride = 1
+        if (not busy and self.reference_volatility and volatility is not None
+                and math.isfinite(volatility) and volatility > 0):
+            stride = int(min(self.max_stride, max(1, self.reference_volatility // volatility)))
+        if stride != self.stride:
+            self.log(f"⏱️ Ciclo cada {stride} vela(s) de {self.seconds / 60:g} min")
+        self.stride = self.stats['stride'] = stride
+        return stride
+
+    def next_close(self, now=None):
+        """Momento (epoch) del cierre de la vela stride + margen"""
+        now = self.clock() if now is None else now
+        return (math.floor((now - self.delay) / self.seconds) + self.stride) * self.seconds + self.delay
+
+    def wait(self):
+        """Dormir hasta el próximo ciclo; con running(), de a un segundo para cortar enseguida"""
+        if self._waiting_data and self.retries < self.max_retries:
+            # La vela cerrada todavía no se publicó: reintentar en unos segundos
+            self.retries += 1
+            self.stats['retries'] += 1
+            wakeup = self.clock() + self.retry_seconds
+        else:
+            self._waiting_data = False
+            self.retries = 0
+            wakeup = self.next_close()
+        while self.running is None or self.running():
+            remaining = wakeup - self.clock()
+            if remaining <= 0:
+                break
+            self._sleep(min(remaining, 1.0) if self.running is not None else remaining)
+
+    def summary(self):
+        return dict(self.stats)
+
+
+def simulate(hours=6, interval='1m', seed=0):
+    """Loop fijo de 30 s vs scheduler alineado con reloj simulado: media sesión agitada y media en calma,
+    velas publicadas con 0-6 s de demora"""
+    from volatility import VolatilityEstimator
+
+    seconds = interval_seconds(interval)
+    count = int(hours * 3600 // seconds)
+    rng = np.random.default_rng(seed)
+    sigma = np.where(np.arange(count) < count // 2, 0.0015, 0.0003)
+    close = 65000 * np.exp(np.cumsum(sigma * rng.standard_normal(count)))
+    high = close * (1 + sigma * np.abs(rng.standard_normal(count)))
+    low = close * (1 - sigma * np.abs(rng.standard_normal(count)))
+    start = 1_699_999_980  # Múltiplo de 60: las velas de Binance abren en minutos exactos
+    times = (start + np.arange(count) * seconds) * 1000
+    published = times / 1000 + seconds + rng.uniform(0, 6, count)
+
+    def visible(now):
+        """Velas cerradas ya publicadas + la siguiente (en formación, o vieja si su cierre no se publicó)"""
+        return times[:int(np.searchsorted(published, now, side='right')) + 1]
+
+    # Loop fijo de 30 s: cuántas iteraciones ven una vela cerrada que no habían visto
+    fixed_iterations = fixed_new = 0
+    seen = None
+    now = start + 7.3
+    while now < start + count * seconds:
+        fixed_iterations += 1
+        available = times[:int(np.searchsorted(published, now, side='right'))]
+        if len(available) and available[-1] != seen:
+            fixed_new += 1
+            seen = available[-1]
+        now += 30
+
+    clock = [start + 7.3]
+    estimator = VolatilityEstimator(span=20, atr_period=10)
+    scheduler = CandleScheduler(interval, reference_volatility=0.001, max_stride=3, log=lambda text: None,
+                                clock=lambda: clock[0], sleep=lambda s: clock.__setitem__(0, clock[0] + s))
+    strides = []
+    while clock[0] < start + count * seconds:
+        candles = visible(clock[0])
+        closed = scheduler.closed_count(candles)
+        if closed and scheduler.is_new(candles[closed - 1]):
+            i = closed - 1
+            estimator.update(int(times[i]), close[i], high[i], low[i])
+            strides.append(scheduler.adapt(estimator.ewma_vol))
+        scheduler.wait()
+    stats = scheduler.summary()
+    half = len(strides) // 2
+    print(f"⏱️ {hours}h de velas de {interval}: loop fijo 30s {fixed_iterations} iteraciones ({fixed_new} con vela nueva)")
+    print(f"   alineado {stats['wakeups']} iteraciones: {stats['new_candles']} con vela nueva, "
+          f"{stats['skipped']} reintentos por demora de publicación | ciclos en calma cada "
+          f"{np.mean(strides[half:]):.1f} velas (agitado: {np.mean(strides[:half]):.1f})")
+
+
+if __name__ == "__main__":
+    simulate()
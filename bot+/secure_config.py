@@ -2,180 +2,343 @@
 """
 Módulo de Configuración Segura
 Maneja las variables de entorno de forma segura para todos los bots
+
+La configuración se carga una sola vez, la primera vez que se usa, en una
+instantánea inmutable (ConfigSnapshot). Importar el módulo no lee el .env
+ni imprime nada; las consultas son lecturas de atributos y se pueden hacer
+dentro de los loops. Para recargar sin reiniciar: config.reload() o
+install_reload_handler() + `kill -HUP <pid>`.
 """
 
 import os
-import sys
+import signal
+import threading
+from dataclasses import dataclass, fields
+from functools import cached_property
 from pathlib import Path
 
 # Intentar importar python-dotenv
 try:
-    from dotenv import load_dotenv
+    from dotenv import load_dotenv, dotenv_values
 except ImportError:
-    print("⚠️  python-dotenv no instalado. Instala con: pip install python-dotenv")
     load_dotenv = None
+    dotenv_values = None
+
+ENV_PATH = Path(__file__).parent / '.env'
+
+# Palabras que marcan una variable como sensible (no se muestra completa)
+SENSITIVE_KEYWORDS = ('key', 'secret', 'token', 'password')
+
+
+def mask_value(var_name, value):
+    """Valor apto para logs: las claves se recortan"""
+    if any(keyword in var_name.lower() for keyword in SENSITIVE_KEYWORDS):
+        return f"{value[:8]}..." if value else "No configurada"
+    return value or "No configurada"
+
+
+@dataclass(frozen=True)
+class ConfigSnapshot:
+    """Instantánea inmutable y tipada de la configuración"""
+
+    environment: str = 'TESTNET'
+
+    # Binance
+    binance_api_key_prod: str = None
+    binance_secret_key_prod: str = None
+    binance_api_key_testnet: str = 'demo_key'
+    binance_secret_key_testnet: str = 'demo_secret'
+
+    # Telegram
+    telegram_token_financial: str = None
+    telegram_chat_id: str = None
+    telegram_token_crypto: str = None
+    telegram_chat_id_crypto: str = None
+
+    # Trading
+    initial_balance_crypto: float = 20.0
+    balance_per_bot: float = 10.0
+    balance_per_stock: float = 1000.0
+    max_daily_trades: int = 50
+    max_position_size: float = 0.1
+    stop_loss_limit: float = 0.05
+    max_portfolio_exposure: float = 0.5
+    max_correlated_exposure: float = 0.4
+
+    # Google Cloud
+    gcp_project_id: str = 'galvanized-env-376523'
+    gcp_zone: str = 'asia-southeast1-a'
+    gcp_vm_crypto: str = 'bot-trading-asia'
+    gcp_vm_ml: str = 'bot-trading-ml'
+
+    @classmethod
+    def from_environ(cls, environ=None):
+        """Construir la instantánea desde las variables de entorno (nombre en mayúsculas)"""
+        environ = os.environ if environ is None else environ
+        values = {}
+        for field in fields(cls):
+            raw = environ.get(field.name.upper())
+            if raw is None or raw == '':
+                continue
+            if field.type in (float, 'float'):
+                values[field.name] = float(raw)
+            elif field.type in (int, 'int'):
+                values[field.name] = int(raw)
+            else:
+                values[field.name] = raw
+        return cls(**values)
+
+    @property
+    def is_production(self):
+        return self.environment.upper() == 'PRODUCTION'
+
+    @cached_property
+    def binance(self):
+        if self.environment == 'PRODUCTION':
+            return {
+                'api_key': self.binance_api_key_prod,
+                'secret_key': self.binance_secret_key_prod,
+                'testnet': False
+            }
+        return {
+            'api_key': self.binance_api_key_testnet,
+            'secret_key': self.binance_secret_key_testnet,
+            'testnet': True
+        }
+
+    @cached_property
+    def trading(self):
+        return {
+            'initial_balance_crypto': self.initial_balance_crypto,
+            'balance_per_bot': self.balance_per_bot,
+            'balance_per_stock': self.balance_per_stock,
+            'max_daily_trades': self.max_daily_trades,
+            'max_position_size': self.max_position_size,
+            'stop_loss_limit': self.stop_loss_limit,
+            'max_portfolio_exposure': self.max_portfolio_exposure,
+            'max_correlated_exposure': self.max_correlated_exposure
+        }
+
+    @cached_property
+    def gcp(self):
+        return {
+            'project_id': self.gcp_project_id,
+            'zone': self.gcp_zone,
+            'vm_crypto': self.gcp_vm_crypto,
+            'vm_ml': self.gcp_vm_ml
+        }
+
 
 class SecureConfig:
     """Clase para manejar configuración segura"""
-    
-    def __init__(self):
-        self.load_environment()
-        self.validate_required_vars()
-    
+
+    def __init__(self, verbose=False):
+        self.verbose = verbose
+        self._snapshot = None
+        self._lock = threading.Lock()
+        self._system_keys = None
+
+    def _log(self, message):
+        if self.verbose:
+            print(message)
+
+    @property
+    def snapshot(self):
+        """Instantánea actual (se carga la primera vez que se pide)"""
+        snapshot = self._snapshot
+        if snapshot is None:
+            with self._lock:
+                if self._snapshot is None:
+                    self.load_environment()
+                    self._snapshot = ConfigSnapshot.from_environ()
+                snapshot = self._snapshot
+        return snapshot
+
+    def reload(self):
+        """Volver a leer el .env y reemplazar la instantánea de forma atómica"""
+        with self._lock:
+            self.load_environment()
+            self._snapshot = ConfigSnapshot.from_environ()
+        self._log(f"🔄 Configuración recargada (ambiente: {self._snapshot.environment})")
+        return self._snapshot
+
     def load_environment(self):
         """Cargar variables de entorno"""
-        # Buscar archivo .env
-        env_path = Path(__file__).parent / '.env'
-        
-        if load_dotenv and env_path.exists():
-            load_dotenv(env_path)
-            print("✅ Variables de entorno cargadas desde .env")
-        elif env_path.exists():
-            print("⚠️  Archivo .env encontrado pero python-dotenv no disponible")
-            print("💡 Las variables se cargarán del sistema")
+        # Las variables del sistema tienen prioridad sobre el .env, también al recargar
+        if self._system_keys is None:
+            self._system_keys = set(os.environ)
+
+        if load_dotenv and ENV_PATH.exists():
+            for var_name, value in dotenv_values(ENV_PATH).items():
+                if var_name not in self._system_keys and value is not None:
+                    os.environ[var_name] = value
+            self._log("✅ Variables de entorno cargadas desde .env")
+        elif ENV_PATH.exists():
+            self._log("⚠️  Archivo .env encontrado pero python-dotenv no disponible")
+            self._log("💡 Las variables se cargarán del sistema (pip install python-dotenv)")
         else:
-            print("⚠️  Archivo .env no encontrado, usando variables del sistema")
-    
+            self._log("⚠️  Archivo .env no encontrado, usando variables del sistema")
+
     def get_env_var(self, var_name, default=None, required=False):
         """Obtener variable de entorno de forma segura"""
+        self.snapshot  # Asegurar que el .env ya fue cargado
         value = os.getenv(var_name, default)
-        
+
         if required and not value:
             raise ValueError(f"❌ Variable requerida no encontrada: {var_name}")
-        
+
         # No mostrar valores sensibles en logs
-        if any(keyword in var_name.lower() for keyword in ['key', 'secret', 'token', 'password']):
-            display_value = f"{value[:8]}..." if value else "No configurada"
-        else:
-            display_value = value or "No configurada"
-            
-        print(f"🔧 {var_name}: {display_value}")
+        self._log(f"🔧 {var_name}: {mask_value(var_name, value)}")
         return value
-    
+
     def validate_required_vars(self):
         """Validar que las variables críticas estén configuradas"""
+        snapshot = self.snapshot
         required_vars = []
         warnings = []
-        
+
         # Verificar configuración de ambiente
-        environment = self.get_env_var('ENVIRONMENT', 'TESTNET')
-        
-        if environment == 'PRODUCTION':
+        if snapshot.environment == 'PRODUCTION':
             required_vars.extend([
-                'BINANCE_API_KEY_PROD',
-                'BINANCE_SECRET_KEY_PROD'
+                'binance_api_key_prod',
+                'binance_secret_key_prod'
             ])
         else:
             warnings.append("🟡 Ejecutando en modo TESTNET")
-        
+
         # Verificar variables opcionales pero recomendadas
-        telegram_token = self.get_env_var('TELEGRAM_TOKEN_FINANCIAL')
+        telegram_token = snapshot.telegram_token_financial
         if not telegram_token or 'YOUR_TELEGRAM_BOT_TOKEN_HERE' in telegram_token:
             warnings.append("🟡 Token de Telegram no configurado correctamente")
-        
+
         # Mostrar advertencias
         for warning in warnings:
-            print(warning)
-        
-        return len(required_vars) == 0 or all(os.getenv(var) for var in required_vars)
+            self._log(warning)
+
+        return all(getattr(snapshot, var) for var in required_vars)
 
     # Métodos específicos para cada tipo de configuración
     def get_binance_config(self):
         """Obtener configuración de Binance"""
-        environment = self.get_env_var('ENVIRONMENT', 'TESTNET')
-        
-        if environment == 'PRODUCTION':
-            return {
-                'api_key': self.get_env_var('BINANCE_API_KEY_PROD', required=True),
-                'secret_key': self.get_env_var('BINANCE_SECRET_KEY_PROD', required=True),
-                'testnet': False
-            }
-        else:
-            return {
-                'api_key': self.get_env_var('BINANCE_API_KEY_TESTNET', 'demo_key'),
-                'secret_key': self.get_env_var('BINANCE_SECRET_KEY_TESTNET', 'demo_secret'),
-                'testnet': True
-            }
-    
+        snapshot = self.snapshot
+        binance = snapshot.binance
+
+        if not binance['testnet']:
+            if not binance['api_key']:
+                raise ValueError("❌ Variable requerida no encontrada: BINANCE_API_KEY_PROD")
+            if not binance['secret_key']:
+                raise ValueError("❌ Variable requerida no encontrada: BINANCE_SECRET_KEY_PROD")
+        return dict(binance)
+
     def get_telegram_config(self, bot_type='financial'):
         """Obtener configuración de Telegram"""
+        snapshot = self.snapshot
         if bot_type == 'financial':
             return {
-                'token': self.get_env_var('TELEGRAM_TOKEN_FINANCIAL'),
-                'chat_id': self.get_env_var('TELEGRAM_CHAT_ID')
+                'token': snapshot.telegram_token_financial,
+                'chat_id': snapshot.telegram_chat_id
             }
         else:
             return {
-                'token': self.get_env_var('TELEGRAM_TOKEN_CRYPTO'),
-                'chat_id': self.get_env_var('TELEGRAM_CHAT_ID_CRYPTO', 
-                                          self.get_env_var('TELEGRAM_CHAT_ID'))
+                'token': snapshot.telegram_token_crypto,
+                'chat_id': snapshot.telegram_chat_id_crypto or snapshot.telegram_chat_id
             }
-    
+
     def get_trading_config(self):
         """Obtener configuración de trading"""
-        return {
-            'initial_balance_crypto': float(self.get_env_var('INITIAL_BALANCE_CRYPTO', '20.0')),
-            'balance_per_bot': float(self.get_env_var('BALANCE_PER_BOT', '10.0')),
-            'balance_per_stock': float(self.get_env_var('BALANCE_PER_STOCK', '1000.0')),
-            'max_daily_trades': int(self.get_env_var('MAX_DAILY_TRADES', '50')),
-            'max_position_size': float(self.get_env_var('MAX_POSITION_SIZE', '0.1')),
-            'stop_loss_limit': float(self.get_env_var('STOP_LOSS_LIMIT', '0.05'))
-        }
-    
+        return dict(self.snapshot.trading)
+
     def get_gcp_config(self):
         """Obtener configuración de Google Cloud"""
-        return {
-            'project_id': self.get_env_var('GCP_PROJECT_ID', 'galvanized-env-376523'),
-            'zone': self.get_env_var('GCP_ZONE', 'asia-southeast1-a'),
-            'vm_crypto': self.get_env_var('GCP_VM_CRYPTO', 'bot-trading-asia'),
-            'vm_ml': self.get_env_var('GCP_VM_ML', 'bot-trading-ml')
-        }
+        return dict(self.snapshot.gcp)
+
+
+_config = None
+_config_lock = threading.Lock()
+
+
+def get_config():
+    """Instancia global, creada la primera vez que se usa"""
+    global _config
+    if _config is None:
+        with _config_lock:
+            if _config is None:
+                _config = SecureConfig()
+    return _config
+
+
+def __getattr__(name):
+    # `from secure_config import config` sigue funcionando, pero sin cargar nada al importar
+    if name == 'config':
+        return get_config()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def install_reload_handler():
+    """Recargar la configuración al recibir SIGHUP (solo Unix, hilo principal)"""
+    if not hasattr(signal, 'SIGHUP'):
+        return False
+
+    def handle_sighup(signum, frame):
+        get_config().reload()
+
+    signal.signal(signal.SIGHUP, handle_sighup)
+    return True
 
-# Instancia global para fácil acceso
-config = SecureConfig()
 
 # Funciones de conveniencia
 def get_binance_keys():
     """Función simple para obtener claves de Binance"""
-    return config.get_binance_config()
+    return get_config().get_binance_config()
 
 def get_telegram_keys(bot_type='financial'):
     """Función simple para obtener claves de Telegram"""
-    return config.get_telegram_config(bot_type)
+    return get_config().get_telegram_config(bot_type)
 
 def is_production():
     """Verificar si estamos en producción"""
-    return config.get_env_var('ENVIRONMENT', 'TESTNET').upper() == 'PRODUCTION'
+    return get_config().snapshot.is_production
 
 def safe_start_message():
     """Mensaje seguro de inicio"""
-    environment = config.get_env_var('ENVIRONMENT', 'TESTNET')
-    binance_config = config.get_binance_config()
-    
+    snapshot = get_config().snapshot
+    binance_config = get_binance_keys()
+
     print("🤖 Configuración de seguridad cargada:")
-    print(f"🌍 Ambiente: {environment}")
+    print(f"🌍 Ambiente: {snapshot.environment}")
     print(f"🔐 Binance: {'Producción' if not binance_config['testnet'] else 'Testnet'}")
-    
-    if environment == 'PRODUCTION':
+
+    if snapshot.environment == 'PRODUCTION':
         print("⚠️  ¡EJECUTANDO EN PRODUCCIÓN! Verificar configuración")
         return input("¿Continuar? (yes/no): ").lower() == 'yes'
-    
+
     return True
 
 if __name__ == "__main__":
     print("🔒 Probando configuración segura...")
-    
+    if load_dotenv is None:
+        print("⚠️  python-dotenv no instalado. Instala con: pip install python-dotenv")
+
+    config = get_config()
+    config.verbose = True
+    config.validate_required_vars()
+    snapshot = config.snapshot
+
     # Probar todas las configuraciones
     print("\n📡 Configuración Binance:")
-    binance = config.get_binance_config()
-    
+    for key, value in config.get_binance_config().items():
+        print(f"🔧 {key}: {mask_value(key, value) if isinstance(value, str) else value}")
+
     print("\n📱 Configuración Telegram:")
-    telegram = config.get_telegram_config()
-    
+    for key, value in config.get_telegram_config().items():
+        print(f"🔧 {key}: {mask_value(key, value)}")
+
     print("\n💰 Configuración Trading:")
-    trading = config.get_trading_config()
-    
+    for key, value in config.get_trading_config().items():
+        print(f"🔧 {key}: {value}")
+
     print("\n☁️  Configuración GCP:")
-    gcp = config.get_gcp_config()
-    
-    print("\n✅ Configuración completada correctamente!")
\ No newline at end of file
+    for key, value in config.get_gcp_config().items():
+        print(f"🔧 {key}: {value}")
+
+    print("\n✅ Configuración completada correctamente!")
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+💾 DIARIO DE ESTADO A PRUEBA DE CAÍDAS
+=======================================
+Cada cambio de estado del bot (posición abierta, balance, contadores) se
+agrega a un diario SQLite en modo WAL antes de seguir; cada N entradas se
+compacta en una instantánea. Al arrancar, el bot reconstruye su estado con
+la instantánea + las entradas posteriores, así una caída no pierde la
+posición real abierta.
+
+Uso:
+    journal = StateJournal('ml_real')
+    state = journal.restore()            # {} si es la primera vez
+    journal.record('open', current_position=position, balance=balance)
+"""
+
+import os
+import json
+import time
+import sqlite3
+import datetime
+import threading
+from pathlib import Path
+
+STATE_DIR = Path(__file__).parent
+
+# Entradas del diario entre instantáneas compactadas
+SNAPSHOT_EVERY = 200
+
+
+def get_state_path(name):
+    """Ruta de la base de estado (se puede sobreescribir con STATE_DB_<BOT>)"""
+    env_value = os.getenv(f"STATE_DB_{name.upper()}")
+    if env_value:
+        return Path(env_value)
+    return STATE_DIR / f"{name}_state.db"
+
+
+def _encode(value):
+    """JSON con fechas (entry_time, etc.) y tipos numpy"""
+    if isinstance(value, datetime.datetime):
+        return {'__datetime__': value.isoformat()}
+    if hasattr(value, 'item'):
+        return value.item()
+    raise TypeError(f"Tipo no serializable en el estado: {type(value).__name__}")
+
+
+def _decode(obj):
+    if '__datetime__' in obj and len(obj) == 1:
+        return datetime.datetime.fromisoformat(obj['__datetime__'])
+    return obj
+
+
+class StateJournal:
+    """Diario de estado de un bot sobre SQLite (WAL)"""
+
+    def __init__(self, name, path=None, snapshot_every=SNAPSHOT_EVERY):
+        self.name = name
+        self.path = Path(path) if path else get_state_path(name)
+        self.snapshot_every = snapshot_every
+        self.state = {}
+        self._pending = 0
+        self._lock = threading.Lock()
+
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+        # WAL + synchronous=NORMAL: cada commit es un append al WAL sin fsync (microsegundos)
+        # y sobrevive a la caída del proceso; el fsync ocurre en los checkpoints.
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS journal (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                ts REAL NOT NULL,
+                event TEXT NOT NULL,
+                changes TEXT NOT NULL
+            )""")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS snapshot (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                seq INTEGER NOT NULL,
+                ts REAL NOT NULL,
+                state TEXT NOT NULL
+            )""")
+
+    def restore(self):
+        """Reconstruir el estado: instantánea + entradas posteriores del diario"""
+        with self._lock:
+            state = {}
+            last_seq = 0
+            row = self._conn.execute("SELECT seq, state FROM snapshot WHERE id = 1").fetchone()
+            if row:
+                last_seq, payload = row
+                state = json.loads(payload, object_hook=_decode)
+
+            rows = self._conn.execute(
+                "SELECT changes FROM journal WHERE seq > ? ORDER BY seq", (last_seq,)).fetchall()
+            for (payload,) in rows:
+                state.update(json.loads(payload, object_hook=_decode))
+
+            self.state = state
+            self._pending = len(rows)
+            return dict(state)
+
+    def record(self, event, **changes):
+        """Agregar un cambio de estado al diario (claves de primer nivel, se reemplazan)"""
+        payload = json.dumps(changes, default=_encode, separators=(',', ':'))
+        with self._lock:
+            self._conn.execute("INSERT INTO journal (ts, event, changes) VALUES (?, ?, ?)",
+                               (time.time(), event, payload))
+            self.state.update(changes)
+            self._pending += 1
+            if self._pending >= self.snapshot_every:
+                self._compact()
+
+    def compact(self):
+        """Guardar una instantánea del estado y descartar las entradas ya incluidas"""
+        with self._lock:
+            self._compact()
+
+    def _compact(self):
+        payload = json.dumps(self.state, default=_encode, separators=(',', ':'))
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            (last_seq,) = self._conn.execute("SELECT COALESCE(MAX(seq), 0) FROM journal").fetchone()
+            self._conn.execute("INSERT OR REPLACE INTO snapshot (id, seq, ts, state) VALUES (1, ?, ?, ?)",
+                               (last_seq, time.time(), payload))
+            self._conn.execute("DELETE FROM journal WHERE seq <= ?", (last_seq,))
+            self._conn.execute("COMMIT")
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
+        self._pending = 0
+
+    def history(self, limit=20):
+        """Últimos eventos del diario (para diagnóstico)"""
+        rows = self._conn.execute(
+            "SELECT seq, ts, event, changes FROM journal ORDER BY seq DESC LIMIT ?", (limit,)).fetchall()
+        return [{'seq': seq, 'time': datetime.datetime.fromtimestamp(ts), 'event': event,
+                 'changes': json.loads(changes, object_hook=_decode)}
+                for seq, ts, event, changes in reversed(rows)]
+
+    def close(self):
+        """Compactar y cerrar la base"""
+        with self._lock:
+            if self._pending:
+                self._compact()
+            self._conn.close()
+
+
+if __name__ == "__main__":
+    # Inspeccionar el estado guardado: python state_journal.py ml_real
+    import sys
+
+    for bot_name in sys.argv[1:]:
+        path = get_state_path(bot_name)
+        if not path.exists():
+            print(f"⚪ {bot_name}: sin estado guardado ({path})")
+            continue
+        journal = StateJournal(bot_name)
+        print(f"💾 {bot_name}: {json.dumps(journal.restore(), default=_encode, indent=2)}")
+        for entry in journal.history():
+            print(f"   #{entry['seq']} {entry['time']:%Y-%m-%d %H:%M:%S} {entry['event']}")
@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""
+📏 FILTROS DEL SÍMBOLO (tickSize / stepSize)
+============================================
+Redondeo de precios y cantidades al múltiplo que exige Binance y su formato
+para la API. Binance rechaza la notación científica (-1100 "Illegal
+characters found in parameter 'quantity'"): 0.00009 BTC tiene que viajar como
+"0.00009", no como 9e-05, que es lo que produce urlencode con un float.
+
+Uso:
+    quantity = format_step(0.00009123, 0.00001)          # '0.00009'
+    price = format_step(65336.051, 0.01, up=True)         # '65336.06'
+"""
+
+import math
+
+
+def _decimals(step):
+    return max(0, -int(math.floor(math.log10(step)))) if step else 8
+
+
+def round_step(value, step, up=False):
+    """Redondear precio o cantidad al múltiplo del filtro del símbolo"""
+    if not step:
+        return value
+    steps = value / step
+    steps = math.ceil(steps - 1e-9) if up else math.floor(steps + 1e-9)
+    return round(steps * step, _decimals(step))
+
+
+def format_step(value, step, up=False):
+    """round_step como texto en punto fijo con los decimales del filtro (parámetro de la API)"""
+    return f"{round_step(value, step, up=up):.{_decimals(step)}f}"
+
+
+if __name__ == "__main__":
+    # Prueba rápida: python symbol_filters.py
+    assert round_step(0.00009123, 0.00001) == 0.00009
+    assert format_step(0.0001 * (1 - 0.001), 0.00001) == '0.00009'
+    assert format_step(0.00009, 0.00001) != str(0.00009)  # str(0.00009) == '9e-05'
+    assert format_step(65336.051, 0.01, up=True) == '65336.06'
+    assert format_step(1.5, 1.0) == '1'
+    assert format_step(0.12345678, 0.0) == '0.12345678'
+    print("✅ Cantidades y precios en punto fijo con los decimales del filtro")
@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+"""
+📉 VOLATILIDAD INCREMENTAL POR SÍMBOLO (EWMA + ATR)
+===================================================
+Los bots recalculaban la volatilidad descargando velas cada vez que la
+necesitaban (30 días por trade en BotFinanciero, 50 velas por iteración en
+CloudMLBot). Acá cada símbolo tiene un estimador que se actualiza con las
+velas que ya llegan al bot y entrega la estimación actual en O(1):
+
+- EWMA de retornos al cuadrado (estilo RiskMetrics, media cero) con los
+  pesos ajustados de pandas ewm(adjust=True), así no hace falta semilla.
+- ATR de Wilder (true range con alpha = 1/periodo) y ATR / precio.
+
+La última vela suele estar en formación: se guarda aparte y se vuelve a
+aplicar sobre el estado confirmado cada vez que cambia, sin recorrer la
+historia. Solo se procesan las velas más nuevas que la última vista.
+
+Uso:
+    book = VolatilityBook(span=50, atr_period=25)
+    book.update_frame('BTCUSDT', df)               # velas nuevas de un DataFrame
+    estimator = book.get('BTCUSDT')                # estimator.ewma_vol, estimator.atr_pct
+    vols, _ = book.vectors(['AAPL', 'MSFT'])
+    shares = position_sizes(1000.0, prices, vols)  # todo el lote en una llamada
+"""
+
+import math
+import numpy as np
+
+DEFAULT_SPAN = 50
+DEFAULT_ATR_PERIOD = 25      # Wilder 1/25: la misma memoria que un EWMA de span 50
+MIN_BARS = 10                # Velas antes de dar una estimación
+
+# Sizing por volatilidad: factor = TARGET_VOLATILITY / volatilidad, acotado
+TARGET_VOLATILITY = 0.01
+FACTOR_FLOOR = 0.5
+FACTOR_CAP = 2.0
+
+# Estado confirmado: (time, close, suma r², peso r², suma TR, peso TR, velas)
+_EMPTY = (None, None, 0.0, 0.0, 0.0, 0.0, 0)
+
+
+def _step(state, time, close, high, low, decay, atr_decay):
+    """Aplicar una vela al estado (sin modificarlo)"""
+    _, prev_close, var_sum, var_weight, tr_sum, tr_weight, count = state
+    if prev_close is None:
+        true_range = high - low
+    else:
+        true_range = max(high - low, abs(high - prev_close), abs(low - prev_close))
+        ret = close / prev_close - 1.0
+        var_sum = decay * var_sum + ret * ret
+        var_weight = decay * var_weight + 1.0
+    return (time, close, var_sum, var_weight, atr_decay * tr_sum + true_range, atr_decay * tr_weight + 1.0, count + 1)
+
+
+class VolatilityEstimator:
+    """Volatilidad EWMA y ATR de un símbolo, actualizada vela a vela"""
+
+    def __init__(self, span=DEFAULT_SPAN, atr_period=DEFAULT_ATR_PERIOD, min_bars=MIN_BARS):
+        self.span = span
+        self.atr_period = atr_period
+        self.min_bars = min_bars
+        self.decay = 1.0 - 2.0 / (span + 1.0)
+        self.atr_decay = 1.0 - 1.0 / atr_period
+        self._committed = _EMPTY
+        self._pending = None
+        self._current = _EMPTY
+
+    def update(self, time, close, high=None, low=None):
+        """Agregar o corregir la última vela (las anteriores a ella se ignoran)"""
+        close = float(close)
+        high = close if high is None else float(high)
+        low = close if low is None else float(low)
+        pending = self._pending
+        if pending is not None:
+            if time < pending[0]:
+                return
+            if time > pending[0]:
+                self._committed = _step(self._committed, *pending, self.decay, self.atr_decay)
+        self._pending = (time, close, high, low)
+        self._current = _step(self._committed, time, close, high, low, self.decay, self.atr_decay)
+
+    def update_bars(self, times, close, high=None, low=None):
+        """Aplicar solo las velas desde la última vista (la primera vez, todas)"""
+        times = np.asarray(times)
+        start = 0 if self._pending is None else int(np.searchsorted(times, self._pending[0], side='left'))
+        if start >= len(times):
+            return
+        close = np.asarray(close, dtype=np.float64)
+        high = close if high is None else np.asarray(high, dtype=np.float64)
+        low = close if low is None else np.asarray(low, dtype=np.float64)
+        for i in range(start, len(times)):
+            self.update(times[i].item(), close[i], high[i], low[i])
+
+    @property
+    def count(self):
+        return self._current[6]
+
+    @property
+    def last_time(self):
+        return self._current[0]
+
+    @property
+    def ready(self):
+        return self.count >= self.min_bars
+
+    @property
+    def ewma_vol(self):
+        """Desvío EWMA de los retornos por vela (NaN sin velas suficientes)"""
+        var_sum, var_weight = self._current[2], self._current[3]
+        if not self.ready or var_weight == 0:
+            return math.nan
+        return math.sqrt(var_sum / var_weight)
+
+    @property
+    def atr(self):
+        if not self.ready:
+            return math.nan
+        return self._current[4] / self._current[5]
+
+    @property
+    def atr_pct(self):
+        """ATR relativo al último cierre"""
+        return self.atr / self._current[1] if self.ready else math.nan
+
+
+class VolatilityBook:
+    """Un estimador por símbolo con las mismas opciones"""
+
+    def __init__(self, span=DEFAULT_SPAN, atr_period=DEFAULT_ATR_PERIOD, min_bars=MIN_BARS):
+        self.options = {'span': span, 'atr_period': atr_period, 'min_bars': min_bars}
+        self.estimators = {}
+
+    def _estimator(self, symbol):
+        estimator = self.estimators.get(symbol)
+        if estimator is None:
+            estimator = self.estimators[symbol] = VolatilityEstimator(**self.options)
+        return estimator
+
+    def update(self, symbol, times, close, high=None, low=None):
+        estimator = self._estimator(symbol)
+        estimator.update_bars(times, close, high, low)
+        return estimator
+
+    def update_frame(self, symbol, frame):
+        """Velas de un DataFrame de Binance (timestamp, high, low, close) o de yfinance (índice, High, Low, Close)"""
+        columns = {column.lower(): column for column in frame.columns}
+        if 'timestamp' in columns:
+            times = frame[columns['timestamp']].to_numpy(dtype=np.int64)
+        else:
+            times = frame.index.asi8
+        return self.update(symbol, times, frame[columns['close']].to_numpy(dtype=np.float64),
+                           frame[columns['high']].to_numpy(dtype=np.float64),
+                           frame[columns['low']].to_numpy(dtype=np.float64))
+
+    def get(self, symbol):
+        """Estimador listo del símbolo (None si no hay velas suficientes)"""
+        estimator = self.estimators.get(symbol)
+        return estimator if estimator is not None and estimator.ready else None
+
+    def vectors(self, symbols):
+        """(volatilidad EWMA, ATR / precio) por símbolo; NaN si no hay estimación"""
+        ewma = np.full(len(symbols), np.nan)
+        atr = np.full(len(symbols), np.nan)
+        for i, symbol in enumerate(symbols):
+            estimator = self.get(symbol)
+            if estimator is not None:
+                ewma[i] = estimator.ewma_vol
+                atr[i] = estimator.atr_pct
+        return ewma, atr
+
+
+def volatility_factors(vol, target=TARGET_VOLATILITY, floor=FACTOR_FLOOR, cap=FACTOR_CAP):
+    """Factor de tamaño inverso a la volatilidad; 1.0 donde no hay estimación"""
+    vol = np.asarray(vol, dtype=np.float64)
+    with np.errstate(divide='ignore'):
+        factors = np.clip(target / vol, floor, cap)
+    return np.where(np.isfinite(vol) & (vol > 0), factors, 1.0)
+
+
+def position_sizes(balance, prices, vol, **factor_options):
+    """Unidades por señal: balance x factor de volatilidad / precio (vectorizado)"""
+    return np.asarray(balance, dtype=np.float64) * volatility_factors(vol, **factor_options) / np.asarray(prices, dtype=np.float64)
+
+
+def _synthetic_frame(n, seed=0):
+    """Velas sintéticas de 1m como DataFrame de Binance"""
+    import pandas as pd
+    from indicators import synthetic_candles
+
+    close, volume, high, low = synthetic_candles(n, seed)
+    open_ = np.concatenate([[close[0]], close[:-1]])
+    return pd.DataFrame({'timestamp': 1_700_000_000_000 + np.arange(n, dtype=np.int64) * 60_000,
+                         'open': open_, 'high': np.maximum(high, open_), 'low': np.minimum(low, open_),
+                         'close': close, 'volume': volume})
+
+
+def check_equivalence(n=2000, seed=0):
+    """El estimador incremental (con la última vela corregida) contra pandas"""
+    import pandas as pd
+
+    df = _synthetic_frame(n, seed)
+    estimator = VolatilityEstimator()
+    # Cada vela llega primero a medio formar y después cerrada (la última queda pendiente)
+    for i in range(n):
+        row = df.iloc[i]
+        estimator.update(int(row['timestamp']), (row['open'] + row['close']) / 2, row['high'], row['low'])
+        estimator.update_bars(df['timestamp'].to_numpy()[:i + 1], df['close'].to_numpy()[:i + 1],
+                              df['high'].to_numpy()[:i + 1], df['low'].to_numpy()[:i + 1])
+
+    returns = df['close'].pct_change()
+    expected_vol = np.sqrt((returns ** 2).ewm(span=DEFAULT_SPAN, adjust=True).mean().iloc[-1])
+    prev_close = df['close'].shift()
+    true_range = pd.concat([df['high'] - df['low'], (df['high'] - prev_close).abs(),
+                            (df['low'] - prev_close).abs()], axis=1).max(axis=1)
+    expected_atr = true_range.ewm(alpha=1 / DEFAULT_ATR_PERIOD, adjust=True).mean().iloc[-1]
+    assert math.isclose(estimator.ewma_vol, expected_vol, rel_tol=1e-9), (estimator.ewma_vol, expected_vol)
+    assert math.isclose(estimator.atr, expected_atr, rel_tol=1e-9), (estimator.atr, expected_atr)
+    print(f"✅ EWMA {estimator.ewma_vol:.6f} y ATR {estimator.atr:.2f} iguales a pandas ({n} velas)")
+
+
+def run_benchmark(loops=2000, universe_size=200):
+    """Estimación por iteración: recalcular sobre 50 velas vs actualizar el estimador"""
+    import time
+
+    df = _synthetic_frame(1000)
+    window = df.iloc[-50:]
+    start = time.perf_counter()
+    for _ in range(loops):
+        returns = window['close'].pct_change().dropna()
+        (returns.std() + (window['high'] - window['low']).mean() / window['close'].mean()) / 2
+    recompute_us = (time.perf_counter() - start) / loops * 1e6
+
+    book = VolatilityBook()
+    book.update_frame('BENCH', df.iloc[:-1])
+    last = df.iloc[-2:]
+    start = time.perf_counter()
+    for _ in range(loops):
+        book.update_frame('BENCH', last)
+        estimator = book.get('BENCH')
+        (estimator.ewma_vol + estimator.atr_pct) / 2
+    incremental_us = (time.perf_counter() - start) / loops * 1e6
+
+    symbols = [f"SYM{i}" for i in range(universe_size)]
+    for i, symbol in enumerate(symbols):
+        book.update_frame(symbol, _synthetic_frame(60, seed=i))
+    prices = np.random.default_rng(0).uniform(10, 500, universe_size)
+    start = time.perf_counter()
+    for _ in range(loops // 10):
+        vols, _ = book.vectors(symbols)
+        position_sizes(1000.0, prices, vols)
+    batch_us = (time.perf_counter() - start) / (loops // 10) * 1e6
+
+    print(f"📉 Volatilidad por iteración: recalcular 50 velas {recompute_us:.1f} µs | incremental {incremental_us:.1f} µs "
+          f"(x{recompute_us / incremental_us:.0f})")
+    print(f"📦 Sizing de {universe_size} señales en un lote: {batch_us:.1f} µs")
+
+
+if __name__ == "__main__":
+    check_equivalence()
+    run_benchmark()